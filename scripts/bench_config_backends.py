@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""保存形式ごとに、複数プロセスからの同時書き込みと読み込みを計測する.
+
+使い方: python scripts/bench_config_backends.py [--writers N] [--readers N]
+        [--updates N] [--projects N] [--windows N] [layout ...]
+
+hook の同時発火を想定し、N 個の書き込みプロセスがそれぞれ別のプロジェクトへ
+update_project() を繰り返す間、読み込みプロセスが load() を繰り返す。
+一時ディレクトリで実行するので ~/.itmux には触れない。
+"""
+
+import argparse
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from itmux.config import ConfigManager  # noqa: E402
+from itmux.config_store import CONFIG_LAYOUTS  # noqa: E402
+from itmux.models import WindowConfig  # noqa: E402
+
+
+def _percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _writer(
+    config_path: Path, layout: str, project: str, updates: int, windows: int, start, queue
+) -> None:
+    manager = ConfigManager(config_path, layout=layout)
+    start.wait()
+    latencies = []
+    for i in range(updates):
+        # 毎回内容を変えて、書き込み省略が起きないようにする
+        names = [f"w{i}-{n}" for n in range(windows)]
+        started = time.perf_counter()
+        manager.update_project(project, [WindowConfig(name=name) for name in names])
+        latencies.append(time.perf_counter() - started)
+    queue.put(("write", latencies, manager.write_stats.conflicts))
+
+
+def _reader(config_path: Path, layout: str, done, start, queue) -> None:
+    manager = ConfigManager(config_path, layout=layout)
+    start.wait()
+    latencies = []
+    while not done.is_set():
+        started = time.perf_counter()
+        manager.load()
+        latencies.append(time.perf_counter() - started)
+    queue.put(("read", latencies, 0))
+
+
+def run(layout: str, args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = Path(tmp) / "config.json"
+        manager = ConfigManager(config_path, layout=layout)
+        with manager.transaction():
+            for n in range(args.projects):
+                manager.create_project(
+                    f"project-{n}", [WindowConfig(name=f"w{i}") for i in range(args.windows)]
+                )
+
+        ctx = multiprocessing.get_context("spawn")
+        start, done, queue = ctx.Event(), ctx.Event(), ctx.Queue()
+        writers = [
+            ctx.Process(
+                target=_writer,
+                args=(
+                    config_path,
+                    layout,
+                    f"project-{n % args.projects}",
+                    args.updates,
+                    args.windows,
+                    start,
+                    queue,
+                ),
+            )
+            for n in range(args.writers)
+        ]
+        readers = [
+            ctx.Process(target=_reader, args=(config_path, layout, done, start, queue))
+            for _ in range(args.readers)
+        ]
+        for process in writers + readers:
+            process.start()
+
+        started = time.perf_counter()
+        start.set()
+        # Queue を読む前に join するとパイプが詰まることがあるので、書き込み側の結果を先に受け取る
+        results = [queue.get() for _ in writers]
+        elapsed = time.perf_counter() - started
+        done.set()
+        results += [queue.get() for _ in readers]
+        for process in writers + readers:
+            process.join()
+
+        writes = [s for kind, latencies, _ in results if kind == "write" for s in latencies]
+        reads = [s for kind, latencies, _ in results if kind == "read" for s in latencies]
+        return {
+            "elapsed": elapsed,
+            "writes_per_sec": len(writes) / elapsed,
+            "write_p50": statistics.median(writes),
+            "write_p95": _percentile(writes, 0.95),
+            "read_p95": _percentile(reads, 0.95) if reads else 0.0,
+            "conflicts": sum(conflicts for _, _, conflicts in results),
+        }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("layouts", nargs="*", default=list(CONFIG_LAYOUTS))
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--updates", type=int, default=50)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--windows", type=int, default=8)
+    args = parser.parse_args()
+
+    print(
+        f"{args.writers} writers x {args.updates} updates, {args.readers} readers, "
+        f"{args.projects} projects x {args.windows} windows"
+    )
+    print(f"{'layout':<8} {'writes/s':>9} {'w p50':>8} {'w p95':>8} {'r p95':>8} {'conflicts':>9}")
+    for layout in args.layouts:
+        result = run(layout, args)
+        print(
+            f"{layout:<8} {result['writes_per_sec']:>9.0f} "
+            f"{result['write_p50'] * 1000:>6.1f}ms {result['write_p95'] * 1000:>6.1f}ms "
+            f"{result['read_p95'] * 1000:>6.1f}ms {result['conflicts']:>9}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
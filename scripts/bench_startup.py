@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""サブコマンドごとのコールドスタート時間を計測し、予算超過で失敗する.
+
+使い方: python scripts/bench_startup.py [--runs N] [command ...]
+
+計測結果は ~/.itmux/metrics.json（ITMUX_METRICS_PATH）の
+startup.<command> ヒストグラムに記録する。
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from itmux.metrics import MetricsStore  # noqa: E402
+from itmux.startup import STARTUP_BUDGETS, check_budget, profile_command  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("commands", nargs="*", default=list(STARTUP_BUDGETS))
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    metrics = MetricsStore()
+    failures = []
+    print(f"{'command':<18} {'wall':>8} {'import':>8} {'budget':>8}")
+    for command in args.commands:
+        # 最速の1回で判定する（ディスクキャッシュ等の揺れを除く）
+        profiles = [profile_command(command) for _ in range(args.runs)]
+        best = min(profiles, key=lambda p: p.import_seconds)
+        for profile in profiles:
+            metrics.observe(f"startup.{command}", profile.wall_seconds)
+        failures.extend(check_budget(best))
+        print(
+            f"{command:<18} {best.wall_seconds * 1000:>6.0f}ms "
+            f"{best.import_seconds * 1000:>6.0f}ms "
+            f"{STARTUP_BUDGETS[command].import_ms:>6.0f}ms"
+        )
+
+    for failure in failures:
+        print(f"✗ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,44 +1,48 @@
-"""iTmux CLI entry point."""
+"""iTmux CLI entry point.
+
+hook から頻繁に起動されるため、モジュール読み込み時には click と標準ライブラリ
+だけを import する。iterm2 / pydantic / asyncio を使うモジュールは、
+必要なコマンドの中で import する。
+"""
 
-import asyncio
 import os
 import sys
 import click
-import iterm2
 from pathlib import Path
 
-from .config import ConfigManager, DEFAULT_CONFIG_PATH
-from .orchestrator import ProjectOrchestrator
-from .iterm2 import ITerm2Bridge
 from .exceptions import (
     ProjectNotFoundError,
     ProjectNotOpenError,
     ITerm2Error,
     ConfigError,
     CwdError,
+    DaemonError,
+    RestoreError,
 )
 
 
-async def get_orchestrator() -> ProjectOrchestrator:
-    """iTerm2に接続してOrchestratorインスタンスを作成."""
-    connection = await iterm2.Connection.async_create()
-    app = await iterm2.async_get_app(connection)
+async def get_orchestrator():
+    """Orchestratorインスタンスを作成.
+
+    iTerm2への接続はブリッジを初めて使うときまで遅延する
+    （save / current / list では接続しない）。
+    """
+    from .orchestrator import ProjectOrchestrator
 
-    # 環境変数があれば優先、なければDEFAULT_CONFIG_PATHを使用
-    config_path_str = os.environ.get("ITMUX_CONFIG_PATH")
-    config_path = Path(config_path_str) if config_path_str else DEFAULT_CONFIG_PATH
+    config_manager = get_config_manager()
+    return ProjectOrchestrator(config_manager, metrics=config_manager.metrics)
 
-    config_manager = ConfigManager(config_path)
-    bridge = ITerm2Bridge(connection, app)
 
-    return ProjectOrchestrator(config_manager, bridge)
+def get_config_manager():
+    """ConfigManager インスタンスを作成（ITMUX_CONFIG_PATH 対応）.
 
+    メトリクスはプロセス内に溜め、終了時に1回だけ書き込む。
+    """
+    from .config import ConfigManager
+    from .metrics import process_metrics
+    from .readonly import get_config_path
 
-def get_config_manager() -> ConfigManager:
-    """ConfigManager インスタンスを作成（ITMUX_CONFIG_PATH 対応）."""
-    config_path_str = os.environ.get("ITMUX_CONFIG_PATH")
-    config_path = Path(config_path_str) if config_path_str else DEFAULT_CONFIG_PATH
-    return ConfigManager(config_path)
+    return ConfigManager(get_config_path(), metrics=process_metrics())
 
 
 def handle_config_errors(func):
@@ -92,6 +96,8 @@ def run_async_command(coro, success_message: str, handle_value_error: bool = Fal
         success_message: 成功時のメッセージ
         handle_value_error: ValueErrorをハンドリングするか
     """
+    import asyncio
+
     try:
         asyncio.run(coro)
         click.echo(success_message)
@@ -115,6 +121,12 @@ def run_async_command(coro, success_message: str, handle_value_error: bool = Fal
     except ConfigError as e:
         click.echo(f"✗ Config Error: {e}", err=True)
         sys.exit(1)
+    except DaemonError as e:
+        click.echo(f"✗ Daemon Error: {e}", err=True)
+        sys.exit(1)
+    except RestoreError as e:
+        click.echo(f"✗ Restore Error: {e}", err=True)
+        sys.exit(1)
     except Exception as e:
         click.echo(f"✗ Unexpected error: {e}", err=True)
         sys.exit(1)
@@ -134,23 +146,78 @@ def main():
 @main.command()
 @click.argument("project")
 @click.option("--no-default", is_flag=True, help="Do not create default window if project has no windows")
-def open(project: str, no_default: bool):
+@click.option("--staged", is_flag=True,
+              help="Return once the first window is ready; open the rest in the background")
+@click.option("--restore-all", is_flag=True,
+              help="When tmux is not running, also restore the other saved sessions in the background")
+def open(project: str, no_default: bool, staged: bool, restore_all: bool):
     """Open or restore a project window set."""
     async def _open():
         orchestrator = await get_orchestrator()
-        await orchestrator.open(project, create_default=not no_default)
+        await orchestrator.open(
+            project, create_default=not no_default, staged=staged, restore_others=restore_all
+        )
 
     run_async_command(_open(), f"✓ Opened project: {project}")
 
 
+@main.command(hidden=True)
+@click.argument("project")
+@click.option("--started-at", type=float, default=None, help="Wall-clock start time of the staged open")
+def materialize(project: str, started_at: float | None):
+    """Open the remaining windows of a staged open (background worker)."""
+    def report(done: int, total: int) -> None:
+        click.echo(f"[materialize] {project}: {done}/{total} windows ready", err=True)
+
+    async def _materialize():
+        orchestrator = await get_orchestrator()
+        await orchestrator.materialize(project, started_at=started_at, progress=report)
+
+    run_async_command(_materialize(), f"✓ Materialized project: {project}")
+
+
+@main.command(hidden=True)
+@click.argument("projects", nargs=-1, required=True)
+def restore(projects: tuple[str, ...]):
+    """Restore saved sessions from their layout snapshots (background worker)."""
+    async def _restore():
+        orchestrator = await get_orchestrator()
+        orchestrator.restore_sessions(list(projects))
+
+    run_async_command(_restore(), f"✓ Restored sessions: {', '.join(projects)}")
+
+
 @main.command()
 @click.argument("project", required=False)
 @click.option("--all", is_flag=True, help="Sync all projects (check session existence)")
-def sync(project: str | None, all: bool):
+@click.option("--window-event", type=click.Choice(["added", "removed"]), hidden=True)
+@click.option("--window-id", hidden=True)
+@click.option("--window-index", type=int, hidden=True)
+@click.option("--window-name", hidden=True)
+def sync(
+    project: str | None,
+    all: bool,
+    window_event: str | None,
+    window_id: str | None,
+    window_index: int | None,
+    window_name: str | None,
+):
     """Sync project configuration with current tmux session state."""
+    # hook から渡されたウィンドウの変更（差分同期）
+    event = None
+    if window_event and window_id:
+        event = {"kind": window_event, "window_id": window_id, "index": window_index, "name": window_name}
+
     async def _sync():
+        from .daemon import forward_to_daemon
+        from .tmux.window_events import WindowEvent
+
+        if await forward_to_daemon("sync", project=project, sync_all=all, event=event):
+            return
         orchestrator = await get_orchestrator()
-        await orchestrator.sync(project, sync_all=all)
+        await orchestrator.sync(
+            project, sync_all=all, event=WindowEvent(**event) if event else None
+        )
 
     message = "✓ Synced all projects" if all else f"✓ Synced project: {project or 'current'}"
     run_async_command(_sync(), message, handle_value_error=True)
@@ -158,10 +225,23 @@ def sync(project: str | None, all: bool):
 
 @main.command()
 @click.argument("project", required=False)
-@click.option("--debounce", is_flag=True, help="Enable debounce (skip if saved within 1 second)")
-def save(project: str | None, debounce: bool):
-    """Save tmux session state with tmux-resurrect."""
+@click.option("--debounce", is_flag=True,
+              help="Coalesce rapid requests (save once after the burst settles)")
+@click.option("--deferred", is_flag=True, hidden=True,
+              help="Save debounced projects as they come due (background worker)")
+def save(project: str | None, debounce: bool, deferred: bool):
+    """Save the tmux layout snapshot of a project."""
     async def _save():
+        if deferred:
+            # hook から起動された遅延ワーカーはデーモンに転送しない
+            orchestrator = await get_orchestrator()
+            orchestrator.save_deferred()
+            return
+
+        from .daemon import forward_to_daemon
+
+        if await forward_to_daemon("save", project=project, debounce=debounce):
+            return
         orchestrator = await get_orchestrator()
         orchestrator.save(project, debounce=debounce)
 
@@ -169,11 +249,67 @@ def save(project: str | None, debounce: bool):
     run_async_command(_save(), message, handle_value_error=True)
 
 
+@main.command(hidden=True)
+@click.argument("event")
+@click.argument("project")
+@click.option("--window-id")
+@click.option("--window-index", type=int)
+@click.option("--window-name")
+def hook(
+    event: str,
+    project: str,
+    window_id: str | None,
+    window_index: int | None,
+    window_name: str | None,
+):
+    """Handle a tmux hook event (sync and/or save in one process)."""
+    from .tmux.hook_manager import HookManager
+
+    # sync / save の判定は hook 定義から行い、1プロセス・1回の保存で済ませる
+    # （sync はスナップショットの保存も行うため、sync する hook では save を別に実行しない）
+    try:
+        needs_sync, needs_save, use_debounce = HookManager.hook_actions(event)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="EVENT")
+
+    window_event = None
+    if event in HookManager.WINDOW_EVENTS and window_id:
+        window_event = {
+            "kind": HookManager.WINDOW_EVENTS[event],
+            "window_id": window_id,
+            "index": window_index,
+            "name": window_name,
+        }
+
+    async def _hook():
+        from .daemon import forward_to_daemon
+        from .tmux.window_events import WindowEvent
+
+        if needs_sync:
+            if await forward_to_daemon("sync", project=project, sync_all=False, event=window_event):
+                return
+            orchestrator = await get_orchestrator()
+            await orchestrator.sync(
+                project, event=WindowEvent(**window_event) if window_event else None
+            )
+        elif needs_save:
+            if await forward_to_daemon("save", project=project, debounce=use_debounce):
+                return
+            orchestrator = await get_orchestrator()
+            orchestrator.save(project, debounce=use_debounce)
+
+    run_async_command(_hook(), f"✓ Handled {event}: {project}", handle_value_error=True)
+
+
 @main.command()
 @click.argument("project", required=False)
 def close(project: str | None):
     """Close and detach a project window set."""
     async def _close():
+        from .daemon import forward_to_daemon
+
+        if await forward_to_daemon("close", project=project):
+            return
         orchestrator = await get_orchestrator()
         await orchestrator.close(project)
 
@@ -186,12 +322,43 @@ def close(project: str | None):
 def add(project: str | None, window: str | None):
     """Add a new window to a project."""
     async def _add():
+        from .daemon import forward_to_daemon
+
+        if await forward_to_daemon("add", project=project, window=window):
+            return
         orchestrator = await get_orchestrator()
         await orchestrator.add(project, window)
 
     run_async_command(_add(), f"✓ Added window to project: {project or 'current'}", handle_value_error=True)
 
 
+@main.command()
+@click.option("--socket", "socket_path", type=click.Path(path_type=Path), default=None,
+              help="Unix socket path (default: ~/.itmux/itmuxd.sock)")
+def daemon(socket_path: Path | None):
+    """Run the resident itmuxd daemon (serves sync/save/add/close and staged opens)."""
+    # デーモン自身がクライアント転送しないようにする
+    os.environ["ITMUX_NO_DAEMON"] = "1"
+
+    import asyncio
+    from .daemon import ItmuxDaemon, get_socket_path
+
+    async def _serve():
+        orchestrator = await get_orchestrator()
+        # 常駐プロセスなので、最初のコマンドを待たずに接続しておく
+        await orchestrator.get_bridge()
+        server = ItmuxDaemon(orchestrator, socket_path or get_socket_path())
+        await server.serve_forever()
+
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        click.echo(f"✗ Daemon Error: {e}", err=True)
+        sys.exit(1)
+
+
 @main.group()
 def config():
     """Manage project configuration."""
@@ -242,15 +409,36 @@ def config_unset_cwd(project: str):
     click.echo(f"✓ Unset cwd for project '{project}'")
 
 
+@config.command("export")
+@click.argument("output", required=False, type=click.Path(dir_okay=False, path_type=Path))
+@handle_config_errors
+def config_export(output: Path | None):
+    """Export all projects as config.json-format JSON (stdout if OUTPUT is omitted)."""
+    content = get_config_manager().export_json()
+    if output is None:
+        click.echo(content, nl=False)
+        return
+    output.write_text(content, encoding="utf-8")
+    click.echo(f"✓ Exported config to {output}")
+
+
+@config.command("import")
+@click.argument("source", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@handle_config_errors
+def config_import(source: Path):
+    """Replace all projects with a config.json-format JSON file."""
+    manager = get_config_manager()
+    manager.import_json(source.read_text(encoding="utf-8"))
+    click.echo(f"✓ Imported {len(manager.list_projects())} projects ({manager.layout})")
+
+
 @main.command()
 def list():
     """List all managed projects."""
-    async def _list():
-        orchestrator = await get_orchestrator()
-        return orchestrator.list()
+    from .readonly import list_project_summaries
 
     try:
-        projects = asyncio.run(_list())
+        projects = list_project_summaries()
 
         if not projects:
             click.echo("No projects configured.")
@@ -273,16 +461,13 @@ def list():
 @main.command()
 def current():
     """Show current project name."""
-    async def _current():
-        orchestrator = await get_orchestrator()
-        return orchestrator.current()
+    from .readonly import current_session_name
 
-    try:
-        project_name = asyncio.run(_current())
-        click.echo(project_name)
-    except ValueError:
+    project_name = current_session_name()
+    if not project_name:
         # tmuxセッション外: 何も出力せずexit code 1を返す
         sys.exit(1)
+    click.echo(project_name)
 
 
 if __name__ == "__main__":
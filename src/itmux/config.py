@@ -1,32 +1,96 @@
 """iTmux configuration management."""
 
+import contextlib
 import json
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterator, Optional, Sequence
+
+from .config_store import (
+    LAYOUT_SHARDED,
+    GenerationConflict,
+    StoreSnapshot,
+    create_store,
+    resolve_layout,
+)
+from .models import Config, ProjectConfig, WindowConfig
+from .exceptions import ConfigConflictError, ConfigError, ProjectNotFoundError
+from .metrics import MetricsStore
+from .readonly import DEFAULT_CONFIG_PATH
 
-from filelock import FileLock
 
-from .models import Config, ProjectConfig, WindowConfig
-from .exceptions import ConfigError, ProjectNotFoundError
+# 設定ファイルの書き込み回数（実際に書いた / 内容が同じで省略した）
+CONFIG_WRITES_METRIC = "config.writes"
+CONFIG_WRITES_SKIPPED_METRIC = "config.writes_skipped"
+# 世代番号の不一致で読み直した回数
+CONFIG_CONFLICTS_METRIC = "config.conflicts"
+# 書き込み時にロック取得を待った時間
+CONFIG_LOCK_WAIT_METRIC = "config.lock_wait"
 
+# 世代番号が一致しない場合に読み直して再適用する回数の上限
+MAX_COMMIT_RETRIES = 5
 
-DEFAULT_CONFIG_PATH = Path.home() / ".itmux" / "config.json"
 
+@dataclass
+class ConfigWriteStats:
+    """このインスタンスでの設定ファイル書き込み回数."""
 
-class ConfigManager:
-    """設定ファイル管理クラス."""
+    performed: int = 0
+    skipped: int = 0
+    conflicts: int = 0
+    # ロック取得を待った時間の合計（秒）
+    lock_wait: float = 0.0
+
+
+# 設定への変更操作（再試行時に最新の設定へ再適用できるよう関数で表す）
+ConfigOperation = Callable[[Config], None]
 
-    def __init__(self, config_path: Optional[Path] = None):
+
+def _require_project(config: Config, project_name: str) -> ProjectConfig:
+    if project_name not in config.projects:
+        raise ProjectNotFoundError(f"Project '{project_name}' not found")
+    return config.projects[project_name]
+
+
+class ConfigManager:
+    """設定ファイル管理クラス.
+
+    保存形式（単一ファイル / プロジェクトごとのファイル / SQLite）は config_store が扱い、
+    このクラスはどちらでも同じAPIを提供する。
+
+    変更系メソッドは最新の設定を読み込んで変更を適用し、ロックを1回だけ取って
+    書き込む。読み込み後に別プロセスが書き換えていた場合（世代番号の不一致）は
+    読み直して変更を再適用するため、同時に動く hook 同士で更新が失われない。
+    """
+
+    def __init__(
+        self,
+        config_path: Optional[Path] = None,
+        metrics: Optional[MetricsStore] = None,
+        layout: Optional[str] = None,
+    ):
         """
         Args:
             config_path: 設定ファイルパス（省略時はデフォルト）
+            metrics: 書き込み回数・ロック待ち時間の記録先（省略時は記録しない）。
+                書き込みごとに記録するため、CLI ではプロセス内に溜める buffered な
+                ストアを渡す（write_stats と同じくメモリ上で数え、終了時に1回書き込む）
+            layout: 保存形式（"single" / "sharded" / "sqlite"。省略時は ITMUX_CONFIG_LAYOUT か既存の形式）
         """
         self.config_path = config_path or DEFAULT_CONFIG_PATH
-        self.lock_path = self.config_path.parent / f".{self.config_path.name}.lock"
+        self.layout = resolve_layout(self.config_path, layout)
+        self.store = create_store(self.config_path, self.layout)
+        self.metrics = metrics
+        self.write_stats = ConfigWriteStats()
         self._config: Optional[Config] = None
+        # transaction() 中の読み込み結果と、適用済みの変更操作
+        self._snapshot: Optional[StoreSnapshot] = None
+        self._operations: Optional[list[tuple[str, ConfigOperation]]] = None
 
     def load(self) -> Config:
-        """設定ファイルを読み込む（ファイルロック付き）.
+        """設定ファイルを読み込む.
+
+        書き込みは rename による置き換えなので、読み込みはロックを取らない。
 
         Returns:
             Config: 読み込んだ設定
@@ -34,31 +98,22 @@ class ConfigManager:
         Raises:
             ConfigError: ファイル読み込みエラー、JSON形式エラー
         """
-        # ロックファイルのディレクトリを作成
-        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        self._config = self.store.read().config
+        return self._config
 
-        with FileLock(self.lock_path, timeout=10):
-            if not self.config_path.exists():
-                # ファイルが存在しない場合は空の設定を返す
-                self._config = Config(projects={})
-                return self._config
+    def save(self, config: Optional[Config] = None) -> bool:
+        """設定全体を保存する（ファイルロック付き）.
 
-            try:
-                with open(self.config_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    self._config = Config.model_validate(data)
-                    return self._config
-            except json.JSONDecodeError as e:
-                raise ConfigError(f"Invalid JSON format: {e}") from e
-            except Exception as e:
-                raise ConfigError(f"Failed to load config: {e}") from e
-
-    def save(self, config: Optional[Config] = None) -> None:
-        """設定ファイルを保存する（ファイルロック付き）.
+        世代番号の確認は行わない（後勝ち）。通常の変更は変更系メソッドか
+        transaction() を使う。シリアライズ結果がディスク上の内容と同じ場合は
+        書き込まない。
 
         Args:
             config: 保存する設定（省略時は現在の設定）
 
+        Returns:
+            bool: 実際に書き込んだ場合 True（内容が同じで省略した場合 False）
+
         Raises:
             ConfigError: ファイル書き込みエラー
         """
@@ -67,18 +122,139 @@ class ConfigManager:
                 raise ConfigError("No config to save")
             config = self._config
 
-        # ディレクトリ作成
-        self.config_path.parent.mkdir(parents=True, exist_ok=True)
-        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        written = self.store.save(config)
+        self._count_write(performed=written)
+        return written
+
+    def export_json(self) -> str:
+        """全プロジェクトを config.json と同じ形式の JSON にする（保存形式によらない）.
+
+        Returns:
+            str: JSON 文字列
+
+        Raises:
+            ConfigError: ファイル読み込みエラー
+        """
+        data = self.load().model_dump(mode="json", exclude_none=True)
+        return json.dumps(data, indent=2, ensure_ascii=False) + "\n"
+
+    def import_json(self, content: str) -> bool:
+        """config.json 形式の JSON で全プロジェクトを置き換える.
+
+        Args:
+            content: JSON 文字列
+
+        Returns:
+            bool: 実際に書き込んだ場合 True
+
+        Raises:
+            ConfigError: JSON形式エラー、検証エラー、書き込みエラー
+        """
+        try:
+            data = json.loads(content)
+            config = Config.model_validate({"projects": data.get("projects", {})})
+        except Exception as e:
+            raise ConfigError(f"Failed to import config: {e}") from e
+
+        return self.save(config)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator["ConfigManager"]:
+        """複数の変更を1回の書き込みにまとめる.
+
+        ブロック内の変更系メソッドは読み込んだ設定に適用されるだけで、ブロックを
+        抜けるときにロックを1回取って書き込む。例外で抜けた場合は書き込まない。
+        入れ子にした場合は一番外側でまとめて書き込む::
+
+            with config.transaction():
+                config.update_project("a", windows)
+                config.delete_project("b")
+
+        Raises:
+            ConfigError: 再試行しても世代番号が一致しない、または書き込みエラー
+        """
+        if self._operations is not None:
+            yield self
+            return
+
+        self._snapshot = self.store.read()
+        self._config = self._snapshot.config
+        self._operations = []
+        try:
+            yield self
+        except BaseException:
+            # 適用済みの変更を破棄し、次回アクセス時に読み直す
+            self._config = None
+            raise
+        finally:
+            operations, self._operations = self._operations, None
+            snapshot, self._snapshot = self._snapshot, None
+
+        if operations:
+            self._commit(operations, snapshot)
+
+    def _apply(self, project_name: str, operation: ConfigOperation) -> None:
+        """変更操作を適用して保存（transaction() 中は適用のみ）."""
+        if self._operations is not None:
+            operation(self._config)
+            self._operations.append((project_name, operation))
+            return
+        self._commit([(project_name, operation)])
+
+    def _commit(
+        self,
+        operations: list[tuple[str, ConfigOperation]],
+        snapshot: Optional[StoreSnapshot] = None,
+    ) -> bool:
+        """世代番号を確認して書き込む（不一致なら読み直して再適用）.
+
+        Args:
+            operations: (プロジェクト名, 変更操作) のリスト
+            snapshot: 変更操作を適用済みの読み込み結果（省略時は読み込んで適用する）
+        """
+        touched = {project_name for project_name, _ in operations}
+        for _ in range(MAX_COMMIT_RETRIES + 1):
+            if snapshot is None:
+                snapshot = self.store.read()
+                for _, operation in operations:
+                    operation(snapshot.config)
 
-        with FileLock(self.lock_path, timeout=10):
             try:
-                with open(self.config_path, "w", encoding="utf-8") as f:
-                    data = config.model_dump(mode="json", exclude_none=True)
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-                    f.write("\n")  # 末尾改行
-            except Exception as e:
-                raise ConfigError(f"Failed to save config: {e}") from e
+                result = self.store.commit(snapshot.config, touched, snapshot)
+            except GenerationConflict:
+                self._count_conflict()
+                snapshot = None
+                continue
+
+            self._config = snapshot.config
+            self._record_lock_wait(result.lock_wait)
+            self._count_write(performed=result.written)
+            return result.written
+
+        self._config = None
+        raise ConfigError(
+            f"Config was modified concurrently; gave up after {MAX_COMMIT_RETRIES + 1} attempts"
+        )
+
+    def _count_write(self, performed: bool) -> None:
+        if performed:
+            self.write_stats.performed += 1
+        else:
+            self.write_stats.skipped += 1
+        if self.metrics is not None:
+            self.metrics.increment(
+                CONFIG_WRITES_METRIC if performed else CONFIG_WRITES_SKIPPED_METRIC
+            )
+
+    def _count_conflict(self) -> None:
+        self.write_stats.conflicts += 1
+        if self.metrics is not None:
+            self.metrics.increment(CONFIG_CONFLICTS_METRIC)
+
+    def _record_lock_wait(self, seconds: float) -> None:
+        self.write_stats.lock_wait += seconds
+        if self.metrics is not None:
+            self.metrics.observe(CONFIG_LOCK_WAIT_METRIC, seconds)
 
     def get_project(self, project_name: str) -> ProjectConfig:
         """プロジェクト設定を取得.
@@ -93,12 +269,13 @@ class ConfigManager:
             ProjectNotFoundError: プロジェクトが存在しない
         """
         if self._config is None:
-            self.load()
+            # 全体を読み込まず、このプロジェクトだけを検証する
+            project = self.store.read_project(project_name)
+            if project is None:
+                raise ProjectNotFoundError(f"Project '{project_name}' not found")
+            return project
 
-        if project_name not in self._config.projects:
-            raise ProjectNotFoundError(f"Project '{project_name}' not found")
-
-        return self._config.projects[project_name]
+        return _require_project(self._config, project_name)
 
     def list_projects(self) -> list[str]:
         """プロジェクト名一覧を取得.
@@ -106,36 +283,49 @@ class ConfigManager:
         Returns:
             list[str]: プロジェクト名のリスト
         """
+        if self._config is None and self.layout == LAYOUT_SHARDED:
+            # インデックスだけを読む（プロジェクトごとのファイルは開かない）
+            return self.store.list_projects()
+
         if self._config is None:
             self.load()
 
         return list(self._config.projects.keys())
 
     def update_project(
-        self, project_name: str, windows: list[WindowConfig]
+        self,
+        project_name: str,
+        windows: list[WindowConfig],
+        expected: Optional[Sequence[str]] = None,
     ) -> None:
         """プロジェクトのウィンドウリストを更新（自動同期用）.
 
         close時に現在のウィンドウリストで設定を上書きします。
 
+        windows を読み込んだウィンドウリストから計算した場合は、その名前の並びを
+        expected に渡す。書き込む時点（世代番号の不一致で読み直した場合も含む）の
+        ウィンドウリストが expected と違えば、上書きせずに ConfigConflictError を
+        送出する（古いリストから計算した結果で、別プロセスの更新を消さないため）。
+
         Args:
             project_name: プロジェクト名
             windows: 現在のウィンドウリスト
+            expected: windows の計算に使ったウィンドウ名の並び（省略時は確認しない）
 
         Raises:
             ProjectNotFoundError: プロジェクトが存在しない
+            ConfigConflictError: ウィンドウリストが expected から変わっていた
         """
-        if self._config is None:
-            self.load()
-
-        if project_name not in self._config.projects:
-            raise ProjectNotFoundError(f"Project '{project_name}' not found")
-
-        # ウィンドウリストを更新
-        self._config.projects[project_name].tmux_windows = windows
+        def operation(config: Config) -> None:
+            project = _require_project(config, project_name)
+            if expected is not None and [w.name for w in project.tmux_windows] != list(expected):
+                raise ConfigConflictError(
+                    f"Windows of project '{project_name}' were modified concurrently"
+                )
+            # 再適用に備えてリストは複製して渡す
+            project.tmux_windows = list(windows)
 
-        # 自動保存
-        self.save()
+        self._apply(project_name, operation)
 
     def add_window(self, project_name: str, window: WindowConfig) -> None:
         """プロジェクトに新しいウィンドウを追加.
@@ -148,25 +338,18 @@ class ConfigManager:
             ProjectNotFoundError: プロジェクトが存在しない
             ConfigError: ウィンドウ名が重複
         """
-        if self._config is None:
-            self.load()
+        def operation(config: Config) -> None:
+            project = _require_project(config, project_name)
 
-        if project_name not in self._config.projects:
-            raise ProjectNotFoundError(f"Project '{project_name}' not found")
+            # 重複チェック
+            if any(w.name == window.name for w in project.tmux_windows):
+                raise ConfigError(
+                    f"Window '{window.name}' already exists in project '{project_name}'"
+                )
 
-        project = self._config.projects[project_name]
-
-        # 重複チェック
-        if any(w.name == window.name for w in project.tmux_windows):
-            raise ConfigError(
-                f"Window '{window.name}' already exists in project '{project_name}'"
-            )
+            project.tmux_windows.append(window)
 
-        # ウィンドウ追加
-        project.tmux_windows.append(window)
-
-        # 自動保存
-        self.save()
+        self._apply(project_name, operation)
 
     def set_project_cwd(self, project_name: str, cwd: str | Path) -> None:
         """プロジェクトの作業ディレクトリを設定.
@@ -179,11 +362,8 @@ class ConfigManager:
             ProjectNotFoundError: プロジェクトが存在しない
             ConfigError: パスが存在しない、またはディレクトリでない
         """
-        if self._config is None:
-            self.load()
-
-        if project_name not in self._config.projects:
-            raise ProjectNotFoundError(f"Project '{project_name}' not found")
+        # プロジェクトの存在確認をパスの検証より先に行う
+        self.get_project(project_name)
 
         path = Path(cwd).expanduser().resolve(strict=False)
         if not path.exists():
@@ -191,8 +371,10 @@ class ConfigManager:
         if not path.is_dir():
             raise ConfigError(f"Not a directory: {path}")
 
-        self._config.projects[project_name].cwd = path
-        self.save()
+        def operation(config: Config) -> None:
+            _require_project(config, project_name).cwd = path
+
+        self._apply(project_name, operation)
 
     def unset_project_cwd(self, project_name: str) -> None:
         """プロジェクトの作業ディレクトリを削除.
@@ -203,14 +385,10 @@ class ConfigManager:
         Raises:
             ProjectNotFoundError: プロジェクトが存在しない
         """
-        if self._config is None:
-            self.load()
+        def operation(config: Config) -> None:
+            _require_project(config, project_name).cwd = None
 
-        if project_name not in self._config.projects:
-            raise ProjectNotFoundError(f"Project '{project_name}' not found")
-
-        self._config.projects[project_name].cwd = None
-        self.save()
+        self._apply(project_name, operation)
 
     def create_project(
         self, project_name: str, windows: Optional[list[WindowConfig]] = None
@@ -224,20 +402,16 @@ class ConfigManager:
         Raises:
             ConfigError: プロジェクトが既に存在する
         """
-        if self._config is None:
-            self.load()
-
-        if project_name in self._config.projects:
-            raise ConfigError(f"Project '{project_name}' already exists")
+        def operation(config: Config) -> None:
+            if project_name in config.projects:
+                raise ConfigError(f"Project '{project_name}' already exists")
 
-        # プロジェクト作成
-        self._config.projects[project_name] = ProjectConfig(
-            name=project_name,
-            tmux_windows=windows or []
-        )
+            config.projects[project_name] = ProjectConfig(
+                name=project_name,
+                tmux_windows=list(windows or [])
+            )
 
-        # 自動保存
-        self.save()
+        self._apply(project_name, operation)
 
     def delete_project(self, project_name: str) -> None:
         """プロジェクトを削除.
@@ -248,17 +422,11 @@ class ConfigManager:
         Raises:
             ProjectNotFoundError: プロジェクトが存在しない
         """
-        if self._config is None:
-            self.load()
-
-        if project_name not in self._config.projects:
-            raise ProjectNotFoundError(f"Project '{project_name}' not found")
-
-        # プロジェクト削除
-        del self._config.projects[project_name]
+        def operation(config: Config) -> None:
+            _require_project(config, project_name)
+            del config.projects[project_name]
 
-        # 自動保存
-        self.save()
+        self._apply(project_name, operation)
 
 
 # 便利関数（後方互換性・簡易API用）
@@ -0,0 +1,181 @@
+"""検証済み設定のキャッシュ.
+
+hook のたびに全プロジェクトへ pydantic の検証（cwd の resolve、環境変数名・
+ウィンドウ名の検査）を行わないよう、検証済みの内容を元データ（ファイルなど）の
+mtime・サイズ・ハッシュをキーに `~/.itmux/.config.cache.json` へ保存し、
+次回は model_construct で検証なしに組み立てる。
+
+検証はプロジェクト単位で行い、必要になったプロジェクトだけをキャッシュに
+追加する（get_project("x") は x だけを検証する）。キャッシュは使い捨てで、
+読めない・壊れている場合は空として扱う。
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from .models import ProjectConfig, WindowConfig, WindowSize
+from .exceptions import ConfigError
+
+
+CACHE_VERSION = 1
+
+# (元データのプロジェクト {名前: 辞書}, 世代番号) を返す読み込み関数
+SourceLoader = Callable[[], tuple[dict[str, Any], int]]
+
+
+def get_cache_path(config_path: Path) -> Path:
+    """検証済み設定のキャッシュファイルのパス."""
+    return config_path.parent / ".config.cache.json"
+
+
+def cache_key(content: bytes, stat: Optional[os.stat_result] = None) -> list:
+    """元データの mtime・サイズ・ハッシュ（ファイル以外は mtime なし）."""
+    return [
+        stat.st_mtime_ns if stat is not None else None,
+        stat.st_size if stat is not None else len(content),
+        hashlib.sha256(content).hexdigest(),
+    ]
+
+
+def construct_project(data: dict[str, Any]) -> ProjectConfig:
+    """検証済みの辞書から検証なしで ProjectConfig を組み立てる."""
+    return ProjectConfig.model_construct(
+        name=data["name"],
+        description=data.get("description"),
+        cwd=Path(data["cwd"]) if data.get("cwd") is not None else None,
+        environments=dict(data.get("environments", {})),
+        tmux_windows=[
+            WindowConfig.model_construct(
+                name=window["name"],
+                window_size=(
+                    WindowSize.model_construct(**window["window_size"])
+                    if window.get("window_size") is not None
+                    else None
+                ),
+            )
+            for window in data.get("tmux_windows", [])
+        ],
+    )
+
+
+def validate_project(project_name: str, data: Any) -> ProjectConfig:
+    """1プロジェクトを検証する（Config の名前とキーの一致チェックを含む）.
+
+    Raises:
+        ConfigError: 検証エラー
+    """
+    try:
+        project = ProjectConfig.model_validate(data)
+    except Exception as e:
+        raise ConfigError(f"Failed to load config: {e}") from e
+    if project.name != project_name:
+        raise ConfigError(
+            f'Failed to load config: project key "{project_name}" does not match name "{project.name}"'
+        )
+    return project
+
+
+class ValidationCache:
+    """元データごとの検証済みプロジェクト.
+
+    エントリは {"key": cache_key, "generation": int, "names": [...],
+    "projects": {名前: 検証済みの辞書}}。names は元データに含まれる全プロジェクト名、
+    projects は検証済みのものだけを持つ。
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: Optional[dict[str, dict[str, Any]]] = None
+        self._dirty = False
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if self._entries is None:
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                valid = isinstance(data, dict) and data.get("version") == CACHE_VERSION
+                self._entries = data["entries"] if valid else {}
+            except (OSError, ValueError, KeyError):
+                self._entries = {}
+        return self._entries
+
+    def resolve(
+        self,
+        source: str,
+        key: list,
+        loader: SourceLoader,
+        names: Optional[list[str]] = None,
+    ) -> tuple[dict[str, ProjectConfig], int]:
+        """元データのプロジェクトを返す（キャッシュ済みのものは検証しない）.
+
+        Args:
+            source: 元データの識別子（ファイルパスなど）
+            key: cache_key() の結果
+            loader: キャッシュにない場合に元データを読み込む関数
+            names: 必要なプロジェクト（省略時は全プロジェクト。存在しない名前は無視）
+
+        Returns:
+            tuple: ({プロジェクト名: ProjectConfig}, 世代番号)
+
+        Raises:
+            ConfigError: 検証エラー
+        """
+        entries = self._load()
+        entry = entries.get(source)
+        if entry is not None and entry.get("key") != key:
+            entry = None
+
+        if entry is not None:
+            wanted = [n for n in (entry["names"] if names is None else names) if n in entry["names"]]
+            if all(n in entry["projects"] for n in wanted):
+                self.hits += 1
+                return (
+                    {n: construct_project(entry["projects"][n]) for n in wanted},
+                    entry["generation"],
+                )
+
+        self.misses += 1
+        raw, generation = loader()
+        if entry is None:
+            entry = {"key": key, "generation": generation, "names": list(raw), "projects": {}}
+            entries[source] = entry
+
+        result = {}
+        for project_name in (list(raw) if names is None else names):
+            if project_name not in raw:
+                continue
+            if project_name in entry["projects"]:
+                result[project_name] = construct_project(entry["projects"][project_name])
+                continue
+            project = validate_project(project_name, raw[project_name])
+            entry["projects"][project_name] = project.model_dump(mode="json", exclude_none=True)
+            result[project_name] = project
+        self._dirty = True
+        return result, generation
+
+    def retain(self, sources: set[str]) -> None:
+        """指定した元データ以外のエントリを削除（削除されたファイルの分など）."""
+        entries = self._load()
+        for source in set(entries) - sources:
+            del entries[source]
+            self._dirty = True
+
+    def save(self) -> None:
+        """変更があればキャッシュファイルを置き換える（失敗しても無視する）."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        tmp_path = self.path.parent / f".{self.path.name}.{os.getpid()}.tmp"
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(
+                json.dumps({"version": CACHE_VERSION, "entries": self._entries}, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            os.replace(tmp_path, self.path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
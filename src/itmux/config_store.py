@@ -0,0 +1,714 @@
+"""設定の保存形式（単一ファイル / プロジェクトごとのファイル）.
+
+- single: `~/.itmux/config.json` に全プロジェクトを1ファイルで保存（従来形式）
+- sharded: `~/.itmux/projects/<name>.json` にプロジェクトごとに保存し、
+  `projects/index.json` にプロジェクト名の一覧を持つ。ロックもプロジェクト
+  ごとなので、別プロジェクトへの書き込みは競合しない
+- sqlite: `~/.itmux/config.db`（WAL モード）にプロジェクト・ウィンドウ・環境変数を
+  行として保存する。書き込みは対象プロジェクトの行だけを置き換え、読み込みは
+  書き込み中でも待たない
+
+JSON の形式はシリアライズ結果がディスク上の内容と同じなら書き込まず、書き込む
+場合は一時ファイルに fsync してから rename で置き換える。各プロジェクト（単一
+ファイルはファイル全体）は書き込みごとに進む世代番号（"generation"）を持ち、
+commit() は読み込み時の世代番号と一致する場合だけ書き込む。
+
+読み込みは config_cache の検証済みキャッシュを通し、内容の変わっていない
+プロジェクトは pydantic の検証を省く。read_project() は1プロジェクトだけを検証する。
+"""
+
+import contextlib
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from filelock import FileLock
+
+from .config_cache import ValidationCache, cache_key, get_cache_path
+from .models import Config, ProjectConfig
+from .exceptions import ConfigError
+from .readonly import (
+    CONFIG_LAYOUTS,
+    LAYOUT_SHARDED,
+    LAYOUT_SINGLE,
+    LAYOUT_SQLITE,
+    detect_layout,
+    fetch_database_projects,
+    get_database_path,
+    get_index_path,
+    get_lock_path,
+    get_project_path,
+    get_projects_dir,
+    read_json_file,
+    read_layout_projects,
+    resolve_layout,
+)
+
+
+# 別の形式へ移行した後の移行元（config.json / projects/index.json / config.db）の退避先（拡張子）
+MIGRATED_SUFFIX = ".migrated"
+
+# 書き込みごとに1つ進む世代番号（楽観的並行制御に使う）
+GENERATION_KEY = "generation"
+
+
+class GenerationConflict(Exception):
+    """読み込み後に別プロセスが同じファイルを書き換えた."""
+
+
+@dataclass
+class StoreSnapshot:
+    """読み込んだ設定と、読み込み時点の世代番号."""
+
+    config: Config
+    # 単一ファイルは ""、sharded はプロジェクト名がキー
+    generations: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class CommitResult:
+    """コミットの結果."""
+
+    written: bool
+    # ロック取得までの待ち時間（秒）
+    lock_wait: float
+
+
+def _serialize(data: Any) -> str:
+    return json.dumps(data, indent=2, ensure_ascii=False) + "\n"  # 末尾改行
+
+
+def _atomic_write(path: Path, content: str) -> None:
+    """一時ファイルに fsync してから rename で置き換える."""
+    tmp_path = path.parent / f".{path.name}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _split_generation(data: Any) -> tuple[Any, int]:
+    """ファイルの内容から世代番号を取り出す（なければ 0）."""
+    if not isinstance(data, dict):
+        return data, 0
+    data = dict(data)
+    generation = data.pop(GENERATION_KEY, 0)
+    return data, generation if isinstance(generation, int) else 0
+
+
+def _tombstone_path(path: Path) -> Path:
+    """削除したプロジェクトの最後の世代番号を残すファイル（sharded 形式）."""
+    return path.parent / f".{path.name}.deleted"
+
+
+def _read_versioned(path: Path) -> tuple[Optional[dict], int]:
+    """ロック下でファイルを読み、(内容, 世代番号) を返す（存在しない・壊れている場合は None, 0）."""
+    try:
+        return _split_generation(json.loads(path.read_text(encoding="utf-8")))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None, 0
+
+
+def _read_source(path: Path) -> Optional[tuple[list, bytes]]:
+    """ファイルのキャッシュキーと内容を読む（存在しなければ None）."""
+    try:
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            content = f.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        raise ConfigError(f"Failed to load config: {e}") from e
+    return cache_key(content, stat), content
+
+
+def _parse_json(path: Path, content: bytes) -> Any:
+    try:
+        return json.loads(content)
+    except ValueError:
+        # 書き込み途中の内容を読んだ場合に備え、ロックを取って読み直す
+        return read_json_file(path)
+
+
+def _write_versioned(path: Path, data: dict) -> bool:
+    """内容が変わる場合だけ世代番号を1つ進めて書き込む（呼び出し側でロック済み）."""
+    current, generation = _read_versioned(path)
+    if current == data:
+        return False
+    _atomic_write(path, _serialize({GENERATION_KEY: generation + 1, **data}))
+    return True
+
+
+def _read_migration_source(config_path: Path) -> tuple[Config, Optional[Path]]:
+    """移行元になる既存の形式から全プロジェクトを読む（ロック済みで呼ぶ）.
+
+    Returns:
+        tuple: (設定, 移行後に退避するファイル（なければ None）)
+    """
+    layout = detect_layout(config_path)
+    projects = read_layout_projects(config_path, layout) or {}
+    # sharded 形式のファイルは世代番号を含む
+    projects = {name: _split_generation(data)[0] for name, data in projects.items()}
+    if layout == LAYOUT_SHARDED:
+        source = get_index_path(config_path)
+    elif layout == LAYOUT_SQLITE:
+        source = get_database_path(config_path)
+        # -wal に残っている書き込みをデータベースに反映してから退避する
+        conn = _connect_database(source)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+    else:
+        source = config_path
+    return _validate(projects), (source if source.exists() else None)
+
+
+def _retire_migration_source(source: Optional[Path]) -> None:
+    """移行元を退避し、保存形式の自動判定で再び選ばれないようにする."""
+    if source is not None:
+        os.replace(source, source.with_name(source.name + MIGRATED_SUFFIX))
+
+
+def _dump_project(project: ProjectConfig) -> dict[str, Any]:
+    return project.model_dump(mode="json", exclude_none=True)
+
+
+def _validate(projects: dict[str, Any]) -> Config:
+    try:
+        return Config.model_validate({"projects": projects})
+    except Exception as e:
+        raise ConfigError(f"Failed to load config: {e}") from e
+
+
+class SingleFileStore:
+    """全プロジェクトを config.json 1ファイルに保存する形式."""
+
+    def __init__(self, config_path: Path):
+        self.config_path = config_path
+        self.lock_path = get_lock_path(config_path)
+        self.tmp_path = config_path.parent / f".{config_path.name}.tmp"
+        self.cache = ValidationCache(get_cache_path(config_path))
+
+    def _read(self, names: Optional[list[str]] = None) -> tuple[dict[str, ProjectConfig], int]:
+        source = _read_source(self.config_path)
+        if source is None:
+            # ファイルが存在しない場合は空の設定
+            return {}, 0
+        key, content = source
+
+        def load() -> tuple[dict[str, Any], int]:
+            data, generation = _split_generation(_parse_json(self.config_path, content))
+            if data is None:
+                return {}, 0
+            if not isinstance(data, dict) or not isinstance(data.get("projects", {}), dict):
+                raise ConfigError("Failed to load config: 'projects' must be an object")
+            return data.get("projects", {}), generation
+
+        projects, generation = self.cache.resolve(str(self.config_path), key, load, names)
+        self.cache.save()
+        return projects, generation
+
+    def read(self) -> StoreSnapshot:
+        """設定と世代番号を読み込む（書き込みは rename なのでロック不要）."""
+        projects, generation = self._read()
+        return StoreSnapshot(Config.model_construct(projects=projects), {"": generation})
+
+    def read_project(self, project_name: str) -> Optional[ProjectConfig]:
+        """1プロジェクトだけを検証して読み込む（存在しなければ None）."""
+        return self._read([project_name])[0].get(project_name)
+
+    def list_projects(self) -> list[str]:
+        return list(self.read().config.projects)
+
+    def save(self, config: Config) -> bool:
+        """設定全体を保存（変更がなければ書き込まない）."""
+        self.config_path.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(self.lock_path, timeout=10):
+            try:
+                return _write_versioned(
+                    self.config_path, config.model_dump(mode="json", exclude_none=True)
+                )
+            except Exception as e:
+                raise ConfigError(f"Failed to save config: {e}") from e
+
+    def commit(self, config: Config, touched: set[str], snapshot: StoreSnapshot) -> CommitResult:
+        """読み込み時から世代番号が変わっていなければ保存する.
+
+        Raises:
+            GenerationConflict: 読み込み後に別プロセスが書き換えた
+        """
+        self.config_path.parent.mkdir(parents=True, exist_ok=True)
+        started = time.monotonic()
+        with FileLock(self.lock_path, timeout=10):
+            lock_wait = time.monotonic() - started
+            _, generation = _read_versioned(self.config_path)
+            if generation != snapshot.generations.get("", 0):
+                raise GenerationConflict(str(self.config_path))
+            try:
+                written = _write_versioned(
+                    self.config_path, config.model_dump(mode="json", exclude_none=True)
+                )
+            except Exception as e:
+                raise ConfigError(f"Failed to save config: {e}") from e
+        return CommitResult(written, lock_wait)
+
+
+class ShardedStore:
+    """プロジェクトごとのファイルとインデックスに保存する形式."""
+
+    def __init__(self, config_path: Path):
+        self.config_path = config_path
+        self.projects_dir = get_projects_dir(config_path)
+        self.index_path = get_index_path(config_path)
+        self.cache = ValidationCache(get_cache_path(config_path))
+
+    def _ensure_migrated(self) -> None:
+        """インデックスがなければ作成し、既存の config.json / config.db があれば移行する."""
+        if self.index_path.exists():
+            return
+
+        self.projects_dir.mkdir(parents=True, exist_ok=True)
+        # 移行は旧形式と同じロックの下で1回だけ行う
+        with FileLock(get_lock_path(self.config_path), timeout=10):
+            if self.index_path.exists():
+                return
+            try:
+                config, source = _read_migration_source(self.config_path)
+                for project_name, project in config.projects.items():
+                    self._write_project(project_name, project)
+                self._write_index(list(config.projects))
+                _retire_migration_source(source)
+            except ConfigError:
+                raise
+            except Exception as e:
+                raise ConfigError(f"Failed to migrate config: {e}") from e
+
+    def _project_path(self, project_name: str) -> Path:
+        return get_project_path(self.config_path, project_name)
+
+    def _read_index(self) -> list[str]:
+        data = read_json_file(self.index_path)
+        return list(data.get("projects", [])) if data else []
+
+    def _write_index(self, project_names: list[str]) -> bool:
+        with FileLock(get_lock_path(self.index_path), timeout=10):
+            return _write_if_changed(self.index_path, _serialize({"projects": project_names}))
+
+    def _update_index(self, present: dict[str, bool]) -> bool:
+        """インデックスにプロジェクトを追加・削除（作成・削除時のみ）.
+
+        Args:
+            present: {プロジェクト名: インデックスに載せるか}
+        """
+        names = self._read_index()
+        if all((name in names) == value for name, value in present.items()):
+            return False
+        with FileLock(get_lock_path(self.index_path), timeout=10):
+            names = self._read_index()
+            for project_name, value in present.items():
+                if value and project_name not in names:
+                    names.append(project_name)
+                elif not value and project_name in names:
+                    names.remove(project_name)
+            return _write_if_changed(self.index_path, _serialize({"projects": names}))
+
+    def _write_project_unlocked(self, project_name: str, project: Optional[ProjectConfig]) -> bool:
+        """プロジェクトのファイルを書く（None なら削除）.
+
+        削除したプロジェクトの世代番号は tombstone に残し、同じ名前で作り直したときは
+        その続きから数える。削除前に読み込んだプロセスの世代番号と、作り直した後の
+        世代番号が一致してしまわないようにする（ABA 問題）。
+        """
+        path = self._project_path(project_name)
+        tombstone = _tombstone_path(path)
+        if project is None:
+            if not path.exists():
+                return False
+            _, generation = _read_versioned(path)
+            _atomic_write(tombstone, _serialize({GENERATION_KEY: generation}))
+            path.unlink()
+            return True
+
+        data = _dump_project(project)
+        if path.exists():
+            return _write_versioned(path, data)
+        _, generation = _read_versioned(tombstone)
+        _atomic_write(path, _serialize({GENERATION_KEY: generation + 1, **data}))
+        tombstone.unlink(missing_ok=True)
+        return True
+
+    def _write_project(self, project_name: str, project: Optional[ProjectConfig]) -> bool:
+        """プロジェクトのファイルを書く（None なら削除）. そのプロジェクトのロックだけを取る."""
+        with FileLock(get_lock_path(self._project_path(project_name)), timeout=10):
+            return self._write_project_unlocked(project_name, project)
+
+    def _read_project_file(self, project_name: str) -> Optional[tuple[ProjectConfig, int]]:
+        path = self._project_path(project_name)
+        source = _read_source(path)
+        if source is None:
+            return None
+        key, content = source
+
+        def load() -> tuple[dict[str, Any], int]:
+            data, generation = _split_generation(_parse_json(path, content))
+            return ({project_name: data} if data is not None else {}), generation
+
+        projects, generation = self.cache.resolve(str(path), key, load)
+        return (projects[project_name], generation) if project_name in projects else None
+
+    def read(self) -> StoreSnapshot:
+        """インデックスに載っている全プロジェクトと、それぞれの世代番号を読み込む."""
+        self._ensure_migrated()
+        projects = {}
+        generations = {}
+        for project_name in self._read_index():
+            loaded = self._read_project_file(project_name)
+            if loaded is not None:
+                projects[project_name], generations[project_name] = loaded
+        # 削除されたプロジェクトのエントリを捨てる
+        self.cache.retain({str(self._project_path(name)) for name in projects})
+        self.cache.save()
+        return StoreSnapshot(Config.model_construct(projects=projects), generations)
+
+    def read_project(self, project_name: str) -> Optional[ProjectConfig]:
+        """そのプロジェクトのファイルだけを読んで検証する（存在しなければ None）."""
+        self._ensure_migrated()
+        loaded = self._read_project_file(project_name)
+        self.cache.save()
+        return loaded[0] if loaded is not None else None
+
+    def list_projects(self) -> list[str]:
+        """インデックスだけを読んでプロジェクト名一覧を返す."""
+        self._ensure_migrated()
+        return self._read_index()
+
+    def save(self, config: Config) -> bool:
+        """設定全体を保存（変更のあったプロジェクトのファイルだけを書く）."""
+        self._ensure_migrated()
+        try:
+            written = False
+            for project_name, project in config.projects.items():
+                written |= self._write_project(project_name, project)
+            for project_name in set(self._read_index()) - set(config.projects):
+                written |= self._write_project(project_name, None)
+            written |= self._write_index(list(config.projects))
+            return written
+        except Exception as e:
+            raise ConfigError(f"Failed to save config: {e}") from e
+
+    def _stored_generation(self, project_name: str, indexed: list[str]) -> Optional[int]:
+        """プロジェクトの世代番号（インデックスに載っていない・ファイルがなければ None）.
+
+        インデックスの更新前に中断したプロセスが残したファイルは read() から見えないため、
+        存在しないものとして扱う（次の作成でインデックスに載る）。
+        """
+        path = self._project_path(project_name)
+        if project_name not in indexed or not path.exists():
+            return None
+        return _read_versioned(path)[1]
+
+    def commit(self, config: Config, touched: set[str], snapshot: StoreSnapshot) -> CommitResult:
+        """変更したプロジェクトのロックだけを取り、世代番号を確認して保存する.
+
+        インデックスの更新もプロジェクトのロックを持ったまま行うので、ロックの外から
+        プロジェクトのファイルとインデックスが食い違って見えることはない。
+
+        Raises:
+            GenerationConflict: 読み込み後に別プロセスが対象プロジェクトを書き換えた
+        """
+        self._ensure_migrated()
+        started = time.monotonic()
+        with contextlib.ExitStack() as stack:
+            # 複数プロジェクトのロックは名前順に取る（デッドロック防止）
+            for project_name in sorted(touched):
+                stack.enter_context(
+                    FileLock(get_lock_path(self._project_path(project_name)), timeout=10)
+                )
+            lock_wait = time.monotonic() - started
+
+            indexed = self._read_index()
+            for project_name in sorted(touched):
+                generation = self._stored_generation(project_name, indexed)
+                if generation != snapshot.generations.get(project_name):
+                    raise GenerationConflict(project_name)
+
+            try:
+                written = False
+                for project_name in sorted(touched):
+                    written |= self._write_project_unlocked(
+                        project_name, config.projects.get(project_name)
+                    )
+                written |= self._update_index(
+                    {name: name in config.projects for name in sorted(touched)}
+                )
+            except Exception as e:
+                raise ConfigError(f"Failed to save config: {e}") from e
+        return CommitResult(written, lock_wait)
+
+
+def _write_if_changed(path: Path, content: str) -> bool:
+    """内容が変わる場合だけ置き換える（世代番号を持たないインデックス用）."""
+    try:
+        if path.read_text(encoding="utf-8") == content:
+            return False
+    except FileNotFoundError:
+        pass
+    _atomic_write(path, content)
+    return True
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE projects (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    description TEXT,
+    cwd TEXT,
+    generation INTEGER NOT NULL
+);
+CREATE TABLE windows (
+    project TEXT NOT NULL REFERENCES projects(name) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    columns INTEGER,
+    lines INTEGER,
+    PRIMARY KEY (project, position)
+);
+CREATE TABLE environments (
+    project TEXT NOT NULL REFERENCES projects(name) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (project, key)
+);
+"""
+
+# 削除したプロジェクトの最後の世代番号（同じ名前で作り直したときにその続きから数える）。
+# 以前のバージョンで作成したデータベースにもないので、書き込み時に作成する
+SQLITE_TOMBSTONES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tombstones (
+    name TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+)
+"""
+
+
+def _connect_database(path: Path) -> sqlite3.Connection:
+    """WAL モードで接続する（トランザクションは明示的に BEGIN する）."""
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL では NORMAL でもクラッシュ時に壊れない（電源断で直前のコミットが失われうるのみ）
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+@contextlib.contextmanager
+def _write_transaction(conn: sqlite3.Connection) -> Iterator[float]:
+    """書き込みロックを取ってトランザクションを開始し、ロック待ち時間（秒）を返す."""
+    started = time.monotonic()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield time.monotonic() - started
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _write_project_rows(
+    conn: sqlite3.Connection, project_name: str, project: Optional[ProjectConfig]
+) -> bool:
+    """プロジェクトの行を置き換える（None なら削除）. 内容が同じなら書き込まない."""
+    current, _ = fetch_database_projects(conn, project_name)
+    if project is None:
+        if project_name not in current:
+            return False
+        conn.execute(SQLITE_TOMBSTONES_SCHEMA)
+        conn.execute(
+            "INSERT OR REPLACE INTO tombstones (name, generation) "
+            "SELECT name, generation FROM projects WHERE name = ?",
+            (project_name,),
+        )
+        # windows / environments は ON DELETE CASCADE で消える
+        conn.execute("DELETE FROM projects WHERE name = ?", (project_name,))
+        return True
+
+    data = _dump_project(project)
+    if current.get(project_name) == data:
+        return False
+
+    if project_name in current:
+        conn.execute(
+            "UPDATE projects SET description = ?, cwd = ?, generation = generation + 1 "
+            "WHERE name = ?",
+            (data.get("description"), data.get("cwd"), project_name),
+        )
+        conn.execute("DELETE FROM windows WHERE project = ?", (project_name,))
+        conn.execute("DELETE FROM environments WHERE project = ?", (project_name,))
+    else:
+        conn.execute(SQLITE_TOMBSTONES_SCHEMA)
+        conn.execute(
+            "INSERT INTO projects (name, position, description, cwd, generation) "
+            "VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM projects), ?, ?, "
+            "(SELECT COALESCE(MAX(generation), 0) + 1 FROM tombstones WHERE name = ?))",
+            (project_name, data.get("description"), data.get("cwd"), project_name),
+        )
+        conn.execute("DELETE FROM tombstones WHERE name = ?", (project_name,))
+
+    conn.executemany(
+        "INSERT INTO windows (project, position, name, columns, lines) VALUES (?, ?, ?, ?, ?)",
+        [
+            (
+                project_name,
+                position,
+                window["name"],
+                window.get("window_size", {}).get("columns"),
+                window.get("window_size", {}).get("lines"),
+            )
+            for position, window in enumerate(data["tmux_windows"])
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO environments (project, position, key, value) VALUES (?, ?, ?, ?)",
+        [
+            (project_name, position, key, value)
+            for position, (key, value) in enumerate(data.get("environments", {}).items())
+        ],
+    )
+    return True
+
+
+class SqliteStore:
+    """SQLite（WAL モード）のデータベースに行として保存する形式."""
+
+    def __init__(self, config_path: Path):
+        self.config_path = config_path
+        self.db_path = get_database_path(config_path)
+        self.tmp_path = self.db_path.parent / f".{self.db_path.name}.tmp"
+        self.cache = ValidationCache(get_cache_path(config_path))
+
+    def _ensure_migrated(self) -> None:
+        """データベースがなければ作成し、既存の config.json / projects/ があれば取り込む.
+
+        一時ファイルに作成してから rename するので、他のプロセスからは
+        スキーマ作成前のデータベースが見えない。
+        """
+        if self.db_path.exists():
+            return
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(get_lock_path(self.config_path), timeout=10):
+            if self.db_path.exists():
+                return
+            try:
+                config, source = _read_migration_source(self.config_path)
+                self.tmp_path.unlink(missing_ok=True)
+                conn = _connect_database(self.tmp_path)
+                try:
+                    conn.executescript(SQLITE_SCHEMA)
+                    with _write_transaction(conn):
+                        for project_name, project in config.projects.items():
+                            _write_project_rows(conn, project_name, project)
+                finally:
+                    # 最後の接続を閉じると WAL がチェックポイントされ -wal / -shm も消える
+                    conn.close()
+                os.replace(self.tmp_path, self.db_path)
+                _retire_migration_source(source)
+            except ConfigError:
+                raise
+            except Exception as e:
+                raise ConfigError(f"Failed to migrate config: {e}") from e
+
+    @contextlib.contextmanager
+    def _connection(self, action: str) -> Iterator[sqlite3.Connection]:
+        self._ensure_migrated()
+        try:
+            conn = _connect_database(self.db_path)
+            try:
+                yield conn
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            raise ConfigError(f"Failed to {action} config: {e}") from e
+
+    def _fetch(self, project_name: Optional[str] = None) -> tuple[dict[str, ProjectConfig], dict[str, int]]:
+        with self._connection("load") as conn:
+            # 3つのテーブルを同じ時点の内容で読む
+            conn.execute("BEGIN")
+            rows, generations = fetch_database_projects(conn, project_name)
+            conn.execute("COMMIT")
+
+        projects = {}
+        for name, data in rows.items():
+            # 行の内容をキーにする（世代番号は行から読んだものを使う）
+            key = cache_key(json.dumps(data, sort_keys=True).encode("utf-8"))
+            found, _ = self.cache.resolve(
+                f"{self.db_path}#{name}", key, lambda name=name, data=data: ({name: data}, 0)
+            )
+            projects.update(found)
+        return projects, generations
+
+    def read(self) -> StoreSnapshot:
+        """全プロジェクトと、それぞれの世代番号を読み込む（書き込み中でも待たない）."""
+        projects, generations = self._fetch()
+        self.cache.retain({f"{self.db_path}#{name}" for name in projects})
+        self.cache.save()
+        return StoreSnapshot(Config.model_construct(projects=projects), generations)
+
+    def read_project(self, project_name: str) -> Optional[ProjectConfig]:
+        """1プロジェクトの行だけを読んで検証する（存在しなければ None）."""
+        projects, _ = self._fetch(project_name)
+        self.cache.save()
+        return projects.get(project_name)
+
+    def list_projects(self) -> list[str]:
+        with self._connection("load") as conn:
+            return [name for (name,) in conn.execute("SELECT name FROM projects ORDER BY position")]
+
+    def save(self, config: Config) -> bool:
+        """設定全体を1トランザクションで保存（変更のあったプロジェクトの行だけを書く）."""
+        with self._connection("save") as conn, _write_transaction(conn):
+            existing = [name for (name,) in conn.execute("SELECT name FROM projects")]
+            written = False
+            for project_name, project in config.projects.items():
+                written |= _write_project_rows(conn, project_name, project)
+            for project_name in set(existing) - set(config.projects):
+                written |= _write_project_rows(conn, project_name, None)
+        return written
+
+    def commit(self, config: Config, touched: set[str], snapshot: StoreSnapshot) -> CommitResult:
+        """世代番号を確認し、変更したプロジェクトの行だけを1トランザクションで保存する.
+
+        Raises:
+            GenerationConflict: 読み込み後に別プロセスが対象プロジェクトを書き換えた
+        """
+        with self._connection("save") as conn, _write_transaction(conn) as lock_wait:
+            for project_name in sorted(touched):
+                row = conn.execute(
+                    "SELECT generation FROM projects WHERE name = ?", (project_name,)
+                ).fetchone()
+                if (row[0] if row else 0) != snapshot.generations.get(project_name, 0):
+                    raise GenerationConflict(project_name)
+
+            written = False
+            for project_name in sorted(touched):
+                written |= _write_project_rows(
+                    conn, project_name, config.projects.get(project_name)
+                )
+        return CommitResult(written, lock_wait)
+
+
+def create_store(config_path: Path, layout: Optional[str] = None):
+    """保存形式に応じたストアを作成."""
+    layout = resolve_layout(config_path, layout)
+    if layout == LAYOUT_SHARDED:
+        return ShardedStore(config_path)
+    if layout == LAYOUT_SQLITE:
+        return SqliteStore(config_path)
+    return SingleFileStore(config_path)
@@ -0,0 +1,397 @@
+"""常駐デーモン（itmuxd）とUnixソケットクライアント.
+
+hookから毎回フルCLIプロセスを起動すると、Pythonの起動・iTerm2への接続・
+config.jsonの再読込がイベントごとに発生する。デーモンはiTerm2接続、
+ConfigManager、ProjectOrchestratorを1つずつ保持し、クライアントは
+ローカルソケット経由でリクエストを転送する。
+
+プロトコル: 1リクエスト = 1行のJSON、1レスポンス = 1行のJSON。
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Optional
+
+from .exceptions import (
+    ConfigError,
+    CwdError,
+    DaemonError,
+    ITerm2Error,
+    ProjectNotFoundError,
+    ProjectNotOpenError,
+    ProjectNotOpenReason,
+)
+from .readonly import current_session_name
+from .save_scheduler import DebounceScheduler
+
+
+DEFAULT_SOCKET_PATH = Path.home() / ".itmux" / "itmuxd.sock"
+
+# クライアントから転送する環境変数（プロジェクト名の自動検出に使用）
+FORWARDED_ENV_KEYS = ("TMUX", "TMUX_PANE", "ITMUX_COMMAND")
+
+# デーモンが受け付けるコマンド
+DAEMON_COMMANDS = frozenset({"ping", "sync", "save", "add", "close", "materialize", "restore"})
+
+# メトリクスをファイルに書き込む最短の間隔（秒）。リクエストごとには書き込まない
+METRICS_FLUSH_INTERVAL = 30.0
+
+# 受け付けた時点で応答し、バックグラウンドで処理するコマンド
+BACKGROUND_COMMANDS = frozenset({"materialize", "restore"})
+
+# 起動時に既存のデーモンが応答するか確かめる ping の待ち時間（秒）
+PING_TIMEOUT = 1.0
+
+# 例外の型名 → 例外クラス（エラーをクライアント側で再構築するため）
+_ERROR_TYPES: dict[str, type[Exception]] = {
+    "ProjectNotFoundError": ProjectNotFoundError,
+    "ConfigError": ConfigError,
+    "CwdError": CwdError,
+    "ITerm2Error": ITerm2Error,
+    "ValueError": ValueError,
+}
+
+
+def get_socket_path() -> Path:
+    """ソケットパスを取得（ITMUX_SOCKET_PATH 対応）."""
+    socket_path_str = os.environ.get("ITMUX_SOCKET_PATH")
+    return Path(socket_path_str) if socket_path_str else DEFAULT_SOCKET_PATH
+
+
+def daemon_disabled() -> bool:
+    """ITMUX_NO_DAEMON が設定されていればクライアント転送を行わない."""
+    return bool(os.environ.get("ITMUX_NO_DAEMON"))
+
+
+def _encode_error(error: Exception) -> dict[str, Any]:
+    """例外をレスポンス用の辞書に変換."""
+    if isinstance(error, ProjectNotOpenError):
+        return {
+            "type": "ProjectNotOpenError",
+            "project": error.project_name,
+            "reason": error.reason.value,
+            "message": str(error),
+        }
+    for name, error_type in _ERROR_TYPES.items():
+        if type(error) is error_type:
+            return {"type": name, "message": str(error)}
+    return {"type": type(error).__name__, "message": str(error)}
+
+
+def _decode_error(payload: dict[str, Any]) -> Exception:
+    """レスポンスの辞書から例外を再構築."""
+    error_type = payload.get("type", "")
+    message = payload.get("message", "")
+    if error_type == "ProjectNotOpenError":
+        return ProjectNotOpenError(
+            payload.get("project", ""), ProjectNotOpenReason(payload.get("reason"))
+        )
+    if error_type in _ERROR_TYPES:
+        return _ERROR_TYPES[error_type](message)
+    return DaemonError(f"{error_type}: {message}")
+
+
+def _is_connection_error(error: BaseException) -> bool:
+    """iTerm2 との接続が切れたことによる例外か（原因の例外もたどる）."""
+    try:
+        from websockets.exceptions import ConnectionClosed
+    except ImportError:  # pragma: no cover - iterm2 の依存として常にある
+        ConnectionClosed = ConnectionError
+    seen: set[int] = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        if isinstance(current, (ConnectionError, EOFError, ConnectionClosed)):
+            return True
+        seen.add(id(current))
+        current = current.__cause__ or current.__context__
+    return False
+
+
+@contextlib.contextmanager
+def _forwarded_environ(env: dict[str, str]):
+    """クライアントの環境変数を一時的に適用する（リクエストは直列実行）."""
+    saved = {key: os.environ.get(key) for key in FORWARDED_ENV_KEYS}
+    try:
+        for key in FORWARDED_ENV_KEYS:
+            if key in env:
+                os.environ[key] = env[key]
+            else:
+                os.environ.pop(key, None)
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+class ItmuxDaemon:
+    """iTerm2接続とOrchestratorを保持し、ソケット経由のリクエストを処理する."""
+
+    def __init__(self, orchestrator, socket_path: Optional[Path] = None):
+        """
+        Args:
+            orchestrator: ProjectOrchestrator インスタンス
+            socket_path: 待ち受けるUnixソケットのパス（省略時はデフォルト）
+        """
+        self.orchestrator = orchestrator
+        self.socket_path = socket_path or get_socket_path()
+        # Orchestrator は並行実行を想定していないため、リクエストを直列化する
+        self._lock = asyncio.Lock()
+        self._server: Optional[asyncio.AbstractServer] = None
+        # 実行中のバックグラウンド処理（GCで回収されないよう参照を保持）
+        self._background_tasks: set[asyncio.Task] = set()
+        # save --debounce はメモリ上のタイマーでまとめ、期限に1回だけ保存する
+        self.save_scheduler = DebounceScheduler(self._save_scheduled)
+        self._due_saves: set[str] = set()
+
+    async def dispatch(self, request: dict[str, Any]) -> dict[str, Any]:
+        """1リクエストを処理してレスポンスを返す.
+
+        Args:
+            request: {"command": str, "args": dict, "env": dict}
+
+        Returns:
+            dict: {"ok": True} または {"ok": False, "error": {...}}
+        """
+        command = request.get("command")
+        args = request.get("args") or {}
+        env = request.get("env") or {}
+
+        if command not in DAEMON_COMMANDS:
+            return {"ok": False, "error": {"type": "DaemonError", "message": f"Unknown command: {command}"}}
+        if command == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if command == "save" and args.get("debounce"):
+            with _forwarded_environ(env):
+                project = args.get("project") or current_session_name()
+            if project:
+                decision = self.save_scheduler.request(project)
+                return {"ok": True, "debounce": decision.value}
+        if command in BACKGROUND_COMMANDS:
+            task = asyncio.create_task(self._execute(command, args, env))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+            return {"ok": True, "scheduled": True}
+
+        return await self._execute(command, args, env)
+
+    async def _execute(
+        self, command: str, args: dict[str, Any], env: dict[str, str]
+    ) -> dict[str, Any]:
+        """リクエストを直列に実行する."""
+        async with self._lock:
+            try:
+                with _forwarded_environ(env):
+                    # 他プロセス（config set 等）による変更を反映するため毎回読み直す
+                    self.orchestrator.config.load()
+                    await self._run(command, args)
+                return {"ok": True}
+            except Exception as e:
+                print(f"[daemon] {command} failed: {e}", file=sys.stderr)
+                response = {"ok": False, "error": _encode_error(e)}
+                bridge = self.orchestrator.bridge
+                if bridge is not None and (_is_connection_error(e) or not bridge.is_connected):
+                    # iTerm2 の再起動などで切れた接続は捨て、次のリクエストで接続し直す。
+                    # クライアントにはプロセス内で処理し直させる
+                    print("[daemon] iTerm2 connection lost, reconnecting on next request", file=sys.stderr)
+                    self.orchestrator.reset_bridge()
+                    response["fallback"] = True
+                return response
+            finally:
+                self.orchestrator.metrics.flush(min_interval=METRICS_FLUSH_INTERVAL)
+
+    async def _save_scheduled(self, projects: list[str]) -> None:
+        """debounce の期限に達した保存を実行する（DebounceScheduler のコールバック）.
+
+        実行中のリクエストを待つ間に期限が来たプロジェクトも、先にロックを
+        取ったコールバックがまとめて保存する（後のコールバックは何もしない）。
+        """
+        self._due_saves.update(projects)
+        await self._execute("save_scheduled", {}, {})
+
+    async def _run(self, command: str, args: dict[str, Any]) -> None:
+        """コマンドをOrchestratorのメソッドに振り分ける."""
+        orchestrator = self.orchestrator
+        if command == "sync":
+            from .tmux.window_events import WindowEvent
+
+            event = args.get("event")
+            await orchestrator.sync(
+                args.get("project"),
+                sync_all=bool(args.get("sync_all")),
+                event=WindowEvent(**event) if event else None,
+            )
+        elif command == "save":
+            orchestrator.save(args.get("project"), debounce=bool(args.get("debounce")))
+        elif command == "save_scheduled":
+            projects, self._due_saves = sorted(self._due_saves), set()
+            if projects:
+                orchestrator.save_scheduled(projects)
+        elif command == "add":
+            await orchestrator.add(args.get("project"), args.get("window"))
+        elif command == "close":
+            await orchestrator.close(args.get("project"))
+        elif command == "materialize":
+            project = args.get("project")
+
+            def report(done: int, total: int) -> None:
+                print(f"[daemon] materialize {project}: {done}/{total} windows ready", file=sys.stderr)
+
+            await orchestrator.materialize(
+                project, started_at=args.get("started_at"), progress=report
+            )
+        elif command == "restore":
+            orchestrator.restore_sessions(args.get("projects") or [])
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """ソケット接続1本分の処理."""
+        try:
+            line = await reader.readline()
+            try:
+                request = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                response = {"ok": False, "error": {"type": "DaemonError", "message": f"Invalid request: {e}"}}
+            else:
+                response = await self.dispatch(request)
+            writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def serve_forever(self) -> None:
+        """ソケットを作成してリクエストを待ち受ける.
+
+        Raises:
+            DaemonError: 同じソケットで別のデーモンが応答した
+        """
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            pid = await ping_daemon(self.socket_path)
+            if pid is not None:
+                raise DaemonError(f"Daemon already running on {self.socket_path} (pid={pid})")
+            # 前回異常終了したソケットファイルを掃除
+            self.socket_path.unlink()
+
+        self._server = await asyncio.start_unix_server(
+            self._handle_client, path=str(self.socket_path)
+        )
+        os.chmod(self.socket_path, 0o600)
+        print(f"[daemon] listening on {self.socket_path} pid={os.getpid()}", file=sys.stderr)
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            # 保存待ちを残したまま終了しない（最後のレイアウトを保存する）
+            await self.save_scheduler.flush()
+            self.orchestrator.metrics.flush()
+            with contextlib.suppress(FileNotFoundError):
+                self.socket_path.unlink()
+
+
+async def ping_daemon(socket_path: Path, timeout: float = PING_TIMEOUT) -> Optional[int]:
+    """ソケットのデーモンに ping を送る.
+
+    Returns:
+        Optional[int]: 応答したデーモンの pid（接続できない・応答しない場合は None）
+    """
+    try:
+        reader, writer = await asyncio.open_unix_connection(str(socket_path))
+    except OSError:
+        return None
+    try:
+        writer.write(b'{"command": "ping"}\n')
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), timeout=timeout)
+        response = json.loads(line)
+    except (asyncio.TimeoutError, OSError, ValueError):
+        return None
+    finally:
+        writer.close()
+        with contextlib.suppress(Exception):
+            await writer.wait_closed()
+    return response.get("pid") if isinstance(response, dict) and response.get("ok") else None
+
+
+async def forward_to_daemon(
+    command: str,
+    socket_path: Optional[Path] = None,
+    timeout: float = 30.0,
+    **args: Any,
+) -> bool:
+    """リクエストをデーモンに転送する.
+
+    デーモンが起動していない（ソケットがない、接続拒否）場合は False を返し、
+    呼び出し側は従来どおりプロセス内で処理する。デーモンが応答しない・処理中に
+    終了した・iTerm2 との接続が切れていたと応答した場合も False を返す
+    （hook を失敗させず、プロセス内で処理し直す）。
+
+    Args:
+        command: コマンド名（sync/save/add/close/materialize/restore）
+        socket_path: ソケットパス（省略時はデフォルト）
+        timeout: レスポンス待ちのタイムアウト（秒）
+        **args: コマンド引数
+
+    Returns:
+        bool: デーモンで処理された場合 True
+
+    Raises:
+        デーモン側で発生した例外（ProjectNotFoundError 等）を再構築して送出
+    """
+    if daemon_disabled():
+        return False
+
+    path = socket_path or get_socket_path()
+    if not path.exists():
+        return False
+
+    try:
+        reader, writer = await asyncio.open_unix_connection(str(path))
+    except (ConnectionRefusedError, FileNotFoundError, OSError):
+        return False
+
+    request = {
+        "command": command,
+        "args": args,
+        "env": {key: os.environ[key] for key in FORWARDED_ENV_KEYS if key in os.environ},
+    }
+    try:
+        writer.write(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), timeout=timeout)
+    except asyncio.TimeoutError:
+        print(
+            f"[daemon] no response within {timeout} seconds, handling {command} locally",
+            file=sys.stderr,
+        )
+        return False
+    except OSError as e:
+        print(f"[daemon] {e}, handling {command} locally", file=sys.stderr)
+        return False
+    finally:
+        writer.close()
+        with contextlib.suppress(Exception):
+            await writer.wait_closed()
+
+    if not line:
+        # デーモンが処理中に終了した場合
+        print(f"[daemon] connection closed, handling {command} locally", file=sys.stderr)
+        return False
+
+    response = json.loads(line)
+    if not response.get("ok"):
+        if response.get("fallback"):
+            # デーモンの iTerm2 接続が切れていた（デーモンは次のリクエストで接続し直す）
+            print(f"[daemon] iTerm2 connection lost, handling {command} locally", file=sys.stderr)
+            return False
+        raise _decode_error(response.get("error") or {})
+    return True
@@ -9,6 +9,12 @@ class ConfigError(Exception):
     pass
 
 
+class ConfigConflictError(ConfigError):
+    """読み込んだ後に別プロセスが設定を書き換えていたエラー（計算し直しが必要）."""
+
+    pass
+
+
 class CwdError(Exception):
     """作業ディレクトリ（cwd）関連エラー."""
 
@@ -70,3 +76,15 @@ class WindowCreationTimeoutError(ITerm2Error):
     """ウィンドウ生成タイムアウトエラー."""
 
     pass
+
+
+class RestoreError(Exception):
+    """保存したレイアウトからのセッション復元エラー."""
+
+    pass
+
+
+class DaemonError(Exception):
+    """常駐デーモン（itmuxd）との通信エラー."""
+
+    pass
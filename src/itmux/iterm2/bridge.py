@@ -1,17 +1,27 @@
 """iTerm2 Python API integration layer."""
 
 import asyncio
+import shlex
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional, Sequence
 
 import iterm2
 
 from ..models import WindowSize, WindowConfig
 from ..exceptions import ITerm2Error
+from ..metrics import MetricsStore, process_metrics
 from ..tmux.cwd import cwd_respawn_pane_command
 from ..tmux.session_manager import SessionManager
 from ..tmux.hook_manager import HookManager
-from .window_manager import WindowManager
+from ..tmux.window_events import WINDOW_MAP_OPTION, WindowMap
+from .readiness import (
+    CONNECT_READY_METRIC,
+    CONNECT_TIMEOUT_METRIC,
+    SURFACE_WINDOWS_METRIC,
+    ReadinessPolicy,
+)
+from .window_manager import WindowEntry, WindowIndex, WindowManager
 
 
 class ITerm2Bridge:
@@ -20,21 +30,48 @@ class ITerm2Bridge:
     各種マネージャーを統合し、高レベルの操作を提供します。
     """
 
-    def __init__(self, connection: iterm2.Connection, app: iterm2.App):
+    def __init__(
+        self,
+        connection: iterm2.Connection,
+        app: iterm2.App,
+        readiness: Optional[ReadinessPolicy] = None,
+        metrics: Optional[MetricsStore] = None,
+    ):
         """Initialize ITerm2Bridge.
 
         Args:
             connection: iTerm2接続オブジェクト
             app: iTerm2アプリケーションオブジェクト
+            readiness: 接続準備完了待ちのタイムアウト方針（省略時は環境変数から）
+            metrics: 所要時間の記録先（省略時はプロセスで共有するストア。終了時に書き込む）
         """
         self.connection = connection
         self.app = app
+        self.readiness = readiness or ReadinessPolicy.from_env()
+        self.metrics = metrics or process_metrics()
 
         # 各種マネージャーを初期化
         self.session_manager = SessionManager(connection)
         self.hook_manager = HookManager()
         self.window_manager = WindowManager(app)
 
+    @classmethod
+    async def connect(cls) -> "ITerm2Bridge":
+        """iTerm2に接続してブリッジを作成.
+
+        Returns:
+            ITerm2Bridge: 接続済みのブリッジ
+        """
+        connection = await iterm2.Connection.async_create()
+        app = await iterm2.async_get_app(connection)
+        return cls(connection, app)
+
+    @property
+    def is_connected(self) -> bool:
+        """iTerm2 との websocket 接続が開いているか（iTerm2 の終了・再起動で False）."""
+        websocket = getattr(self.connection, "websocket", None)
+        return websocket is not None and not websocket.closed
+
     async def find_windows_by_project(self, project_name: str) -> list[iterm2.Window]:
         """プロジェクトに属するウィンドウを検索.
 
@@ -46,6 +83,14 @@ class ITerm2Bridge:
         """
         return await self.window_manager.find_windows_by_project(project_name)
 
+    async def build_window_index(self) -> WindowIndex:
+        """全iTerm2ウィンドウのタグとtmux情報のスナップショットを作成.
+
+        Returns:
+            WindowIndex: プロジェクト・ウィンドウ名・tmuxウィンドウIDの検索用スナップショット
+        """
+        return await self.window_manager.build_window_index()
+
     async def set_window_size(
         self, window_id: str, window_size: WindowSize
     ) -> None:
@@ -73,6 +118,7 @@ class ITerm2Bridge:
         first_window_name: str = "default",
         environments: Optional[dict[str, str]] = None,
         cwd: Optional[Path] = None,
+        extra_windows: Sequence[WindowConfig] = (),
     ) -> None:
         """tmux Control Modeセッションに接続.
 
@@ -80,7 +126,8 @@ class ITerm2Bridge:
             project_name: プロジェクト名
             first_window_name: 最初のウィンドウ名
             environments: 適用するセッション環境変数
-            cwd: 初回ウィンドウの作業ディレクトリ
+            cwd: アタッチ前に作成するウィンドウの作業ディレクトリ
+            extra_windows: アタッチ前に作成する2つ目以降のウィンドウ
 
         Raises:
             ITerm2Error: 接続に失敗
@@ -88,41 +135,104 @@ class ITerm2Bridge:
         try:
             from ..tmux.environment import prepare_session_environments
 
-            # シェル起動前にセッション環境変数を整える
+            # シェル起動前にセッション環境変数を整え、ウィンドウをまとめて作成する
+            # （アタッチ前に作成したウィンドウはネイティブウィンドウとして開かれる）
             prepare_session_environments(
                 project_name,
                 environments or {},
                 first_window_name,
                 cwd=cwd,
+                extra_windows=extra_windows,
             )
 
-            # Control Modeで既存セッションにアタッチ
-            gateway = await iterm2.Window.async_create(
-                self.connection,
-                command=f"/opt/homebrew/bin/tmux -CC attach-session -t {project_name}"
+            timeout = self.readiness.timeout_for(
+                self.metrics.histogram(CONNECT_READY_METRIC)
             )
+            started = time.monotonic()
+
+            # ゲートウェイ作成前に購読を開始し、pane 表示の通知を取りこぼさない
+            async with iterm2.NewSessionMonitor(self.connection) as monitor:
+                # Control Modeで既存セッションにアタッチ
+                gateway = await iterm2.Window.async_create(
+                    self.connection,
+                    command=f"/opt/homebrew/bin/tmux -CC attach-session -t {project_name}"
+                )
 
-            if not gateway:
-                raise ITerm2Error("Failed to create gateway window")
-
-            # TmuxConnection確立を待つ（ポーリング）
-            for attempt in range(20):  # 最大2秒（0.1秒 × 20回）
-                await asyncio.sleep(0.1)
-                try:
-                    await self.session_manager.get_tmux_connection(project_name)
-                    break  # 接続確立完了
-                except ITerm2Error:
-                    if attempt == 19:
-                        raise ITerm2Error(f"TmuxConnection not established after 2 seconds for project: {project_name}")
-                    continue
+                if not gateway:
+                    raise ITerm2Error("Failed to create gateway window")
 
-            # Connection確立後、tmux paneの初期化完了を待つ
-            # Connection確立 ≠ paneが入力を受け付ける準備完了
-            await asyncio.sleep(0.3)
+                await self._wait_until_ready(project_name, monitor, timeout)
+
+            self.metrics.observe(CONNECT_READY_METRIC, time.monotonic() - started)
 
         except Exception as e:
             raise ITerm2Error(f"Failed to connect to session: {e}") from e
 
+    async def _is_session_ready(self, project_name: str) -> bool:
+        """TmuxConnection が確立し、その pane が iTerm2 に表示されているか."""
+        try:
+            tmux_conn = await self.session_manager.get_tmux_connection(project_name)
+        except ITerm2Error:
+            return False
+        # Connection確立 ≠ paneが入力を受け付ける準備完了のため、
+        # 接続に属するタブが現れるまで待つ
+        return any(
+            tab.tmux_connection_id == tmux_conn.connection_id
+            for window in self.app.windows
+            for tab in window.tabs
+        )
+
+    async def _wait_for_notification(self, monitor, check, timeout: float):
+        """通知を受けるたびに check() を評価し、結果が得られたら返す.
+
+        Args:
+            monitor: 購読中の iterm2.NewSessionMonitor
+            check: 準備完了なら真となる値を返す非同期関数
+            timeout: 待ち時間の上限（秒）
+
+        Returns:
+            check() の結果（タイムアウト時は None）
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            result = await check()
+            if result:
+                return result
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(
+                    monitor.async_get(),
+                    timeout=min(remaining, self.readiness.recheck_interval),
+                )
+            except asyncio.TimeoutError:
+                # 通知の取りこぼしに備えて定期的にも確認する
+                pass
+
+    async def _wait_until_ready(
+        self, project_name: str, monitor, timeout: float
+    ) -> None:
+        """新規セッションの通知ごとに準備完了を確認する.
+
+        Args:
+            project_name: プロジェクト名
+            monitor: 購読中の iterm2.NewSessionMonitor
+            timeout: 待ち時間の上限（秒）
+
+        Raises:
+            ITerm2Error: タイムアウト
+        """
+        ready = await self._wait_for_notification(
+            monitor, lambda: self._is_session_ready(project_name), timeout
+        )
+        if not ready:
+            self.metrics.increment(CONNECT_TIMEOUT_METRIC)
+            raise ITerm2Error(
+                f"TmuxConnection not ready after {timeout:.1f} seconds for project: {project_name}"
+            )
+
     async def get_tmux_connection(self, project_name: str) -> iterm2.TmuxConnection:
         """プロジェクトのTmuxConnectionを取得.
 
@@ -194,6 +304,43 @@ class ITerm2Bridge:
             await self._apply_window_cwd(tmux_conn, iterm_window, cwd)
         return iterm_window
 
+    async def create_tmux_windows(
+        self,
+        tmux_conn: iterm2.TmuxConnection,
+        project_name: str,
+        count: int,
+        cwd: Optional[Path] = None,
+    ) -> list[iterm2.Window]:
+        """アタッチ済みセッションにネイティブウィンドウをまとめて作成.
+
+        アタッチ済みのセッションでは async_create_window() でしかネイティブウィンドウを
+        作れないため（#15）、作成・アクティブ化を並行して行い、待ち時間が
+        ウィンドウ数に比例しないようにする。
+
+        Args:
+            tmux_conn: TmuxConnection
+            project_name: プロジェクト名
+            count: 作成するウィンドウ数
+            cwd: 新規ウィンドウの作業ディレクトリ
+
+        Returns:
+            list[iterm2.Window]: 作成したiTerm2ウィンドウ
+        """
+        if count <= 0:
+            return []
+
+        windows = list(await asyncio.gather(*(
+            self._create_tmux_window(tmux_conn, project_name, cwd=cwd)
+            for _ in range(count)
+        )))
+
+        # フロー制御（%pause）によるview-mode遷移を防ぐため、
+        # ウィンドウ作成直後にアクティブ化してPaused状態から復帰させる
+        # 参考: docs/ideas/Tmuxウィンドウがview-modeに入る現象.md 6.2節
+        await asyncio.sleep(0.05)
+        await asyncio.gather(*(window.async_activate() for window in windows))
+        return windows
+
     async def add_window(
         self,
         project_name: str,
@@ -218,16 +365,10 @@ class ITerm2Bridge:
             tmux_conn = await self.get_tmux_connection(project_name)
 
             # 新しいウィンドウを作成（openと同じ方法）
-            iterm_window = await self._create_tmux_window(
-                tmux_conn, project_name, cwd=cwd
+            [iterm_window] = await self.create_tmux_windows(
+                tmux_conn, project_name, 1, cwd=cwd
             )
 
-            # フロー制御（%pause）によるview-mode遷移を防ぐため、
-            # ウィンドウ作成直後にアクティブ化してPaused状態から復帰させる
-            # 参考: docs/ideas/Tmuxウィンドウがview-modeに入る現象.md 6.2節
-            await asyncio.sleep(0.05)
-            await iterm_window.async_activate()
-
             # iTerm2ウィンドウにタグ付け（user.window_nameにIDを設定）
             await self.window_manager.tag_window(iterm_window, project_name, window_name)
 
@@ -252,13 +393,17 @@ class ITerm2Bridge:
         Returns:
             list of (iterm2.Window, tmux_window_id, window_index)
         """
-        # tmux list-windowsでセッションのウィンドウ一覧を取得
+        tmux_windows = await self._list_session_windows(tmux_conn)
+        return self._match_session_windows(tmux_conn.connection_id, tmux_windows)
+
+    @staticmethod
+    async def _list_session_windows(tmux_conn: iterm2.TmuxConnection) -> dict[str, str]:
+        """tmux list-windows で tmux_window_id（@なし）→ window_index のマップを取得."""
         result_str = await tmux_conn.async_send_command(
             "list-windows -F '#{window_index}:#{window_id}'"
         )
         lines = result_str.strip().split('\n') if result_str.strip() else []
 
-        # tmux_window_id → window_index のマップ（@を除去）
         tmux_windows = {}
         for line in lines:
             parts = line.split(':')
@@ -266,11 +411,57 @@ class ITerm2Bridge:
                 window_index = parts[0]
                 tmux_window_id = parts[1].lstrip('@')
                 tmux_windows[tmux_window_id] = window_index
+        return tmux_windows
+
+    async def list_session_window_ids(self, tmux_conn: iterm2.TmuxConnection) -> list[str]:
+        """セッションの tmux ウィンドウID（@なし）をインデックス順に取得."""
+        tmux_windows = await self._list_session_windows(tmux_conn)
+        return sorted(tmux_windows, key=lambda wid: int(tmux_windows[wid]))
+
+    async def find_session_window(
+        self, tmux_conn: iterm2.TmuxConnection, tmux_window_id: str, window_index: str
+    ) -> Optional[WindowEntry]:
+        """tmuxウィンドウ1つに対応するiTerm2ウィンドウを待って、タグを読み取る.
+
+        Args:
+            tmux_conn: TmuxConnection
+            tmux_window_id: tmuxウィンドウID（@なし）
+            window_index: ウィンドウインデックス
 
-        # TmuxConnectionのIDを取得（セッションを特定するため）
-        tmux_connection_id = tmux_conn.connection_id
+        Returns:
+            Optional[WindowEntry]: 表示されなかった場合は None
+        """
+        target = {tmux_window_id: window_index}
+        await self._wait_for_session_windows(tmux_conn, target)
+        matched = self._match_session_windows(tmux_conn.connection_id, target)
+        if not matched:
+            return None
+        return await self.window_manager._read_entry(matched[0][0])
+
+    @staticmethod
+    async def read_window_map(
+        tmux_conn: iterm2.TmuxConnection, project_name: str
+    ) -> Optional[WindowMap]:
+        """セッションに記録したウィンドウの対応表を読む（未記録なら None）."""
+        value = await tmux_conn.async_send_command(
+            f"show-options -qv -t {shlex.quote(project_name)} {WINDOW_MAP_OPTION}"
+        )
+        return WindowMap.loads(value.strip()) if value and value.strip() else None
 
-        # iTerm2の全ウィンドウから、このセッションに属するものを探す
+    @staticmethod
+    async def write_window_map(
+        tmux_conn: iterm2.TmuxConnection, project_name: str, window_map: WindowMap
+    ) -> None:
+        """ウィンドウの対応表をセッションのユーザーオプションに記録."""
+        await tmux_conn.async_send_command(
+            f"set-option -t {shlex.quote(project_name)} {WINDOW_MAP_OPTION} "
+            f"{shlex.quote(window_map.dumps())}"
+        )
+
+    def _match_session_windows(
+        self, tmux_connection_id: str, tmux_windows: dict[str, str]
+    ) -> list[tuple[iterm2.Window, str, str]]:
+        """iTerm2の全ウィンドウから、セッションに属するものを探す."""
         matched_windows = []
         for window in self.app.windows:
             for tab in window.tabs:
@@ -284,12 +475,38 @@ class ITerm2Bridge:
 
         return matched_windows
 
+    async def _wait_for_session_windows(
+        self, tmux_conn: iterm2.TmuxConnection, tmux_windows: dict[str, str]
+    ) -> None:
+        """セッションの全tmuxウィンドウがiTerm2に表示されるのを通知で待つ.
+
+        アタッチ直後は最初のpaneしか表示されていないことがあり、そのまま
+        照合すると未表示のウィンドウを重複して作成してしまう。タイムアウト時は
+        表示済みのウィンドウだけで続行する。
+        """
+        async def all_surfaced() -> bool:
+            matched = self._match_session_windows(tmux_conn.connection_id, tmux_windows)
+            return len(matched) >= len(tmux_windows)
+
+        if not tmux_windows or await all_surfaced():
+            return
+
+        timeout = self.readiness.timeout_for(
+            self.metrics.histogram(SURFACE_WINDOWS_METRIC)
+        )
+        started = time.monotonic()
+        async with iterm2.NewSessionMonitor(self.connection) as monitor:
+            surfaced = await self._wait_for_notification(monitor, all_surfaced, timeout)
+        if surfaced:
+            self.metrics.observe(SURFACE_WINDOWS_METRIC, time.monotonic() - started)
+
     async def tag_session_windows(
         self,
         tmux_conn: iterm2.TmuxConnection,
         project_name: str,
         window_configs: list[WindowConfig],
         cwd: Optional[Path] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
     ) -> list[str]:
         """セッションの既存ウィンドウにタグ付けし、不足分を作成.
 
@@ -298,12 +515,15 @@ class ITerm2Bridge:
             project_name: プロジェクト名
             window_configs: 必要なウィンドウ設定のリスト
             cwd: 新規作成ウィンドウの作業ディレクトリ
+            progress: 進捗コールバック（完了数, 全体数）
 
         Returns:
             list[str]: 新規作成されたiTerm2ウィンドウIDのリスト
         """
-        # セッションに属するウィンドウを検出
-        matched_windows = await self.find_windows_by_tmux_session(tmux_conn)
+        # セッションに属するウィンドウを検出（アタッチ前に作成した分の表示を待つ）
+        tmux_windows = await self._list_session_windows(tmux_conn)
+        await self._wait_for_session_windows(tmux_conn, tmux_windows)
+        matched_windows = self._match_session_windows(tmux_conn.connection_id, tmux_windows)
 
         # window_index順にソート
         matched_windows.sort(key=lambda x: int(x[2]))
@@ -312,8 +532,10 @@ class ITerm2Bridge:
         config_names = {w.name for w in window_configs}
         tagged_names = set()
         created_window_ids = []
+        total = max(len(window_configs), len(matched_windows))
 
         # 既存ウィンドウにタグ付け（config順に対応させる）
+        assignments = []
         for i, (window, tmux_window_id, window_index) in enumerate(matched_windows):
             if i < len(window_configs):
                 window_name = window_configs[i].name
@@ -327,36 +549,77 @@ class ITerm2Bridge:
                     counter += 1
                 window_name = candidate
 
-            await self.window_manager.tag_window(window, project_name, window_name)
+            assignments.append((window, project_name, window_name))
             tagged_names.add(window_name)
 
-        # configにあるが既存ウィンドウがないものを作成
-        for window_config in window_configs:
-            if window_config.name not in tagged_names:
-                iterm_window = await self._create_tmux_window(
-                    tmux_conn, project_name, cwd=cwd
-                )
+        await self.window_manager.tag_windows(assignments)
+        if progress and assignments:
+            progress(len(tagged_names), total)
 
-                # view-mode遷移防止
-                await asyncio.sleep(0.05)
-                await iterm_window.async_activate()
+        # configにあるが既存ウィンドウがないものをまとめて作成
+        missing_configs = [w for w in window_configs if w.name not in tagged_names]
+        created_windows = await self.create_tmux_windows(
+            tmux_conn, project_name, len(missing_configs), cwd=cwd
+        )
+        await self.window_manager.tag_windows([
+            (iterm_window, project_name, window_config.name)
+            for iterm_window, window_config in zip(created_windows, missing_configs)
+        ])
 
-                await self.window_manager.tag_window(iterm_window, project_name, window_config.name)
-                tagged_names.add(window_config.name)
-                created_window_ids.append(iterm_window.window_id)
+        for iterm_window, window_config in zip(created_windows, missing_configs):
+            tagged_names.add(window_config.name)
+            created_window_ids.append(iterm_window.window_id)
+            if progress:
+                progress(len(tagged_names), total)
 
-                # ウィンドウサイズ復元
-                if window_config.window_size:
-                    await self.set_window_size(iterm_window.window_id, window_config.window_size)
+            # ウィンドウサイズ復元
+            if window_config.window_size:
+                await self.set_window_size(iterm_window.window_id, window_config.window_size)
 
         return created_window_ids
 
+    async def tag_primary_window(
+        self,
+        tmux_conn: iterm2.TmuxConnection,
+        project_name: str,
+        window_config: WindowConfig,
+        cwd: Optional[Path] = None,
+    ) -> Optional[str]:
+        """セッションの先頭ウィンドウだけを待ってタグ付け（段階的 open 用）.
+
+        残りのウィンドウの表示待ち・タグ付けは tag_session_windows() に任せる。
+
+        Args:
+            tmux_conn: TmuxConnection
+            project_name: プロジェクト名
+            window_config: 先頭ウィンドウの設定
+            cwd: 先頭ウィンドウを作成する場合の作業ディレクトリ
+
+        Returns:
+            Optional[str]: 新規作成した場合はそのiTerm2ウィンドウID
+        """
+        tmux_windows = await self._list_session_windows(tmux_conn)
+        if tmux_windows:
+            primary_id = min(tmux_windows, key=lambda wid: int(tmux_windows[wid]))
+            primary = {primary_id: tmux_windows[primary_id]}
+            await self._wait_for_session_windows(tmux_conn, primary)
+            matched = self._match_session_windows(tmux_conn.connection_id, primary)
+            if matched:
+                window = matched[0][0]
+                await self.window_manager.tag_window(window, project_name, window_config.name)
+                return None
+
+        [iterm_window] = await self.create_tmux_windows(tmux_conn, project_name, 1, cwd=cwd)
+        await self.window_manager.tag_window(iterm_window, project_name, window_config.name)
+        return iterm_window.window_id
+
     async def open_project_windows(
         self,
         project_name: str,
         window_configs: list[WindowConfig],
         environments: Optional[dict[str, str]] = None,
         cwd: Optional[Path] = None,
+        primary_only: bool = False,
     ) -> list[str]:
         """プロジェクトのtmuxウィンドウを開く.
 
@@ -368,6 +631,7 @@ class ITerm2Bridge:
             window_configs: ウィンドウ設定のリスト（空の場合は default を作成）
             environments: セッション環境変数（シェル起動前に適用）
             cwd: 新規ウィンドウの作業ディレクトリ
+            primary_only: 先頭ウィンドウだけタグ付けして戻る（残りは tag_session_windows で揃える）
 
         Returns:
             list[str]: 新規作成されたiTerm2ウィンドウIDのリスト
@@ -380,18 +644,25 @@ class ITerm2Bridge:
             if not window_configs:
                 window_configs = [WindowConfig(name="default")]
 
-            # 2. セッションに接続（環境変数は connect 前に適用）
+            # 2. セッションに接続（環境変数の適用とウィンドウ作成は connect 前に行う）
             await self.connect_to_session(
                 project_name,
                 window_configs[0].name,
                 environments=environments,
                 cwd=cwd,
+                extra_windows=window_configs[1:],
             )
 
             # 3. TmuxConnection を取得
             tmux_conn = await self.get_tmux_connection(project_name)
 
             # 4. 既存ウィンドウにタグ付けし、不足分を作成
+            if primary_only:
+                window_id = await self.tag_primary_window(
+                    tmux_conn, project_name, window_configs[0], cwd=cwd
+                )
+                return [window_id] if window_id else []
+
             window_ids = await self.tag_session_windows(
                 tmux_conn, project_name, window_configs, cwd=cwd
             )
@@ -0,0 +1,53 @@
+"""tmux Control Mode 接続の準備完了待ちの設定."""
+
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from ..metrics import LatencyHistogram
+
+
+# connect_to_session の所要時間（ゲートウェイ作成〜pane表示）を記録するヒストグラム名
+CONNECT_READY_METRIC = "connect_to_session.time_to_ready"
+# 準備完了待ちがタイムアウトした回数
+CONNECT_TIMEOUT_METRIC = "connect_to_session.timeouts"
+# アタッチ後、セッションの全ウィンドウがiTerm2に表示されるまでの所要時間
+SURFACE_WINDOWS_METRIC = "tag_session_windows.time_to_surface"
+
+
+@dataclass
+class ReadinessPolicy:
+    """準備完了待ちのタイムアウト方針.
+
+    固定値（ITMUX_CONNECT_TIMEOUT）が指定されていなければ、過去の所要時間の
+    p95 に倍率を掛けた値を [min_timeout, max_timeout] に収めて使う。
+    """
+
+    timeout: Optional[float] = None
+    min_timeout: float = 2.0
+    max_timeout: float = 15.0
+    default_timeout: float = 5.0
+    multiplier: float = 3.0
+    # 通知を取りこぼした場合に備えた再確認の間隔（秒）
+    recheck_interval: float = 0.25
+
+    @classmethod
+    def from_env(cls) -> "ReadinessPolicy":
+        """環境変数 ITMUX_CONNECT_TIMEOUT（秒）を反映したポリシーを作成."""
+        value = os.environ.get("ITMUX_CONNECT_TIMEOUT")
+        if not value:
+            return cls()
+        try:
+            timeout = float(value)
+        except ValueError:
+            return cls()
+        return cls(timeout=timeout) if timeout > 0 else cls()
+
+    def timeout_for(self, histogram: Optional[LatencyHistogram] = None) -> float:
+        """今回の待ち時間の上限（秒）を決める."""
+        if self.timeout is not None:
+            return self.timeout
+        p95 = histogram.percentile(0.95) if histogram is not None else None
+        if p95 is None:
+            return self.default_timeout
+        return min(self.max_timeout, max(self.min_timeout, p95 * self.multiplier))
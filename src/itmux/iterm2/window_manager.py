@@ -1,19 +1,93 @@
 """iTerm2ウィンドウの管理."""
 
+import asyncio
+import json
+from dataclasses import dataclass, field
+
 import iterm2
+from iterm2 import api_pb2
 from typing import Optional
 
 
+# スナップショットで読み取るユーザー変数
+PROJECT_ID_VARIABLE = "user.projectID"
+WINDOW_NAME_VARIABLE = "user.window_name"
+
+# タグ一括書き込み時の同時RPC数の上限
+TAG_WRITE_CONCURRENCY = 8
+
+
+@dataclass
+class WindowEntry:
+    """iTerm2ウィンドウ1つ分のスナップショット."""
+
+    window: iterm2.Window
+    project_id: Optional[str] = None
+    window_name: Optional[str] = None
+    tmux_window_id: Optional[str] = None
+    tmux_connection_id: Optional[str] = None
+
+
+@dataclass
+class WindowIndex:
+    """全iTerm2ウィンドウのタグとtmux情報を1回で読み取ったスナップショット."""
+
+    entries: list[WindowEntry] = field(default_factory=list)
+
+    def entries_for_project(self, project_name: str) -> list[WindowEntry]:
+        """user.projectID が一致するエントリ."""
+        return [e for e in self.entries if e.project_id == project_name]
+
+    def windows_for_project(self, project_name: str) -> list[iterm2.Window]:
+        """user.projectID が一致するウィンドウ."""
+        return [e.window for e in self.entries_for_project(project_name)]
+
+    def window_names_for_project(self, project_name: str) -> set[str]:
+        """プロジェクトに属するウィンドウの user.window_name の集合."""
+        return {
+            e.window_name for e in self.entries_for_project(project_name) if e.window_name
+        }
+
+    def by_window(self, window: iterm2.Window) -> Optional[WindowEntry]:
+        """iTerm2ウィンドウに対応するエントリを検索."""
+        for entry in self.entries:
+            if entry.window is window or entry.window.window_id == window.window_id:
+                return entry
+        return None
+
+    def by_tmux_window_id(self, tmux_window_id: str) -> Optional[WindowEntry]:
+        """tmuxウィンドウID（@なし）でエントリを検索."""
+        wid = str(tmux_window_id).lstrip("@")
+        for entry in self.entries:
+            if entry.tmux_window_id == wid:
+                return entry
+        return None
+
+    def entries_for_connection(self, tmux_connection_id: str) -> list[WindowEntry]:
+        """TmuxConnection に属するエントリ."""
+        return [e for e in self.entries if e.tmux_connection_id == tmux_connection_id]
+
+
+def _tmux_tab(window: iterm2.Window):
+    """ウィンドウ内で最初に見つかったtmux連携タブ（なければ None）."""
+    for tab in window.tabs:
+        if tab.tmux_connection_id:
+            return tab
+    return None
+
+
 class WindowManager:
     """iTerm2ウィンドウの作成・タグ付けを管理するクラス."""
 
-    def __init__(self, app: iterm2.App):
+    def __init__(self, app: iterm2.App, write_concurrency: int = TAG_WRITE_CONCURRENCY):
         """Initialize WindowManager.
 
         Args:
             app: iTerm2 App instance
+            write_concurrency: タグ一括書き込み時の同時RPC数の上限
         """
         self.app = app
+        self.write_concurrency = write_concurrency
 
     async def tag_window(
         self,
@@ -23,13 +97,60 @@ class WindowManager:
     ) -> None:
         """iTerm2ウィンドウにプロジェクトタグを設定.
 
+        2つの変数を1回の Variable RPC でまとめて書き込みます。
+
         Args:
             window: iTerm2ウィンドウ
             project_name: プロジェクト名
             window_name: ウィンドウ名
+
+        Raises:
+            iterm2.RPCException: 書き込みに失敗
+        """
+        result = await iterm2.rpc.async_variable(
+            window.connection,
+            sets=[
+                (PROJECT_ID_VARIABLE, json.dumps(project_name)),
+                (WINDOW_NAME_VARIABLE, json.dumps(window_name)),
+            ],
+            window_id=window.window_id,
+        )
+        status = result.variable_response.status
+        if status != api_pb2.VariableResponse.Status.Value("OK"):
+            raise iterm2.RPCException(api_pb2.VariableResponse.Status.Name(status))
+
+    async def tag_windows(
+        self,
+        assignments: list[tuple[iterm2.Window, str, str]],
+        snapshot: Optional[WindowIndex] = None,
+    ) -> int:
+        """複数ウィンドウのタグをまとめて書き込む.
+
+        snapshot が渡された場合、タグが既に一致しているウィンドウは書き込みを
+        省略します。書き込みは同時 write_concurrency 件までの並行RPCで行います。
+
+        Args:
+            assignments: (ウィンドウ, プロジェクト名, ウィンドウ名) のリスト
+            snapshot: 書き込み前のタグを読み取ったスナップショット
+
+        Returns:
+            int: 実際に書き込んだウィンドウ数
         """
-        await window.async_set_variable("user.projectID", project_name)
-        await window.async_set_variable("user.window_name", window_name)
+        pending = []
+        for window, project_name, window_name in assignments:
+            entry = snapshot.by_window(window) if snapshot is not None else None
+            if entry and entry.project_id == project_name and entry.window_name == window_name:
+                continue
+            pending.append((window, project_name, window_name))
+
+        semaphore = asyncio.Semaphore(self.write_concurrency)
+
+        async def write(window: iterm2.Window, project_name: str, window_name: str) -> None:
+            async with semaphore:
+                await self.tag_window(window, project_name, window_name)
+
+        await asyncio.gather(*(write(*assignment) for assignment in pending))
+        return len(pending)
 
     async def tag_window_by_tmux_id(
         self,
@@ -53,6 +174,34 @@ class WindowManager:
                 return window.window_id
         return None
 
+    @staticmethod
+    async def _read_entry(window: iterm2.Window) -> WindowEntry:
+        """1ウィンドウ分のタグを読み取る（2変数を並行取得）."""
+        tab = _tmux_tab(window)
+        entry = WindowEntry(window=window)
+        if tab is None:
+            # tmux連携でないウィンドウはプロジェクトに属さないためRPCを省略
+            return entry
+
+        entry.tmux_connection_id = tab.tmux_connection_id
+        entry.tmux_window_id = str(tab.tmux_window_id) if tab.tmux_window_id else None
+        entry.project_id, entry.window_name = await asyncio.gather(
+            window.async_get_variable(PROJECT_ID_VARIABLE),
+            window.async_get_variable(WINDOW_NAME_VARIABLE),
+        )
+        return entry
+
+    async def build_window_index(self) -> WindowIndex:
+        """全ウィンドウのタグを並行して読み取り、スナップショットを作成.
+
+        Returns:
+            WindowIndex: プロジェクト・ウィンドウ名・tmuxウィンドウIDの検索用スナップショット
+        """
+        entries = await asyncio.gather(
+            *(self._read_entry(window) for window in self.app.windows)
+        )
+        return WindowIndex(entries=list(entries))
+
     async def find_windows_by_project(self, project_name: str) -> list[iterm2.Window]:
         """プロジェクト名でiTerm2ウィンドウを検索.
 
@@ -62,9 +211,5 @@ class WindowManager:
         Returns:
             該当するウィンドウのリスト
         """
-        result = []
-        for window in self.app.windows:
-            project_id = await window.async_get_variable("user.projectID")
-            if project_id == project_name:
-                result.append(window)
-        return result
+        index = await self.build_window_index()
+        return index.windows_for_project(project_name)
@@ -0,0 +1,209 @@
+"""実行時メトリクス（レイテンシヒストグラム・カウンタ）の記録.
+
+hook や open の所要時間を ~/.itmux/metrics.json に蓄積し、タイムアウトの
+自動調整や最適化の効果確認に使う。複数プロセスから書き込まれるため、
+更新はファイルロック下で read-modify-write する。
+
+CLI はプロセスごとに1つの buffered なストアを使い、記録をメモリに溜めて
+終了時（デーモンは一定間隔）に1回だけ書き込む。hook は1イベントごとに
+起動されるため、記録のたびにロックを取ってファイルを書き直すと、省略した
+書き込みの件数を数えるだけでもファイル I/O が発生する。
+"""
+
+import atexit
+import json
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from filelock import FileLock, Timeout
+
+
+DEFAULT_METRICS_PATH = Path.home() / ".itmux" / "metrics.json"
+
+# ヒストグラムのバケット上限（秒）。最後のバケットは上限なし
+DEFAULT_BUCKETS = (0.05, 0.1, 0.2, 0.4, 0.8, 1.6, 3.2, 6.4, 12.8)
+
+
+def get_metrics_path() -> Path:
+    """メトリクスファイルのパスを取得（ITMUX_METRICS_PATH 対応）."""
+    metrics_path_str = os.environ.get("ITMUX_METRICS_PATH")
+    return Path(metrics_path_str) if metrics_path_str else DEFAULT_METRICS_PATH
+
+
+@dataclass
+class LatencyHistogram:
+    """固定バケットのレイテンシヒストグラム."""
+
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    counts: list[int] = field(default_factory=list)
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def __post_init__(self) -> None:
+        if len(self.counts) != len(self.buckets) + 1:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, seconds: float) -> None:
+        """1件の観測値を追加."""
+        index = len(self.buckets)
+        for i, upper in enumerate(self.buckets):
+            if seconds <= upper:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q分位点の推定値（該当バケットの上限。観測がなければ None）."""
+        if self.count == 0:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def to_dict(self) -> dict:
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        return cls(
+            buckets=tuple(data.get("buckets", DEFAULT_BUCKETS)),
+            counts=list(data.get("counts", [])),
+            count=int(data.get("count", 0)),
+            total=float(data.get("total", 0.0)),
+            max=float(data.get("max", 0.0)),
+        )
+
+
+class MetricsStore:
+    """メトリクスファイルの読み書き.
+
+    書き込みに失敗しても本処理を止めないよう、例外は握りつぶす。
+    buffered の場合、observe / increment はメモリに溜め、flush() でまとめて
+    1回書き込む（読み出しにはまだ書き込んでいない分も含める）。
+    """
+
+    def __init__(self, path: Optional[Path] = None, buffered: bool = False):
+        """
+        Args:
+            path: メトリクスファイルパス（省略時はデフォルト）
+            buffered: 記録をメモリに溜め、flush() で書き込むか
+        """
+        self.path = path or get_metrics_path()
+        self.lock_path = self.path.parent / f".{self.path.name}.lock"
+        self.buffered = buffered
+        self._pending_counters: dict[str, int] = {}
+        self._pending_observations: dict[str, list[float]] = {}
+        self._last_flush = time.monotonic()
+
+    def load(self) -> dict:
+        """メトリクスを読み込む（存在しない・壊れている場合は空）."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {"histograms": {}, "counters": {}}
+        data.setdefault("histograms", {})
+        data.setdefault("counters", {})
+        return data
+
+    def _update(self, mutate) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with FileLock(self.lock_path, timeout=1):
+                data = self.load()
+                mutate(data)
+                tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=2, ensure_ascii=False)
+                    f.write("\n")
+                os.replace(tmp_path, self.path)
+        except (OSError, Timeout):
+            pass
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        """ヒストグラムを取得（未記録なら空）."""
+        data = self.load()["histograms"].get(name)
+        histogram = LatencyHistogram.from_dict(data) if data else LatencyHistogram()
+        for seconds in self._pending_observations.get(name, []):
+            histogram.observe(seconds)
+        return histogram
+
+    def counter(self, name: str) -> int:
+        """カウンタ値を取得（未記録なら0）."""
+        return int(self.load()["counters"].get(name, 0)) + self._pending_counters.get(name, 0)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """ヒストグラムに観測値を追加."""
+        self._pending_observations.setdefault(name, []).append(seconds)
+        if not self.buffered:
+            self.flush()
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """カウンタを加算."""
+        self._pending_counters[name] = self._pending_counters.get(name, 0) + amount
+        if not self.buffered:
+            self.flush()
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending_counters or self._pending_observations)
+
+    def flush(self, min_interval: float = 0.0) -> None:
+        """溜めた記録を1回の read-modify-write で書き込む.
+
+        Args:
+            min_interval: 前回の書き込みからこの秒数が経っていなければ書き込まない
+                （常駐するデーモンがリクエストごとに呼ぶ場合）
+        """
+        if not self.has_pending or time.monotonic() - self._last_flush < min_interval:
+            return
+        counters, self._pending_counters = self._pending_counters, {}
+        observations, self._pending_observations = self._pending_observations, {}
+        self._last_flush = time.monotonic()
+
+        def mutate(data: dict) -> None:
+            for name, amount in counters.items():
+                data["counters"][name] = int(data["counters"].get(name, 0)) + amount
+            for name, values in observations.items():
+                raw = data["histograms"].get(name)
+                histogram = LatencyHistogram.from_dict(raw) if raw else LatencyHistogram()
+                for seconds in values:
+                    histogram.observe(seconds)
+                data["histograms"][name] = histogram.to_dict()
+
+        self._update(mutate)
+
+
+_process_stores: dict[Path, MetricsStore] = {}
+
+
+def process_metrics() -> MetricsStore:
+    """このプロセスで共有する buffered なストア（終了時に1回だけ書き込む）."""
+    path = get_metrics_path()
+    store = _process_stores.get(path)
+    if store is None:
+        store = _process_stores[path] = MetricsStore(path, buffered=True)
+        atexit.register(store.flush)
+    return store
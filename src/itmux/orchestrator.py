@@ -3,48 +3,149 @@
 import asyncio
 import os
 import subprocess
-from typing import Optional
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional, Sequence
+
+from filelock import Timeout
 
 from .config import ConfigManager
-from .iterm2 import ITerm2Bridge
+from .daemon import forward_to_daemon
 from .models import WindowConfig, ProjectConfig
 from .exceptions import (
+    ConfigConflictError,
     ITerm2Error,
     ProjectNotFoundError,
     ProjectNotOpenError,
     ProjectNotOpenReason,
+    RestoreError,
 )
 from .tmux.environment import apply_session_environments
+from .tmux.hook_manager import read_managed_sessions, unregister_managed_sessions
+from .tmux.server import TmuxServerSnapshot
 from .tmux.cwd import validate_cwd_path
+from .tmux.window_events import WINDOW_ADDED, WindowEvent, WindowMap
+from .tmux.snapshot import (
+    capture_snapshots,
+    delete_snapshot,
+    get_snapshot_path,
+    list_snapshot_names,
+    load_snapshot,
+    read_pending_restores,
+    restore_snapshot,
+    save_snapshot,
+    write_pending_restores,
+)
+from .metrics import MetricsStore
+from .save_scheduler import (
+    SAVES_COALESCED_METRIC,
+    SaveCoordinator,
+    SaveDecision,
+    SaveScheduleFile,
+)
+from .readonly import current_session_name
+
+if TYPE_CHECKING:
+    from .iterm2 import ITerm2Bridge
+
+
+# open の所要時間（最初のウィンドウが使えるまで / 全ウィンドウが揃うまで）
+OPEN_FIRST_WINDOW_METRIC = "open.time_to_first_window"
+OPEN_FULL_PROJECT_METRIC = "open.time_to_full_project"
+
+# スナップショットからの復元の所要時間（プロジェクトごと）
+RESTORE_PROJECT_METRIC = "restore.time_per_project"
+
+# スナップショット保存のフィンガープリント判定（一致して保存を省略 / 不一致で保存）
+SNAPSHOT_FINGERPRINT_HITS_METRIC = "snapshot.fingerprint_hits"
+SNAPSHOT_FINGERPRINT_MISSES_METRIC = "snapshot.fingerprint_misses"
+
+# hook のウィンドウイベントの差分同期（適用 / 全体の照合にフォールバック）
+SYNC_DELTA_APPLIED_METRIC = "sync.delta_applied"
+SYNC_DELTA_FALLBACK_METRIC = "sync.delta_fallback"
+
+# 全体の照合で、取得中にウィンドウリストが更新されていた場合に取得し直す回数の上限
+MAX_SYNC_ATTEMPTS = 3
+
+# 段階的 open のバックグラウンドワーカーのログ
+OPEN_LOG_PATH = Path.home() / ".itmux" / "open.log"
+
+# hook と、hook から起動する遅延保存ワーカーのログ
+HOOK_LOG_PATH = Path.home() / ".itmux" / "hook.log"
+
+
+async def connect_bridge() -> "ITerm2Bridge":
+    """iTerm2に接続してブリッジを作成（iterm2 はここで初めて import する）."""
+    from .iterm2 import ITerm2Bridge
+
+    return await ITerm2Bridge.connect()
 
 
 class ProjectOrchestrator:
     """プロジェクトのopen/close/add/list機能を提供するオーケストレーター."""
 
-    def __init__(self, config_manager: ConfigManager, iterm2_bridge: ITerm2Bridge):
+    def __init__(
+        self,
+        config_manager: ConfigManager,
+        iterm2_bridge: Optional["ITerm2Bridge"] = None,
+        metrics: Optional[MetricsStore] = None,
+        bridge_factory: Optional[Callable[[], Awaitable["ITerm2Bridge"]]] = None,
+    ):
         """
         Args:
             config_manager: 設定管理インスタンス
             iterm2_bridge: iTerm2ブリッジインスタンス
+            metrics: 所要時間の記録先（省略時はデフォルトのメトリクスファイル）
+            bridge_factory: ブリッジを作成するコルーチン関数。iterm2_bridge が
+                省略された場合、iTerm2を使う操作で初めて呼び出す
         """
         self.config = config_manager
         self.bridge = iterm2_bridge
+        self.metrics = metrics or MetricsStore()
+        self._bridge_factory = bridge_factory or connect_bridge
+        self._bridge_lock = asyncio.Lock()
 
-    def _tmux_has_session(self, session_name: str) -> bool:
+    async def get_bridge(self) -> "ITerm2Bridge":
+        """iTerm2ブリッジを取得（初回のみiTerm2に接続）.
+
+        save / current / list など iTerm2 を使わないコマンドは接続しないため、
+        tmux コマンド1回分の時間で終わる。
+
+        Returns:
+            ITerm2Bridge: 接続済みのブリッジ
+        """
+        if self.bridge is None or not self.bridge.is_connected:
+            async with self._bridge_lock:
+                if self.bridge is not None and not self.bridge.is_connected:
+                    # iTerm2 の再起動などで切れた接続は捨てて接続し直す（デーモン）
+                    self.reset_bridge()
+                if self.bridge is None:
+                    self.bridge = await self._bridge_factory()
+        return self.bridge
+
+    def reset_bridge(self) -> None:
+        """iTerm2 への接続を捨てる（次に iTerm2 を使う操作で接続し直す）."""
+        self.bridge = None
+
+    def _tmux_server(self) -> TmuxServerSnapshot:
+        """tmuxサーバーのセッション・ウィンドウ一覧を1回のtmux起動で取得."""
+        return TmuxServerSnapshot.capture()
+
+    def _tmux_has_session(
+        self, session_name: str, server: Optional[TmuxServerSnapshot] = None
+    ) -> bool:
         """tmuxセッションが存在するか確認.
 
         Args:
             session_name: セッション名
+            server: 取得済みのスナップショット（省略時は新たに取得）
 
         Returns:
             bool: セッションが存在すればTrue
         """
-        result = subprocess.run(
-            ["tmux", "has-session", "-t", session_name],
-            capture_output=True,
-            env=os.environ.copy()
-        )
-        return result.returncode == 0
+        if server is None:
+            server = self._tmux_server()
+        return server.has_session(session_name)
 
     _SYNC_EPHEMERAL_PROJECT_FIELDS = frozenset({"name", "tmux_windows"})
 
@@ -103,26 +204,32 @@ class ProjectOrchestrator:
         """
         import sys
 
+        bridge = await self.get_bridge()
         try:
-            tmux_conn = await self.bridge.get_tmux_connection(project_name)
+            tmux_conn = await bridge.get_tmux_connection(project_name)
         except Exception as e:
             print(f"[sync] TmuxConnection not found: {e}", file=sys.stderr)
             return []
 
         # セッションに属するウィンドウを検出（共通ヘルパー使用）
-        matched_windows = await self.bridge.find_windows_by_tmux_session(tmux_conn)
+        matched_windows = await bridge.find_windows_by_tmux_session(tmux_conn)
         print(f"[sync] matched {len(matched_windows)} iTerm2 windows", file=sys.stderr)
 
+        # 既存タグは全ウィンドウ分を1回のスナップショットで読み取る
+        snapshot = await bridge.build_window_index()
+
         # window_index順にソート
         matched_windows.sort(key=lambda x: int(x[2]))
 
-        # 各ウィンドウにタグ付け（重複を避ける）
+        # 各ウィンドウの名前を決める（重複を避ける）
         result = []
+        assignments = []
         used_names = set()
         counter = 1
 
         for window, tmux_window_id, window_index in matched_windows:
-            window_name = await window.async_get_variable("user.window_name")
+            entry = snapshot.by_window(window)
+            window_name = entry.window_name if entry else None
 
             # 既存の名前が重複している場合、または未タグの場合は新しい名前を生成
             if not window_name or window_name in used_names:
@@ -138,13 +245,114 @@ class ProjectOrchestrator:
                 window_name = candidate
 
             used_names.add(window_name)
-
-            # タグ付け（user.projectIDとuser.window_name）
-            await self.bridge.window_manager.tag_window(window, project_name, window_name)
+            assignments.append((window, project_name, window_name))
             result.append(WindowConfig(name=window_name))
 
+        # タグ付け（user.projectIDとuser.window_name）
+        # スナップショットと一致するウィンドウは書き込まず、残りは並行して書き込む
+        written = await bridge.window_manager.tag_windows(assignments, snapshot=snapshot)
+        print(f"[sync] tagged {written}/{len(assignments)} windows", file=sys.stderr)
+
+        # 以降の hook イベントを差分で反映できるよう、ウィンドウの対応表を記録
+        window_map = WindowMap([
+            (tmux_window_id, config.name)
+            for (_, tmux_window_id, _), config in zip(matched_windows, result)
+        ])
+        await bridge.write_window_map(tmux_conn, project_name, window_map)
+
         return result
 
+    async def _sync_window_event(self, project_name: str, event: WindowEvent) -> bool:
+        """hook から渡されたウィンドウ1つ分の変更を反映.
+
+        差分を適用できない場合（対応表が未記録、config や tmux のウィンドウ
+        一覧と食い違うなど）は、全体の照合（`_sync_single_project`）を行う。
+
+        Args:
+            project_name: プロジェクト名
+            event: ウィンドウの追加・削除
+
+        Returns:
+            bool: tmuxセッションが存在したか
+        """
+        import sys
+
+        print(
+            f"[sync] project={project_name} window {event.kind} "
+            f"@{event.window_id} index={event.index} name={event.name}",
+            file=sys.stderr,
+        )
+        try:
+            applied = await self._apply_window_event(project_name, event)
+        except Exception as e:
+            print(f"[sync] delta sync failed: {e}", file=sys.stderr)
+            applied = False
+
+        if applied:
+            self.metrics.increment(SYNC_DELTA_APPLIED_METRIC)
+            return True
+
+        self.metrics.increment(SYNC_DELTA_FALLBACK_METRIC)
+        print(f"[sync] Falling back to full reconcile", file=sys.stderr)
+        return await self._sync_single_project(project_name)
+
+    async def _apply_window_event(self, project_name: str, event: WindowEvent) -> bool:
+        """ウィンドウの追加・削除を config と iTerm2 のタグに差分で反映.
+
+        Returns:
+            bool: 差分を適用できたか（False なら全体の照合が必要）
+        """
+        import sys
+
+        project = self.config.get_project(project_name)
+        config_names = [w.name for w in project.tmux_windows]
+
+        bridge = await self.get_bridge()
+        tmux_conn = await bridge.get_tmux_connection(project_name)
+        window_map = await bridge.read_window_map(tmux_conn, project_name)
+        if window_map is None:
+            return False
+        live_ids = await bridge.list_session_window_ids(tmux_conn)
+
+        windows = list(project.tmux_windows)
+        if event.kind == WINDOW_ADDED:
+            if window_map.matches(config_names, live_ids):
+                # add コマンドの明示的な sync などで反映済み
+                return True
+            position = window_map.position_for_added(event.window_id, config_names, live_ids)
+            if position is None:
+                return False
+
+            entry = await bridge.find_session_window(tmux_conn, event.window_id, str(event.index))
+            if entry is None:
+                return False
+            # add コマンドで付けたタグがあればその名前を使う
+            window_name = entry.window_name if entry.project_id == project_name else None
+            if not window_name or window_name in config_names:
+                window_name = self._generate_window_name(project_name)
+            if entry.project_id != project_name or entry.window_name != window_name:
+                await bridge.window_manager.tag_window(entry.window, project_name, window_name)
+                print(f"[sync] Tagged tmux@{event.window_id} as '{window_name}'", file=sys.stderr)
+
+            windows.insert(position, WindowConfig(name=window_name))
+            window_map.entries.insert(position, (event.window_id, window_name))
+        else:
+            if event.window_id not in window_map.ids and window_map.matches(config_names, live_ids):
+                # 反映済み
+                return True
+            position = window_map.position_for_removed(event.window_id, config_names, live_ids)
+            if position is None:
+                return False
+            print(f"[sync] Removing window '{windows[position].name}'", file=sys.stderr)
+            del windows[position]
+            del window_map.entries[position]
+
+        # 読み込んだ後に別の hook がウィンドウリストを更新していれば ConfigConflictError
+        # になり、全体の照合に切り替える（古いリストへの差分で上書きしない）
+        self.config.update_project(project_name, windows, expected=config_names)
+        await bridge.write_window_map(tmux_conn, project_name, window_map)
+        return True
+
     def _resolve_project_name(self, project_name: Optional[str]) -> str:
         """プロジェクト名を解決（引数 or tmux session）.
 
@@ -159,20 +367,9 @@ class ProjectOrchestrator:
         """
         if project_name is None:
             # tmux内で実行されている場合、session名を取得
-            if os.environ.get("TMUX"):
-                try:
-                    result = subprocess.run(
-                        ["tmux", "display-message", "-p", "#{session_name}"],
-                        capture_output=True,
-                        text=True,
-                        check=True,
-                        env=os.environ.copy()
-                    )
-                    project_name = result.stdout.strip()
-                    if project_name:
-                        return project_name
-                except Exception:
-                    pass
+            project_name = current_session_name()
+            if project_name:
+                return project_name
 
             raise ValueError("No project specified and not running in tmux session")
 
@@ -187,8 +384,9 @@ class ProjectOrchestrator:
         Raises:
             ProjectNotOpenError: プロジェクトが iTerm2 で開いていない
         """
+        bridge = await self.get_bridge()
         try:
-            await self.bridge.get_tmux_connection(project_name)
+            await bridge.get_tmux_connection(project_name)
             return
         except ITerm2Error:
             pass
@@ -229,83 +427,69 @@ class ProjectOrchestrator:
                 return candidate
             counter += 1
 
-    @staticmethod
-    def _should_save_resurrect(project_name: str, debounce_seconds: float = 1.0) -> bool:
-        """tmux-resurrect保存のdebounce判定.
+    def _save_snapshots(
+        self, project_names: Optional[list[str]] = None, requests: int = 1
+    ) -> None:
+        """tmuxのレイアウトをプロジェクトごとのスナップショットに保存.
 
-        Args:
-            project_name: プロジェクト名
-            debounce_seconds: debounce時間（秒）
+        保存は SaveCoordinator でサーバー全体で1本にまとめる。他のプロセスが
+        保存中なら待ち行列に積んで戻り、そのプロセスが続けてまとめて保存する。
+        まとめて省いた保存の回数はメトリクスに加算する。
 
-        Returns:
-            bool: 保存を実行すべき場合True
+        Args:
+            project_names: 保存するプロジェクト（省略時は設定にある全プロジェクト）
+            requests: まとめている保存要求の数（デーモンのタイマーでまとめた場合など）
         """
-        import time
-        from pathlib import Path
+        import sys
 
-        lock_file = Path.home() / ".itmux" / f".last_save_{project_name}"
-        now = time.time()
+        if project_names is None:
+            project_names = self.config.list_projects()
+        try:
+            coalesced = SaveCoordinator().run(project_names, self._write_snapshots, requests)
+        except (OSError, Timeout) as e:
+            print(f"[save] snapshot save error: {e}", file=sys.stderr)
+            return
 
-        if lock_file.exists():
-            try:
-                last = float(lock_file.read_text().strip())
-                if now - last < debounce_seconds:
-                    return False  # 指定秒数以内なのでスキップ
-            except (ValueError, OSError):
-                pass  # ファイル読み取り失敗時は実行
-
-        # タイムスタンプ更新
-        lock_file.parent.mkdir(parents=True, exist_ok=True)
-        lock_file.write_text(str(now))
-        return True
+        if coalesced is None:
+            print(f"[save] Queued behind a running save: {', '.join(project_names)}", file=sys.stderr)
+        elif coalesced:
+            self.metrics.increment(SAVES_COALESCED_METRIC, coalesced)
+            print(f"[save] coalesced {coalesced} save requests", file=sys.stderr)
 
-    def _save_tmux_resurrect(self, debounce: bool = False, project_name: str = "") -> None:
-        """tmux-resurrectで状態を保存.
+    def _write_snapshots(self, project_names: list[str]) -> None:
+        """プロジェクトのレイアウトを1回の `list-panes` で取得して保存する.
 
-        Args:
-            debounce: debounce判定を行うか
-            project_name: debounce判定用のプロジェクト名（debounce=Trueの場合必須）
+        tmux-resurrect の save.sh（サーバー全体を保存するシェルスクリプト）の代わりに、
+        対象プロジェクトのウィンドウ・ペインだけを取得する。レイアウトの
+        フィンガープリントが前回保存分と同じプロジェクトは書き込まず、
+        一致（hit）・不一致（miss）の件数をメトリクスに加算し、今回の件数を hook.log に出力する。
 
-        tmux-continuumの自動保存の代替として、sync時に手動で保存を実行します。
-        tmux-resurrectの保存スクリプトが存在する場合のみ実行します。
+        Args:
+            project_names: 保存するプロジェクト
         """
         import sys
-        import subprocess
-        from pathlib import Path
-
-        # debounce判定
-        if debounce:
-            if not project_name:
-                print(f"[save] Error: project_name required for debounce", file=sys.stderr)
-                return
-            if not self._should_save_resurrect(project_name):
-                print(f"[save] Skipped (debounce)", file=sys.stderr)
-                return
-
-        save_script = Path.home() / ".tmux" / "plugins" / "tmux-resurrect" / "scripts" / "save.sh"
-
-        if not save_script.exists():
-            # tmux-resurrectがインストールされていない場合はスキップ
-            return
 
         try:
-            # subprocess.runに明示的に環境変数を渡す（hookから実行される場合のPATH問題対策）
-            result = subprocess.run(
-                [str(save_script)],
-                capture_output=True,
-                text=True,
-                timeout=5,
-                check=False,
-                env=os.environ.copy()
-            )
-            if result.returncode != 0:
-                print(f"[save] tmux-resurrect save failed: {result.stderr}", file=sys.stderr)
-            else:
-                print(f"[save] tmux-resurrect saved", file=sys.stderr)
-        except subprocess.TimeoutExpired:
-            print(f"[save] tmux-resurrect save timeout", file=sys.stderr)
+            snapshots = capture_snapshots(project_names)
+            hits = misses = 0
+            for name, snapshot in snapshots.items():
+                if save_snapshot(snapshot, get_snapshot_path(self.config.config_path, name)):
+                    misses += 1
+                    print(f"[save] snapshot saved: {name}", file=sys.stderr)
+                else:
+                    hits += 1
         except Exception as e:
-            print(f"[save] tmux-resurrect save error: {e}", file=sys.stderr)
+            print(f"[save] snapshot save error: {e}", file=sys.stderr)
+            return
+
+        if not snapshots:
+            return
+        if hits:
+            self.metrics.increment(SNAPSHOT_FINGERPRINT_HITS_METRIC, hits)
+        if misses:
+            self.metrics.increment(SNAPSHOT_FINGERPRINT_MISSES_METRIC, misses)
+        # 累計はメトリクスファイルで確認する（ここで読むと保存のたびにファイルを読み直す）
+        print(f"[save] fingerprint hits={hits} misses={misses}", file=sys.stderr)
 
     def list(self) -> dict:
         """プロジェクト一覧取得.
@@ -330,30 +514,138 @@ class ProjectOrchestrator:
             }
         return result
 
-    def _is_tmux_running(self) -> bool:
-        """tmuxプロセスが起動しているかチェック.
+    async def _restore_for_open(
+        self, project_name: str, restore_others: bool = False
+    ) -> Optional[Sequence[str]]:
+        """open するプロジェクトだけを保存したレイアウトから復元する.
+
+        tmux サーバーが起動していなければ、スナップショットのある全プロジェクトを
+        復元待ちとし、開くプロジェクトだけをその場で復元する。残りは tmux サーバーの
+        ユーザーオプションに記録し、それぞれ初めて open されたときに復元する
+        （restore_others ならバックグラウンドで今すぐ復元する）。
+        サーバーが起動していれば、復元待ちの確認は tmux 1回で終わる。
+
+        Args:
+            project_name: 開くプロジェクト名
+            restore_others: 残りのプロジェクトをバックグラウンドで復元するか
+
+        開くプロジェクトの復元に失敗した場合は、復元待ちに残して（次の open で
+        やり直す）RestoreError を送出する。作りかけのセッションは残さない。
+
+        Returns:
+            Optional[Sequence[str]]: tmux サーバーがまだなく記録できなかった復元待ち
+                （iTerm2 でセッションを作った後に記録する）
+
+        Raises:
+            RestoreError: 開くプロジェクトを復元できなかった
+        """
+        pending = read_pending_restores()
+        if pending is None:
+            # 設定から削除されたプロジェクトのスナップショットは復元しない
+            project_names = set(self.config.list_projects())
+            pending = [
+                name
+                for name in list_snapshot_names(self.config.config_path)
+                if name in project_names
+            ]
+            if not pending:
+                self._restore_with_resurrect()
+                return None
+        elif project_name not in pending and not (restore_others and pending):
+            return None
+
+        failed = False
+        if project_name in pending:
+            # 復元できなくても、同名のセッションが既にあれば（手動で作った場合など）
+            # 復元するものはない
+            if self._restore_project(project_name) or self._tmux_has_session(project_name):
+                pending.remove(project_name)
+            else:
+                failed = True
+        # バックグラウンドで復元するプロジェクトも復元待ちに残し、復元できたものだけを
+        # restore_sessions が外す（失敗したものは初めて open したときにやり直す）
+        recorded = write_pending_restores(pending)
+        others = [name for name in pending if name != project_name]
+        if restore_others and others:
+            await self._restore_in_background(others)
+        if failed:
+            raise RestoreError(
+                f"プロジェクト '{project_name}' のセッションを保存したレイアウトから"
+                f"復元できませんでした（次の open で再試行します）。\n"
+                f"  スナップショット: {get_snapshot_path(self.config.config_path, project_name)}"
+            )
+        if recorded:
+            return None
+        return pending or None
+
+    def _restore_project(self, project_name: str) -> bool:
+        """1プロジェクトのセッションをスナップショットから復元し、所要時間を記録する.
 
         Returns:
-            bool: tmuxが起動していればTrue
+            bool: 復元できた（または復元するスナップショットがない）場合 True
         """
-        result = subprocess.run(
-            ["tmux", "ls"],
-            capture_output=True,
-            env=os.environ.copy()
+        import sys
+
+        snapshot = load_snapshot(get_snapshot_path(self.config.config_path, project_name))
+        if snapshot is None:
+            print(f"[restore] No snapshot: {project_name}", file=sys.stderr)
+            return True
+        started = time.monotonic()
+        if not restore_snapshot(snapshot):
+            print(f"[restore] Failed: {project_name}", file=sys.stderr)
+            return False
+        elapsed = time.monotonic() - started
+        self.metrics.observe(RESTORE_PROJECT_METRIC, elapsed)
+        print(f"[restore] Restored {project_name} in {elapsed:.3f}s", file=sys.stderr)
+        return True
+
+    def restore_sessions(self, project_names: Sequence[str]) -> None:
+        """複数のプロジェクトを復元し、復元待ちから外す（バックグラウンド処理）.
+
+        復元できなかったプロジェクトは復元待ちに残す（初めて open したときにやり直す）。
+
+        Args:
+            project_names: プロジェクト名のリスト
+        """
+        restored = [name for name in project_names if self._restore_project(name)]
+        pending = read_pending_restores()
+        if pending:
+            write_pending_restores([name for name in pending if name not in restored])
+
+    async def _restore_in_background(self, project_names: Sequence[str]) -> None:
+        """残りのプロジェクトの復元をデーモン、なければ切り離したワーカーに任せる."""
+        if await forward_to_daemon("restore", projects=list(project_names)):
+            return
+
+        import sys
+
+        itmux_command = os.environ.get("ITMUX_COMMAND", "itmux")
+        OPEN_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(OPEN_LOG_PATH, "a", encoding="utf-8") as log:
+            subprocess.Popen(
+                [itmux_command, "restore", *project_names],
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=log,
+                start_new_session=True,
+            )
+        print(
+            f"[restore] Restoring {len(project_names)} other sessions in background "
+            f"(log: {OPEN_LOG_PATH})",
+            file=sys.stderr,
         )
-        return result.returncode == 0
 
-    def _restore_tmux_sessions(self) -> None:
-        """tmux-resurrectで保存されたセッションを復元.
+    def _restore_with_resurrect(self) -> None:
+        """tmux-resurrect の restore.sh を実行する.
 
-        tmux-resurrectのrestore.shを実行して全セッションを復元します。
+        スナップショット導入前に resurrect で保存した状態の復元用（スナップショットが
+        1つもない場合だけ使う）。
         """
         import sys
-        from pathlib import Path
 
         restore_script = Path.home() / ".tmux" / "plugins" / "tmux-resurrect" / "scripts" / "restore.sh"
         if not restore_script.exists():
-            print("[restore] tmux-resurrect not installed, skipping restore", file=sys.stderr)
+            print("[restore] No saved state, skipping restore", file=sys.stderr)
             return
 
         print("[restore] Restoring tmux sessions...", file=sys.stderr)
@@ -374,7 +666,13 @@ class ProjectOrchestrator:
         except Exception as e:
             print(f"[restore] Error: {e}", file=sys.stderr)
 
-    async def open(self, project_name: str, create_default: bool = True) -> None:
+    async def open(
+        self,
+        project_name: str,
+        create_default: bool = True,
+        staged: bool = False,
+        restore_others: bool = False,
+    ) -> bool:
         """プロジェクトを開く.
 
         プロジェクトが存在しない場合は自動作成します。
@@ -382,13 +680,21 @@ class ProjectOrchestrator:
         Args:
             project_name: プロジェクト名
             create_default: プロジェクトのウィンドウが0個の場合、defaultウィンドウを作成するか
+            staged: 最初のウィンドウだけタグ付けして戻り、残りはバックグラウンドで揃える
+            restore_others: tmux 起動時に、他のプロジェクトもバックグラウンドで復元する
+
+        Returns:
+            bool: 残りのウィンドウをバックグラウンドに回した場合 True
 
         Raises:
             ITerm2Error: iTerm2操作が失敗
         """
-        # 0. tmuxが起動していない場合、tmux-resurrectで復元
-        if not self._is_tmux_running():
-            self._restore_tmux_sessions()
+        started_at = time.time()
+        started = time.monotonic()
+
+        # 0. tmux の起動後に初めて開くプロジェクトは、保存したレイアウトから復元
+        # （他のプロジェクトは初めて開くときか、バックグラウンドで復元する）
+        unrecorded_restores = await self._restore_for_open(project_name, restore_others)
 
         # 1. プロジェクト設定取得（存在しない場合は作成）
         try:
@@ -402,43 +708,126 @@ class ProjectOrchestrator:
             validate_cwd_path(project.cwd)
 
         # 2. 既存のiTerm2ウィンドウを検索（既に開いているwindowを特定）
-        existing_windows = await self.bridge.find_windows_by_project(project_name)
-        existing_window_names = set()
-        for window in existing_windows:
-            window_name = await window.async_get_variable("user.window_name")
-            if window_name:
-                existing_window_names.add(window_name)
+        # 全ウィンドウのタグを1回のスナップショットで読み取る
+        bridge = await self.get_bridge()
+        window_index = await bridge.build_window_index()
+        existing_window_names = window_index.window_names_for_project(project_name)
 
         # 3. まだ開かれていないwindowだけを開く（差分のみ）
         windows_to_open = [
             w for w in project.tmux_windows
             if w.name not in existing_window_names
         ]
+        # 2つ以上開く場合だけ段階的に開く意味がある。一部が開いている場合は
+        # 先頭ウィンドウの対応付けがずれるため、通常どおりまとめて開く
+        staged = staged and len(windows_to_open) > 1 and not existing_window_names
 
         # windows_to_openが空でも、プロジェクトのウィンドウが0個かつcreate_default=Trueなら開く
         if windows_to_open or (not project.tmux_windows and create_default):
-            await self.bridge.open_project_windows(
+            await bridge.open_project_windows(
                 project_name,
                 windows_to_open,
                 project.environments,
                 cwd=project.cwd,
+                primary_only=staged,
             )
-        elif project.environments:
+        else:
             # 全ウィンドウが既に開いている場合（resurrect 後の再適用など）
+            # 差分適用なので、変更がなければ読み取り1回で終わる
             apply_session_environments(project_name, project.environments)
 
         # 4. hookを設定（自動同期を有効化）
         # セッションスコープのhook（after-new-window等）は上書きされるため、
         # グローバルのsession-closedも上書きされるため、何回openしても多重登録されない
         itmux_command = os.environ.get("ITMUX_COMMAND", "itmux")
-        await self.bridge.setup_hooks(project_name, itmux_command=itmux_command)
+        await bridge.setup_hooks(project_name, itmux_command=itmux_command)
+
+        if unrecorded_restores:
+            # 開いたプロジェクトにスナップショットがなく tmux が未起動だったため、ここで記録する
+            write_pending_restores(unrecorded_restores)
+
+        self.metrics.observe(OPEN_FIRST_WINDOW_METRIC, time.monotonic() - started)
+        if not staged:
+            self.metrics.observe(OPEN_FULL_PROJECT_METRIC, time.monotonic() - started)
+            return False
+
+        # 5. 残りのウィンドウはバックグラウンドで揃える
+        await self._materialize_in_background(project_name, started_at)
+        return True
+
+    async def materialize(
+        self,
+        project_name: str,
+        started_at: Optional[float] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> None:
+        """段階的 open の残りのウィンドウを揃える（バックグラウンド処理）.
+
+        セッションのウィンドウをconfig順に対応付けてタグ付けし、
+        不足分を作成します。タグ付け済みのウィンドウは同じ名前で上書きされます。
+
+        Args:
+            project_name: プロジェクト名
+            started_at: open 開始時刻（time.time()）。指定時は全体の所要時間を記録
+            progress: 進捗コールバック（完了数, 全体数）
+
+        Raises:
+            ProjectNotFoundError: プロジェクトが存在しない
+            ITerm2Error: iTerm2操作が失敗
+        """
+        project = self.config.get_project(project_name)
+        window_configs = project.tmux_windows or [WindowConfig(name="default")]
+
+        bridge = await self.get_bridge()
+        tmux_conn = await bridge.get_tmux_connection(project_name)
+        await bridge.tag_session_windows(
+            tmux_conn,
+            project_name,
+            window_configs,
+            cwd=project.cwd,
+            progress=progress,
+        )
+
+        if started_at is not None:
+            self.metrics.observe(OPEN_FULL_PROJECT_METRIC, time.time() - started_at)
+
+    async def _materialize_in_background(self, project_name: str, started_at: float) -> None:
+        """残りのウィンドウの作成をデーモン、なければ切り離したワーカーに任せる."""
+        if await forward_to_daemon(
+            "materialize", project=project_name, started_at=started_at
+        ):
+            return
+
+        import sys
+
+        itmux_command = os.environ.get("ITMUX_COMMAND", "itmux")
+        OPEN_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(OPEN_LOG_PATH, "a", encoding="utf-8") as log:
+            subprocess.Popen(
+                [itmux_command, "materialize", project_name, "--started-at", str(started_at)],
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=log,
+                start_new_session=True,
+            )
+        print(
+            f"[open] Materializing remaining windows of {project_name} in background "
+            f"(log: {OPEN_LOG_PATH})",
+            file=sys.stderr,
+        )
 
-    async def sync(self, project_name: Optional[str] = None, sync_all: bool = False) -> None:
+    async def sync(
+        self,
+        project_name: Optional[str] = None,
+        sync_all: bool = False,
+        event: Optional[WindowEvent] = None,
+    ) -> None:
         """プロジェクトの状態を同期（tmuxセッション → config.json）.
 
         Args:
             project_name: プロジェクト名（省略時はtmux sessionから自動検出、sync_all=Trueの場合は無視）
-            sync_all: 全プロジェクトの整合性をチェック（session-closed hookから呼ばれる）
+            sync_all: 全プロジェクトの整合性をチェック
+            event: hook から渡されたウィンドウの変更（指定時はその差分だけを反映）
 
         Raises:
             ProjectNotFoundError: プロジェクトが存在しない（sync_all=Falseの場合のみ）
@@ -448,63 +837,192 @@ class ProjectOrchestrator:
 
         if sync_all:
             await self._sync_all_projects()
+            has_session = True
+        elif event is not None:
+            has_session = await self._sync_window_event(
+                self._resolve_project_name(project_name), event
+            )
         else:
-            await self._sync_single_project(project_name)
+            has_session = await self._sync_single_project(project_name)
 
-        # tmux-resurrectで状態を保存（continuum代替）
-        self._save_tmux_resurrect()
+        # レイアウトのスナップショットを保存（continuum代替）
+        # 閉じたセッション（session-closed hook）は取得できないため、前回の保存分を残す
+        if has_session:
+            self._save_snapshots(None if sync_all else [self._resolve_project_name(project_name)])
 
         print(f"[sync] END", file=sys.stderr)
 
     def save(self, project_name: Optional[str] = None, debounce: bool = False) -> None:
-        """tmux-resurrectで状態を保存.
+        """tmuxのレイアウトをスナップショットに保存.
 
         Args:
-            project_name: プロジェクト名（debounce=Trueの場合は必須、省略時はtmux sessionから自動検出）
-            debounce: debounce判定を行うか（連続実行の防止）
+            project_name: プロジェクト名（省略時はtmux sessionから自動検出、tmux外では全プロジェクト）
+            debounce: 連続した要求をまとめるか（最後の要求から一定時間後に1回保存する）
 
         Raises:
-            ValueError: project_nameが必要だが指定されていない
+            ValueError: debounce有効時にproject_nameを決定できない
         """
         import sys
         print(f"[save] START pid={os.getpid()}", file=sys.stderr)
 
-        # debounce有効時はproject_name必須
-        if debounce:
-            if not project_name:
-                project_name = self._resolve_project_name(None)
+        if not project_name:
+            # debounce有効時はproject_name必須
+            project_name = (
+                self._resolve_project_name(None) if debounce else current_session_name()
+            )
 
-        # tmux-resurrect保存実行
-        self._save_tmux_resurrect(debounce=debounce, project_name=project_name or "")
+        if debounce:
+            self._schedule_save(project_name)
+        else:
+            self._save_snapshots([project_name] if project_name else None)
 
         print(f"[save] END", file=sys.stderr)
 
+    def _schedule_save(self, project_name: str) -> None:
+        """保存要求を状態ファイルに記録し、必要なら遅延ワーカーを起動する."""
+        import sys
+
+        decision = SaveScheduleFile().request(project_name, self._spawn_deferred_save)
+        if decision is SaveDecision.RUN:
+            self._save_snapshots([project_name])
+        elif decision is SaveDecision.SKIPPED:
+            print(f"[save] Skipped (debounce)", file=sys.stderr)
+        else:
+            print(f"[save] Scheduled (debounce): {project_name}", file=sys.stderr)
+
+    @staticmethod
+    def _spawn_deferred_save() -> int:
+        """期限まで待って保存する遅延ワーカーを切り離して起動し、PIDを返す.
+
+        ワーカーはサーバー全体で1つで、他のプロジェクトの保存待ちも引き受ける。
+        """
+        itmux_command = os.environ.get("ITMUX_COMMAND", "itmux")
+        HOOK_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(HOOK_LOG_PATH, "a", encoding="utf-8") as log:
+            process = subprocess.Popen(
+                [itmux_command, "save", "--deferred"],
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=log,
+                start_new_session=True,
+            )
+        return process.pid
+
+    def save_deferred(self) -> None:
+        """遅延ワーカー: 期限の来たプロジェクトをまとめて保存し、保存待ちがなくなったら終わる."""
+        scheduler = SaveScheduleFile()
+        while project_names := scheduler.take_due():
+            # 待っている間の変更（プロジェクトの削除など）を反映する
+            self.config.load()
+            scheduler.retain(self.config.list_projects())
+            self.save_scheduled(project_names)
+
+    def save_scheduled(self, project_names: Sequence[str]) -> None:
+        """debounce の期限に達した保存をまとめて実行する（削除されたプロジェクトは保存しない）.
+
+        Args:
+            project_names: プロジェクト名のリスト
+        """
+        import sys
+
+        existing = set(self.config.list_projects())
+        removed = [name for name in project_names if name not in existing]
+        if removed:
+            print(f"[save] Dropped (project removed): {', '.join(removed)}", file=sys.stderr)
+        targets = [name for name in project_names if name in existing]
+        if targets:
+            self._save_snapshots(targets, requests=len(targets))
+
     async def _sync_all_projects(self) -> None:
-        """全プロジェクトの整合性をチェック（session-closed hookから呼ばれる）.
+        """全プロジェクトの整合性をチェック（`itmux sync --all`）.
 
+        session-closed hook は閉じたプロジェクトだけを `_sync_single_project` で
+        処理するため、こちらはユーザーが明示的に実行したときの全体の整合性チェック。
         セッションが存在しないプロジェクトは、ユーザー設定が残っていれば
         tmux_windows をクリアして保持し、ウィンドウ定義のみの場合は削除する。
         """
         import sys
         print(f"[sync] Checking all projects", file=sys.stderr)
 
-        for proj_name in self.config.list_projects():
-            if not self._tmux_has_session(proj_name):
-                try:
-                    self._handle_session_absent_on_sync(proj_name)
-                except Exception:
-                    pass
+        # セッション一覧は1回だけ取得し、全プロジェクトの判定に使う
+        server = self._tmux_server()
+
+        # 複数プロジェクトの変更を1回の書き込みにまとめる
+        absent = []
+        with self.config.transaction():
+            for proj_name in self.config.list_projects():
+                if not self._tmux_has_session(proj_name, server):
+                    absent.append(proj_name)
+                    try:
+                        self._handle_session_absent_on_sync(proj_name)
+                    except Exception:
+                        pass
+
+        # 削除・名前変更されたプロジェクトのセッションも含め、存在しないセッションを
+        # 管理下の一覧から外す
+        if server.running:
+            closed = [
+                name
+                for name in read_managed_sessions() or []
+                if not self._tmux_has_session(name, server)
+            ]
+            if closed:
+                unregister_managed_sessions(closed)
+
+        # 設定から削除・名前変更されたプロジェクトのスナップショットも片付ける
+        project_names = set(self.config.list_projects())
+        orphaned = [
+            name
+            for name in list_snapshot_names(self.config.config_path)
+            if name not in project_names
+        ]
+        self._retain_project_state(absent + orphaned)
+
+    def _retain_project_state(self, closed: Sequence[str] = ()) -> None:
+        """削除されたプロジェクトの保存待ち・以前のタイムスタンプファイルと、閉じたセッションの
+        スナップショットを片付ける.
+
+        tmux サーバーの終了（kill-server・再起動）でも各セッションの session-closed hook は
+        実行されるため、スナップショットはサーバーが起動している（他のセッションが残って
+        いる）ときだけ、ユーザーが閉じたものとして削除する。復元待ち（サーバーの起動後に
+        まだ開いていない）のプロジェクトのものは残す。設定から削除されたプロジェクトの
+        ものはサーバーの状態によらず削除する。
+
+        Args:
+            closed: セッションが見つからなかったプロジェクト名
+        """
+        import sys
+
+        project_names = self.config.list_projects()
+        try:
+            SaveScheduleFile().retain(project_names)
+        except (OSError, Timeout) as e:
+            print(f"[sync] save schedule cleanup skipped: {e}", file=sys.stderr)
+
+        if not closed:
+            return
+        pending = read_pending_restores()
+        for name in closed:
+            if name in project_names and (pending is None or name in pending):
+                continue
+            if delete_snapshot(get_snapshot_path(self.config.config_path, name)):
+                print(f"[sync] Removed snapshot of closed session: {name}", file=sys.stderr)
 
-    async def _sync_single_project(self, project_name: Optional[str] = None) -> None:
+    async def _sync_single_project(self, project_name: Optional[str] = None) -> bool:
         """単一プロジェクトの状態を同期（tmuxセッション → config.json）.
 
         tmux セッションが存在しない場合、ユーザー設定が残っていれば
         tmux_windows をクリアして保持し、ウィンドウ定義のみの場合は削除する。
         セッションが存在する場合、ウィンドウリストを config.json に反映する。
 
+        session-closed hook からは閉じたプロジェクトの名前で呼ばれる。
+
         Args:
             project_name: プロジェクト名（省略時は環境変数から取得）
 
+        Returns:
+            bool: tmuxセッションが存在したか
+
         Raises:
             ProjectNotFoundError: プロジェクトが存在しない
         """
@@ -521,23 +1039,44 @@ class ProjectOrchestrator:
             except Exception:
                 # プロジェクトが既に存在しない場合は無視
                 pass
-            return
+            # 閉じたセッションを管理下の一覧に残さない（プロジェクトを削除した場合も含む）
+            unregister_managed_sessions([project_name])
+            self._retain_project_state([project_name])
+            return False
+
+        # 3〜4. tmuxセッションのウィンドウを取得してタグ付けし、設定を更新する。
+        # 取得している間に別の hook がウィンドウリストを更新した場合は、tmux から
+        # 取得し直す（古い取得結果で新しい更新を上書きしない）
+        for attempt in range(MAX_SYNC_ATTEMPTS):
+            if attempt:
+                self.config.load()
+            try:
+                expected = [w.name for w in self.config.get_project(project_name).tmux_windows]
+            except ProjectNotFoundError:
+                expected = None
 
-        # 3. tmuxセッションのウィンドウを取得し、iTerm2ウィンドウにタグ付け
-        print(f"[sync] Getting windows from tmux session", file=sys.stderr)
-        windows_config = await self._sync_windows_from_tmux_session(project_name)
-        print(f"[sync] Got {len(windows_config)} windows", file=sys.stderr)
+            print(f"[sync] Getting windows from tmux session", file=sys.stderr)
+            windows_config = await self._sync_windows_from_tmux_session(project_name)
+            print(f"[sync] Got {len(windows_config)} windows", file=sys.stderr)
+            if not windows_config:
+                return True
 
-        # 4. 設定を更新
-        if windows_config:
             try:
-                self.config.update_project(project_name, windows_config)
+                self.config.update_project(project_name, windows_config, expected=expected)
                 print(f"[sync] Config updated", file=sys.stderr)
             except ProjectNotFoundError:
                 # プロジェクトが存在しない場合は作成してから更新
                 print(f"[sync] Project not found, creating", file=sys.stderr)
                 self.config.create_project(project_name, windows_config)
                 print(f"[sync] Project created", file=sys.stderr)
+            except ConfigConflictError:
+                print(f"[sync] Windows changed concurrently, retrying", file=sys.stderr)
+                continue
+            return True
+
+        raise ConfigConflictError(
+            f"Windows of project '{project_name}' kept changing; gave up after {MAX_SYNC_ATTEMPTS} attempts"
+        )
 
     async def close(self, project_name: Optional[str] = None) -> None:
         """プロジェクトを閉じる（自動同期）.
@@ -552,7 +1091,8 @@ class ProjectOrchestrator:
         project_name = self._resolve_project_name(project_name)
 
         # 2. プロジェクトのiTerm2ウィンドウを検索
-        windows = await self.bridge.find_windows_by_project(project_name)
+        bridge = await self.get_bridge()
+        windows = await bridge.find_windows_by_project(project_name)
 
         # 3. ウィンドウが見つからなければ何もしない
         if not windows:
@@ -568,18 +1108,18 @@ class ProjectOrchestrator:
 
             # メニューアイテムが有効かチェック
             menu_state = await iterm2.MainMenu.async_get_menu_item_state(
-                self.bridge.connection,
+                bridge.connection,
                 "tmux.Detach"
             )
 
             if menu_state.enabled:
                 await iterm2.MainMenu.async_select_menu_item(
-                    self.bridge.connection,
+                    bridge.connection,
                     "tmux.Detach"
                 )
             else:
                 # メニューが無効な場合はtmuxコマンドで直接detach
-                tmux_conn = await self.bridge.get_tmux_connection(project_name)
+                tmux_conn = await bridge.get_tmux_connection(project_name)
                 await tmux_conn.async_send_command("detach-client")
 
     def current(self) -> str:
@@ -621,7 +1161,8 @@ class ProjectOrchestrator:
         if project.cwd:
             validate_cwd_path(project.cwd)
         apply_session_environments(project_name, project.environments)
-        await self.bridge.add_window(project_name, window_name, cwd=project.cwd)
+        bridge = await self.get_bridge()
+        await bridge.add_window(project_name, window_name, cwd=project.cwd)
 
         # 5. 状態を同期（hookも実行されるが、確実性のため明示的に呼ぶ）
         # after-new-window hookが発火するが、タイミングによっては
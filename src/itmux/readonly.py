@@ -0,0 +1,286 @@
+"""重い依存を読み込まない読み取り専用の処理.
+
+hook やシェル補完から頻繁に起動される `itmux current` / `itmux list` 用。
+pydantic（models）や iterm2（websockets / protobuf）を import せず、
+標準ライブラリだけで config.json と tmux の状態を読む。
+"""
+
+import json
+import os
+import subprocess
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import quote
+
+from .exceptions import ConfigError
+
+
+DEFAULT_CONFIG_PATH = Path.home() / ".itmux" / "config.json"
+
+LAYOUT_SINGLE = "single"
+LAYOUT_SHARDED = "sharded"
+LAYOUT_SQLITE = "sqlite"
+CONFIG_LAYOUTS = (LAYOUT_SINGLE, LAYOUT_SHARDED, LAYOUT_SQLITE)
+
+
+def get_config_path() -> Path:
+    """設定ファイルのパスを取得（ITMUX_CONFIG_PATH 対応）."""
+    config_path_str = os.environ.get("ITMUX_CONFIG_PATH")
+    return Path(config_path_str) if config_path_str else DEFAULT_CONFIG_PATH
+
+
+def get_projects_dir(config_path: Path) -> Path:
+    """プロジェクトごとの設定ファイルを置くディレクトリ（sharded 形式）."""
+    return config_path.parent / "projects"
+
+
+def get_index_path(config_path: Path) -> Path:
+    """sharded 形式のプロジェクト一覧（インデックス）のパス."""
+    return get_projects_dir(config_path) / "index.json"
+
+
+def get_project_path(config_path: Path, project_name: str) -> Path:
+    """sharded 形式のプロジェクト設定ファイルのパス."""
+    return get_projects_dir(config_path) / f"{quote(project_name, safe='')}.json"
+
+
+def get_database_path(config_path: Path) -> Path:
+    """sqlite 形式のデータベースのパス."""
+    return config_path.parent / "config.db"
+
+
+def get_lock_path(path: Path) -> Path:
+    """設定ファイルに対応するロックファイルのパス."""
+    return path.parent / f".{path.name}.lock"
+
+
+def detect_layout(config_path: Path) -> str:
+    """既存のファイルから保存形式を判定する（projects/index.json > config.db > config.json）."""
+    if get_index_path(config_path).exists():
+        return LAYOUT_SHARDED
+    if get_database_path(config_path).exists():
+        return LAYOUT_SQLITE
+    return LAYOUT_SINGLE
+
+
+def resolve_layout(config_path: Path, layout: Optional[str] = None) -> str:
+    """保存形式を決める.
+
+    明示指定 > 環境変数 ITMUX_CONFIG_LAYOUT > 既存の projects/index.json /
+    config.db の有無。一度移行すれば、環境変数のない hook からも同じ形式で読まれる。
+
+    Raises:
+        ConfigError: 未知の形式が指定された
+    """
+    layout = layout or os.environ.get("ITMUX_CONFIG_LAYOUT")
+    if layout:
+        if layout not in CONFIG_LAYOUTS:
+            raise ConfigError(
+                f"Unknown config layout '{layout}' (expected one of: {', '.join(CONFIG_LAYOUTS)})"
+            )
+        return layout
+    return detect_layout(config_path)
+
+
+def read_json_file(path: Path) -> Any:
+    """JSONファイルを読む（存在しなければ None）.
+
+    書き込みは rename で置き換えるため通常はロック不要。書き込み途中で
+    JSON が壊れていた場合のみ、ConfigManager と同じロックを取って読み直す。
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except json.JSONDecodeError:
+        from filelock import FileLock
+
+        try:
+            with FileLock(get_lock_path(path), timeout=10):
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError as e:
+            raise ConfigError(f"Invalid JSON format: {e}") from e
+        except Exception as e:
+            raise ConfigError(f"Failed to load config: {e}") from e
+    except Exception as e:
+        raise ConfigError(f"Failed to load config: {e}") from e
+
+
+def fetch_database_projects(
+    conn: Any, project_name: Optional[str] = None
+) -> tuple[dict[str, dict[str, Any]], dict[str, int]]:
+    """sqlite 形式のデータベースからプロジェクトを config.json と同じ形式で読む.
+
+    Args:
+        conn: sqlite3 の接続
+        project_name: 読むプロジェクト（省略時は全プロジェクト）
+
+    Returns:
+        tuple: ({プロジェクト名: 設定の辞書}, {プロジェクト名: 世代番号})
+    """
+    if project_name is None:
+        project_where, where, params = "", "", ()
+    else:
+        project_where, where, params = "WHERE name = ?", "WHERE project = ?", (project_name,)
+
+    projects: dict[str, dict[str, Any]] = {}
+    generations: dict[str, int] = {}
+    rows = conn.execute(
+        f"SELECT name, description, cwd, generation FROM projects {project_where} ORDER BY position",
+        params,
+    )
+    for name, description, cwd, generation in rows:
+        project: dict[str, Any] = {"name": name}
+        if description is not None:
+            project["description"] = description
+        if cwd is not None:
+            project["cwd"] = cwd
+        project["tmux_windows"] = []
+        projects[name] = project
+        generations[name] = generation
+
+    rows = conn.execute(
+        f"SELECT project, key, value FROM environments {where} ORDER BY project, position",
+        params,
+    )
+    for name, key, value in rows:
+        projects[name].setdefault("environments", {})[key] = value
+
+    rows = conn.execute(
+        f"SELECT project, name, columns, lines FROM windows {where} ORDER BY project, position",
+        params,
+    )
+    for name, window_name, columns, lines in rows:
+        window: dict[str, Any] = {"name": window_name}
+        if columns is not None:
+            window["window_size"] = {"columns": columns, "lines": lines}
+        projects[name]["tmux_windows"].append(window)
+
+    return projects, generations
+
+
+def read_database(path: Path) -> Optional[dict[str, dict[str, Any]]]:
+    """sqlite 形式のデータベースを読む（存在しなければ None）.
+
+    WAL モードなので書き込み中でも待たずに読める。
+    """
+    import sqlite3
+
+    if not path.exists():
+        return None
+    try:
+        conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        try:
+            # 3つのテーブルを同じ時点の内容で読む
+            conn.execute("BEGIN")
+            projects, _ = fetch_database_projects(conn)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        raise ConfigError(f"Failed to load config: {e}") from e
+    return projects
+
+
+def _read_sharded(config_path: Path) -> Optional[dict[str, Any]]:
+    """sharded 形式のプロジェクトを読む（インデックスがなければ None）."""
+    index = read_json_file(get_index_path(config_path))
+    if index is None:
+        return None
+    projects = {}
+    for project_name in index.get("projects", []):
+        project = read_json_file(get_project_path(config_path, project_name))
+        if project is not None:
+            projects[project_name] = project
+    return projects
+
+
+def _read_single(config_path: Path) -> Optional[dict[str, Any]]:
+    """config.json のプロジェクトを読む（ファイルがなければ None）."""
+    data = read_json_file(config_path)
+    if data is None:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("projects", {}), dict):
+        raise ConfigError("Failed to load config: 'projects' must be an object")
+    return data.get("projects", {})
+
+
+_LAYOUT_READERS = {
+    LAYOUT_SINGLE: _read_single,
+    LAYOUT_SHARDED: _read_sharded,
+    LAYOUT_SQLITE: lambda config_path: read_database(get_database_path(config_path)),
+}
+
+
+def read_layout_projects(config_path: Path, layout: str) -> Optional[dict[str, Any]]:
+    """指定した保存形式のプロジェクトを検証せずに読む（その形式のファイルがなければ None）."""
+    return _LAYOUT_READERS[layout](config_path)
+
+
+def read_config_data(config_path: Optional[Path] = None) -> dict[str, Any]:
+    """設定ファイルを検証せずに辞書として読み込む.
+
+    単一ファイル（config.json）、sharded 形式（projects/index.json +
+    プロジェクトごとのファイル）、sqlite 形式（config.db）のいずれにも対応する。
+    形式は ConfigManager と同じく resolve_layout() で決め、指定された形式へ
+    まだ移行していなければ、移行元になる既存の形式を読む。
+
+    Args:
+        config_path: 設定ファイルパス（省略時は get_config_path()）
+
+    Returns:
+        dict: {"projects": {...}} 形式の設定（ファイルがなければ空）
+
+    Raises:
+        ConfigError: ファイル読み込みエラー、JSON形式エラー、未知の保存形式
+    """
+    config_path = config_path or get_config_path()
+
+    projects = read_layout_projects(config_path, resolve_layout(config_path))
+    if projects is None:
+        projects = read_layout_projects(config_path, detect_layout(config_path))
+    return {"projects": projects or {}}
+
+
+def list_project_summaries(config_path: Optional[Path] = None) -> dict[str, dict[str, Any]]:
+    """プロジェクト一覧を取得（ProjectOrchestrator.list() と同じ形式）.
+
+    Args:
+        config_path: 設定ファイルパス（省略時は get_config_path()）
+
+    Returns:
+        dict: {"project-name": {"windows": [...], "count": n, "description": ...}}
+
+    Raises:
+        ConfigError: ファイル読み込みエラー、JSON形式エラー
+    """
+    result = {}
+    for project_name, project in read_config_data(config_path)["projects"].items():
+        windows = [w.get("name") for w in project.get("tmux_windows", [])]
+        result[project_name] = {
+            "windows": windows,
+            "count": len(windows),
+            "description": project.get("description"),
+        }
+    return result
+
+
+def current_session_name() -> Optional[str]:
+    """実行中の tmux セッション名を取得（tmux 外・取得失敗時は None）."""
+    if not os.environ.get("TMUX"):
+        return None
+    try:
+        result = subprocess.run(
+            ["tmux", "display-message", "-p", "#{session_name}"],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=os.environ.copy()
+        )
+    except Exception:
+        return None
+    return result.stdout.strip() or None
@@ -0,0 +1,425 @@
+"""スナップショット保存の debounce スケジューラ.
+
+ペインのリサイズ（ドラッグ）などで hook から連続して届く保存要求を
+プロジェクトごとにまとめる。
+
+- trailing edge（デフォルト）: 最後の要求から window 秒経ったら1回保存する。
+  連続した要求の最後の状態が必ず保存される
+- max_wait: 要求が途切れなくても、最初の要求から max_wait 秒で保存する
+- trailing を無効にすると leading edge（最初の要求ですぐ保存し、window 秒以内の
+  要求は捨てる）になる
+
+デーモンではメモリ上のタイマー（DebounceScheduler）、デーモンがない場合は
+1つの状態ファイル（SaveScheduleFile）と、期限まで待って保存する遅延ワーカー
+（`itmux save --deferred`、サーバー全体で1つ）で同じ規則を実現する。
+期限が近いプロジェクトは1回の保存にまとめる。
+
+保存の実行は SaveCoordinator がサーバー全体で1本にまとめる（single-flight）。
+保存中に届いた要求は待ち行列に入り、実行中のプロセスが続けて1回だけ保存する。
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, Optional
+
+from filelock import FileLock, Timeout
+
+
+DEFAULT_SCHEDULE_PATH = Path.home() / ".itmux" / "save_schedule.json"
+
+# 期限がこの秒数以内に来るプロジェクトは、同じ保存にまとめる
+COALESCE_WINDOW = 0.25
+
+# まとめて省いた保存の回数
+SAVES_COALESCED_METRIC = "snapshot.saves_coalesced"
+
+# 以前の leading edge debounce がプロジェクトごとに作っていたタイムスタンプファイル
+LEGACY_STAMP_GLOB = ".last_save_*"
+
+
+def get_schedule_path() -> Path:
+    """状態ファイルのパスを取得（ITMUX_SAVE_SCHEDULE_PATH 対応）."""
+    schedule_path_str = os.environ.get("ITMUX_SAVE_SCHEDULE_PATH")
+    return Path(schedule_path_str) if schedule_path_str else DEFAULT_SCHEDULE_PATH
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        value = float(os.environ.get(name, ""))
+    except ValueError:
+        return default
+    return value if value >= 0 else default
+
+
+class SaveDecision(Enum):
+    """保存要求に対する判定."""
+
+    RUN = "run"  # 今すぐ保存する（leading edge）
+    SCHEDULED = "scheduled"  # 期限に保存する（trailing edge）
+    SKIPPED = "skipped"  # window 内なので捨てる（leading edge）
+
+
+@dataclass(frozen=True)
+class DebouncePolicy:
+    """debounce の設定.
+
+    Attributes:
+        window: 最後の要求から保存までの待ち時間（秒）
+        max_wait: 最初の要求から保存までの最大待ち時間（秒、window 未満なら window）
+        trailing: False なら leading edge で動作する
+    """
+
+    window: float = 1.0
+    max_wait: float = 5.0
+    trailing: bool = True
+
+    @classmethod
+    def from_env(cls) -> "DebouncePolicy":
+        """環境変数（ITMUX_SAVE_DEBOUNCE / ITMUX_SAVE_MAX_WAIT / ITMUX_SAVE_TRAILING）から作成."""
+        trailing = os.environ.get("ITMUX_SAVE_TRAILING", "1").strip().lower()
+        return cls(
+            window=_env_float("ITMUX_SAVE_DEBOUNCE", cls.window),
+            max_wait=_env_float("ITMUX_SAVE_MAX_WAIT", cls.max_wait),
+            trailing=trailing not in ("0", "false", "no", "off"),
+        )
+
+    def due(self, first: float, last: float) -> float:
+        """保存する時刻（最初の要求 first、最後の要求 last から計算）."""
+        return min(last + self.window, first + max(self.max_wait, self.window))
+
+
+class DebounceScheduler:
+    """メモリ上のタイマーによる debounce（デーモン用）.
+
+    期限に達すると callback(projects) をタスクとして実行する。期限が
+    COALESCE_WINDOW 以内に来る他のプロジェクトも同じ呼び出しにまとめる。
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[list[str]], Awaitable[None]],
+        policy: Optional[DebouncePolicy] = None,
+    ):
+        """
+        Args:
+            callback: 保存を実行するコルーチン関数（プロジェクト名のリストを受け取る）
+            policy: debounce の設定（省略時は環境変数から）
+        """
+        self.policy = policy or DebouncePolicy.from_env()
+        self._callback = callback
+        # プロジェクト名 → (最初の要求時刻, 期限, タイマー)
+        self._pending: dict[str, tuple[float, float, asyncio.TimerHandle]] = {}
+        # leading edge: プロジェクト名 → 最後に保存した時刻
+        self._last_run: dict[str, float] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> list[str]:
+        """保存を待っているプロジェクト."""
+        return list(self._pending)
+
+    def request(self, project: str) -> SaveDecision:
+        """保存要求を受け付ける."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if not self.policy.trailing:
+            # window を過ぎた記録は捨てる（削除されたプロジェクトの分も残らない）
+            self._last_run = {
+                name: at for name, at in self._last_run.items() if now - at < self.policy.window
+            }
+            if project in self._last_run:
+                return SaveDecision.SKIPPED
+            self._last_run[project] = now
+            self._start([project])
+            return SaveDecision.RUN
+
+        first = now
+        if project in self._pending:
+            first, _, handle = self._pending[project]
+            handle.cancel()
+        due = self.policy.due(first, now)
+        self._pending[project] = (first, due, loop.call_later(due - now, self._fire, project))
+        return SaveDecision.SCHEDULED
+
+    def discard(self, project: str) -> None:
+        """保存待ちを取り消す."""
+        entry = self._pending.pop(project, None)
+        if entry is not None:
+            entry[2].cancel()
+        self._last_run.pop(project, None)
+
+    async def flush(self) -> None:
+        """保存待ちをすべて今すぐ実行し、実行中の保存の完了を待つ（終了時用）."""
+        if self._pending:
+            self._start(self._take(list(self._pending)))
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _fire(self, project: str) -> None:
+        horizon = asyncio.get_running_loop().time() + COALESCE_WINDOW
+        names = [name for name, (_, due, _) in self._pending.items() if due <= horizon]
+        self._start(self._take(sorted(set(names) | {project})))
+
+    def _take(self, projects: list[str]) -> list[str]:
+        for project in projects:
+            entry = self._pending.pop(project, None)
+            if entry is not None:
+                entry[2].cancel()
+        return projects
+
+    def _start(self, projects: list[str]) -> None:
+        task = asyncio.create_task(self._callback(projects))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+class SaveScheduleFile:
+    """1つの状態ファイルによる debounce（デーモンがない場合）.
+
+    状態ファイルにはプロジェクトごとの最初・最後の要求時刻と、サーバー全体で
+    1つの遅延ワーカーの PID を記録する。要求したプロセスはワーカーがいなければ
+    起動してすぐ終わり、ワーカーが期限の来たプロジェクトをまとめて取り出しては
+    保存し、保存待ちがなくなったら終了する。複数プロセスから更新されるため、
+    read-modify-write はファイルロック下で行う。
+    """
+
+    def __init__(self, path: Optional[Path] = None, policy: Optional[DebouncePolicy] = None):
+        """
+        Args:
+            path: 状態ファイルのパス（省略時はデフォルト）
+            policy: debounce の設定（省略時は環境変数から）
+        """
+        self.path = path or get_schedule_path()
+        self.lock_path = self.path.parent / f".{self.path.name}.lock"
+        self.policy = policy or DebouncePolicy.from_env()
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {"projects": {}}
+        if not isinstance(state, dict) or not isinstance(state.get("projects"), dict):
+            return {"projects": {}}
+        return state
+
+    def load(self) -> dict[str, dict]:
+        """プロジェクトごとの状態を読み込む（存在しない・壊れている場合は空）."""
+        return self._load_state()["projects"]
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """ロック下で状態を読み、変更があれば書き戻す."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(self.lock_path, timeout=5):
+            state = self._load_state()
+            original = json.dumps(state, sort_keys=True)
+            yield state
+            if json.dumps(state, sort_keys=True) != original:
+                tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(state, f, indent=2, ensure_ascii=False)
+                    f.write("\n")
+                os.replace(tmp_path, self.path)
+
+    def request(
+        self,
+        project: str,
+        spawn_worker: Callable[[], int],
+        now: Optional[float] = None,
+    ) -> SaveDecision:
+        """保存要求を記録する.
+
+        trailing edge では、生きているワーカーがいなければロック下で
+        spawn_worker() を呼んで起動し、その PID を記録する（同時に届いた要求で
+        ワーカーが重複しない）。
+
+        Args:
+            project: プロジェクト名
+            spawn_worker: 遅延ワーカーを起動して PID を返す関数
+            now: 現在時刻（テスト用、省略時は time.time()）
+        """
+        now = time.time() if now is None else now
+        with self._locked() as state:
+            entry = state["projects"].setdefault(project, {})
+            if not self.policy.trailing:
+                if now - entry.get("saved", 0.0) < self.policy.window:
+                    return SaveDecision.SKIPPED
+                entry["saved"] = now
+                return SaveDecision.RUN
+
+            entry.setdefault("first", now)
+            entry["last"] = now
+            if not _process_alive(state.get("worker")):
+                state["worker"] = spawn_worker()
+            return SaveDecision.SCHEDULED
+
+    def take_due(
+        self,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.time,
+    ) -> list[str]:
+        """遅延ワーカー: 最も早い期限まで待ち、期限の来たプロジェクトを取り出す.
+
+        待っている間に届いた要求で期限が延びれば、その分だけ待ち直す。期限が
+        COALESCE_WINDOW 以内に来るプロジェクトも一緒に取り出す。保存待ちが
+        なければワーカーの記録を消して空のリストを返す（次の要求で新しい
+        ワーカーが起動される）。記録された PID はラッパー（ITMUX_COMMAND）の
+        ものの場合があるため、自分の PID で置き換えてから待つ。
+
+        Returns:
+            list[str]: 保存するプロジェクト（なくなったら空）
+        """
+        while True:
+            with self._locked() as state:
+                projects = state["projects"]
+                deadlines = {
+                    name: self.policy.due(entry.get("first", entry["last"]), entry["last"])
+                    for name, entry in projects.items()
+                    if "last" in entry
+                }
+                if not deadlines:
+                    state.pop("worker", None)
+                    return []
+                state["worker"] = os.getpid()
+                now = clock()
+                earliest = min(deadlines.values())
+                if now >= earliest:
+                    names = sorted(
+                        name for name, due in deadlines.items() if due <= now + COALESCE_WINDOW
+                    )
+                    for name in names:
+                        del projects[name]
+                    return names
+            sleep(earliest - now)
+
+    def retain(self, projects: Iterable[str]) -> None:
+        """存在しないプロジェクトの状態と、以前のタイムスタンプファイルを削除する."""
+        keep = set(projects)
+        with self._locked() as state:
+            for name in [name for name in state["projects"] if name not in keep]:
+                del state["projects"][name]
+        for stamp in self.path.parent.glob(LEGACY_STAMP_GLOB):
+            with contextlib.suppress(OSError):
+                stamp.unlink()
+
+
+class SaveCoordinator:
+    """サーバー全体で保存を1本にまとめる（single-flight）.
+
+    保存要求は待ち行列ファイルに追加し、実行ロックを取れたプロセスだけが
+    待ち行列が空になるまで取り出して保存する（1回の保存で待ち行列の全プロジェクトを
+    まとめて取得する）。保存中に届いた要求は待たずに戻り、実行中のプロセスが
+    続けてもう1回（follow-up）まとめて保存する。
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        """
+        Args:
+            path: 待ち行列ファイルのパス（省略時は状態ファイルと同じディレクトリの save_queue.json）
+        """
+        self.path = path or get_schedule_path().with_name("save_queue.json")
+        self.lock_path = self.path.parent / f".{self.path.name}.lock"
+        self.run_lock_path = self.path.parent / f".{self.path.name}.run.lock"
+
+    def _update(self, mutate: Callable[[dict], None]) -> dict:
+        """ロック下で待ち行列を読み、mutate で更新して書き戻す（更新前の内容を返す）."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(self.lock_path, timeout=5):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    queue = json.load(f)
+            except (OSError, ValueError):
+                queue = {}
+            if not isinstance(queue, dict):
+                queue = {}
+            before = {
+                "projects": list(queue.get("projects", [])),
+                "requests": int(queue.get("requests", 0)),
+            }
+            queue = dict(before)
+            mutate(queue)
+            if queue != before:
+                tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(queue, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            return before
+
+    def _enqueue(self, projects: list[str], requests: int) -> None:
+        def mutate(queue: dict) -> None:
+            queue["projects"] = sorted(set(queue["projects"]) | set(projects))
+            queue["requests"] += requests
+
+        self._update(mutate)
+
+    def _take(self) -> tuple[list[str], int]:
+        def mutate(queue: dict) -> None:
+            queue["projects"] = []
+            queue["requests"] = 0
+
+        taken = self._update(mutate)
+        return taken["projects"], taken["requests"]
+
+    def run(
+        self,
+        projects: list[str],
+        save: Callable[[list[str]], None],
+        requests: int = 1,
+    ) -> Optional[int]:
+        """保存要求を出し、実行中の保存がなければ自分で実行する.
+
+        Args:
+            projects: 保存するプロジェクト
+            save: プロジェクト名のリストを受け取って保存する関数
+            requests: この呼び出しがまとめている要求の数（デーモンのタイマーでまとめた場合など）
+
+        Returns:
+            Optional[int]: 自分で保存した場合はまとめて省いた保存の回数、
+                実行中の保存に任せた場合は None
+        """
+        if not projects:
+            return 0
+        self._enqueue(projects, requests)
+        coalesced: Optional[int] = None
+        while True:
+            run_lock = FileLock(self.run_lock_path)
+            try:
+                run_lock.acquire(timeout=0)
+            except Timeout:
+                # 実行中のプロセスが、ロックを放す前に待ち行列を確認する
+                return coalesced
+            try:
+                while True:
+                    batch, count = self._take()
+                    if not batch:
+                        break
+                    coalesced = (coalesced or 0) + max(count - 1, 0)
+                    save(batch)
+            finally:
+                run_lock.release()
+            # ロックを放す直前に積まれた要求を取りこぼさない
+            if not self._has_pending():
+                return coalesced
+
+    def _has_pending(self) -> bool:
+        return bool(self._update(lambda queue: None)["projects"])
+
+
+def _process_alive(pid) -> bool:
+    """PID のプロセスが生きているか."""
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,174 @@
+"""サブコマンドごとの起動時間（import 時間）の計測.
+
+hook は `itmux` を毎分数十回起動するため、起動コストはそのまま遅延になる。
+各サブコマンドを `python -X importtime` 付きの新しいプロセスで実行し、
+itmux 以下で発生した import の所要時間と、読み込んではいけない重いモジュールを
+確認する。scripts/bench_startup.py とテスト（tests/itmux/test_startup.py）で使う。
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class StartupBudget:
+    """サブコマンドの起動時間の上限."""
+
+    argv: tuple[str, ...]
+    # itmux 以下の import に許す時間（ミリ秒）
+    import_ms: float
+    # 読み込んではいけないトップレベルパッケージ
+    forbidden: frozenset[str] = frozenset()
+
+
+_LIGHT = frozenset({"iterm2", "pydantic", "asyncio"})
+_NO_ITERM2 = frozenset({"iterm2"})
+
+# iTerm2に接続するまで本体が進まないコマンド（open / materialize / daemon）は、
+# 引数解決（シェル補完と同じ経路）だけを測る
+STARTUP_BUDGETS: dict[str, StartupBudget] = {
+    "help": StartupBudget(("--help",), 150, _LIGHT),
+    "current": StartupBudget(("current",), 150, _LIGHT),
+    "list": StartupBudget(("list",), 150, _LIGHT),
+    "open": StartupBudget(("open", "--help"), 150, _LIGHT),
+    "materialize": StartupBudget(("materialize", "--help"), 150, _LIGHT),
+    "daemon": StartupBudget(("daemon", "--help"), 150, _LIGHT),
+    "config show": StartupBudget(("config", "show", "bench"), 800, _NO_ITERM2),
+    "config set cwd": StartupBudget(("config", "set", "cwd", "bench", "/"), 800, _NO_ITERM2),
+    "config unset cwd": StartupBudget(("config", "unset", "cwd", "bench"), 800, _NO_ITERM2),
+    "save": StartupBudget(("save",), 800, _NO_ITERM2),
+    "sync": StartupBudget(("sync", "--all"), 800, _NO_ITERM2),
+    "hook": StartupBudget(("hook", "after-split-window", "bench"), 800, _NO_ITERM2),
+    "close": StartupBudget(("close",), 800, _NO_ITERM2),
+    "add": StartupBudget(("add",), 800, _NO_ITERM2),
+}
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+@dataclass
+class StartupProfile:
+    """1回の起動の計測結果."""
+
+    command: str
+    exit_code: int
+    wall_seconds: float
+    # itmux.cli 以降に発生した import の累積時間（秒）
+    import_seconds: float
+    modules: set[str] = field(default_factory=set)
+
+    def loaded(self, package: str) -> bool:
+        """パッケージ（またはそのサブモジュール）が読み込まれたか."""
+        return any(m == package or m.startswith(package + ".") for m in self.modules)
+
+
+def parse_importtime(stderr: str) -> tuple[float, set[str]]:
+    """-X importtime の出力から、itmux.cli 以降の import 時間とモジュール一覧を得る.
+
+    インタプリタ自体の起動（site など）は含めない。
+
+    Returns:
+        tuple: (トップレベル import の累積時間（秒）, 読み込まれたモジュール名の集合)
+    """
+    total_us = 0
+    modules: set[str] = set()
+    started = False
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        if name == "itmux.cli":
+            started = True
+        if not started:
+            continue
+        modules.add(name)
+        # 出力は子→親の順。インデント1文字（トップレベル）の行だけを足す
+        if len(indent) == 1:
+            total_us += cumulative
+    return total_us / 1_000_000, modules
+
+
+def _bench_env(workdir: Path) -> dict[str, str]:
+    """実環境に触れないよう HOME / 設定 / メトリクスを一時ディレクトリに向ける."""
+    import itmux
+
+    config_path = workdir / "config.json"
+    if not config_path.exists():
+        config_path.write_text(
+            json.dumps({"projects": {"bench": {"name": "bench", "tmux_windows": [{"name": "main"}]}}})
+        )
+
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("TMUX", "ITMUX_"))}
+    src_dir = str(Path(itmux.__file__).resolve().parent.parent)
+    env.update({
+        "HOME": str(workdir),
+        "ITMUX_CONFIG_PATH": str(config_path),
+        "ITMUX_METRICS_PATH": str(workdir / "metrics.json"),
+        "ITMUX_SOCKET_PATH": str(workdir / "itmuxd.sock"),
+        "ITMUX_NO_DAEMON": "1",
+        "PYTHONPATH": os.pathsep.join(filter(None, [src_dir, env.get("PYTHONPATH")])),
+    })
+    return env
+
+
+def profile_command(
+    command: str,
+    workdir: Optional[Path] = None,
+    python: str = sys.executable,
+) -> StartupProfile:
+    """サブコマンドを新しいプロセスで1回実行して計測.
+
+    Args:
+        command: STARTUP_BUDGETS のキー
+        workdir: HOME 等に使う一時ディレクトリ（省略時は新規作成）
+        python: 実行する Python インタプリタ
+    """
+    budget = STARTUP_BUDGETS[command]
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = workdir or Path(tmp)
+        code = (
+            "import sys; sys.argv = ['itmux', *sys.argv[1:]]; "
+            "from itmux.cli import main; main()"
+        )
+        started = time.monotonic()
+        result = subprocess.run(
+            [python, "-X", "importtime", "-c", code, *budget.argv],
+            capture_output=True,
+            text=True,
+            env=_bench_env(workdir),
+            cwd=workdir,
+        )
+        wall = time.monotonic() - started
+
+    import_seconds, modules = parse_importtime(result.stderr)
+    return StartupProfile(command, result.returncode, wall, import_seconds, modules)
+
+
+def check_budget(profile: StartupProfile, timing: bool = True) -> list[str]:
+    """予算超過の内容を返す（空なら予算内）.
+
+    Args:
+        profile: 計測結果
+        timing: import 時間も判定するか（False なら読み込んだモジュールだけ）
+    """
+    budget = STARTUP_BUDGETS[profile.command]
+    problems = [
+        f"{profile.command}: imports {package}"
+        for package in sorted(budget.forbidden)
+        if profile.loaded(package)
+    ]
+    if timing and profile.import_seconds * 1000 > budget.import_ms:
+        problems.append(
+            f"{profile.command}: import time {profile.import_seconds * 1000:.0f}ms "
+            f"> budget {budget.import_ms:.0f}ms"
+        )
+    return problems
@@ -1,15 +1,35 @@
-"""tmux integration modules."""
+"""tmux integration modules.
 
-from .session_manager import SessionManager
-from .hook_manager import HookManager
+SessionManager は iterm2 に依存するため、属性アクセス時に読み込む
+（tmux コマンドだけを使う処理で iterm2 を import しないように）。
+"""
+
+from .batch import TmuxBatch, TmuxCommandResult, run_tmux
 from .environment import apply_session_environments, tmux_has_session, prepare_session_environments
 from .cwd import validate_cwd_path
+from .snapshot import ProjectSnapshot, capture_snapshots, restore_snapshot
+from .server import TmuxServerSnapshot
+from .hook_manager import HookManager
 
 __all__ = [
+    "TmuxBatch",
+    "TmuxCommandResult",
+    "run_tmux",
     "SessionManager",
     "HookManager",
     "apply_session_environments",
     "tmux_has_session",
     "prepare_session_environments",
     "validate_cwd_path",
+    "ProjectSnapshot",
+    "capture_snapshots",
+    "restore_snapshot",
+    "TmuxServerSnapshot",
 ]
+
+
+def __getattr__(name: str):
+    if name == "SessionManager":
+        from .session_manager import SessionManager
+        return SessionManager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,132 @@
+"""tmuxコマンドの一括実行.
+
+複数のtmuxコマンドを `\\;` で連結し、1回のtmux起動（1 fork）で実行する。
+tmuxはコマンド列の途中で失敗するとそれ以降を実行しないため、各コマンドの
+直後にマーカーを出力する display-message を挟み、標準出力からコマンドごとの
+成否と出力を復元する。
+"""
+
+import os
+import secrets
+import subprocess
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class TmuxCommandResult:
+    """一括実行したtmuxコマンド1件分の結果."""
+
+    args: list[str]
+    ok: bool = False
+    executed: bool = False
+    output: str = ""
+    error: str = ""
+
+    @property
+    def lines(self) -> list[str]:
+        """出力を行単位で返す（空出力は空リスト）."""
+        return self.output.splitlines() if self.output else []
+
+
+def escape_argument(arg: str) -> str:
+    """末尾の `;` がコマンド区切りと解釈されないようにエスケープ.
+
+    tmuxは末尾の `\\;` を `;` に戻すため、値が元から `\\;` で終わる場合も
+    必ずエスケープする（`x\\;` → `x\\\\;` → tmux側で `x\\;`）。
+    """
+    if arg.endswith(";"):
+        return arg[:-1] + "\\;"
+    return arg
+
+
+@dataclass
+class TmuxBatch:
+    """tmuxコマンドを収集し、1回のtmux起動でまとめて実行する.
+
+    Example:
+        batch = TmuxBatch()
+        batch.add("has-session", "-t", "proj")
+        batch.add("set-environment", "-t", "proj", "FOO", "bar")
+        results = batch.run()
+    """
+
+    env: Optional[dict[str, str]] = None
+    tmux_command: str = "tmux"
+    commands: list[list[str]] = field(default_factory=list)
+
+    def add(self, *args: str) -> int:
+        """コマンドを追加し、結果リスト内のインデックスを返す."""
+        self.commands.append([str(a) for a in args])
+        return len(self.commands) - 1
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def build_argv(self, marker: str) -> list[str]:
+        """tmuxに渡す引数列を組み立てる（各コマンドの後ろにマーカー出力を挟む）."""
+        argv = [self.tmux_command]
+        for index, command in enumerate(self.commands):
+            if index > 0:
+                argv.append(";")
+            argv.extend(escape_argument(a) for a in command)
+            argv.extend([";", "display-message", "-p", f"{marker}{index}"])
+        return argv
+
+    def run(self) -> list[TmuxCommandResult]:
+        """収集したコマンドを1回のtmux起動で実行.
+
+        Returns:
+            list[TmuxCommandResult]: 追加順のコマンドごとの結果。
+                失敗したコマンド以降は executed=False になる。
+        """
+        results = [TmuxCommandResult(args=command) for command in self.commands]
+        if not self.commands:
+            return results
+
+        marker = f"__itmux_batch_{secrets.token_hex(4)}_"
+        completed = subprocess.run(
+            self.build_argv(marker),
+            capture_output=True,
+            text=True,
+            check=False,
+            env=(self.env or os.environ).copy(),
+        )
+
+        # マーカーでコマンドごとの出力に分割
+        stdout = completed.stdout or ""
+        buffer: list[str] = []
+        done = 0
+        for line in stdout.splitlines():
+            if line.startswith(marker) and done < len(results):
+                result = results[done]
+                result.ok = True
+                result.executed = True
+                result.output = "\n".join(buffer)
+                buffer = []
+                done += 1
+            else:
+                buffer.append(line)
+
+        if completed.returncode == 0:
+            # 全コマンド成功（マーカーが取れなかった場合も成功扱い）
+            for result in results[done:]:
+                result.ok = True
+                result.executed = True
+            if done < len(results):
+                results[-1].output = "\n".join(buffer)
+        elif done < len(results):
+            # 最初にマーカーが出なかったコマンドが失敗、以降は未実行
+            failed = results[done]
+            failed.executed = True
+            failed.output = "\n".join(buffer)
+            failed.error = (completed.stderr or "").strip()
+
+        return results
+
+
+def run_tmux(*args: str, env: Optional[dict[str, str]] = None) -> TmuxCommandResult:
+    """tmuxコマンドを1件だけ実行する（TmuxBatchの簡易版）."""
+    batch = TmuxBatch(env=env)
+    batch.add(*args)
+    return batch.run()[0]
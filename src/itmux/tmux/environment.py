@@ -1,24 +1,123 @@
 """tmuxセッションへの環境変数適用."""
 
-import os
-import subprocess
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Sequence
 
+from ..models import WindowConfig
+from .batch import TmuxBatch, run_tmux
 from .cwd import cwd_creation_args
 
 # 環境変数適用前の一時ウィンドウ名（ユーザー向けシェルは起動しない）
 BOOTSTRAP_WINDOW = "_itmux_bootstrap"
 
+# iTmux が設定した環境変数名を記録するセッションユーザーオプション
+# （config から削除された変数だけを unset するため）
+MANAGED_ENV_OPTION = "@itmux_env_keys"
+
+
+@dataclass
+class SessionEnvironment:
+    """tmuxセッションの現在の環境変数と、iTmux 管理下の変数名."""
+
+    values: dict[str, str] = field(default_factory=dict)
+    managed_keys: set[str] = field(default_factory=set)
+
+
+@dataclass
+class EnvironmentDiff:
+    """config とセッション環境変数の差分."""
+
+    to_set: dict[str, str] = field(default_factory=dict)
+    to_unset: list[str] = field(default_factory=list)
+    managed_keys: set[str] = field(default_factory=set)
+    managed_changed: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.to_set or self.to_unset or self.managed_changed)
+
 
 def tmux_has_session(session_name: str, env: Optional[dict[str, str]] = None) -> bool:
-    """tmuxセッションが存在するか確認."""
-    result = subprocess.run(
-        ["tmux", "has-session", "-t", session_name],
-        capture_output=True,
-        env=(env or os.environ).copy(),
+    """tmuxセッションが存在するか確認（セッション名は完全一致。"proj" は "project" に当たらない）."""
+    return run_tmux("has-session", "-t", f"={session_name}", env=env).ok
+
+
+def _add_set_environment(
+    batch: TmuxBatch, session_name: str, environments: dict[str, str]
+) -> None:
+    """set-environment コマンドをバッチに追加."""
+    for key, value in environments.items():
+        batch.add("set-environment", "-t", session_name, key, value)
+
+
+def _add_set_managed_keys(
+    batch: TmuxBatch, session_name: str, managed_keys: set[str]
+) -> None:
+    """管理下の変数名を記録するコマンドをバッチに追加."""
+    if managed_keys:
+        batch.add(
+            "set-option", "-t", session_name, MANAGED_ENV_OPTION, " ".join(sorted(managed_keys))
+        )
+    else:
+        batch.add("set-option", "-u", "-t", session_name, MANAGED_ENV_OPTION)
+
+
+def parse_show_environment(lines: list[str]) -> dict[str, str]:
+    """show-environment の出力を辞書に変換（`-KEY` の削除済みエントリは除外）."""
+    values = {}
+    for line in lines:
+        if not line or line.startswith("-") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        values[key] = value
+    return values
+
+
+def read_session_environment(
+    session_name: str, env: Optional[dict[str, str]] = None
+) -> Optional[SessionEnvironment]:
+    """セッションの環境変数と管理下の変数名を1回のtmux起動で取得.
+
+    Returns:
+        SessionEnvironment: セッションが存在しない場合は None
+    """
+    batch = TmuxBatch(env=env)
+    batch.add("show-environment", "-t", f"={session_name}")
+    # show-options の -t はペイン指定なので、完全一致は "=<セッション>:" で指定する
+    batch.add("show-options", "-qv", "-t", f"={session_name}:", MANAGED_ENV_OPTION)
+    show_env, show_managed = batch.run()
+    if not show_env.ok:
+        return None
+    return SessionEnvironment(
+        values=parse_show_environment(show_env.lines),
+        managed_keys=set(show_managed.output.split()) if show_managed.ok else set(),
+    )
+
+
+def diff_session_environment(
+    current: SessionEnvironment, environments: dict[str, str]
+) -> EnvironmentDiff:
+    """config の environments とセッションの現在値から差分を計算.
+
+    値が異なる・未設定の変数は set、以前 iTmux が設定して config から
+    削除された変数は unset の対象になる。
+    """
+    to_set = {
+        key: value
+        for key, value in environments.items()
+        if current.values.get(key) != value
+    }
+    to_unset = sorted(
+        key for key in current.managed_keys
+        if key not in environments and key in current.values
+    )
+    managed_keys = set(environments)
+    return EnvironmentDiff(
+        to_set=to_set,
+        to_unset=to_unset,
+        managed_keys=managed_keys,
+        managed_changed=managed_keys != current.managed_keys,
     )
-    return result.returncode == 0
 
 
 def apply_session_environments(
@@ -26,7 +125,11 @@ def apply_session_environments(
     environments: dict[str, str],
     env: Optional[dict[str, str]] = None,
 ) -> bool:
-    """tmuxセッションスコープの環境変数を適用.
+    """tmuxセッションスコープの環境変数を差分適用.
+
+    現在のセッション環境を1回の show-environment で取得し、値が変わった変数の
+    set-environment と、config から削除された変数の set-environment -u だけを
+    1回のtmux起動で実行する。差分がなければ書き込みは行わない。
 
     Args:
         session_name: tmuxセッション名（= プロジェクト名）
@@ -36,108 +139,170 @@ def apply_session_environments(
     Returns:
         bool: 適用を試みた場合 True、スキップした場合 False
     """
-    if not environments:
+    current = read_session_environment(session_name, env=env)
+    if current is None:
         return False
 
-    if not tmux_has_session(session_name, env=env):
-        return False
+    diff = diff_session_environment(current, environments)
+    if not diff:
+        return True
 
-    run_env = (env or os.environ).copy()
-    for key, value in environments.items():
-        subprocess.run(
-            ["tmux", "set-environment", "-t", session_name, key, value],
-            capture_output=True,
-            check=False,
-            env=run_env,
-        )
+    batch = TmuxBatch(env=env)
+    _add_set_environment(batch, session_name, diff.to_set)
+    for key in diff.to_unset:
+        batch.add("set-environment", "-u", "-t", session_name, key)
+    if diff.managed_changed:
+        _add_set_managed_keys(batch, session_name, diff.managed_keys)
+    batch.run()
     return True
 
 
+def _add_new_windows(
+    batch: TmuxBatch,
+    session_name: str,
+    windows: Sequence[WindowConfig],
+    cwd: Optional[Path] = None,
+) -> None:
+    """new-window -n <name> -c <cwd> をバッチに追加（シェルは1ウィンドウ1回だけ起動）.
+
+    window_size があれば同じバッチで resize-window も行う。
+    """
+    for window in windows:
+        batch.add(
+            "new-window",
+            "-d",
+            "-t",
+            session_name,
+            "-n",
+            window.name,
+            *cwd_creation_args(cwd),
+        )
+        if window.window_size:
+            batch.add(
+                "resize-window",
+                "-t",
+                f"={session_name}:={window.name}",
+                "-x",
+                str(window.window_size.columns),
+                "-y",
+                str(window.window_size.lines),
+            )
+
+
+def add_detached_windows(
+    session_name: str,
+    windows: Sequence[WindowConfig],
+    cwd: Optional[Path] = None,
+    env: Optional[dict[str, str]] = None,
+) -> int:
+    """どのクライアントもアタッチしていないセッションに不足ウィンドウを作成.
+
+    Control Mode でアタッチ済みのセッションに tmux 側から new-window すると、
+    iTerm2 では既存ウィンドウのタブとして表示される（#15）。アタッチ前に
+    作成しておけば、アタッチ時にそれぞれネイティブウィンドウとして開かれる。
+
+    Args:
+        session_name: tmuxセッション名
+        windows: 開くウィンドウのリスト（先頭から既存ウィンドウに対応付ける）
+        cwd: 新規ウィンドウの作業ディレクトリ
+        env: subprocess に渡す環境変数
+
+    Returns:
+        int: 作成したウィンドウ数
+    """
+    result = run_tmux(
+        "display-message", "-p", "-t", f"={session_name}",
+        "#{session_attached} #{session_windows}",
+        env=env,
+    )
+    if not result.ok:
+        return 0
+    try:
+        attached, window_count = (int(v) for v in result.output.split())
+    except ValueError:
+        return 0
+    if attached > 0:
+        return 0
+
+    missing = list(windows[window_count:])
+    if not missing:
+        return 0
+
+    batch = TmuxBatch(env=env)
+    _add_new_windows(batch, session_name, missing, cwd)
+    batch.run()
+    return len(missing)
+
+
 def prepare_session_environments(
     session_name: str,
     environments: dict[str, str],
     first_window_name: str,
     cwd: Optional[Path] = None,
     env: Optional[dict[str, str]] = None,
+    extra_windows: Sequence[WindowConfig] = (),
 ) -> bool:
     """シェル起動前にセッション環境変数を整える.
 
     新規セッションかつ environments がある場合は、一時ウィンドウで
     セッションだけ作成してから set-environment し、初回ウィンドウを作る。
+    extra_windows のウィンドウも同じバッチで作成するため、
+    セッション作成から全ウィンドウの作成までは1回のtmux起動で実行する。
+    既存セッションでは環境変数を差分適用し、アタッチされていなければ
+    不足ウィンドウを作成する。
 
     Args:
         session_name: tmuxセッション名
         environments: 適用する環境変数
         first_window_name: 初回ウィンドウ名
-        cwd: 初回ウィンドウの作業ディレクトリ
+        cwd: 作成するウィンドウの作業ディレクトリ
         env: subprocess に渡す環境変数
+        extra_windows: 初回ウィンドウ以降に作成するウィンドウ
 
     Returns:
         bool: 新規セッションを作成した場合 True
     """
-    run_env = (env or os.environ).copy()
-
-    if tmux_has_session(session_name, env=run_env):
-        apply_session_environments(session_name, environments, env=run_env)
+    if tmux_has_session(session_name, env=env):
+        apply_session_environments(session_name, environments, env=env)
+        if extra_windows:
+            add_detached_windows(
+                session_name,
+                [WindowConfig(name=first_window_name), *extra_windows],
+                cwd=cwd,
+                env=env,
+            )
         return False
 
+    batch = TmuxBatch(env=env)
     if environments:
-        subprocess.run(
-            [
-                "tmux",
-                "new-session",
-                "-d",
-                "-s",
-                session_name,
-                "-n",
-                BOOTSTRAP_WINDOW,
-            ],
-            capture_output=True,
-            check=False,
-            env=run_env,
-        )
-        apply_session_environments(session_name, environments, env=run_env)
+        batch.add("new-session", "-d", "-s", session_name, "-n", BOOTSTRAP_WINDOW)
+        _add_set_environment(batch, session_name, environments)
+        _add_set_managed_keys(batch, session_name, set(environments))
         if first_window_name != BOOTSTRAP_WINDOW:
-            subprocess.run(
-                [
-                    "tmux",
-                    "new-window",
-                    "-t",
-                    session_name,
-                    "-n",
-                    first_window_name,
-                    *cwd_creation_args(cwd),
-                ],
-                capture_output=True,
-                check=False,
-                env=run_env,
-            )
-            subprocess.run(
-                [
-                    "tmux",
-                    "kill-window",
-                    "-t",
-                    f"{session_name}:{BOOTSTRAP_WINDOW}",
-                ],
-                capture_output=True,
-                check=False,
-                env=run_env,
-            )
-    else:
-        subprocess.run(
-            [
-                "tmux",
-                "new-session",
-                "-d",
-                "-s",
+            batch.add(
+                "new-window",
+                "-t",
                 session_name,
                 "-n",
                 first_window_name,
                 *cwd_creation_args(cwd),
-            ],
-            capture_output=True,
-            check=False,
-            env=run_env,
+            )
+            # 一時ウィンドウより後ろに作成してから削除し、インデックス順を config 順に揃える
+            _add_new_windows(batch, session_name, extra_windows, cwd)
+            batch.add("kill-window", "-t", f"{session_name}:{BOOTSTRAP_WINDOW}")
+        else:
+            _add_new_windows(batch, session_name, extra_windows, cwd)
+    else:
+        batch.add(
+            "new-session",
+            "-d",
+            "-s",
+            session_name,
+            "-n",
+            first_window_name,
+            *cwd_creation_args(cwd),
         )
+        _add_new_windows(batch, session_name, extra_windows, cwd)
+    batch.run()
 
     return True
@@ -1,8 +1,88 @@
-"""tmux hookの管理."""
+"""tmux hookの管理.
+
+hook はどれも `itmux hook <hook名> <プロジェクト>` の1プロセスを起動し、
+sync / save のどちらを行うかはそのプロセスが HookManager の hook 定義から決める
+（iterm2 は型注釈にだけ使い、hook のプロセスでは import しない）。
+"""
+
+from __future__ import annotations
 
 import os
 import shlex
-import iterm2
+from typing import TYPE_CHECKING, Optional, Sequence
+
+from .batch import run_tmux
+from .window_events import WINDOW_ADDED, WINDOW_REMOVED
+
+if TYPE_CHECKING:
+    import iterm2
+
+
+# iTmux が管理するセッション名の一覧（サーバーのグローバルなユーザーオプション）。
+# ":proj-a:proj-b:" の形式（tmux のセッション名には ":" を使えないため区切りに使う）。
+# session-closed の時点では閉じたセッションのオプションは読めないため、
+# セッションではなくグローバルに記録する。
+MANAGED_SESSIONS_OPTION = "@itmux_managed"
+
+# 登録解除で、読み込んだ後に別の open が登録していた場合に読み直す回数の上限
+_UNREGISTER_ATTEMPTS = 3
+
+
+def _format_escape(text: str) -> str:
+    """tmux のフォーマット文字列中でそのまま展開されるようにエスケープ."""
+    return text.replace("#", "##").replace(",", "#,").replace("}", "#}")
+
+
+def _glob_escape(text: str) -> str:
+    """#{m:...} のパターン中でワイルドカードとして扱われないようにエスケープ."""
+    for char in "\\*?[":
+        text = text.replace(char, "\\" + char)
+    return text
+
+
+def read_managed_sessions(env: Optional[dict[str, str]] = None) -> Optional[list[str]]:
+    """MANAGED_SESSIONS_OPTION に登録されたセッション名（tmux サーバーがなければ None）."""
+    result = run_tmux("show-options", "-gqv", MANAGED_SESSIONS_OPTION, env=env)
+    if not result.ok:
+        return None
+    return [name for name in result.output.strip().split(":") if name]
+
+
+def unregister_managed_sessions(
+    session_names: Sequence[str], env: Optional[dict[str, str]] = None
+) -> bool:
+    """セッション名を MANAGED_SESSIONS_OPTION から外す.
+
+    削除・名前変更されたプロジェクトや閉じたセッションが残っていると、そのセッションを
+    閉じるたびに session-closed hook が Python を起動するため、sync がセッションの
+    不在を確認したときに外す。読み込んだ値が書き込む時点でも同じ場合だけ
+    書き換える（tmux の if-shell -F で判定し、並行する open の登録を消さない）。
+
+    Returns:
+        bool: 登録を外した場合 True（登録されていなかった・tmux サーバーがない場合 False）
+    """
+    targets = set(session_names)
+    for _ in range(_UNREGISTER_ATTEMPTS):
+        managed = read_managed_sessions(env=env)
+        if not managed or not targets.intersection(managed):
+            return False
+        remaining = [name for name in managed if name not in targets]
+        if remaining:
+            value = ":" + ":".join(remaining) + ":"
+            update = f"set-option -g {MANAGED_SESSIONS_OPTION} {shlex.quote(value)}"
+        else:
+            update = f"set-option -gu {MANAGED_SESSIONS_OPTION}"
+        current = ":" + ":".join(managed) + ":"
+        condition = f"#{{==:#{{{MANAGED_SESSIONS_OPTION}}},{_format_escape(current)}}}"
+        # 値が変わっていた場合だけ else 側でマーカーを出力し、読み直してやり直す
+        result = run_tmux(
+            "if-shell", "-F", condition, update, "display-message -p changed", env=env
+        )
+        if not result.ok:
+            return False
+        if result.output.strip() != "changed":
+            return True
+    return False
 
 
 class HookManager:
@@ -15,89 +95,157 @@ class HookManager:
     # 将来的な追加・削除を容易にするためリストで管理
     SESSION_HOOKS = [
         ("after-new-window", "ウィンドウ作成時", True, True, False),
-        ("window-unlinked", "ウィンドウ削除時", True, True, False),
         ("after-split-window", "pane分割時", False, True, False),
         ("after-kill-pane", "pane削除時", False, True, False),
         ("after-resize-pane", "paneリサイズ時", False, True, True),
     ]
 
-    @staticmethod
-    def _build_hook_command(
-        project_name: str,
-        needs_sync: bool,
-        needs_save: bool,
-        use_debounce: bool,
-        itmux_command: str = "itmux"
-    ) -> str:
-        """hookコマンドを生成.
+    # グローバルスコープのhook定義（形式は SESSION_HOOKS と同じ）
+    # window-unlinked はウィンドウが既にセッションから外れているため、セッション
+    # スコープに設定しても別のセッションの hook として扱われ、実行されないことがある。
+    # グローバルに設定し、管理下のセッションが残っているときだけ実行する
+    # （セッションごと閉じたときは session-closed が処理する）
+    GLOBAL_HOOKS = [
+        ("window-unlinked", "ウィンドウ削除時", True, True, False),
+    ]
 
-        Args:
-            project_name: プロジェクト名
-            needs_sync: sync実行が必要か
-            needs_save: save実行が必要か
-            use_debounce: debounceが必要か
-            itmux_command: itmuxコマンドのパス
+    # session終了時のhook（グローバルスコープ、管理下のセッションだけ、形式は SESSION_HOOKS と同じ）
+    # 閉じたセッションのスナップショットは取得できないため save はしない
+    SESSION_CLOSED_HOOK = ("session-closed", "セッション終了時", True, False, False)
 
-        Returns:
-            str: hookから実行するコマンド文字列
-        """
+    # ウィンドウの変更を伴う hook（差分同期用）
+    WINDOW_EVENTS = {
+        "after-new-window": WINDOW_ADDED,
+        "window-unlinked": WINDOW_REMOVED,
+    }
+
+    # 変更されたウィンドウの情報（run-shell のフォーマット展開で埋め込む）
+    # after-* hook では window_* が新しいウィンドウ、window-unlinked では hook_window_* が
+    # 削除されたウィンドウを指す
+    WINDOW_EVENT_ARGS = {
+        "after-new-window": (
+            "--window-id #{window_id} --window-index #{window_index} "
+            "--window-name #{q:window_name}"
+        ),
+        "window-unlinked": "--window-id #{hook_window} --window-name #{q:hook_window_name}",
+    }
+
+    # hook から閉じた・変更されたセッション名を渡すときのプロジェクト名
+    HOOK_SESSION_NAME = "#{q:hook_session_name}"
+
+    @staticmethod
+    def _env_vars() -> str:
+        """hookから起動する itmux に引き継ぐ環境変数（shlex.quote()で安全にエスケープ）."""
         current_path = os.environ.get("PATH", "")
         config_path = os.environ.get("ITMUX_CONFIG_PATH", "")
         itmux_command_env = os.environ.get("ITMUX_COMMAND", "")
 
-        # 環境変数の設定（shlex.quote()で安全にエスケープ）
         env_vars = f"PATH={shlex.quote(current_path)}"
         if config_path:
             env_vars += f" ITMUX_CONFIG_PATH={shlex.quote(config_path)}"
         if itmux_command_env:
             env_vars += f" ITMUX_COMMAND={shlex.quote(itmux_command_env)}"
+        return env_vars
 
-        commands = []
+    @staticmethod
+    def _managed_condition(session_alive: bool = False) -> str:
+        """hook のセッションが管理下か判定する if-shell -F 用のフォーマット.
 
-        if needs_sync:
-            commands.append(f"{itmux_command} sync {project_name}")
+        Args:
+            session_alive: セッションがまだ存在することも条件にするか
+        """
+        managed = f"#{{m:*:#{{hook_session_name}}:*,#{{{MANAGED_SESSIONS_OPTION}}}}}"
+        if not session_alive:
+            return managed
+        alive = "#{m:*:#{hook_session_name}:*,:#{S:#{session_name}:}}"
+        return f"#{{&&:{managed},{alive}}}"
 
-        if needs_save:
-            save_cmd = f"{itmux_command} save {project_name}"
-            if use_debounce:
-                save_cmd += " --debounce"
-            commands.append(save_cmd)
+    @classmethod
+    def hook_actions(cls, hook_name: str) -> tuple[bool, bool, bool]:
+        """hook で行う処理（sync必要, save必要, debounce有効）を hook 定義から引く.
 
-        # 複数コマンドを && で連結
-        command = " && ".join(commands)
-        # 全体を括弧で囲んでからリダイレクト（echoの出力も含めてリダイレクトする）
-        return f"({env_vars} {command}) >> ~/.itmux/hook.log 2>&1 || true"
+        Raises:
+            ValueError: 未定義の hook
+        """
+        for name, _, needs_sync, needs_save, use_debounce in (
+            *cls.SESSION_HOOKS, *cls.GLOBAL_HOOKS, cls.SESSION_CLOSED_HOOK
+        ):
+            if name == hook_name:
+                return needs_sync, needs_save, use_debounce
+        raise ValueError(f"Unknown hook event: {hook_name}")
 
-    @staticmethod
-    def _build_sync_all_command(itmux_command: str = "itmux") -> str:
-        """全プロジェクトのsync --allコマンドを生成.
+    @classmethod
+    def _build_hook_command(
+        cls,
+        project_name: str,
+        hook_name: str,
+        itmux_command: str = "itmux",
+    ) -> str:
+        """hookコマンドを生成（`itmux hook <hook名> <プロジェクト>` の1プロセス）.
 
         Args:
+            project_name: プロジェクト名
+            hook_name: hook名（WINDOW_EVENT_ARGS にあれば変更されたウィンドウの情報も渡す）
             itmux_command: itmuxコマンドのパス
 
         Returns:
             str: hookから実行するコマンド文字列
         """
-        current_path = os.environ.get("PATH", "")
-        config_path = os.environ.get("ITMUX_CONFIG_PATH", "")
+        command = f"{itmux_command} hook {hook_name} {project_name}"
+        if hook_name in cls.WINDOW_EVENT_ARGS:
+            command += f" {cls.WINDOW_EVENT_ARGS[hook_name]}"
+        # 全体を括弧で囲んでからリダイレクト（echoの出力も含めてリダイレクトする）
+        return f"({cls._env_vars()} {command}) >> ~/.itmux/hook.log 2>&1 || true"
 
-        # 環境変数の設定（shlex.quote()で安全にエスケープ）
-        env_vars = f"PATH={shlex.quote(current_path)}"
-        if config_path:
-            env_vars += f" ITMUX_CONFIG_PATH={shlex.quote(config_path)}"
+    @classmethod
+    def _build_global_hook(cls, hook_name: str, itmux_command: str = "itmux") -> str:
+        """GLOBAL_HOOKS の hook に設定する tmux コマンドを生成.
 
-        return f"{env_vars} {itmux_command} sync --all >> ~/.itmux/hook.log 2>&1 || true"
+        管理下のセッションがまだ存在するときだけ、そのセッションを対象に
+        _build_hook_command() のコマンドを実行する。
+        """
+        command = cls._build_hook_command(cls.HOOK_SESSION_NAME, hook_name, itmux_command)
+        run_shell = f"run-shell -b {shlex.quote(command)}"
+        condition = cls._managed_condition(session_alive=True)
+        return f"if-shell -F {shlex.quote(condition)} {shlex.quote(run_shell)}"
 
-    @staticmethod
-    def _check_resurrect_installed() -> bool:
-        """tmux-resurrectがインストールされているかチェック.
+    @classmethod
+    def _build_session_closed_hook(cls, itmux_command: str = "itmux") -> str:
+        """session-closed hook（グローバル）に設定する tmux コマンドを生成.
+
+        閉じたセッションが MANAGED_SESSIONS_OPTION に含まれるかを tmux 側の
+        if-shell -F で判定し、管理下のセッションだけ `itmux hook session-closed <session>`
+        を実行する（他のツールや一時的なセッションでは Python を起動しない）。
+
+        Args:
+            itmux_command: itmuxコマンドのパス
 
         Returns:
-            bool: インストール済みの場合True
+            str: set-hook に渡す tmux コマンド文字列
         """
-        from pathlib import Path
-        save_script = Path.home() / ".tmux" / "plugins" / "tmux-resurrect" / "scripts" / "save.sh"
-        return save_script.exists()
+        # セッション名は run-shell のフォーマット展開時にシェル用にクォートする
+        command = cls._build_hook_command(
+            cls.HOOK_SESSION_NAME, cls.SESSION_CLOSED_HOOK[0], itmux_command
+        )
+        condition = cls._managed_condition()
+        run_shell = f"run-shell -b {shlex.quote(command)}"
+        return f"if-shell -F {shlex.quote(condition)} {shlex.quote(run_shell)}"
+
+    @staticmethod
+    def _build_register_command(project_name: str) -> str:
+        """セッション名を MANAGED_SESSIONS_OPTION に追加する tmux コマンドを生成.
+
+        追加済みかどうかの判定もフォーマット（set-option -F）で行い、
+        1コマンドで冪等に追加する（並行する open でも読み書きがずれない）。
+        """
+        option = f"#{{{MANAGED_SESSIONS_OPTION}}}"
+        entry = _format_escape(project_name)
+        pattern = _format_escape(_glob_escape(project_name))
+        value = (
+            f"#{{?#{{m:*:{pattern}:*,{option}}},{option},"
+            f"#{{?{MANAGED_SESSIONS_OPTION},{option},:}}{entry}:}}"
+        )
+        return f"set-option -gF {MANAGED_SESSIONS_OPTION} {shlex.quote(value)}"
 
     async def setup_hooks(
         self,
@@ -112,24 +260,12 @@ class HookManager:
             project_name: プロジェクト名
             itmux_command: itmuxコマンドのパス（デフォルト: "itmux"）
         """
-        import sys
-
-        # tmux-resurrectの有無を確認
-        resurrect_available = self._check_resurrect_installed()
-        if not resurrect_available:
-            print("⚠️  tmux-resurrect not installed, pane layouts won't be saved", file=sys.stderr)
-
         # run-shell -b を使って外部コマンドをバックグラウンド実行
         # -b: バックグラウンド実行（デッドロック防止）
-        for hook_name, description, needs_sync, needs_save, use_debounce in self.SESSION_HOOKS:
-            # tmux-resurrect必要だが未インストールの場合はスキップ
-            if needs_save and not resurrect_available:
-                continue
-
-            # hookコマンド生成
-            command = self._build_hook_command(
-                project_name, needs_sync, needs_save, use_debounce, itmux_command
-            )
+        # save はitmux自身のスナップショットなので、tmux-resurrectの有無によらず設定する
+        for hook_name, *_ in self.SESSION_HOOKS:
+            # hookコマンド生成（sync / save の判定は起動したプロセスが hook 定義から行う）
+            command = self._build_hook_command(project_name, hook_name, itmux_command)
 
             # run-shell の引数全体を shlex.quote() でエスケープ
             hook_command = f"run-shell -b {shlex.quote(command)}"
@@ -137,11 +273,19 @@ class HookManager:
                 f"set-hook -t {project_name} {hook_name} {shlex.quote(hook_command)}"
             )
 
+        # グローバルスコープのhook（-gで上書き、-agではない）
+        # 以前セッションスコープに設定していた分は外す
+        for hook_name, *_ in self.GLOBAL_HOOKS:
+            await tmux_conn.async_send_command(f"set-hook -u -t {project_name} {hook_name}")
+            global_hook_command = self._build_global_hook(hook_name, itmux_command)
+            await tmux_conn.async_send_command(
+                f"set-hook -g {hook_name} {shlex.quote(global_hook_command)}"
+            )
+
         # session終了時のhook（グローバルスコープ）
-        # 全プロジェクトの整合性をチェック（-gで上書き、-agではない）
-        # どのセッションが閉じても、全プロジェクトをチェックして存在しないセッションを削除
-        sync_all_command = self._build_sync_all_command(itmux_command)
-        global_hook_command = f"run-shell -b {shlex.quote(sync_all_command)}"
+        # 管理下のセッションとして登録し、閉じたときはそのプロジェクトだけを sync する
+        await tmux_conn.async_send_command(self._build_register_command(project_name))
+        global_hook_command = self._build_session_closed_hook(itmux_command)
         await tmux_conn.async_send_command(
             f"set-hook -g session-closed {shlex.quote(global_hook_command)}"
         )
@@ -157,7 +301,7 @@ class HookManager:
             tmux_conn: TmuxConnection
             project_name: プロジェクト名
 
-        注意: グローバルsession-closedフックは削除しない（他のプロジェクトも使用）
+        注意: グローバルのhook（GLOBAL_HOOKS・session-closed）は削除しない（他のプロジェクトも使用）
         """
         try:
             # セッションスコープのhookを削除（-u オプション）
@@ -0,0 +1,91 @@
+"""tmux サーバー全体の状態のスナップショット.
+
+セッション・ウィンドウ（ペイン数を含む）を1回の `list-windows -a -F` で
+取得し、セッションの有無などの問い合わせにはこのスナップショットから答える。
+プロジェクトごとに `has-session` を起動すると、session-closed hook の
+`sync --all` が設定済みプロジェクトの数だけ fork するため。
+
+`has-session -t NAME` と違い、セッション名は完全一致で判定する
+（`-t` は前方一致でも成功するため、"proj" が "project" に一致していた）。
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .batch import run_tmux
+
+
+# list-windows の出力フィールド（ウィンドウ名にタブは含まれない前提。
+# ウィンドウ名は最後に置き、区切り以外のタブが入っても崩れないようにする）
+WINDOW_FIELDS = (
+    "session_name",
+    "window_id",
+    "window_index",
+    "window_panes",
+    "window_name",
+)
+LIST_WINDOWS_FORMAT = "\t".join(f"#{{{name}}}" for name in WINDOW_FIELDS)
+
+
+@dataclass
+class TmuxWindowInfo:
+    """tmux ウィンドウ1つ分の情報."""
+
+    window_id: str
+    index: int
+    name: str
+    panes: int = 1
+
+
+@dataclass
+class TmuxServerSnapshot:
+    """ある時点の tmux サーバーのセッション・ウィンドウ一覧.
+
+    Attributes:
+        running: tmux サーバーが起動しているか
+        sessions: セッション名 → ウィンドウ一覧（window_index 順）
+    """
+
+    running: bool = False
+    sessions: dict[str, list[TmuxWindowInfo]] = field(default_factory=dict)
+
+    @classmethod
+    def capture(cls, env: Optional[dict[str, str]] = None) -> "TmuxServerSnapshot":
+        """tmux サーバーの状態を1回の tmux 起動で取得.
+
+        サーバーが起動していない場合（list-windows が失敗した場合）は、
+        running=False の空のスナップショットを返す。
+        """
+        result = run_tmux("list-windows", "-a", "-F", LIST_WINDOWS_FORMAT, env=env)
+        if not result.ok:
+            return cls()
+        return cls.parse(result.output)
+
+    @classmethod
+    def parse(cls, output: str) -> "TmuxServerSnapshot":
+        """list-windows -a -F LIST_WINDOWS_FORMAT の出力を解析."""
+        snapshot = cls(running=True)
+        for line in output.splitlines():
+            parts = line.split("\t", len(WINDOW_FIELDS) - 1)
+            if len(parts) != len(WINDOW_FIELDS):
+                continue
+            session, window_id, index, panes, name = parts
+            try:
+                window = TmuxWindowInfo(
+                    window_id=window_id, index=int(index), name=name, panes=int(panes)
+                )
+            except ValueError:
+                continue
+            snapshot.sessions.setdefault(session, []).append(window)
+
+        for windows in snapshot.sessions.values():
+            windows.sort(key=lambda w: w.index)
+        return snapshot
+
+    def has_session(self, session_name: str) -> bool:
+        """セッションが存在するか（完全一致）."""
+        return session_name in self.sessions
+
+    def windows(self, session_name: str) -> list[TmuxWindowInfo]:
+        """セッションのウィンドウ一覧（セッションがなければ空リスト）."""
+        return list(self.sessions.get(session_name, []))
@@ -1,24 +1,88 @@
 """tmuxセッションの管理."""
 
+import asyncio
+import shlex
+from typing import Optional
+
 import iterm2
 from ..exceptions import ITerm2Error
+from .batch import run_tmux
+
+# TmuxConnection の ID を記録するセッションユーザーオプション
+# （短命な hook プロセスがプローブせずに接続を特定するため）
+CONNECTION_ID_OPTION = "@itmux_connection_id"
 
 
 class SessionManager:
     """tmuxセッションの管理を担当するクラス."""
 
-    def __init__(self, connection: iterm2.Connection):
+    def __init__(self, connection: iterm2.Connection, probe_timeout: float = 1.0):
         """Initialize SessionManager.
 
         Args:
             connection: iTerm2 Connection
+            probe_timeout: 1接続あたりの session name 問い合わせのタイムアウト（秒）
         """
         self.connection = connection
+        self.probe_timeout = probe_timeout
+        # connection_id → session name
+        self._sessions: dict[str, str] = {}
+        # 永続化されたIDを確認済みのプロジェクト
+        self._hint_checked: set[str] = set()
+
+    def invalidate(self, project_name: Optional[str] = None) -> None:
+        """キャッシュを破棄（project_name 指定時はそのセッションのみ）."""
+        if project_name is None:
+            self._sessions.clear()
+            self._hint_checked.clear()
+            return
+        for connection_id, session_name in list(self._sessions.items()):
+            if session_name == project_name:
+                del self._sessions[connection_id]
+        self._hint_checked.discard(project_name)
+
+    async def _probe(self, conn: iterm2.TmuxConnection) -> Optional[str]:
+        """接続先の session name を問い合わせる（失敗・タイムアウト時は None）."""
+        try:
+            result = await asyncio.wait_for(
+                conn.async_send_command("display-message -p '#{session_name}'"),
+                timeout=self.probe_timeout,
+            )
+        except Exception:
+            return None
+        return result.strip() or None
+
+    @staticmethod
+    def _read_persisted_connection_id(project_name: str) -> Optional[str]:
+        """セッションユーザーオプションに記録された connection_id を読む."""
+        # "=<セッション>:" で完全一致（"proj" の値を "project" セッションから読まない。
+        # show-options の -t はペイン指定なので、"=" だけではセッションとして解釈されない）
+        result = run_tmux("show-options", "-qv", "-t", f"={project_name}:", CONNECTION_ID_OPTION)
+        if not result.ok:
+            return None
+        return result.output.strip() or None
+
+    async def _persist_connection_id(
+        self, conn: iterm2.TmuxConnection, project_name: str
+    ) -> None:
+        """connection_id をセッションユーザーオプションに記録する."""
+        try:
+            await conn.async_send_command(
+                f"set-option -t {shlex.quote(f'={project_name}:')} "
+                f"{CONNECTION_ID_OPTION} {shlex.quote(conn.connection_id)}"
+            )
+        except Exception:
+            # 記録できなくても次回プローブするだけなので無視
+            pass
 
     async def get_tmux_connection(self, project_name: str) -> iterm2.TmuxConnection:
         """プロジェクトのTmuxConnectionを取得.
 
-        tmuxコマンドでsession nameを確認しながらTmuxConnectionを都度検索します（キャッシュしません）。
+        connection_id → session name の対応をキャッシュし、接続一覧に存在しない
+        IDは破棄して再構築します。キャッシュにない場合はセッションユーザーオプションに
+        記録されたIDの接続だけを問い合わせて確認し（iTerm2 の再起動などで ID が
+        別の接続に再利用されることがあるため）、一致しなければ未知の接続を並行して
+        問い合わせます。
 
         Args:
             project_name: プロジェクト名
@@ -29,20 +93,45 @@ class SessionManager:
         Raises:
             ITerm2Error: TmuxConnection取得に失敗
         """
-        # 全てのTmuxConnectionを取得
+        # 全てのTmuxConnectionを取得（1 RPC）
         tmux_conns = await iterm2.async_get_tmux_connections(self.connection)
+        by_id = {conn.connection_id: conn for conn in tmux_conns}
+
+        # 消えた接続のエントリを破棄
+        for connection_id in list(self._sessions):
+            if connection_id not in by_id:
+                del self._sessions[connection_id]
 
-        # 各connectionのsession nameを確認
-        for conn in tmux_conns:
-            try:
-                # tmuxコマンドでsession nameを取得
-                result = await conn.async_send_command("display-message -p '#{session_name}'")
-                session_name = result.strip()
+        # 1. キャッシュ
+        for connection_id, session_name in self._sessions.items():
+            if session_name == project_name:
+                return by_id[connection_id]
 
+        # 2. 永続化されたID（プロセスごとに1回だけ、その接続だけをプローブして確認）
+        if project_name not in self._hint_checked:
+            self._hint_checked.add(project_name)
+            hinted_id = self._read_persisted_connection_id(project_name)
+            if hinted_id in by_id and hinted_id not in self._sessions:
+                session_name = await self._probe(by_id[hinted_id])
+                if session_name is not None:
+                    self._sessions[hinted_id] = session_name
                 if session_name == project_name:
-                    return conn
-            except Exception:
-                # このconnectionでコマンド実行に失敗した場合は次へ
+                    return by_id[hinted_id]
+
+        # 3. 未知の接続を並行してプローブ
+        unknown = [conn for conn in tmux_conns if conn.connection_id not in self._sessions]
+        session_names = await asyncio.gather(*(self._probe(conn) for conn in unknown))
+
+        found = None
+        for conn, session_name in zip(unknown, session_names):
+            if session_name is None:
                 continue
+            self._sessions[conn.connection_id] = session_name
+            if session_name == project_name and found is None:
+                found = conn
+
+        if found is not None:
+            await self._persist_connection_id(found, project_name)
+            return found
 
         raise ITerm2Error(f"TmuxConnection not found for project: {project_name}")
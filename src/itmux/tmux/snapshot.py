@@ -0,0 +1,340 @@
+"""tmux のレイアウトのスナップショット（tmux-resurrect の代替）.
+
+プロジェクト（tmux セッション）のウィンドウ・ペインのレイアウト
+（`#{window_layout}`）・ペインの作業ディレクトリ・前面のコマンドを
+1回の `list-panes -F` で取得し、プロジェクトごとのファイルに保存する。
+復元は new-session / new-window / split-window / select-layout を
+1回の tmux 起動（TmuxBatch）でまとめて実行する。
+
+前面のコマンドは記録のみで、復元時には再実行しない（シェルを作業
+ディレクトリで開き直す）。
+
+保存時はレイアウトに関わる状態（ウィンドウ・ペイン・レイアウト・作業
+ディレクトリ）のフィンガープリントを前回保存分と比べ、変わっていなければ
+書き込まない。フィンガープリントはスナップショットファイル自体に記録する
+（別ファイルにすると、並行する保存で内容とずれることがある）。
+"""
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional, Sequence
+from urllib.parse import quote, unquote
+
+from .batch import TmuxBatch, run_tmux
+
+
+SNAPSHOT_VERSION = 1
+
+# 遅延復元を待っているプロジェクト（tmux サーバーのユーザーオプション。
+# サーバーの終了とともに消えるため、再起動前の記録が残らない）
+PENDING_RESTORE_OPTION = "@itmux_pending_restore"
+
+# list-panes の出力フィールド（ウィンドウ名・パスにタブは含まれない前提）
+PANE_FIELDS = (
+    "session_name",
+    "window_index",
+    "window_name",
+    "window_layout",
+    "window_active",
+    "pane_index",
+    "pane_active",
+    "pane_current_path",
+    "pane_current_command",
+)
+LIST_PANES_FORMAT = "\t".join(f"#{{{name}}}" for name in PANE_FIELDS)
+
+# window_layout の先頭（"checksum,WxH,..."）からウィンドウサイズを取り出す
+_LAYOUT_SIZE = re.compile(r"^[0-9a-f]{4},(\d+)x(\d+),")
+
+
+@dataclass
+class PaneSnapshot:
+    """ペイン1つ分の状態."""
+
+    cwd: str
+    command: str = ""
+    active: bool = False
+
+
+@dataclass
+class WindowSnapshot:
+    """ウィンドウ1つ分の状態."""
+
+    index: int
+    name: str
+    layout: str
+    active: bool = False
+    panes: list[PaneSnapshot] = field(default_factory=list)
+
+    @property
+    def size(self) -> Optional[tuple[int, int]]:
+        """レイアウト文字列から (columns, lines) を返す."""
+        match = _LAYOUT_SIZE.match(self.layout)
+        return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+@dataclass
+class ProjectSnapshot:
+    """プロジェクト（tmux セッション）1つ分の状態."""
+
+    session: str
+    windows: list[WindowSnapshot] = field(default_factory=list)
+
+    def fingerprint(self) -> str:
+        """レイアウトに関わる状態のハッシュ.
+
+        ウィンドウ（インデックス・名前・レイアウト）とペインの作業ディレクトリから
+        計算する。前面のコマンドとアクティブなウィンドウ・ペインは頻繁に変わるため
+        含めない（これらだけが変わった場合は保存しない）。
+        """
+        state = [
+            self.session,
+            [
+                [window.index, window.name, window.layout, [pane.cwd for pane in window.panes]]
+                for window in self.windows
+            ],
+        ]
+        encoded = json.dumps(state, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def to_dict(self) -> dict:
+        return {"version": SNAPSHOT_VERSION, "fingerprint": self.fingerprint(), **asdict(self)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ProjectSnapshot":
+        return cls(
+            session=data["session"],
+            windows=[
+                WindowSnapshot(
+                    index=window["index"],
+                    name=window["name"],
+                    layout=window["layout"],
+                    active=window.get("active", False),
+                    panes=[PaneSnapshot(**pane) for pane in window.get("panes", [])],
+                )
+                for window in data.get("windows", [])
+            ],
+        )
+
+
+def parse_list_panes(output: str) -> dict[str, ProjectSnapshot]:
+    """`list-panes -F LIST_PANES_FORMAT` の出力をセッションごとのスナップショットにする."""
+    snapshots: dict[str, ProjectSnapshot] = {}
+    windows: dict[tuple[str, int], WindowSnapshot] = {}
+    for line in output.splitlines():
+        values = line.split("\t")
+        if len(values) != len(PANE_FIELDS):
+            continue
+        row = dict(zip(PANE_FIELDS, values))
+        session = row["session_name"]
+        key = (session, int(row["window_index"]))
+        window = windows.get(key)
+        if window is None:
+            window = WindowSnapshot(
+                index=key[1],
+                name=row["window_name"],
+                layout=row["window_layout"],
+                active=row["window_active"] == "1",
+            )
+            windows[key] = window
+            snapshots.setdefault(session, ProjectSnapshot(session)).windows.append(window)
+        window.panes.append(
+            PaneSnapshot(
+                cwd=row["pane_current_path"],
+                command=row["pane_current_command"],
+                active=row["pane_active"] == "1",
+            )
+        )
+    return snapshots
+
+
+def capture_snapshots(
+    sessions: list[str], env: Optional[dict[str, str]] = None
+) -> dict[str, ProjectSnapshot]:
+    """セッションのスナップショットを1回の tmux 呼び出しで取得する.
+
+    1セッションなら `list-panes -s -t`、複数なら `list-panes -a` で全ペインを
+    取得して絞り込む。存在しないセッションは結果に含まれない。
+
+    Args:
+        sessions: セッション名（プロジェクト名）のリスト
+        env: tmux に渡す環境変数（省略時は os.environ）
+
+    Returns:
+        dict: {セッション名: ProjectSnapshot}
+    """
+    if not sessions:
+        return {}
+    if len(sessions) == 1:
+        result = run_tmux("list-panes", "-s", "-t", f"={sessions[0]}", "-F", LIST_PANES_FORMAT, env=env)
+    else:
+        result = run_tmux("list-panes", "-a", "-F", LIST_PANES_FORMAT, env=env)
+    if not result.ok:
+        return {}
+    wanted = set(sessions)
+    return {
+        session: snapshot
+        for session, snapshot in parse_list_panes(result.output).items()
+        if session in wanted and snapshot.windows
+    }
+
+
+def get_snapshots_dir(config_path: Path) -> Path:
+    """スナップショットを置くディレクトリ（config.json と同じ場所の snapshots/）."""
+    return config_path.parent / "snapshots"
+
+
+def get_snapshot_path(config_path: Path, project_name: str) -> Path:
+    """プロジェクトのスナップショットファイルのパス."""
+    return get_snapshots_dir(config_path) / f"{quote(project_name, safe='')}.json"
+
+
+def read_snapshot_fingerprint(path: Path) -> Optional[str]:
+    """保存済みスナップショットのフィンガープリント（無い・読めない場合は None）."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+        return None
+    fingerprint = data.get("fingerprint")
+    return fingerprint if isinstance(fingerprint, str) else None
+
+
+def list_snapshot_names(config_path: Path) -> list[str]:
+    """スナップショットが保存されているプロジェクト名."""
+    return sorted(unquote(path.stem) for path in get_snapshots_dir(config_path).glob("*.json"))
+
+
+def save_snapshot(snapshot: ProjectSnapshot, path: Path) -> bool:
+    """スナップショットを保存（フィンガープリントが前回と同じなら書き込まない）.
+
+    Returns:
+        bool: 実際に書き込んだ場合 True
+    """
+    if read_snapshot_fingerprint(path) == snapshot.fingerprint():
+        return False
+    content = json.dumps(snapshot.to_dict(), indent=2, ensure_ascii=False) + "\n"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.parent / f".{path.name}.{os.getpid()}.tmp"
+    tmp_path.write_text(content, encoding="utf-8")
+    os.replace(tmp_path, path)
+    return True
+
+
+def delete_snapshot(path: Path) -> bool:
+    """スナップショットを削除する.
+
+    Returns:
+        bool: 削除した場合 True（存在しなかった場合 False）
+    """
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def load_snapshot(path: Path) -> Optional[ProjectSnapshot]:
+    """スナップショットを読み込む（存在しない・読めない場合は None）."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") != SNAPSHOT_VERSION:
+            return None
+        return ProjectSnapshot.from_dict(data)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def build_restore_batch(
+    snapshot: ProjectSnapshot, env: Optional[dict[str, str]] = None
+) -> TmuxBatch:
+    """スナップショットからセッションを作り直すコマンド列を組み立てる.
+
+    ウィンドウは保存順に作り（インデックスは base-index に従う）、作ったばかりの
+    ウィンドウは末尾のウィンドウ（`$`）として指定する。名前では指定しない
+    （自動で付く "zsh" などの同名のウィンドウや、`.`・`:` を含む名前で
+    別のウィンドウに当たったり、見つからずに以降のコマンドが止まったりするため）。
+    ペインは split-window で増やしてから保存したレイアウトを select-layout で
+    適用する。分割の途中で領域が足りなくならないよう、分割ごとに tiled に並べ直す。
+    """
+    batch = TmuxBatch(env=env)
+    session = snapshot.session
+    target = f"={session}:$"
+    home = os.path.expanduser("~")
+    for position, window in enumerate(snapshot.windows):
+        first_cwd = window.panes[0].cwd if window.panes else home
+        if position == 0:
+            command = ["new-session", "-d", "-s", session, "-n", window.name, "-c", first_cwd]
+            if window.size:
+                command += ["-x", str(window.size[0]), "-y", str(window.size[1])]
+            batch.add(*command)
+        else:
+            # インデックスを指定しない new-window は空いている最小のインデックスに入る。
+            # 先頭から詰めて作っているので、作ったウィンドウは常に末尾になる
+            batch.add("new-window", "-d", "-t", f"={session}:", "-n", window.name, "-c", first_cwd)
+
+        # -d なしで分割すると新しいペインがアクティブになり、次の分割がその後ろに入る
+        # （保存時のペイン順が保たれる）
+        for pane in window.panes[1:]:
+            batch.add("split-window", "-t", target, "-c", pane.cwd)
+            batch.add("select-layout", "-t", target, "tiled")
+        if len(window.panes) > 1:
+            batch.add("select-layout", "-t", target, window.layout)
+            # 最後のペインから数えて、保存時のアクティブペインを選び直す
+            active = next((i for i, pane in enumerate(window.panes) if pane.active), 0)
+            batch.add("select-pane", "-t", f"{target}.+{active + 1}")
+        if window.active:
+            # 以降の new-window は -d なので、アクティブなウィンドウは変わらない
+            batch.add("select-window", "-t", target)
+    return batch
+
+
+def restore_snapshot(snapshot: ProjectSnapshot, env: Optional[dict[str, str]] = None) -> bool:
+    """スナップショットからセッションを作り直す（1回の tmux 起動）.
+
+    セッションが既に存在する場合は何もしない。途中のコマンドが失敗した場合は、
+    作りかけのセッションを削除する（次の復元をやり直せるように）。
+
+    Returns:
+        bool: 全コマンドが成功した場合 True
+    """
+    if not snapshot.windows:
+        return False
+    results = build_restore_batch(snapshot, env=env).run()
+    if all(result.ok for result in results):
+        return True
+    if results[0].ok:
+        run_tmux("kill-session", "-t", f"={snapshot.session}", env=env)
+    return False
+
+
+def read_pending_restores(env: Optional[dict[str, str]] = None) -> Optional[list[str]]:
+    """遅延復元を待っているプロジェクト（tmux サーバーが起動していなければ None）.
+
+    tmux の起動確認を兼ねる（tmux 1回）。
+    """
+    result = run_tmux("show-options", "-gqv", PENDING_RESTORE_OPTION, env=env)
+    if not result.ok:
+        return None
+    try:
+        names = json.loads(result.output) if result.output.strip() else []
+    except ValueError:
+        return []
+    return [name for name in names if isinstance(name, str)] if isinstance(names, list) else []
+
+
+def write_pending_restores(names: Sequence[str], env: Optional[dict[str, str]] = None) -> bool:
+    """遅延復元を待っているプロジェクトを記録する（空なら削除）.
+
+    Returns:
+        bool: 記録できた場合 True（tmux サーバーが起動していなければ False）
+    """
+    if names:
+        value = json.dumps(sorted(names), ensure_ascii=False, separators=(",", ":"))
+        return run_tmux("set-option", "-g", PENDING_RESTORE_OPTION, value, env=env).ok
+    return run_tmux("set-option", "-gu", PENDING_RESTORE_OPTION, env=env).ok
@@ -0,0 +1,112 @@
+"""tmux hook から渡されるウィンドウの追加・削除イベント（差分同期用）.
+
+after-new-window / window-unlinked hook は、対象ウィンドウの ID・インデックス・
+名前を `itmux sync` に渡す。sync はセッションのユーザーオプション
+WINDOW_MAP_OPTION に記録した「tmux ウィンドウ ID → config のウィンドウ名」の
+対応表を使い、そのウィンドウ1つ分だけを config と iTerm2 のタグに反映する。
+
+config の tmux_windows はウィンドウインデックス順の名前の並びで、tmux の
+ウィンドウ名とは独立している（iTerm2 の user.window_name が元）。削除された
+ウィンドウがどの名前だったかは tmux にも iTerm2 にも残らないため、対応表を
+セッション側に持つ。対応表が config・実際のウィンドウ一覧と食い違う場合は
+差分を適用せず、全体の照合（`_sync_single_project`）で記録し直す。
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+
+# tmux ウィンドウ ID（@なし）とウィンドウ名の組を、インデックス順の JSON 配列で記録する
+WINDOW_MAP_OPTION = "@itmux_windows"
+
+WINDOW_ADDED = "added"
+WINDOW_REMOVED = "removed"
+WINDOW_EVENT_KINDS = (WINDOW_ADDED, WINDOW_REMOVED)
+
+
+@dataclass(frozen=True)
+class WindowEvent:
+    """hook から渡されたウィンドウ1つ分の変更.
+
+    Attributes:
+        kind: WINDOW_ADDED または WINDOW_REMOVED
+        window_id: tmux ウィンドウ ID（先頭の @ は除く）
+        index: ウィンドウインデックス（削除時は不明なので None）
+        name: tmux のウィンドウ名（ログ用）
+    """
+
+    kind: str
+    window_id: str
+    index: Optional[int] = None
+    name: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if self.kind not in WINDOW_EVENT_KINDS:
+            raise ValueError(f"unknown window event: {self.kind}")
+        object.__setattr__(self, "window_id", str(self.window_id).lstrip("@"))
+
+
+@dataclass
+class WindowMap:
+    """tmux ウィンドウ ID → config のウィンドウ名の対応表（インデックス順）."""
+
+    entries: list[tuple[str, str]] = field(default_factory=list)
+
+    @classmethod
+    def loads(cls, value: str) -> Optional["WindowMap"]:
+        """オプションの値を読み込む（未記録・不正な値は None）."""
+        try:
+            data = json.loads(value)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(data, list):
+            return None
+        entries = []
+        for item in data:
+            if not (isinstance(item, list) and len(item) == 2 and all(isinstance(v, str) for v in item)):
+                return None
+            entries.append((item[0], item[1]))
+        return cls(entries)
+
+    def dumps(self) -> str:
+        return json.dumps([list(entry) for entry in self.entries], ensure_ascii=False)
+
+    @property
+    def ids(self) -> list[str]:
+        return [window_id for window_id, _ in self.entries]
+
+    @property
+    def names(self) -> list[str]:
+        return [name for _, name in self.entries]
+
+    def matches(self, config_names: Sequence[str], live_ids: Sequence[str]) -> bool:
+        """config のウィンドウ名・tmux のウィンドウ一覧と一致しているか."""
+        return self.names == list(config_names) and self.ids == list(live_ids)
+
+    def position_for_added(
+        self, window_id: str, config_names: Sequence[str], live_ids: Sequence[str]
+    ) -> Optional[int]:
+        """追加されたウィンドウを挿入する位置（差分を適用できなければ None）.
+
+        追加されたウィンドウ以外が対応表と一致しているときだけ、tmux の
+        ウィンドウ一覧での位置を返す。
+        """
+        if window_id not in live_ids or window_id in self.ids:
+            return None
+        others = [wid for wid in live_ids if wid != window_id]
+        if not self.matches(config_names, others):
+            return None
+        return list(live_ids).index(window_id)
+
+    def position_for_removed(
+        self, window_id: str, config_names: Sequence[str], live_ids: Sequence[str]
+    ) -> Optional[int]:
+        """削除されたウィンドウの位置（差分を適用できなければ None）."""
+        if window_id not in self.ids or window_id in live_ids:
+            return None
+        if self.names != list(config_names):
+            return None
+        if [wid for wid in self.ids if wid != window_id] != list(live_ids):
+            return None
+        return self.ids.index(window_id)
@@ -4,9 +4,37 @@ import os
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
+from itmux.iterm2.window_manager import WindowIndex
 from itmux.models import WindowSize, WindowConfig, ProjectConfig
 
 
+def pytest_addoption(parser):
+    """計測系のテストを有効にするオプション."""
+    parser.addoption(
+        "--run-bench",
+        action="store_true",
+        default=False,
+        help="run wall-clock benchmark tests (marked with @pytest.mark.bench)",
+    )
+
+
+def pytest_configure(config):
+    """pytestの設定."""
+    config.addinivalue_line(
+        "markers", "bench: wall-clock benchmark test (run with --run-bench)"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """--run-bench がなければ計測系のテストをスキップ（実行環境の速さに左右されるため）."""
+    if config.getoption("--run-bench"):
+        return
+    skip_bench = pytest.mark.skip(reason="benchmark test (use --run-bench)")
+    for item in items:
+        if "bench" in item.keywords:
+            item.add_marker(skip_bench)
+
+
 @pytest.fixture
 def sample_window_size():
     """サンプルウィンドウサイズ."""
@@ -63,6 +91,9 @@ def mock_new_session_monitor():
     """NewSessionMonitor のモック（コンテキストマネージャ）."""
 
     class MockMonitor:
+        def __init__(self, connection=None):
+            self.connection = connection
+
         async def __aenter__(self):
             return self
 
@@ -94,6 +125,7 @@ def mock_iterm2_bridge():
     """ITerm2Bridgeのモック（非同期）."""
     bridge = AsyncMock()
     bridge.find_windows_by_project.return_value = []
+    bridge.build_window_index.return_value = WindowIndex()
     bridge.attach_session.return_value = "window-id-1"
     bridge.add_session.return_value = "window-id-2"
     return bridge
@@ -103,7 +135,7 @@ def mock_iterm2_bridge():
 def mock_subprocess():
     """subprocessのモック."""
     with patch("subprocess.run") as mock_run:
-        mock_run.return_value = MagicMock(returncode=0)
+        mock_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
         yield mock_run
 
 
@@ -112,3 +144,31 @@ def mock_environ():
     """os.environのモック."""
     with patch.dict(os.environ, {}, clear=True):
         yield os.environ
+
+
+@pytest.fixture(autouse=True)
+def isolate_daemon_socket(tmp_path, monkeypatch):
+    """稼働中の itmuxd にリクエストが転送されないよう、ソケットパスを隔離."""
+    monkeypatch.setenv("ITMUX_SOCKET_PATH", str(tmp_path / "itmuxd.sock"))
+    monkeypatch.delenv("ITMUX_NO_DAEMON", raising=False)
+
+
+@pytest.fixture(autouse=True)
+def isolate_metrics(tmp_path, monkeypatch):
+    """テスト中の所要時間記録が ~/.itmux/metrics.json に書き込まれないよう隔離."""
+    monkeypatch.setenv("ITMUX_METRICS_PATH", str(tmp_path / "metrics.json"))
+    # mock_environ で環境変数が消されてもデフォルトパスに書き込まない
+    monkeypatch.setattr("itmux.metrics.DEFAULT_METRICS_PATH", tmp_path / "metrics.json")
+    # 開発者の環境の保存形式の指定をテストに持ち込まない
+    monkeypatch.delenv("ITMUX_CONFIG_LAYOUT", raising=False)
+
+
+@pytest.fixture(autouse=True)
+def isolate_save_schedule(tmp_path, monkeypatch):
+    """保存の debounce 状態が ~/.itmux/save_schedule.json に書き込まれないよう隔離."""
+    monkeypatch.setenv("ITMUX_SAVE_SCHEDULE_PATH", str(tmp_path / "save_schedule.json"))
+    monkeypatch.setattr(
+        "itmux.save_scheduler.DEFAULT_SCHEDULE_PATH", tmp_path / "save_schedule.json"
+    )
+    for name in ("ITMUX_SAVE_DEBOUNCE", "ITMUX_SAVE_MAX_WAIT", "ITMUX_SAVE_TRAILING"):
+        monkeypatch.delenv(name, raising=False)
@@ -22,18 +22,13 @@ class TestList:
         """プロジェクト一覧表示."""
         runner = CliRunner()
 
-        # orchestratorのモック
-        mock_orchestrator = MagicMock()
-        mock_orchestrator.list.return_value = {
+        # 軽量リーダーのモック（listはorchestratorを使わない）
+        summaries = {
             "project1": {"windows": ["editor", "server"], "count": 2},
             "project2": {"windows": ["main"], "count": 1},
         }
 
-        # get_orchestratorを非同期関数としてモック
-        async def mock_get_orchestrator():
-            return mock_orchestrator
-
-        with patch("itmux.cli.get_orchestrator", side_effect=mock_get_orchestrator):
+        with patch("itmux.readonly.list_project_summaries", return_value=summaries):
             result = runner.invoke(main, ["list"])
 
         assert result.exit_code == 0
@@ -48,13 +43,7 @@ class TestList:
         """プロジェクトが0個."""
         runner = CliRunner()
 
-        mock_orchestrator = MagicMock()
-        mock_orchestrator.list.return_value = {}
-
-        async def mock_get_orchestrator():
-            return mock_orchestrator
-
-        with patch("itmux.cli.get_orchestrator", side_effect=mock_get_orchestrator):
+        with patch("itmux.readonly.list_project_summaries", return_value={}):
             result = runner.invoke(main, ["list"])
 
         assert result.exit_code == 0
@@ -64,13 +53,10 @@ class TestList:
         """設定エラー."""
         runner = CliRunner()
 
-        mock_orchestrator = MagicMock()
-        mock_orchestrator.list.side_effect = ConfigError("Invalid config")
-
-        async def mock_get_orchestrator():
-            return mock_orchestrator
-
-        with patch("itmux.cli.get_orchestrator", side_effect=mock_get_orchestrator):
+        with patch(
+            "itmux.readonly.list_project_summaries",
+            side_effect=ConfigError("Invalid config"),
+        ):
             result = runner.invoke(main, ["list"])
 
         assert result.exit_code == 1
@@ -95,7 +81,9 @@ class TestOpen:
 
         assert result.exit_code == 0
         assert "✓ Opened project: test-project" in result.output
-        mock_orchestrator.open.assert_called_once_with("test-project", create_default=True)
+        mock_orchestrator.open.assert_called_once_with(
+            "test-project", create_default=True, staged=False, restore_others=False
+        )
 
     def test_open_project_not_found(self):
         """存在しないプロジェクト."""
@@ -132,6 +120,23 @@ class TestOpen:
         assert "✗ iTerm2 Error: Connection failed" in result.output
 
 
+    def test_open_staged(self):
+        """--staged / --restore-all を orchestrator に渡す."""
+        runner = CliRunner()
+        mock_orchestrator = AsyncMock()
+
+        async def mock_get_orchestrator():
+            return mock_orchestrator
+
+        with patch("itmux.cli.get_orchestrator", side_effect=mock_get_orchestrator):
+            result = runner.invoke(main, ["open", "test-project", "--staged", "--restore-all"])
+
+        assert result.exit_code == 0
+        mock_orchestrator.open.assert_called_once_with(
+            "test-project", create_default=True, staged=True, restore_others=True
+        )
+
+
 class TestClose:
     """closeコマンドのテスト."""
 
@@ -312,38 +317,75 @@ class TestCurrent:
         """現在のプロジェクト名を取得（成功）."""
         runner = CliRunner()
 
-        mock_orchestrator = MagicMock()
-        mock_orchestrator.current.return_value = "test-project"
-
-        async def mock_get_orchestrator():
-            return mock_orchestrator
-
-        with patch("itmux.cli.get_orchestrator", side_effect=mock_get_orchestrator):
+        with patch(
+            "itmux.readonly.current_session_name", return_value="test-project"
+        ) as mock_current:
             result = runner.invoke(main, ["current"])
 
         assert result.exit_code == 0
         assert "test-project" in result.output
-        mock_orchestrator.current.assert_called_once()
+        mock_current.assert_called_once()
 
     def test_current_not_in_tmux(self):
         """tmuxセッション外ではexit code 1を返す（エラーメッセージなし）."""
         runner = CliRunner()
 
-        mock_orchestrator = MagicMock()
-        mock_orchestrator.current.side_effect = ValueError(
-            "No project specified and not running in tmux session"
-        )
-
-        async def mock_get_orchestrator():
-            return mock_orchestrator
-
-        with patch("itmux.cli.get_orchestrator", side_effect=mock_get_orchestrator):
+        with patch("itmux.readonly.current_session_name", return_value=None):
             result = runner.invoke(main, ["current"])
 
         assert result.exit_code == 1
         assert result.output == ""  # 何も出力しない
 
 
+class TestNoITerm2Connection:
+    """iTerm2を使わないコマンドは接続しないことのテスト."""
+
+    @pytest.fixture
+    def mock_async_create(self, tmp_path):
+        """iTerm2接続の作成を監視（ITMUX_CONFIG_PATH は空の設定）."""
+        config_path = tmp_path / "config.json"
+        config_path.write_text(json.dumps({"projects": {}}))
+        with patch(
+            "itmux.iterm2.bridge.iterm2.Connection.async_create", new_callable=AsyncMock
+        ) as mock_create, patch.dict(
+            "os.environ",
+            {"ITMUX_CONFIG_PATH": str(config_path), "ITMUX_NO_DAEMON": "1"},
+        ):
+            yield mock_create
+
+    def test_save_does_not_connect(self, mock_async_create):
+        """saveはスナップショットを保存するだけで接続しない."""
+        runner = CliRunner()
+
+        with patch("itmux.orchestrator.ProjectOrchestrator._save_snapshots") as mock_save:
+            result = runner.invoke(main, ["save", "test-project"])
+
+        assert result.exit_code == 0
+        mock_save.assert_called_once()
+        mock_async_create.assert_not_called()
+
+    def test_current_does_not_connect(self, mock_async_create):
+        """currentはtmuxに問い合わせるだけで接続しない."""
+        runner = CliRunner()
+
+        with patch("itmux.readonly.current_session_name", return_value="test-project"):
+            result = runner.invoke(main, ["current"])
+
+        assert result.exit_code == 0
+        assert "test-project" in result.output
+        mock_async_create.assert_not_called()
+
+    def test_list_does_not_connect(self, mock_async_create):
+        """listは設定ファイルを読むだけで接続しない."""
+        runner = CliRunner()
+
+        result = runner.invoke(main, ["list"])
+
+        assert result.exit_code == 0
+        assert "No projects configured." in result.output
+        mock_async_create.assert_not_called()
+
+
 class TestConfig:
     """config サブコマンドのテスト."""
 
@@ -470,3 +512,157 @@ class TestConfig:
 
         assert result.exit_code == 1
         assert "✗ Error: Project 'nonexistent' not found" in result.output
+
+
+    def test_config_export_import(self, config_file, tmp_path):
+        """config.json 形式で書き出し、別の保存形式に取り込む."""
+        runner = CliRunner()
+        exported = tmp_path / "export.json"
+        result = runner.invoke(
+            main,
+            ["config", "export", str(exported)],
+            env={"ITMUX_CONFIG_PATH": str(config_file)},
+        )
+        assert result.exit_code == 0
+
+        target = tmp_path / "sqlite" / "config.json"
+        result = runner.invoke(
+            main,
+            ["config", "import", str(exported)],
+            env={"ITMUX_CONFIG_PATH": str(target), "ITMUX_CONFIG_LAYOUT": "sqlite"},
+        )
+        assert result.exit_code == 0
+        assert "Imported 1 projects (sqlite)" in result.output
+
+        result = runner.invoke(
+            main, ["config", "export"], env={"ITMUX_CONFIG_PATH": str(target)}
+        )
+        assert result.exit_code == 0
+        assert json.loads(result.output) == json.loads(config_file.read_text())
+
+
+class TestDaemonClient:
+    """デーモン転送のテスト."""
+
+    def test_sync_forwarded_to_daemon(self):
+        """デーモンが処理した場合は iTerm2 に接続しない."""
+        runner = CliRunner()
+
+        forward = AsyncMock(return_value=True)
+        with patch("itmux.daemon.forward_to_daemon", forward), \
+                patch("itmux.cli.get_orchestrator") as mock_get_orchestrator:
+            result = runner.invoke(main, ["sync", "test-project"])
+
+        assert result.exit_code == 0
+        assert "✓ Synced project: test-project" in result.output
+        forward.assert_awaited_once_with(
+            "sync", project="test-project", sync_all=False, event=None
+        )
+        mock_get_orchestrator.assert_not_called()
+
+    def test_sync_window_event_forwarded_to_daemon(self):
+        """hook から渡されたウィンドウの変更はそのままデーモンに渡す."""
+        runner = CliRunner()
+
+        forward = AsyncMock(return_value=True)
+        with patch("itmux.daemon.forward_to_daemon", forward):
+            result = runner.invoke(main, [
+                "sync", "proj", "--window-event", "added",
+                "--window-id", "@3", "--window-index", "2", "--window-name", "zsh",
+            ])
+
+        assert result.exit_code == 0
+        forward.assert_awaited_once_with(
+            "sync", project="proj", sync_all=False,
+            event={"kind": "added", "window_id": "@3", "index": 2, "name": "zsh"},
+        )
+
+    def test_fallback_when_daemon_not_running(self):
+        """デーモン不在時は従来どおりプロセス内で実行."""
+        runner = CliRunner()
+
+        mock_orchestrator = AsyncMock()
+        mock_orchestrator.close = AsyncMock()
+
+        async def mock_get_orchestrator():
+            return mock_orchestrator
+
+        with patch("itmux.cli.get_orchestrator", side_effect=mock_get_orchestrator):
+            result = runner.invoke(main, ["close", "test-project"])
+
+        assert result.exit_code == 0
+        mock_orchestrator.close.assert_called_once_with("test-project")
+
+
+class TestHook:
+    """hook コマンド（tmux hook の単一の入口）のテスト."""
+
+    def test_window_event_is_one_sync_request(self):
+        """ウィンドウ作成は sync 1回（保存は sync の中で1回）としてデーモンに渡す."""
+        runner = CliRunner()
+
+        forward = AsyncMock(return_value=True)
+        with patch("itmux.daemon.forward_to_daemon", forward):
+            result = runner.invoke(main, [
+                "hook", "after-new-window", "proj",
+                "--window-id", "@3", "--window-index", "1", "--window-name", "zsh",
+            ])
+
+        assert result.exit_code == 0
+        forward.assert_awaited_once_with(
+            "sync", project="proj", sync_all=False,
+            event={"kind": "added", "window_id": "@3", "index": 1, "name": "zsh"},
+        )
+
+    def test_save_only_event_uses_debounce_from_table(self):
+        runner = CliRunner()
+
+        forward = AsyncMock(return_value=True)
+        with patch("itmux.daemon.forward_to_daemon", forward):
+            result = runner.invoke(main, ["hook", "after-resize-pane", "proj"])
+
+        assert result.exit_code == 0
+        forward.assert_awaited_once_with("save", project="proj", debounce=True)
+
+    def test_unknown_event(self):
+        result = CliRunner().invoke(main, ["hook", "client-attached", "proj"])
+
+        assert result.exit_code == 2
+        assert "Unknown hook event" in result.output
+
+    def test_subprocess_starts_per_event(
+        self, mock_config_manager, mock_iterm2_bridge, monkeypatch
+    ):
+        """ウィンドウ作成1回で起動する子プロセスは、スナップショット保存の tmux 1回だけ."""
+        from itmux.models import ProjectConfig, WindowConfig
+        from itmux.orchestrator import ProjectOrchestrator
+        from itmux.tmux.window_events import WindowMap
+        from itmux.iterm2.window_manager import WindowEntry
+
+        monkeypatch.setenv("ITMUX_NO_DAEMON", "1")
+        mock_config_manager.get_project.return_value = ProjectConfig(
+            name="proj", tmux_windows=[WindowConfig(name="editor")]
+        )
+        mock_iterm2_bridge.read_window_map.return_value = WindowMap([("1", "editor")])
+        mock_iterm2_bridge.list_session_window_ids.return_value = ["1", "3"]
+        mock_iterm2_bridge.find_session_window.return_value = WindowEntry(window=AsyncMock())
+        mock_iterm2_bridge.window_manager = MagicMock(tag_window=AsyncMock())
+        orchestrator = ProjectOrchestrator(mock_config_manager, mock_iterm2_bridge)
+
+        async def mock_get_orchestrator():
+            return orchestrator
+
+        with patch("itmux.cli.get_orchestrator", mock_get_orchestrator), \
+                patch("subprocess.run") as mock_run, patch("subprocess.Popen") as mock_popen:
+            mock_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
+            result = CliRunner().invoke(main, [
+                "hook", "after-new-window", "proj",
+                "--window-id", "@3", "--window-index", "1", "--window-name", "zsh",
+            ])
+
+        assert result.exit_code == 0, result.output
+        mock_popen.assert_not_called()
+        assert [c.args[0][1] for c in mock_run.call_args_list] == ["list-panes"]
+        assert [w.name for w in mock_config_manager.update_project.call_args.args[1]] == [
+            "editor", "window-1",
+        ]
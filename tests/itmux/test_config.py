@@ -4,9 +4,19 @@ import json
 import pytest
 from pathlib import Path
 
-from itmux.config import ConfigManager, load_config, get_project, list_projects
+from itmux.config import (
+    CONFIG_CONFLICTS_METRIC,
+    CONFIG_LOCK_WAIT_METRIC,
+    CONFIG_WRITES_METRIC,
+    CONFIG_WRITES_SKIPPED_METRIC,
+    ConfigManager,
+    load_config,
+    get_project,
+    list_projects,
+)
+from itmux.metrics import MetricsStore
 from itmux.models import Config, ProjectConfig, WindowConfig, WindowSize
-from itmux.exceptions import ConfigError, ProjectNotFoundError
+from itmux.exceptions import ConfigConflictError, ConfigError, ProjectNotFoundError
 
 
 @pytest.fixture
@@ -232,6 +242,81 @@ class TestConfigManager:
         assert "my-project" in data["projects"]
         assert "tmux_windows" in data["projects"]["my-project"]
 
+    def test_save_skips_identical_content(self, temp_config_file, sample_config_data):
+        """内容が変わらない保存はファイルを書き換えない."""
+        with open(temp_config_file, "w") as f:
+            json.dump(sample_config_data, f)
+
+        manager = ConfigManager(temp_config_file)
+        manager.update_project("test-project", [WindowConfig(name="window1")])
+        content = temp_config_file.read_text()
+
+        # 同じウィンドウリストで再度更新（hookからのsyncに相当）
+        manager.update_project("test-project", [WindowConfig(name="window1")])
+
+        assert manager.write_stats.performed == 1
+        assert manager.write_stats.skipped == 1
+        assert temp_config_file.read_text() == content
+
+    def test_save_is_atomic(self, temp_config_file, sample_config_data):
+        """一時ファイル経由で置き換え、一時ファイルは残らない."""
+        with open(temp_config_file, "w") as f:
+            json.dump(sample_config_data, f)
+
+        manager = ConfigManager(temp_config_file)
+        manager.add_window("test-project", WindowConfig(name="window3"))
+
+        assert not manager.store.tmp_path.exists()
+        with open(temp_config_file) as f:
+            data = json.load(f)
+        assert [w["name"] for w in data["projects"]["test-project"]["tmux_windows"]] == [
+            "window1", "window2", "window3"
+        ]
+
+    def test_save_failure_keeps_existing_file(self, temp_config_file, sample_config_data, monkeypatch):
+        """書き込み失敗時も既存のconfig.jsonは壊れない."""
+        with open(temp_config_file, "w") as f:
+            json.dump(sample_config_data, f)
+        original = temp_config_file.read_text()
+
+        def fail_replace(src, dst):
+            raise OSError("disk full")
+
+        monkeypatch.setattr("itmux.config_store.os.replace", fail_replace)
+        manager = ConfigManager(temp_config_file)
+
+        with pytest.raises(ConfigError, match="Failed to save config"):
+            manager.update_project("test-project", [])
+
+        assert temp_config_file.read_text() == original
+
+    def test_write_counters_recorded_in_metrics(self, temp_config_file, tmp_path):
+        """書き込み回数・省略回数をメトリクスに記録."""
+        metrics = MetricsStore(tmp_path / "metrics.json")
+        manager = ConfigManager(temp_config_file, metrics=metrics)
+        manager.load()
+
+        manager.create_project("p", [WindowConfig(name="w1")])
+        manager.update_project("p", [WindowConfig(name="w1")])
+        manager.update_project("p", [WindowConfig(name="w2")])
+
+        assert metrics.counter(CONFIG_WRITES_METRIC) == 2
+        assert metrics.counter(CONFIG_WRITES_SKIPPED_METRIC) == 1
+
+    def test_buffered_metrics_are_not_written_per_config_write(self, temp_config_file, tmp_path):
+        """buffered なストアなら、書き込み（省略を含む）ごとにメトリクスファイルを書き直さない."""
+        metrics = MetricsStore(tmp_path / "metrics.json", buffered=True)
+        manager = ConfigManager(temp_config_file, metrics=metrics)
+        manager.create_project("p", [WindowConfig(name="w1")])
+        for _ in range(3):
+            manager.update_project("p", [WindowConfig(name="w1")])
+
+        assert not metrics.path.exists()
+        assert manager.write_stats.skipped == 3
+
+        metrics.flush()
+        assert MetricsStore(metrics.path).counter(CONFIG_WRITES_SKIPPED_METRIC) == 3
+
     def test_set_project_cwd(self, temp_config_file, sample_config_data, tmp_path):
         """cwd 設定."""
         with open(temp_config_file, "w") as f:
@@ -340,3 +425,387 @@ class TestFunctionAPI:
         projects = list_projects(temp_config_file)
 
         assert projects == ["test-project"]
+
+
+class TestShardedLayout:
+    """プロジェクトごとのファイルに保存する形式のテスト."""
+
+    @pytest.fixture
+    def two_projects_data(self):
+        """2プロジェクトの設定データ."""
+        return {
+            "projects": {
+                "project-a": {"name": "project-a", "tmux_windows": [{"name": "a1"}]},
+                "project-b": {"name": "project-b", "tmux_windows": [{"name": "b1"}]},
+            }
+        }
+
+    def test_migrates_single_file(self, temp_config_file, two_projects_data):
+        """既存のconfig.jsonをプロジェクトごとのファイルに移行."""
+        with open(temp_config_file, "w") as f:
+            json.dump(two_projects_data, f)
+
+        manager = ConfigManager(temp_config_file, layout="sharded")
+        config = manager.load()
+
+        projects_dir = temp_config_file.parent / "projects"
+        assert list(config.projects) == ["project-a", "project-b"]
+        assert json.loads((projects_dir / "index.json").read_text()) == {
+            "projects": ["project-a", "project-b"]
+        }
+        assert json.loads((projects_dir / "project-a.json").read_text())["tmux_windows"] == [
+            {"name": "a1"}
+        ]
+        assert not temp_config_file.exists()
+        assert (temp_config_file.parent / "config.json.migrated").exists()
+
+        # 移行後は指定なしでも sharded として読む
+        assert ConfigManager(temp_config_file).layout == "sharded"
+
+    def test_update_writes_only_that_project(self, temp_config_file, two_projects_data):
+        """更新は対象プロジェクトのファイルだけを書く."""
+        with open(temp_config_file, "w") as f:
+            json.dump(two_projects_data, f)
+        manager = ConfigManager(temp_config_file, layout="sharded")
+        manager.load()
+
+        projects_dir = temp_config_file.parent / "projects"
+        other_mtime = (projects_dir / "project-b.json").stat().st_mtime_ns
+        index_mtime = (projects_dir / "index.json").stat().st_mtime_ns
+
+        manager.update_project("project-a", [WindowConfig(name="a2")])
+
+        assert ConfigManager(temp_config_file).get_project("project-a").tmux_windows == [
+            WindowConfig(name="a2")
+        ]
+        assert (projects_dir / "project-b.json").stat().st_mtime_ns == other_mtime
+        assert (projects_dir / "index.json").stat().st_mtime_ns == index_mtime
+
+    def test_writes_to_other_project_do_not_contend(self, temp_config_file, two_projects_data):
+        """別プロジェクトのロックを保持していても書き込める."""
+        from filelock import FileLock
+
+        with open(temp_config_file, "w") as f:
+            json.dump(two_projects_data, f)
+        manager = ConfigManager(temp_config_file, layout="sharded")
+        manager.load()
+
+        lock_a = temp_config_file.parent / "projects" / ".project-a.json.lock"
+        with FileLock(lock_a, timeout=0):
+            manager.update_project("project-b", [WindowConfig(name="b2")])
+
+        assert manager.write_stats.performed == 1
+
+    def test_create_and_delete_update_index(self, temp_config_file):
+        """作成・削除でインデックスを更新し、list_projectsはインデックスを読む."""
+        manager = ConfigManager(temp_config_file, layout="sharded")
+        manager.create_project("p1", [WindowConfig(name="w1")])
+        manager.create_project("p2")
+        manager.delete_project("p1")
+
+        projects_dir = temp_config_file.parent / "projects"
+        assert not (projects_dir / "p1.json").exists()
+        assert ConfigManager(temp_config_file).list_projects() == ["p2"]
+
+    def test_unindexed_project_file_is_recreated(self, temp_config_file):
+        """インデックス更新前に中断して残ったファイルは、作成時にインデックスへ載せる."""
+        manager = ConfigManager(temp_config_file, layout="sharded")
+        manager.create_project("a")
+        projects_dir = temp_config_file.parent / "projects"
+        (projects_dir / "b.json").write_text(
+            json.dumps({"generation": 1, "name": "b", "tmux_windows": [{"name": "old"}]})
+        )
+
+        manager.create_project("b", [WindowConfig(name="w1")])
+
+        reloaded = ConfigManager(temp_config_file)
+        assert reloaded.list_projects() == ["a", "b"]
+        assert [w.name for w in reloaded.get_project("b").tmux_windows] == ["w1"]
+        assert manager.write_stats.conflicts == 0
+
+    def test_readonly_reader_supports_sharded(self, temp_config_file, two_projects_data):
+        """軽量リーダーもsharded形式を読める."""
+        from itmux.readonly import list_project_summaries
+
+        with open(temp_config_file, "w") as f:
+            json.dump(two_projects_data, f)
+        ConfigManager(temp_config_file, layout="sharded").load()
+
+        summaries = list_project_summaries(temp_config_file)
+
+        assert summaries["project-a"]["windows"] == ["a1"]
+        assert summaries["project-b"]["count"] == 1
+
+    def test_unknown_layout_raises_error(self, temp_config_file):
+        """未知の保存形式はエラー."""
+        with pytest.raises(ConfigError, match="Unknown config layout"):
+            ConfigManager(temp_config_file, layout="yaml")
+
+
+class TestSqliteLayout:
+    """SQLite（WAL モード）に保存する形式のテスト."""
+
+    @pytest.fixture
+    def two_projects_data(self):
+        """2プロジェクトの設定データ."""
+        return {
+            "projects": {
+                "project-a": {
+                    "name": "project-a",
+                    "description": "A",
+                    "environments": {"NODE_ENV": "development", "A_VAR": "1"},
+                    "tmux_windows": [
+                        {"name": "a1", "window_size": {"columns": 200, "lines": 60}},
+                        {"name": "a2"},
+                    ],
+                },
+                "project-b": {"name": "project-b", "tmux_windows": [{"name": "b1"}]},
+            }
+        }
+
+    def test_migrates_single_file(self, temp_config_file, two_projects_data):
+        """既存のconfig.jsonをデータベースに移行し、内容を保つ."""
+        with open(temp_config_file, "w") as f:
+            json.dump(two_projects_data, f)
+
+        manager = ConfigManager(temp_config_file, layout="sqlite")
+        config = manager.load()
+
+        assert config.model_dump(mode="json", exclude_none=True) == two_projects_data
+        assert (temp_config_file.parent / "config.db").exists()
+        assert not temp_config_file.exists()
+        assert (temp_config_file.parent / "config.json.migrated").exists()
+
+        # 移行後は指定なしでも sqlite として読む
+        assert ConfigManager(temp_config_file).layout == "sqlite"
+
+    def test_migrates_between_layouts(self, temp_config_file, two_projects_data):
+        """sharded から sqlite、sqlite から sharded へも内容を保って移行する."""
+        from itmux.readonly import read_config_data
+
+        with open(temp_config_file, "w") as f:
+            json.dump(two_projects_data, f)
+        ConfigManager(temp_config_file, layout="sharded").load()
+
+        manager = ConfigManager(temp_config_file, layout="sqlite")
+        assert manager.load().model_dump(mode="json", exclude_none=True) == two_projects_data
+        projects_dir = temp_config_file.parent / "projects"
+        assert (projects_dir / "index.json.migrated").exists()
+        # 移行元を退避したので、指定なしでも sqlite として読む
+        assert ConfigManager(temp_config_file).layout == "sqlite"
+        assert list(read_config_data(temp_config_file)["projects"]) == ["project-a", "project-b"]
+
+        manager.delete_project("project-b")
+        manager = ConfigManager(temp_config_file, layout="sharded")
+        assert manager.list_projects() == ["project-a"]
+        assert manager.get_project("project-a").environments == {
+            "NODE_ENV": "development",
+            "A_VAR": "1",
+        }
+        assert (temp_config_file.parent / "config.db.migrated").exists()
+        assert ConfigManager(temp_config_file).layout == "sharded"
+
+    def test_uses_wal_mode(self, temp_config_file):
+        """WAL モードで作成される."""
+        import sqlite3
+
+        ConfigManager(temp_config_file, layout="sqlite").create_project("p1")
+
+        conn = sqlite3.connect(temp_config_file.parent / "config.db")
+        try:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        finally:
+            conn.close()
+
+    def test_update_touches_only_that_project(self, temp_config_file, two_projects_data):
+        """更新は対象プロジェクトの行だけを書き換える."""
+        with open(temp_config_file, "w") as f:
+            json.dump(two_projects_data, f)
+        manager = ConfigManager(temp_config_file, layout="sqlite")
+        before = manager.store.read().generations
+
+        manager.update_project("project-b", [WindowConfig(name="b2")])
+
+        after = manager.store.read().generations
+        assert after == {"project-a": before["project-a"], "project-b": before["project-b"] + 1}
+        assert manager.get_project("project-a").environments == {
+            "NODE_ENV": "development",
+            "A_VAR": "1",
+        }
+
+    def test_delete_removes_rows(self, temp_config_file, two_projects_data):
+        """削除でウィンドウ・環境変数の行も消える."""
+        import sqlite3
+
+        with open(temp_config_file, "w") as f:
+            json.dump(two_projects_data, f)
+        ConfigManager(temp_config_file, layout="sqlite").delete_project("project-a")
+
+        conn = sqlite3.connect(temp_config_file.parent / "config.db")
+        try:
+            assert conn.execute("SELECT COUNT(*) FROM windows").fetchone()[0] == 1
+            assert conn.execute("SELECT COUNT(*) FROM environments").fetchone()[0] == 0
+        finally:
+            conn.close()
+        assert ConfigManager(temp_config_file).list_projects() == ["project-b"]
+
+    def test_readonly_reader_supports_sqlite(self, temp_config_file, two_projects_data):
+        """軽量リーダーもsqlite形式を読める."""
+        from itmux.readonly import list_project_summaries
+
+        with open(temp_config_file, "w") as f:
+            json.dump(two_projects_data, f)
+        ConfigManager(temp_config_file, layout="sqlite").load()
+
+        summaries = list_project_summaries(temp_config_file)
+
+        assert summaries["project-a"] == {
+            "windows": ["a1", "a2"],
+            "count": 2,
+            "description": "A",
+        }
+
+    def test_export_import_round_trip(self, temp_config_file, tmp_path, two_projects_data):
+        """JSON への書き出しと取り込みで内容が変わらない."""
+        source = ConfigManager(temp_config_file, layout="sqlite")
+        assert source.import_json(json.dumps(two_projects_data)) is True
+        exported = source.export_json()
+
+        assert json.loads(exported) == two_projects_data
+
+        target = ConfigManager(tmp_path / "other" / "config.json", layout="single")
+        target.import_json(exported)
+        assert target.export_json() == exported
+        # 同じ内容の取り込みは書き込まない
+        assert source.import_json(exported) is False
+
+    def test_import_invalid_json_raises_error(self, temp_config_file):
+        """不正な JSON は ConfigError."""
+        manager = ConfigManager(temp_config_file, layout="sqlite")
+
+        with pytest.raises(ConfigError, match="Failed to import config"):
+            manager.import_json("{not json")
+
+
+@pytest.mark.parametrize("layout", ["single", "sharded", "sqlite"])
+class TestTransaction:
+    """transaction() と世代番号による楽観的並行制御のテスト."""
+
+    def test_batches_changes_into_one_write(self, temp_config_file, layout):
+        """ブロック内の変更は抜けるときに1回だけ書き込む."""
+        manager = ConfigManager(temp_config_file, layout=layout)
+
+        with manager.transaction():
+            manager.create_project("p1", [WindowConfig(name="w1")])
+            manager.create_project("p2")
+            manager.add_window("p1", WindowConfig(name="w2"))
+            assert manager.write_stats.performed == 0
+
+        assert manager.write_stats.performed == 1
+        reloaded = ConfigManager(temp_config_file)
+        assert sorted(reloaded.list_projects()) == ["p1", "p2"]
+        assert [w.name for w in reloaded.get_project("p1").tmux_windows] == ["w1", "w2"]
+
+    def test_exception_discards_changes(self, temp_config_file, layout):
+        """例外で抜けた場合は何も書き込まない."""
+        manager = ConfigManager(temp_config_file, layout=layout)
+        manager.create_project("p1")
+
+        with pytest.raises(RuntimeError):
+            with manager.transaction():
+                manager.delete_project("p1")
+                raise RuntimeError("boom")
+
+        assert manager.write_stats.performed == 1
+        assert manager.list_projects() == ["p1"]
+
+    def test_concurrent_update_is_not_lost(self, temp_config_file, layout):
+        """読み込み後に別プロセスが書き換えた場合は読み直して再適用する."""
+        manager = ConfigManager(temp_config_file, layout=layout)
+        manager.create_project("p1", [WindowConfig(name="w1")])
+
+        with manager.transaction():
+            manager.add_window("p1", WindowConfig(name="mine"))
+            # 別プロセスがトランザクションの途中で同じプロジェクトを書き換える
+            ConfigManager(temp_config_file).add_window("p1", WindowConfig(name="theirs"))
+
+        assert manager.write_stats.conflicts == 1
+        windows = ConfigManager(temp_config_file).get_project("p1").tmux_windows
+        assert [w.name for w in windows] == ["w1", "theirs", "mine"]
+
+    def test_update_from_stale_windows_is_rejected(self, temp_config_file, layout):
+        """古いウィンドウリストから計算した更新は、別プロセスの更新を上書きしない."""
+        manager = ConfigManager(temp_config_file, layout=layout)
+        manager.create_project("p1", [WindowConfig(name="w1")])
+        expected = [w.name for w in manager.get_project("p1").tmux_windows]
+
+        # 別プロセスが先にウィンドウを追加する
+        ConfigManager(temp_config_file).add_window("p1", WindowConfig(name="theirs"))
+
+        with pytest.raises(ConfigConflictError):
+            manager.update_project(
+                "p1", [WindowConfig(name="w1"), WindowConfig(name="mine")], expected=expected
+            )
+
+        windows = ConfigManager(temp_config_file).get_project("p1").tmux_windows
+        assert [w.name for w in windows] == ["w1", "theirs"]
+
+        manager.update_project("p1", [WindowConfig(name="w1")], expected=["w1", "theirs"])
+        windows = ConfigManager(temp_config_file).get_project("p1").tmux_windows
+        assert [w.name for w in windows] == ["w1"]
+
+    def test_gives_up_after_max_retries(self, temp_config_file, layout, monkeypatch):
+        """世代番号が一致し続けない場合は ConfigError."""
+        from itmux.config_store import GenerationConflict
+
+        manager = ConfigManager(temp_config_file, layout=layout)
+
+        def always_conflict(*args, **kwargs):
+            raise GenerationConflict("p1")
+
+        monkeypatch.setattr(manager.store, "commit", always_conflict)
+
+        with pytest.raises(ConfigError, match="modified concurrently"):
+            manager.create_project("p1")
+
+    def test_generation_advances_only_on_write(self, temp_config_file, layout):
+        """世代番号は実際に書き込んだときだけ進む."""
+        manager = ConfigManager(temp_config_file, layout=layout)
+        manager.create_project("p1", [WindowConfig(name="w1")])
+        manager.update_project("p1", [WindowConfig(name="w2")])
+        manager.update_project("p1", [WindowConfig(name="w2")])
+
+        key = "" if layout == "single" else "p1"
+        assert manager.store.read().generations[key] == 2
+
+    def test_recreated_project_does_not_reuse_generation(self, temp_config_file, layout):
+        """削除前に読み込んだ内容で、作り直したプロジェクトを上書きしない（ABA）."""
+        if layout == "single":
+            pytest.skip("単一ファイルは世代番号がファイル全体で1つ")
+        manager = ConfigManager(temp_config_file, layout=layout)
+        manager.create_project("p1", [WindowConfig(name="w1")])
+        manager.update_project("p1", [WindowConfig(name="w2")])
+
+        with manager.transaction():
+            manager.add_window("p1", WindowConfig(name="stale"))
+            other = ConfigManager(temp_config_file)
+            other.delete_project("p1")
+            other.create_project("p1", [WindowConfig(name="new")])
+            other.update_project("p1", [WindowConfig(name="new2")])
+
+        assert manager.write_stats.conflicts == 1
+        windows = ConfigManager(temp_config_file).get_project("p1").tmux_windows
+        assert [w.name for w in windows] == ["new2", "stale"]
+
+    def test_lock_wait_and_conflicts_recorded_in_metrics(self, temp_config_file, tmp_path, layout):
+        """ロック待ち時間と再試行回数をメトリクスに記録."""
+        metrics = MetricsStore(tmp_path / "metrics.json")
+        manager = ConfigManager(temp_config_file, metrics=metrics, layout=layout)
+        manager.create_project("p1")
+
+        with manager.transaction():
+            manager.add_window("p1", WindowConfig(name="w1"))
+            ConfigManager(temp_config_file).add_window("p1", WindowConfig(name="w2"))
+
+        assert metrics.histogram(CONFIG_LOCK_WAIT_METRIC).count == 2
+        assert metrics.counter(CONFIG_CONFLICTS_METRIC) == 1
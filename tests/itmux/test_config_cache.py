@@ -0,0 +1,115 @@
+"""tests/itmux/test_config_cache.py - 検証済み設定キャッシュのテスト."""
+
+import json
+import pytest
+
+from itmux.config import ConfigManager
+from itmux.config_cache import construct_project, get_cache_path
+from itmux.exceptions import ConfigError
+from itmux.models import ProjectConfig
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    """2プロジェクトの設定ファイル."""
+    path = tmp_path / "config.json"
+    path.write_text(
+        json.dumps(
+            {
+                "projects": {
+                    "a": {
+                        "name": "a",
+                        "cwd": str(tmp_path),
+                        "environments": {"NODE_ENV": "development"},
+                        "tmux_windows": [
+                            {"name": "w1", "window_size": {"columns": 200, "lines": 60}},
+                            {"name": "w2"},
+                        ],
+                    },
+                    "b": {"name": "b", "tmux_windows": [{"name": "w1"}]},
+                }
+            }
+        )
+    )
+    return path
+
+
+def _fail_validation(*args, **kwargs):
+    raise AssertionError("validated a cached project")
+
+
+class TestValidationCache:
+    """検証済みキャッシュのテスト."""
+
+    @pytest.mark.parametrize("layout", ["single", "sharded", "sqlite"])
+    def test_second_load_skips_validation(self, config_file, monkeypatch, layout):
+        """2回目の読み込みは検証せずにキャッシュから組み立てる."""
+        first = ConfigManager(config_file, layout=layout).load()
+
+        monkeypatch.setattr("itmux.config_cache.validate_project", _fail_validation)
+        manager = ConfigManager(config_file, layout=layout)
+        second = manager.load()
+
+        assert second == first
+        assert manager.store.cache.hits > 0
+        assert manager.store.cache.misses == 0
+
+    def test_constructed_project_equals_validated(self, config_file):
+        """model_construct で組み立てた結果は検証した結果と同じ."""
+        data = json.loads(config_file.read_text())["projects"]["a"]
+        validated = ProjectConfig.model_validate(data)
+
+        constructed = construct_project(validated.model_dump(mode="json", exclude_none=True))
+
+        assert constructed == validated
+        assert constructed.model_dump(mode="json") == validated.model_dump(mode="json")
+
+    def test_content_change_invalidates(self, config_file):
+        """同じサイズでも内容が変われば検証し直す."""
+        ConfigManager(config_file).load()
+        config_file.write_text(config_file.read_text().replace('"w2"', '"w3"'))
+
+        manager = ConfigManager(config_file)
+        windows = manager.load().projects["a"].tmux_windows
+
+        assert [w.name for w in windows] == ["w1", "w3"]
+        assert manager.store.cache.misses == 1
+
+    def test_get_project_validates_only_that_project(self, config_file):
+        """get_project は指定したプロジェクトだけを検証する."""
+        data = json.loads(config_file.read_text())
+        data["projects"]["b"]["environments"] = {"BAD-NAME": "x"}
+        config_file.write_text(json.dumps(data))
+
+        manager = ConfigManager(config_file)
+        assert manager.get_project("a").name == "a"
+
+        with pytest.raises(ConfigError, match="invalid characters"):
+            manager.get_project("b")
+        with pytest.raises(ConfigError):
+            manager.load()
+
+    def test_partial_entry_is_completed(self, config_file, monkeypatch):
+        """get_project で検証したプロジェクトは、全体の読み込み時に検証し直さない."""
+        ConfigManager(config_file).get_project("a")
+
+        validated = []
+        from itmux import config_cache
+
+        original = config_cache.validate_project
+        monkeypatch.setattr(
+            "itmux.config_cache.validate_project",
+            lambda name, data: validated.append(name) or original(name, data),
+        )
+        ConfigManager(config_file).load()
+
+        assert validated == ["b"]
+
+    def test_corrupt_cache_is_ignored(self, config_file):
+        """壊れたキャッシュファイルは空として扱う."""
+        ConfigManager(config_file).load()
+        get_cache_path(config_file).write_text("{not json")
+
+        config = ConfigManager(config_file).load()
+
+        assert list(config.projects) == ["a", "b"]
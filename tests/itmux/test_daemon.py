@@ -0,0 +1,280 @@
+"""tests/itmux/test_daemon.py - 常駐デーモンとクライアントのテスト."""
+
+import asyncio
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from itmux.daemon import ItmuxDaemon, forward_to_daemon, get_socket_path, ping_daemon
+from itmux.exceptions import (
+    DaemonError,
+    ProjectNotFoundError,
+    ProjectNotOpenError,
+    ProjectNotOpenReason,
+)
+
+
+@pytest.fixture
+def mock_orchestrator():
+    """ProjectOrchestratorのモック."""
+    orchestrator = MagicMock()
+    orchestrator.sync = AsyncMock()
+    orchestrator.add = AsyncMock()
+    orchestrator.close = AsyncMock()
+    orchestrator.save = MagicMock()
+    orchestrator.materialize = AsyncMock()
+    return orchestrator
+
+
+async def _start(daemon: ItmuxDaemon) -> asyncio.Task:
+    """デーモンをバックグラウンドで起動し、ソケット作成を待つ."""
+    task = asyncio.create_task(daemon.serve_forever())
+    for _ in range(100):
+        if daemon.socket_path.exists():
+            break
+        await asyncio.sleep(0.01)
+    return task
+
+
+class TestDispatch:
+    """ItmuxDaemon.dispatch() のテスト."""
+
+    @pytest.mark.asyncio
+    async def test_sync_is_forwarded_to_orchestrator(self, mock_orchestrator, tmp_path):
+        """sync リクエストは config を読み直してから orchestrator.sync を呼ぶ."""
+        daemon = ItmuxDaemon(mock_orchestrator, tmp_path / "d.sock")
+
+        response = await daemon.dispatch(
+            {"command": "sync", "args": {"project": "proj", "sync_all": False}}
+        )
+
+        assert response == {"ok": True}
+        mock_orchestrator.config.load.assert_called_once()
+        mock_orchestrator.sync.assert_awaited_once_with("proj", sync_all=False, event=None)
+
+    @pytest.mark.asyncio
+    async def test_sync_window_event(self, mock_orchestrator, tmp_path):
+        """hook のウィンドウイベントは WindowEvent にして渡す."""
+        from itmux.tmux.window_events import WindowEvent
+
+        daemon = ItmuxDaemon(mock_orchestrator, tmp_path / "d.sock")
+
+        await daemon.dispatch({
+            "command": "sync",
+            "args": {"project": "proj", "event": {"kind": "removed", "window_id": "@4"}},
+        })
+
+        mock_orchestrator.sync.assert_awaited_once_with(
+            "proj", sync_all=False, event=WindowEvent("removed", "4")
+        )
+
+    @pytest.mark.asyncio
+    async def test_save_with_debounce_coalesces_in_memory(self, mock_orchestrator, tmp_path):
+        """save --debounce はメモリ上のタイマーでまとめ、期限に1回だけ保存する."""
+        from itmux.save_scheduler import DebouncePolicy, DebounceScheduler
+
+        daemon = ItmuxDaemon(mock_orchestrator, tmp_path / "d.sock")
+        daemon.save_scheduler = DebounceScheduler(
+            daemon._save_scheduled, DebouncePolicy(window=0.05, max_wait=1.0)
+        )
+
+        for _ in range(3):
+            response = await daemon.dispatch(
+                {"command": "save", "args": {"project": "proj", "debounce": True}}
+            )
+            assert response == {"ok": True, "debounce": "scheduled"}
+        mock_orchestrator.save_scheduled.assert_not_called()
+
+        await asyncio.sleep(0.15)
+
+        mock_orchestrator.save.assert_not_called()
+        mock_orchestrator.save_scheduled.assert_called_once_with(["proj"])
+
+    @pytest.mark.asyncio
+    async def test_due_saves_are_coalesced_behind_running_request(
+        self, mock_orchestrator, tmp_path
+    ):
+        """実行中のリクエストを待つ間に期限が来た保存は、1回にまとめる."""
+        daemon = ItmuxDaemon(mock_orchestrator, tmp_path / "d.sock")
+
+        async with daemon._lock:
+            first = asyncio.create_task(daemon._save_scheduled(["a"]))
+            second = asyncio.create_task(daemon._save_scheduled(["b"]))
+            await asyncio.sleep(0)
+        await asyncio.gather(first, second)
+
+        mock_orchestrator.save_scheduled.assert_called_once_with(["a", "b"])
+
+    @pytest.mark.asyncio
+    async def test_materialize_runs_in_background(self, mock_orchestrator, tmp_path):
+        """materialize は受け付けた時点で応答し、バックグラウンドで実行する."""
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def _materialize(project, started_at=None, progress=None):
+            started.set()
+            await release.wait()
+
+        mock_orchestrator.materialize.side_effect = _materialize
+        daemon = ItmuxDaemon(mock_orchestrator, tmp_path / "d.sock")
+
+        response = await daemon.dispatch(
+            {"command": "materialize", "args": {"project": "proj", "started_at": 1.0}}
+        )
+
+        assert response == {"ok": True, "scheduled": True}
+        await asyncio.wait_for(started.wait(), timeout=1)
+        release.set()
+        await asyncio.gather(*daemon._background_tasks)
+        call = mock_orchestrator.materialize.await_args
+        assert call.args == ("proj",)
+        assert call.kwargs["started_at"] == 1.0
+
+    @pytest.mark.asyncio
+    async def test_unknown_command(self, mock_orchestrator, tmp_path):
+        """未知のコマンドはエラーレスポンス."""
+        daemon = ItmuxDaemon(mock_orchestrator, tmp_path / "d.sock")
+
+        response = await daemon.dispatch({"command": "open", "args": {}})
+
+        assert response["ok"] is False
+        assert response["error"]["type"] == "DaemonError"
+
+    @pytest.mark.asyncio
+    async def test_client_environment_is_applied_during_request(
+        self, mock_orchestrator, tmp_path, monkeypatch
+    ):
+        """クライアントの TMUX はリクエスト中だけ適用され、終了後に元に戻る."""
+        monkeypatch.delenv("TMUX", raising=False)
+        seen = {}
+
+        async def _close(project):
+            seen["TMUX"] = os.environ.get("TMUX")
+
+        mock_orchestrator.close.side_effect = _close
+        daemon = ItmuxDaemon(mock_orchestrator, tmp_path / "d.sock")
+
+        await daemon.dispatch(
+            {"command": "close", "args": {"project": None}, "env": {"TMUX": "/tmp/tmux-1/default,1,0"}}
+        )
+
+        assert seen["TMUX"] == "/tmp/tmux-1/default,1,0"
+        assert "TMUX" not in os.environ
+
+
+class TestForwardToDaemon:
+    """forward_to_daemon() のテスト."""
+
+    @pytest.mark.asyncio
+    async def test_returns_false_without_daemon(self):
+        """ソケットがなければ False（プロセス内処理にフォールバック）."""
+        assert await forward_to_daemon("sync", project="proj") is False
+
+    @pytest.mark.asyncio
+    async def test_returns_false_when_disabled(self, monkeypatch, mock_orchestrator):
+        """ITMUX_NO_DAEMON 設定時は転送しない."""
+        monkeypatch.setenv("ITMUX_NO_DAEMON", "1")
+        daemon = ItmuxDaemon(mock_orchestrator, get_socket_path())
+        task = await _start(daemon)
+        try:
+            assert await forward_to_daemon("sync", project="proj") is False
+        finally:
+            task.cancel()
+        mock_orchestrator.sync.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_roundtrip_over_socket(self, mock_orchestrator):
+        """ソケット経由でリクエストが処理される."""
+        daemon = ItmuxDaemon(mock_orchestrator, get_socket_path())
+        task = await _start(daemon)
+        try:
+            assert await forward_to_daemon("add", project="proj", window="editor") is True
+        finally:
+            task.cancel()
+
+        mock_orchestrator.add.assert_awaited_once_with("proj", "editor")
+
+    @pytest.mark.asyncio
+    async def test_errors_are_reraised_on_client(self, mock_orchestrator):
+        """デーモン側の例外はクライアントで同じ型として再送出される."""
+        mock_orchestrator.sync.side_effect = ProjectNotFoundError("Project 'x' not found")
+        mock_orchestrator.add.side_effect = ProjectNotOpenError(
+            "x", ProjectNotOpenReason.TMUX_DETACHED
+        )
+        mock_orchestrator.close.side_effect = RuntimeError("boom")
+        daemon = ItmuxDaemon(mock_orchestrator, get_socket_path())
+        task = await _start(daemon)
+        try:
+            with pytest.raises(ProjectNotFoundError, match="not found"):
+                await forward_to_daemon("sync", project="x")
+            with pytest.raises(ProjectNotOpenError) as exc_info:
+                await forward_to_daemon("add", project="x")
+            assert exc_info.value.reason is ProjectNotOpenReason.TMUX_DETACHED
+            with pytest.raises(DaemonError, match="boom"):
+                await forward_to_daemon("close", project="x")
+        finally:
+            task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_falls_back_when_daemon_does_not_respond(self, tmp_path):
+        """応答しないデーモンはタイムアウト後に False（プロセス内で処理する）."""
+        path = tmp_path / "stuck.sock"
+        released = asyncio.Event()
+
+        async def never_respond(reader, writer):
+            await released.wait()
+            writer.close()
+
+        server = await asyncio.start_unix_server(never_respond, path=str(path))
+        async with server:
+            assert await forward_to_daemon("sync", socket_path=path, timeout=0.05, project="x") is False
+            released.set()
+
+    @pytest.mark.asyncio
+    async def test_falls_back_when_iterm2_connection_is_lost(self, mock_orchestrator):
+        """iTerm2 との接続が切れていたら接続を捨て、クライアントはプロセス内で処理する."""
+        mock_orchestrator.sync.side_effect = ConnectionResetError("iTerm2 went away")
+        daemon = ItmuxDaemon(mock_orchestrator, get_socket_path())
+        task = await _start(daemon)
+        try:
+            assert await forward_to_daemon("sync", project="x") is False
+        finally:
+            task.cancel()
+
+        mock_orchestrator.reset_bridge.assert_called_once_with()
+
+
+class TestServeForever:
+    """serve_forever() の起動処理のテスト."""
+
+    @pytest.mark.asyncio
+    async def test_refuses_to_replace_running_daemon(self, mock_orchestrator, tmp_path):
+        """同じソケットで応答するデーモンがあれば起動せず、既存のデーモンを残す."""
+        path = tmp_path / "d.sock"
+        first = await _start(ItmuxDaemon(mock_orchestrator, path))
+        try:
+            with pytest.raises(DaemonError, match=f"pid={os.getpid()}"):
+                await ItmuxDaemon(mock_orchestrator, path).serve_forever()
+            assert await forward_to_daemon("sync", socket_path=path, project="x") is True
+        finally:
+            first.cancel()
+
+    @pytest.mark.asyncio
+    async def test_replaces_stale_socket(self, mock_orchestrator, tmp_path):
+        """応答しないソケットファイル（前回の異常終了）は置き換える."""
+        import socket
+
+        path = tmp_path / "d.sock"
+        stale = socket.socket(socket.AF_UNIX)
+        stale.bind(str(path))
+        stale.close()
+
+        task = asyncio.create_task(ItmuxDaemon(mock_orchestrator, path).serve_forever())
+        try:
+            for _ in range(100):
+                if await ping_daemon(path) is not None:
+                    break
+                await asyncio.sleep(0.01)
+            assert await forward_to_daemon("sync", socket_path=path, project="x") is True
+        finally:
+            task.cancel()
@@ -4,45 +4,108 @@ import os
 import pytest
 from unittest.mock import MagicMock, patch
 
+from itmux.models import WindowConfig, WindowSize
 from itmux.tmux.environment import (
     BOOTSTRAP_WINDOW,
+    MANAGED_ENV_OPTION,
+    SessionEnvironment,
+    add_detached_windows,
     apply_session_environments,
+    diff_session_environment,
     prepare_session_environments,
     tmux_has_session,
 )
 
 
+def _batch_commands(argv: list[str]) -> list[list[str]]:
+    """TmuxBatch の argv からマーカー以外のコマンド列を取り出す."""
+    assert argv[0] == "tmux"
+    commands, current = [], []
+    for arg in argv[1:]:
+        if arg == ";":
+            commands.append(current)
+            current = []
+        else:
+            current.append(arg)
+    commands.append(current)
+    return [c for c in commands if c[:2] != ["display-message", "-p"]]
+
+
+def _completed(returncode: int = 0) -> MagicMock:
+    return MagicMock(returncode=returncode, stdout="", stderr="")
+
+
 class TestTmuxHasSession:
     """tmux_has_session()のテスト."""
 
-    @patch("itmux.tmux.environment.subprocess.run")
+    @patch("itmux.tmux.batch.subprocess.run")
     def test_session_exists(self, mock_run):
         """セッションが存在する場合True."""
-        mock_run.return_value = MagicMock(returncode=0)
+        mock_run.return_value = _completed(0)
 
         assert tmux_has_session("my-project") is True
-        mock_run.assert_called_once_with(
-            ["tmux", "has-session", "-t", "my-project"],
-            capture_output=True,
-            env=os.environ.copy(),
-        )
+        mock_run.assert_called_once()
+        assert _batch_commands(mock_run.call_args.args[0]) == [
+            ["has-session", "-t", "=my-project"]
+        ]
+        assert mock_run.call_args.kwargs["env"] == os.environ.copy()
 
-    @patch("itmux.tmux.environment.subprocess.run")
+    @patch("itmux.tmux.batch.subprocess.run")
     def test_session_not_exists(self, mock_run):
         """セッションが存在しない場合False."""
-        mock_run.return_value = MagicMock(returncode=1)
+        mock_run.return_value = _completed(1)
 
         assert tmux_has_session("missing") is False
 
 
+class TestDiffSessionEnvironment:
+    """diff_session_environment()のテスト."""
+
+    def test_only_changed_values_are_set(self):
+        """同じ値の変数は set しない."""
+        current = SessionEnvironment(
+            values={"FOO": "bar", "NODE_ENV": "production"},
+            managed_keys={"FOO", "NODE_ENV"},
+        )
+
+        diff = diff_session_environment(current, {"FOO": "bar", "NODE_ENV": "development"})
+
+        assert diff.to_set == {"NODE_ENV": "development"}
+        assert diff.to_unset == []
+        assert diff.managed_changed is False
+
+    def test_removed_managed_variables_are_unset(self):
+        """config から削除された管理下の変数だけを unset."""
+        current = SessionEnvironment(
+            values={"FOO": "bar", "OLD": "x", "SSH_AUTH_SOCK": "/tmp/agent"},
+            managed_keys={"FOO", "OLD"},
+        )
+
+        diff = diff_session_environment(current, {"FOO": "bar"})
+
+        assert diff.to_set == {}
+        assert diff.to_unset == ["OLD"]
+        assert diff.managed_keys == {"FOO"}
+        assert diff.managed_changed is True
+
+    def test_identical_environment_has_no_diff(self):
+        """差分がなければ falsy."""
+        current = SessionEnvironment(values={"FOO": "bar"}, managed_keys={"FOO"})
+
+        assert not diff_session_environment(current, {"FOO": "bar"})
+
+
 class TestApplySessionEnvironments:
     """apply_session_environments()のテスト."""
 
-    @patch("itmux.tmux.environment.tmux_has_session")
-    @patch("itmux.tmux.environment.subprocess.run")
-    def test_apply_all_variables(self, mock_run, mock_has_session):
-        """各環境変数に対して set-environment を実行."""
-        mock_has_session.return_value = True
+    @patch("itmux.tmux.environment.read_session_environment")
+    @patch("itmux.tmux.batch.subprocess.run")
+    def test_apply_only_diff_in_one_invocation(self, mock_run, mock_read):
+        """差分の set/unset と管理キーの更新を1回のtmux起動で実行."""
+        mock_read.return_value = SessionEnvironment(
+            values={"FOO": "bar", "OLD": "x"}, managed_keys={"FOO", "OLD"}
+        )
+        mock_run.return_value = _completed(0)
 
         result = apply_session_environments(
             "my-project",
@@ -50,53 +113,71 @@ class TestApplySessionEnvironments:
         )
 
         assert result is True
-        assert mock_run.call_count == 2
-        mock_run.assert_any_call(
-            ["tmux", "set-environment", "-t", "my-project", "NODE_ENV", "development"],
-            capture_output=True,
-            check=False,
-            env=os.environ.copy(),
+        mock_run.assert_called_once()
+        assert _batch_commands(mock_run.call_args.args[0]) == [
+            ["set-environment", "-t", "my-project", "NODE_ENV", "development"],
+            ["set-environment", "-u", "-t", "my-project", "OLD"],
+            ["set-option", "-t", "my-project", MANAGED_ENV_OPTION, "FOO NODE_ENV"],
+        ]
+
+    @patch("itmux.tmux.environment.read_session_environment")
+    @patch("itmux.tmux.batch.subprocess.run")
+    def test_unchanged_environment_skips_write(self, mock_run, mock_read):
+        """値が全て一致していれば書き込みは行わない."""
+        environments = {f"VAR_{i}": str(i) for i in range(30)}
+        mock_read.return_value = SessionEnvironment(
+            values=dict(environments), managed_keys=set(environments)
         )
-        mock_run.assert_any_call(
-            ["tmux", "set-environment", "-t", "my-project", "FOO", "bar"],
-            capture_output=True,
-            check=False,
-            env=os.environ.copy(),
+
+        result = apply_session_environments("my-project", environments)
+
+        assert result is True
+        mock_run.assert_not_called()
+
+    @patch("itmux.tmux.batch.subprocess.run")
+    def test_fork_count_is_constant(self, mock_run):
+        """変数の数に関係なく tmux の起動は読み取り1回 + 書き込み1回."""
+        mock_run.return_value = _completed(0)
+
+        apply_session_environments(
+            "my-project", {f"VAR_{i}": str(i) for i in range(30)}
         )
 
-    @patch("itmux.tmux.environment.tmux_has_session")
-    @patch("itmux.tmux.environment.subprocess.run")
-    def test_empty_environments_skipped(self, mock_run, mock_has_session):
-        """空の environments は何もしない."""
+        assert mock_run.call_count == 2
+
+    @patch("itmux.tmux.environment.read_session_environment")
+    @patch("itmux.tmux.batch.subprocess.run")
+    def test_empty_environments_without_managed_keys(self, mock_run, mock_read):
+        """空の environments で管理下の変数もなければ何も書き込まない."""
+        mock_read.return_value = SessionEnvironment(values={"SSH_AUTH_SOCK": "x"})
+
         result = apply_session_environments("my-project", {})
 
-        assert result is False
-        mock_has_session.assert_not_called()
+        assert result is True
         mock_run.assert_not_called()
 
-    @patch("itmux.tmux.environment.tmux_has_session")
-    @patch("itmux.tmux.environment.subprocess.run")
-    def test_session_not_found_skipped(self, mock_run, mock_has_session):
-        """セッションが存在しない場合はスキップ."""
-        mock_has_session.return_value = False
+    @patch("itmux.tmux.batch.subprocess.run")
+    def test_session_not_found_skipped(self, mock_run):
+        """セッションが存在しない場合は show-environment で失敗し False."""
+        mock_run.return_value = _completed(1)
 
         result = apply_session_environments("my-project", {"FOO": "bar"})
 
         assert result is False
-        mock_run.assert_not_called()
+        mock_run.assert_called_once()
 
 
 class TestPrepareSessionEnvironments:
     """prepare_session_environments()のテスト."""
 
-    @patch("itmux.tmux.environment.apply_session_environments")
     @patch("itmux.tmux.environment.tmux_has_session")
-    @patch("itmux.tmux.environment.subprocess.run")
+    @patch("itmux.tmux.batch.subprocess.run")
     def test_new_session_applies_env_before_first_window(
-        self, mock_run, mock_has_session, mock_apply
+        self, mock_run, mock_has_session
     ):
-        """新規セッションでは set-environment 後に初回ウィンドウを作成."""
+        """新規セッションでは set-environment 後に初回ウィンドウを作成（1回のtmux起動）."""
         mock_has_session.return_value = False
+        mock_run.return_value = _completed(0)
 
         created = prepare_session_environments(
             "my-project",
@@ -105,17 +186,19 @@ class TestPrepareSessionEnvironments:
         )
 
         assert created is True
-        mock_apply.assert_called_once()
-        calls = [c.args[0] for c in mock_run.call_args_list]
-        assert calls[0][:4] == ["tmux", "new-session", "-d", "-s"]
-        assert calls[0][6] == BOOTSTRAP_WINDOW
-        assert calls[1][:3] == ["tmux", "new-window", "-t"]
-        assert calls[1][4:6] == ["-n", "editor"]
-        assert calls[2][:3] == ["tmux", "kill-window", "-t"]
+        mock_run.assert_called_once()
+        commands = _batch_commands(mock_run.call_args.args[0])
+        assert commands[0] == [
+            "new-session", "-d", "-s", "my-project", "-n", BOOTSTRAP_WINDOW
+        ]
+        assert commands[1] == ["set-environment", "-t", "my-project", "MY_KEY", "my_value"]
+        assert commands[2] == ["set-option", "-t", "my-project", MANAGED_ENV_OPTION, "MY_KEY"]
+        assert commands[3] == ["new-window", "-t", "my-project", "-n", "editor"]
+        assert commands[4] == ["kill-window", "-t", f"my-project:{BOOTSTRAP_WINDOW}"]
 
     @patch("itmux.tmux.environment.apply_session_environments")
     @patch("itmux.tmux.environment.tmux_has_session")
-    @patch("itmux.tmux.environment.subprocess.run")
+    @patch("itmux.tmux.batch.subprocess.run")
     def test_existing_session_only_applies_env(
         self, mock_run, mock_has_session, mock_apply
     ):
@@ -130,43 +213,42 @@ class TestPrepareSessionEnvironments:
 
         assert created is False
         mock_apply.assert_called_once_with(
-            "my-project", {"MY_KEY": "my_value"}, env=os.environ.copy()
+            "my-project", {"MY_KEY": "my_value"}, env=None
         )
         mock_run.assert_not_called()
 
     @patch("itmux.tmux.environment.tmux_has_session")
-    @patch("itmux.tmux.environment.subprocess.run")
+    @patch("itmux.tmux.batch.subprocess.run")
     def test_new_session_without_environments(
         self, mock_run, mock_has_session
     ):
         """environments なしの新規セッションは通常作成."""
         mock_has_session.return_value = False
+        mock_run.return_value = _completed(0)
 
         created = prepare_session_environments("my-project", {}, "editor")
 
         assert created is True
-        mock_run.assert_called_once_with(
-            ["tmux", "new-session", "-d", "-s", "my-project", "-n", "editor"],
-            capture_output=True,
-            check=False,
-            env=os.environ.copy(),
-        )
+        mock_run.assert_called_once()
+        assert _batch_commands(mock_run.call_args.args[0]) == [
+            ["new-session", "-d", "-s", "my-project", "-n", "editor"]
+        ]
 
     @patch("itmux.tmux.environment.tmux_has_session")
-    @patch("itmux.tmux.environment.subprocess.run")
+    @patch("itmux.tmux.batch.subprocess.run")
     def test_new_session_with_cwd(
         self, mock_run, mock_has_session, tmp_path
     ):
         """cwd 指定の新規セッションは -c 付きで作成."""
         mock_has_session.return_value = False
+        mock_run.return_value = _completed(0)
         cwd = tmp_path.resolve()
 
         created = prepare_session_environments("my-project", {}, "editor", cwd=cwd)
 
         assert created is True
-        mock_run.assert_called_once_with(
+        assert _batch_commands(mock_run.call_args.args[0]) == [
             [
-                "tmux",
                 "new-session",
                 "-d",
                 "-s",
@@ -175,12 +257,73 @@ class TestPrepareSessionEnvironments:
                 "editor",
                 "-c",
                 str(cwd),
+            ]
+        ]
+
+
+class TestPrepareSessionWindows:
+    """prepare_session_environments() / add_detached_windows() のウィンドウ一括作成."""
+
+    @patch("itmux.tmux.environment.tmux_has_session")
+    @patch("itmux.tmux.batch.subprocess.run")
+    def test_new_session_creates_all_windows_in_one_call(
+        self, mock_run, mock_has_session, tmp_path
+    ):
+        """新規セッションでは全ウィンドウを同じバッチで -n/-c 付きで作成."""
+        mock_has_session.return_value = False
+        mock_run.return_value = _completed(0)
+        cwd = tmp_path.resolve()
+
+        prepare_session_environments(
+            "my-project",
+            {},
+            "editor",
+            cwd=cwd,
+            extra_windows=[
+                WindowConfig(name="server"),
+                WindowConfig(name="logs", window_size=WindowSize(columns=120, lines=40)),
             ],
-            capture_output=True,
-            check=False,
-            env=os.environ.copy(),
         )
 
+        mock_run.assert_called_once()
+        assert _batch_commands(mock_run.call_args.args[0]) == [
+            ["new-session", "-d", "-s", "my-project", "-n", "editor", "-c", str(cwd)],
+            ["new-window", "-d", "-t", "my-project", "-n", "server", "-c", str(cwd)],
+            ["new-window", "-d", "-t", "my-project", "-n", "logs", "-c", str(cwd)],
+            ["resize-window", "-t", "=my-project:=logs", "-x", "120", "-y", "40"],
+        ]
+
+    @patch("itmux.tmux.batch.subprocess.run")
+    def test_detached_session_creates_missing_windows(self, mock_run):
+        """アタッチされていないセッションには不足分だけ作成."""
+        mock_run.side_effect = [
+            MagicMock(returncode=0, stdout="0 1\n", stderr=""),
+            _completed(0),
+        ]
+
+        created = add_detached_windows(
+            "my-project",
+            [WindowConfig(name="editor"), WindowConfig(name="server"), WindowConfig(name="logs")],
+        )
+
+        assert created == 2
+        assert _batch_commands(mock_run.call_args.args[0]) == [
+            ["new-window", "-d", "-t", "my-project", "-n", "server"],
+            ["new-window", "-d", "-t", "my-project", "-n", "logs"],
+        ]
+
+    @patch("itmux.tmux.batch.subprocess.run")
+    def test_attached_session_is_left_to_iterm2(self, mock_run):
+        """アタッチ済みセッションでは作成しない（タブ化を避ける）."""
+        mock_run.return_value = MagicMock(returncode=0, stdout="1 1\n", stderr="")
+
+        created = add_detached_windows(
+            "my-project", [WindowConfig(name="editor"), WindowConfig(name="server")]
+        )
+
+        assert created == 0
+        mock_run.assert_called_once()
+
 
 class TestPrepareSessionEnvironmentsIntegration:
     """prepare_session_environments() の tmux 実機検証."""
@@ -191,6 +334,31 @@ class TestPrepareSessionEnvironmentsIntegration:
         if shutil.which("tmux") is None:
             pytest.skip("tmux not available")
 
+    def test_prefix_named_session_is_not_reused(self, tmp_path, monkeypatch):
+        """"project" があっても "proj" は別のセッションとして作成し、環境変数も分ける."""
+        import subprocess
+
+        monkeypatch.delenv("TMUX", raising=False)
+        monkeypatch.setenv("TMUX_TMPDIR", str(tmp_path))
+        try:
+            subprocess.run(["tmux", "new-session", "-d", "-s", "project"], check=True)
+
+            assert tmux_has_session("proj") is False
+            assert prepare_session_environments("proj", {"KEY": "short"}, "editor") is True
+
+            def show(session):
+                return subprocess.run(
+                    ["tmux", "show-environment", "-t", f"={session}", "KEY"],
+                    capture_output=True,
+                    text=True,
+                    check=False,
+                ).stdout.strip()
+
+            assert show("proj") == "KEY=short"
+            assert show("project") != "KEY=short"
+        finally:
+            subprocess.run(["tmux", "kill-server"], capture_output=True, check=False)
+
     def test_session_environment_is_set_before_shell(self):
         """set-environment が初回ウィンドウ作成前にセッションへ設定される."""
         import subprocess
@@ -222,3 +390,69 @@ class TestPrepareSessionEnvironmentsIntegration:
 
         assert "my_value" in result.stdout
 
+    def test_removed_variable_is_unset_on_reapply(self):
+        """config から削除した変数は再適用時に unset される."""
+        import subprocess
+
+        session = "itmux-test-env-diff"
+        subprocess.run(
+            ["tmux", "kill-session", "-t", session],
+            capture_output=True,
+            check=False,
+        )
+
+        prepare_session_environments(session, {"KEEP": "1", "DROP": "2"}, "editor")
+        apply_session_environments(session, {"KEEP": "1"})
+
+        result = subprocess.run(
+            ["tmux", "show-environment", "-t", session],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        subprocess.run(
+            ["tmux", "kill-session", "-t", session],
+            capture_output=True,
+            check=False,
+        )
+
+        assert "KEEP=1" in result.stdout.splitlines()
+        assert "DROP=2" not in result.stdout.splitlines()
+
+    def test_extra_windows_are_created_with_name_and_cwd(self, tmp_path):
+        """追加ウィンドウが名前と作業ディレクトリ付きで作成される."""
+        import subprocess
+
+        session = "itmux-test-env-windows"
+        cwd = tmp_path.resolve()
+        subprocess.run(
+            ["tmux", "kill-session", "-t", session],
+            capture_output=True,
+            check=False,
+        )
+
+        prepare_session_environments(
+            session,
+            {"MY_KEY": "1"},
+            "editor",
+            cwd=cwd,
+            extra_windows=[WindowConfig(name="server"), WindowConfig(name="logs")],
+        )
+
+        result = subprocess.run(
+            ["tmux", "list-windows", "-t", session, "-F", "#{window_name}\t#{pane_start_path}"],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        subprocess.run(
+            ["tmux", "kill-session", "-t", session],
+            capture_output=True,
+            check=False,
+        )
+
+        assert result.stdout.splitlines() == [
+            f"editor\t{cwd}",
+            f"server\t{cwd}",
+            f"logs\t{cwd}",
+        ]
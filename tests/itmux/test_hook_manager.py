@@ -0,0 +1,206 @@
+"""tests/itmux/test_hook_manager.py - tmux hook 設定のテスト."""
+
+import os
+import shlex
+import shutil
+import subprocess
+import time
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from itmux.tmux.batch import run_tmux
+from itmux.tmux import hook_manager
+from itmux.tmux.hook_manager import (
+    MANAGED_SESSIONS_OPTION,
+    HookManager,
+    read_managed_sessions,
+    unregister_managed_sessions,
+)
+
+
+class TestSetupHooks:
+    """setup_hooks() のテスト（TmuxConnection モック）."""
+
+    @pytest.mark.asyncio
+    async def test_registers_session_and_targeted_session_closed_hook(self):
+        tmux_conn = AsyncMock()
+
+        await HookManager().setup_hooks(tmux_conn, "proj", itmux_command="itmux")
+
+        commands = [c.args[0] for c in tmux_conn.async_send_command.await_args_list]
+        assert commands[-2].startswith(f"set-option -gF {MANAGED_SESSIONS_OPTION} ")
+        assert commands[-1].startswith("set-hook -g session-closed ")
+        assert "sync --all" not in commands[-1]
+        assert "hook_session_name" in commands[-1]
+
+
+class TestHookActions:
+    """hook 定義からの sync / save の判定."""
+
+    def test_actions_from_tables(self):
+        assert HookManager.hook_actions("after-new-window") == (True, True, False)
+        assert HookManager.hook_actions("window-unlinked") == (True, True, False)
+        assert HookManager.hook_actions("after-resize-pane") == (False, True, True)
+        assert HookManager.hook_actions("session-closed") == (True, False, False)
+        with pytest.raises(ValueError):
+            HookManager.hook_actions("client-attached")
+
+
+class TestSessionClosedIntegration:
+    """tmux 実機での session-closed hook（独立したtmuxサーバーを使用）."""
+
+    @pytest.fixture
+    def tmux_env(self, tmp_path):
+        if shutil.which("tmux") is None:
+            pytest.skip("tmux not available")
+        env = os.environ.copy()
+        env.pop("TMUX", None)
+        env["TMUX_TMPDIR"] = str(tmp_path)
+        yield env
+        subprocess.run(["tmux", "kill-server"], env=env, capture_output=True, check=False)
+
+    def test_only_managed_sessions_run_sync(self, tmux_env, tmp_path):
+        """管理下のセッションが閉じたときだけ、そのセッション名で sync を起動する."""
+        log = tmp_path / "calls.log"
+        fake = tmp_path / "fake-itmux"
+        fake.write_text(f'#!/bin/sh\necho "$*" >> {shlex.quote(str(log))}\n')
+        fake.chmod(0o755)
+
+        managed = ["proj", "my proj", "a*,b"]
+        sessions = managed + ["pro", "scratch"]
+        run_tmux("new-session", "-d", "-s", "keep", env=tmux_env)
+        for name in sessions:
+            run_tmux("new-session", "-d", "-s", name, env=tmux_env)
+
+        # TmuxConnection.async_send_command と同じくコマンド文字列として解釈させる
+        conf = tmp_path / "hooks.conf"
+        lines = [HookManager._build_register_command(name) for name in managed * 2]
+        lines.append(
+            "set-hook -g session-closed "
+            + shlex.quote(HookManager._build_session_closed_hook(str(fake)))
+        )
+        conf.write_text("\n".join(lines) + "\n")
+        assert run_tmux("source-file", str(conf), env=tmux_env).ok
+        assert run_tmux("show-options", "-gqv", MANAGED_SESSIONS_OPTION, env=tmux_env).output == (
+            ":proj:my proj:a*,b:"
+        )
+
+        for name in sessions:
+            run_tmux("kill-session", "-t", f"={name}", env=tmux_env)
+        for _ in range(50):
+            if log.exists() and len(log.read_text().splitlines()) >= len(managed):
+                break
+            time.sleep(0.1)
+        time.sleep(0.3)
+
+        assert sorted(log.read_text().splitlines()) == sorted(
+            f"hook session-closed {name}" for name in managed
+        )
+
+    @pytest.mark.asyncio
+    async def test_one_process_per_event_with_payload(self, tmux_env, tmp_path):
+        """1イベントにつき itmux の起動は1回で、ウィンドウの変更は対象ウィンドウの情報を渡す."""
+        log = tmp_path / "calls.log"
+        fake = tmp_path / "fake-itmux"
+        fake.write_text(f'#!/bin/sh\necho "$*" >> {shlex.quote(str(log))}\n')
+        fake.chmod(0o755)
+
+        run_tmux("new-session", "-d", "-s", "keep", env=tmux_env)
+        run_tmux("new-session", "-d", "-s", "proj", "-n", "first", env=tmux_env)
+        tmux_conn = AsyncMock()
+        await HookManager().setup_hooks(tmux_conn, "proj", itmux_command=str(fake))
+        conf = tmp_path / "hooks.conf"
+        conf.write_text(
+            "\n".join(c.args[0] for c in tmux_conn.async_send_command.await_args_list) + "\n"
+        )
+        assert run_tmux("source-file", str(conf), env=tmux_env).ok
+
+        def calls(count):
+            for _ in range(50):
+                lines = log.read_text().splitlines() if log.exists() else []
+                if len(lines) >= count:
+                    break
+                time.sleep(0.1)
+            time.sleep(0.3)
+            return log.read_text().splitlines()
+
+        window_id = run_tmux(
+            "new-window", "-d", "-P", "-F", "#{window_id}", "-t", "=proj:", "-n", "my shell",
+            env=tmux_env,
+        ).output.strip()
+        assert calls(1) == [
+            f"hook after-new-window proj --window-id {window_id} "
+            "--window-index 1 --window-name my shell",
+        ]
+
+        log.unlink()
+        run_tmux("split-window", "-d", "-t", window_id, env=tmux_env)
+        assert calls(1) == ["hook after-split-window proj"]
+
+        log.unlink()
+        run_tmux("kill-window", "-t", window_id, env=tmux_env)
+        assert calls(1) == [
+            f"hook window-unlinked proj --window-id {window_id} --window-name my shell",
+        ]
+
+        # セッションごと閉じたときはウィンドウ単位ではなく session-closed だけ
+        log.unlink()
+        run_tmux("kill-session", "-t", "=proj", env=tmux_env)
+        assert calls(1) == ["hook session-closed proj"]
+
+
+class TestUnregisterManagedSessions:
+    """管理下のセッション一覧からの登録解除（独立したtmuxサーバーを使用）."""
+
+    @pytest.fixture
+    def tmux_env(self, tmp_path):
+        if shutil.which("tmux") is None:
+            pytest.skip("tmux not available")
+        env = os.environ.copy()
+        env.pop("TMUX", None)
+        env["TMUX_TMPDIR"] = str(tmp_path)
+        run_tmux("new-session", "-d", "-s", "keep", env=env)
+        yield env
+        subprocess.run(["tmux", "kill-server"], env=env, capture_output=True, check=False)
+
+    def _register(self, env, value):
+        assert run_tmux("set-option", "-g", MANAGED_SESSIONS_OPTION, value, env=env).ok
+
+    def test_removes_only_given_names(self, tmux_env):
+        self._register(tmux_env, ":proj:a.b,c}#d:other:")
+
+        assert unregister_managed_sessions(["a.b,c}#d", "missing"], env=tmux_env) is True
+        assert read_managed_sessions(env=tmux_env) == ["proj", "other"]
+
+        assert unregister_managed_sessions(["missing"], env=tmux_env) is False
+        assert read_managed_sessions(env=tmux_env) == ["proj", "other"]
+
+    def test_unsets_option_when_empty(self, tmux_env):
+        self._register(tmux_env, ":proj:")
+
+        assert unregister_managed_sessions(["proj"], env=tmux_env) is True
+        assert run_tmux(
+            "show-options", "-gqv", MANAGED_SESSIONS_OPTION, env=tmux_env
+        ).output == ""
+
+    def test_keeps_concurrent_registration(self, tmux_env):
+        """読み込んだ後に別の open が登録していたら、読み直してから外す."""
+        self._register(tmux_env, ":proj:new:")
+        reads = [["proj"]]
+        real_read = hook_manager.read_managed_sessions
+
+        def stale_read(env=None):
+            return reads.pop() if reads else real_read(env=env)
+
+        with patch.object(hook_manager, "read_managed_sessions", side_effect=stale_read):
+            assert unregister_managed_sessions(["proj"], env=tmux_env) is True
+
+        assert read_managed_sessions(env=tmux_env) == ["new"]
+
+    def test_without_server(self, tmp_path):
+        env = os.environ.copy()
+        env.pop("TMUX", None)
+        env["TMUX_TMPDIR"] = str(tmp_path)
+
+        assert read_managed_sessions(env=env) is None
+        assert unregister_managed_sessions(["proj"], env=env) is False
@@ -5,10 +5,51 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from itmux.iterm2.bridge import ITerm2Bridge
-from itmux.models import WindowSize
+from itmux.iterm2.readiness import (
+    CONNECT_READY_METRIC,
+    CONNECT_TIMEOUT_METRIC,
+    SURFACE_WINDOWS_METRIC,
+    ReadinessPolicy,
+)
+from itmux.iterm2.window_manager import WindowEntry, WindowIndex, WindowManager
+from itmux.metrics import LatencyHistogram, MetricsStore
+from itmux.models import WindowConfig, WindowSize
 from itmux.exceptions import ITerm2Error, WindowCreationTimeoutError
 
 
+def _tmux_tab(tmux_window_id: str = "1", tmux_connection_id: str = "conn-1") -> MagicMock:
+    """tmux連携タブのモック."""
+    tab = MagicMock()
+    tab.tmux_window_id = tmux_window_id
+    tab.tmux_connection_id = tmux_connection_id
+    return tab
+
+
+def _tagged_window(window_id: str, variables: dict, tmux_window_id: str = "1") -> AsyncMock:
+    """ユーザー変数を持つtmux連携ウィンドウのモック."""
+    window = AsyncMock()
+    window.window_id = window_id
+    window.tabs = [_tmux_tab(tmux_window_id)]
+    window.async_get_variable = AsyncMock(side_effect=lambda name: variables.get(name))
+    return window
+
+
+class TestIsConnected:
+    """is_connected のテスト."""
+
+    def test_follows_websocket_state(self):
+        """websocket が閉じていれば（iTerm2 の終了・再起動）False."""
+        connection = MagicMock()
+        connection.websocket.closed = False
+        bridge = ITerm2Bridge(connection, MagicMock())
+        assert bridge.is_connected is True
+
+        connection.websocket.closed = True
+        assert bridge.is_connected is False
+        connection.websocket = None
+        assert bridge.is_connected is False
+
+
 class TestFindWindowsByProject:
     """find_windows_by_project()のテスト."""
 
@@ -17,18 +58,9 @@ class TestFindWindowsByProject:
         self, mock_iterm2_connection, mock_iterm2_app
     ):
         """プロジェクトIDが一致するウィンドウを検索."""
-        # モックウィンドウを2つ作成
-        window1 = AsyncMock()
-        window1.window_id = "window-1"
-        window1.async_get_variable = AsyncMock(return_value="test-project")
-
-        window2 = AsyncMock()
-        window2.window_id = "window-2"
-        window2.async_get_variable = AsyncMock(return_value="other-project")
-
-        window3 = AsyncMock()
-        window3.window_id = "window-3"
-        window3.async_get_variable = AsyncMock(return_value="test-project")
+        window1 = _tagged_window("window-1", {"user.projectID": "test-project"}, "1")
+        window2 = _tagged_window("window-2", {"user.projectID": "other-project"}, "2")
+        window3 = _tagged_window("window-3", {"user.projectID": "test-project"}, "3")
 
         mock_iterm2_app.windows = [window1, window2, window3]
 
@@ -45,8 +77,7 @@ class TestFindWindowsByProject:
         self, mock_iterm2_connection, mock_iterm2_app
     ):
         """一致するウィンドウがない場合は空リスト."""
-        window1 = AsyncMock()
-        window1.async_get_variable = AsyncMock(return_value="other-project")
+        window1 = _tagged_window("window-1", {"user.projectID": "other-project"})
 
         mock_iterm2_app.windows = [window1]
 
@@ -60,11 +91,8 @@ class TestFindWindowsByProject:
         self, mock_iterm2_connection, mock_iterm2_app
     ):
         """変数が設定されていないウィンドウは除外."""
-        window1 = AsyncMock()
-        window1.async_get_variable = AsyncMock(return_value=None)
-
-        window2 = AsyncMock()
-        window2.async_get_variable = AsyncMock(return_value="test-project")
+        window1 = _tagged_window("window-1", {}, "1")
+        window2 = _tagged_window("window-2", {"user.projectID": "test-project"}, "2")
 
         mock_iterm2_app.windows = [window1, window2]
 
@@ -74,6 +102,139 @@ class TestFindWindowsByProject:
         assert len(result) == 1
         assert window2 in result
 
+    @pytest.mark.asyncio
+    async def test_non_tmux_windows_are_not_queried(
+        self, mock_iterm2_connection, mock_iterm2_app
+    ):
+        """tmux連携でないウィンドウは変数を読み取らない."""
+        plain = AsyncMock()
+        plain.tabs = [_tmux_tab(tmux_window_id=None, tmux_connection_id=None)]
+        tagged = _tagged_window("window-1", {"user.projectID": "test-project"})
+
+        mock_iterm2_app.windows = [plain, tagged]
+
+        bridge = ITerm2Bridge(mock_iterm2_connection, mock_iterm2_app)
+        result = await bridge.find_windows_by_project("test-project")
+
+        assert result == [tagged]
+        plain.async_get_variable.assert_not_called()
+
+
+class TestBuildWindowIndex:
+    """build_window_index() のテスト."""
+
+    @pytest.mark.asyncio
+    async def test_index_lookups_from_single_snapshot(
+        self, mock_iterm2_connection, mock_iterm2_app
+    ):
+        """プロジェクト・ウィンドウ名・tmuxウィンドウIDを同じスナップショットから引ける."""
+        editor = _tagged_window(
+            "w1", {"user.projectID": "proj", "user.window_name": "editor"}, "10"
+        )
+        server = _tagged_window(
+            "w2", {"user.projectID": "proj", "user.window_name": "server"}, "11"
+        )
+        other = _tagged_window(
+            "w3", {"user.projectID": "other", "user.window_name": "main"}, "12"
+        )
+        mock_iterm2_app.windows = [editor, server, other]
+
+        bridge = ITerm2Bridge(mock_iterm2_connection, mock_iterm2_app)
+        index = await bridge.build_window_index()
+
+        assert index.windows_for_project("proj") == [editor, server]
+        assert index.window_names_for_project("proj") == {"editor", "server"}
+        assert index.by_tmux_window_id("@11").window is server
+        assert index.by_tmux_window_id("99") is None
+        # 1ウィンドウにつき2変数のみ読み取る
+        assert all(w.async_get_variable.await_count == 2 for w in (editor, server, other))
+
+
+class TestTagWindows:
+    """WindowManager.tag_window() / tag_windows() のテスト."""
+
+    @staticmethod
+    def _ok_response():
+        from iterm2 import api_pb2
+
+        response = MagicMock()
+        response.variable_response.status = api_pb2.VariableResponse.Status.Value("OK")
+        return response
+
+    @pytest.mark.asyncio
+    async def test_tag_window_writes_both_variables_in_one_rpc(self, mock_iterm2_app):
+        """user.projectID と user.window_name を1回のRPCで書き込む."""
+        window = _tagged_window("w1", {})
+        manager = WindowManager(mock_iterm2_app)
+
+        with patch("iterm2.rpc.async_variable", new=AsyncMock(return_value=self._ok_response())) as rpc:
+            await manager.tag_window(window, "proj", "editor")
+
+        rpc.assert_awaited_once()
+        assert rpc.await_args.kwargs["window_id"] == "w1"
+        assert rpc.await_args.kwargs["sets"] == [
+            ("user.projectID", '"proj"'),
+            ("user.window_name", '"editor"'),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_tag_window_raises_on_error_status(self, mock_iterm2_app):
+        """RPC がエラーを返したら RPCException."""
+        import iterm2
+        from iterm2 import api_pb2
+
+        response = MagicMock()
+        response.variable_response.status = api_pb2.VariableResponse.Status.Value("INVALID_NAME")
+        manager = WindowManager(mock_iterm2_app)
+
+        with patch("iterm2.rpc.async_variable", new=AsyncMock(return_value=response)):
+            with pytest.raises(iterm2.RPCException):
+                await manager.tag_window(_tagged_window("w1", {}), "proj", "editor")
+
+    @pytest.mark.asyncio
+    async def test_tag_windows_skips_matching_tags(self, mock_iterm2_app):
+        """スナップショットのタグと一致するウィンドウは書き込まない."""
+        same = _tagged_window("w1", {})
+        renamed = _tagged_window("w2", {})
+        untagged = _tagged_window("w3", {})
+        snapshot = WindowIndex(entries=[
+            WindowEntry(window=same, project_id="proj", window_name="editor"),
+            WindowEntry(window=renamed, project_id="proj", window_name="old"),
+            WindowEntry(window=untagged),
+        ])
+        manager = WindowManager(mock_iterm2_app)
+        manager.tag_window = AsyncMock()
+
+        written = await manager.tag_windows(
+            [(same, "proj", "editor"), (renamed, "proj", "server"), (untagged, "proj", "logs")],
+            snapshot=snapshot,
+        )
+
+        assert written == 2
+        assert [c.args[0] for c in manager.tag_window.await_args_list] == [renamed, untagged]
+
+    @pytest.mark.asyncio
+    async def test_tag_windows_bounds_concurrency(self, mock_iterm2_app):
+        """同時書き込み数は write_concurrency 以下."""
+        in_flight = 0
+        peak = 0
+
+        async def slow_tag(window, project_name, window_name):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        manager = WindowManager(mock_iterm2_app, write_concurrency=3)
+        manager.tag_window = AsyncMock(side_effect=slow_tag)
+
+        windows = [_tagged_window(f"w{i}", {}) for i in range(10)]
+        written = await manager.tag_windows([(w, "proj", f"win-{i}") for i, w in enumerate(windows)])
+
+        assert written == 10
+        assert peak == 3
+
 
 class TestSetWindowSize:
     """set_window_size()のテスト."""
@@ -161,4 +322,194 @@ class TestCreateTmuxWindow:
         assert "-c" in cmd
         assert str(cwd) in cmd
         assert "-k" in cmd
-        assert "@42" in cmd
\ No newline at end of file
+        assert "@42" in cmd
+
+class TestCreateTmuxWindows:
+    """create_tmux_windows() のテスト."""
+
+    @pytest.mark.asyncio
+    async def test_creates_and_activates_all_windows(
+        self, mock_iterm2_connection, mock_iterm2_app
+    ):
+        """指定数のウィンドウを作成し、view-mode 防止の待機は1回だけ."""
+        created = [AsyncMock(), AsyncMock(), AsyncMock()]
+        tmux_conn = AsyncMock()
+        tmux_conn.async_create_window = AsyncMock(side_effect=created)
+
+        bridge = ITerm2Bridge(mock_iterm2_connection, mock_iterm2_app)
+        with patch("asyncio.sleep") as mock_sleep:
+            windows = await bridge.create_tmux_windows(tmux_conn, "my-project", 3)
+
+        assert windows == created
+        assert tmux_conn.async_create_window.await_count == 3
+        mock_sleep.assert_awaited_once()
+        for window in created:
+            window.async_activate.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_zero_count_does_nothing(self, mock_iterm2_connection, mock_iterm2_app):
+        """作成対象がなければ何もしない."""
+        tmux_conn = AsyncMock()
+        bridge = ITerm2Bridge(mock_iterm2_connection, mock_iterm2_app)
+        assert await bridge.create_tmux_windows(tmux_conn, "my-project", 0) == []
+        tmux_conn.async_create_window.assert_not_called()
+
+
+class TestTagSessionWindows:
+    """tag_session_windows() のテスト."""
+
+    @pytest.fixture
+    def bridge(self, mock_iterm2_connection, mock_iterm2_app, tmp_path):
+        return ITerm2Bridge(
+            mock_iterm2_connection,
+            mock_iterm2_app,
+            readiness=ReadinessPolicy(timeout=0.5, recheck_interval=0.01),
+            metrics=MetricsStore(tmp_path / "metrics.json"),
+        )
+
+    @staticmethod
+    def _native_window(window_id: str, tmux_window_id: str) -> AsyncMock:
+        window = AsyncMock()
+        window.window_id = window_id
+        window.tabs = [_tmux_tab(tmux_window_id, "conn-1")]
+        return window
+
+    @pytest.mark.asyncio
+    async def test_waits_for_precreated_windows_instead_of_duplicating(
+        self, bridge, mock_iterm2_app
+    ):
+        """アタッチ前に作成したウィンドウの表示を待ち、重複作成しない."""
+        tmux_conn = AsyncMock()
+        tmux_conn.connection_id = "conn-1"
+        tmux_conn.async_send_command = AsyncMock(return_value="0:@1\n1:@2\n")
+        mock_iterm2_app.windows = [self._native_window("w-1", "1")]
+
+        class LateMonitor:
+            def __init__(self, connection=None):
+                pass
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *args):
+                return None
+
+            async def async_get(self):
+                # 通知とともに2つ目のウィンドウが表示される
+                mock_iterm2_app.windows = [
+                    TestTagSessionWindows._native_window("w-1", "1"),
+                    TestTagSessionWindows._native_window("w-2", "2"),
+                ]
+                return "new-session-id"
+
+        bridge.window_manager.tag_window = AsyncMock()
+        bridge.create_tmux_windows = AsyncMock(return_value=[])
+
+        with patch("iterm2.NewSessionMonitor", LateMonitor):
+            created = await bridge.tag_session_windows(
+                tmux_conn,
+                "my-project",
+                [WindowConfig(name="editor"), WindowConfig(name="server")],
+            )
+
+        assert created == []
+        bridge.create_tmux_windows.assert_awaited_once_with(
+            tmux_conn, "my-project", 0, cwd=None
+        )
+        tagged = [c.args[2] for c in bridge.window_manager.tag_window.await_args_list]
+        assert tagged == ["editor", "server"]
+        assert bridge.metrics.histogram(SURFACE_WINDOWS_METRIC).count == 1
+
+
+class TestReadinessPolicy:
+    """ReadinessPolicy のテスト."""
+
+    def test_fixed_timeout_from_env(self, monkeypatch):
+        """ITMUX_CONNECT_TIMEOUT 指定時は固定値."""
+        monkeypatch.setenv("ITMUX_CONNECT_TIMEOUT", "7.5")
+        assert ReadinessPolicy.from_env().timeout_for(LatencyHistogram()) == 7.5
+
+    def test_default_without_history(self):
+        """履歴がなければ default_timeout."""
+        assert ReadinessPolicy().timeout_for(LatencyHistogram()) == 5.0
+
+    def test_adapts_to_history(self):
+        """p95 × multiplier を min/max に収める."""
+        histogram = LatencyHistogram()
+        for _ in range(10):
+            histogram.observe(0.7)  # バケット上限 0.8
+        assert ReadinessPolicy().timeout_for(histogram) == pytest.approx(2.4)
+
+        fast = LatencyHistogram()
+        fast.observe(0.01)
+        assert ReadinessPolicy().timeout_for(fast) == 2.0
+
+        slow = LatencyHistogram()
+        slow.observe(10.0)
+        assert ReadinessPolicy().timeout_for(slow) == 15.0
+
+
+class TestConnectToSession:
+    """connect_to_session() のテスト."""
+
+    @pytest.fixture
+    def bridge(self, mock_iterm2_connection, mock_iterm2_app, tmp_path):
+        return ITerm2Bridge(
+            mock_iterm2_connection,
+            mock_iterm2_app,
+            readiness=ReadinessPolicy(timeout=0.5, recheck_interval=0.01),
+            metrics=MetricsStore(tmp_path / "metrics.json"),
+        )
+
+    @pytest.mark.asyncio
+    async def test_ready_when_pane_appears(
+        self, bridge, mock_iterm2_app, mock_new_session_monitor
+    ):
+        """接続に属するタブが現れた時点で完了し、所要時間を記録する."""
+        tmux_conn = MagicMock()
+        tmux_conn.connection_id = "conn-1"
+        pane_window = MagicMock()
+        pane_window.tabs = [_tmux_tab("1", "conn-1")]
+
+        calls = 0
+
+        async def get_conn(project_name):
+            nonlocal calls
+            calls += 1
+            if calls >= 3:
+                # 3回目の確認で pane が表示される
+                mock_iterm2_app.windows = [pane_window]
+            return tmux_conn
+
+        bridge.session_manager.get_tmux_connection = AsyncMock(side_effect=get_conn)
+
+        with patch("itmux.tmux.environment.prepare_session_environments"), \
+             patch("iterm2.NewSessionMonitor", mock_new_session_monitor), \
+             patch("iterm2.Window.async_create", new=AsyncMock(return_value=MagicMock())), \
+             patch("asyncio.sleep") as mock_sleep:
+            await bridge.connect_to_session("my-project")
+
+        mock_sleep.assert_not_called()
+        assert bridge.metrics.histogram(CONNECT_READY_METRIC).count == 1
+
+    @pytest.mark.asyncio
+    async def test_timeout_raises_and_counts(
+        self, bridge, mock_new_session_monitor
+    ):
+        """接続が確立しなければタイムアウトし、回数を記録する."""
+        bridge.session_manager.get_tmux_connection = AsyncMock(
+            side_effect=ITerm2Error("not found")
+        )
+
+        class SilentMonitor(mock_new_session_monitor):
+            async def async_get(self):
+                await asyncio.Event().wait()
+
+        with patch("itmux.tmux.environment.prepare_session_environments"), \
+             patch("iterm2.NewSessionMonitor", SilentMonitor), \
+             patch("iterm2.Window.async_create", new=AsyncMock(return_value=MagicMock())):
+            with pytest.raises(ITerm2Error, match="not ready after 0.5 seconds"):
+                await bridge.connect_to_session("my-project")
+
+        assert bridge.metrics.counter(CONNECT_TIMEOUT_METRIC) == 1
+        assert bridge.metrics.histogram(CONNECT_READY_METRIC).count == 0
@@ -0,0 +1,113 @@
+"""tests/itmux/test_metrics.py - メトリクス記録のテスト."""
+
+from unittest.mock import patch
+
+from itmux.metrics import LatencyHistogram, MetricsStore, process_metrics
+
+
+class TestLatencyHistogram:
+    """LatencyHistogram のテスト."""
+
+    def test_empty_percentile_is_none(self):
+        """観測がなければ分位点は None."""
+        assert LatencyHistogram().percentile(0.95) is None
+
+    def test_percentile_returns_bucket_upper_bound(self):
+        """分位点は該当バケットの上限."""
+        histogram = LatencyHistogram()
+        for _ in range(19):
+            histogram.observe(0.07)
+        histogram.observe(1.0)
+
+        assert histogram.percentile(0.5) == 0.1
+        assert histogram.percentile(0.95) == 0.1
+        assert histogram.percentile(1.0) == 1.6
+
+    def test_overflow_bucket_uses_max(self):
+        """最大バケットを超える観測は最大値を返す."""
+        histogram = LatencyHistogram()
+        histogram.observe(30.0)
+        assert histogram.percentile(0.95) == 30.0
+
+    def test_round_trip(self):
+        """to_dict/from_dict で復元できる."""
+        histogram = LatencyHistogram()
+        histogram.observe(0.3)
+        restored = LatencyHistogram.from_dict(histogram.to_dict())
+        assert restored == histogram
+
+
+class TestMetricsStore:
+    """MetricsStore のテスト."""
+
+    def test_observe_persists_histogram(self, tmp_path):
+        """observe の結果がファイルに保存される."""
+        store = MetricsStore(tmp_path / "metrics.json")
+        store.observe("open", 0.2)
+        store.observe("open", 0.3)
+
+        histogram = MetricsStore(tmp_path / "metrics.json").histogram("open")
+        assert histogram.count == 2
+        assert histogram.total == 0.5
+
+    def test_increment_counter(self, tmp_path):
+        """increment でカウンタが加算される."""
+        store = MetricsStore(tmp_path / "metrics.json")
+        store.increment("timeouts")
+        store.increment("timeouts", 2)
+        assert store.counter("timeouts") == 3
+
+    def test_corrupted_file_is_treated_as_empty(self, tmp_path):
+        """壊れたファイルは空として扱い、上書きする."""
+        path = tmp_path / "metrics.json"
+        path.write_text("{broken")
+        store = MetricsStore(path)
+
+        assert store.histogram("open").count == 0
+        store.observe("open", 0.1)
+        assert store.histogram("open").count == 1
+
+    def test_default_path_from_env(self, tmp_path, monkeypatch):
+        """ITMUX_METRICS_PATH が使われる."""
+        monkeypatch.setenv("ITMUX_METRICS_PATH", str(tmp_path / "m.json"))
+        assert MetricsStore().path == tmp_path / "m.json"
+
+    def test_buffered_store_writes_once_on_flush(self, tmp_path):
+        """buffered なストアは flush() まで書き込まず、読み出しには溜めた分を含める."""
+        store = MetricsStore(tmp_path / "metrics.json", buffered=True)
+        store.increment("writes")
+        store.increment("writes", 2)
+        store.observe("open", 0.2)
+
+        assert not store.path.exists()
+        assert store.counter("writes") == 3
+        assert store.histogram("open").count == 1
+
+        with patch.object(store, "_update", wraps=store._update) as mock_update:
+            store.flush()
+            store.flush()
+        assert mock_update.call_count == 1
+
+        reloaded = MetricsStore(store.path)
+        assert reloaded.counter("writes") == 3
+        assert reloaded.histogram("open").count == 1
+        assert store.counter("writes") == 3
+
+    def test_flush_min_interval(self, tmp_path):
+        """min_interval 以内の flush は書き込まない（デーモン用）."""
+        store = MetricsStore(tmp_path / "metrics.json", buffered=True)
+        store.increment("writes")
+
+        store.flush(min_interval=60)
+        assert not store.path.exists()
+
+        store.flush()
+        assert store.path.exists()
+
+    def test_process_metrics_is_shared_per_path(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("ITMUX_METRICS_PATH", str(tmp_path / "m.json"))
+
+        store = process_metrics()
+
+        assert store.buffered
+        assert process_metrics() is store
@@ -3,8 +3,9 @@
 import os
 import pytest
 from pathlib import Path
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, call, patch
 
+from itmux.iterm2.window_manager import WindowEntry, WindowIndex
 from itmux.orchestrator import ProjectOrchestrator
 from itmux.models import WindowConfig, ProjectConfig, WindowSize
 from itmux.exceptions import (
@@ -22,33 +23,42 @@ class TestHelpers:
         self, mock_config_manager, mock_iterm2_bridge, mock_subprocess
     ):
         """セッションが存在する場合True."""
-        mock_subprocess.return_value = MagicMock(returncode=0)
+        mock_subprocess.return_value = MagicMock(
+            returncode=0, stdout="test-session\t@1\t0\t1\teditor\n", stderr=""
+        )
 
         orchestrator = ProjectOrchestrator(mock_config_manager, mock_iterm2_bridge)
         result = orchestrator._tmux_has_session("test-session")
 
         assert result is True
-        mock_subprocess.assert_called_once_with(
-            ["tmux", "has-session", "-t", "test-session"],
-            capture_output=True,
-            env=os.environ.copy()
-        )
+        mock_subprocess.assert_called_once()
+        assert mock_subprocess.call_args.args[0][:3] == ["tmux", "list-windows", "-a"]
 
     def test_tmux_has_session_not_exists(
         self, mock_config_manager, mock_iterm2_bridge, mock_subprocess
     ):
-        """セッションが存在しない場合False."""
-        mock_subprocess.return_value = MagicMock(returncode=1)
+        """セッションが存在しない場合False（前方一致では一致しない）."""
+        mock_subprocess.return_value = MagicMock(
+            returncode=0, stdout="nonexistent-2\t@1\t0\t1\teditor\n", stderr=""
+        )
 
         orchestrator = ProjectOrchestrator(mock_config_manager, mock_iterm2_bridge)
         result = orchestrator._tmux_has_session("nonexistent")
 
         assert result is False
-        mock_subprocess.assert_called_once_with(
-            ["tmux", "has-session", "-t", "nonexistent"],
-            capture_output=True,
-            env=os.environ.copy()
-        )
+        mock_subprocess.assert_called_once()
+
+    def test_pending_restores_is_one_tmux_call(self, mock_subprocess):
+        """tmuxサーバーの起動確認と復元待ちの取得は show-options 1回."""
+        from itmux.tmux.snapshot import read_pending_restores
+
+        mock_subprocess.return_value = MagicMock(returncode=1, stdout="", stderr="")
+
+        assert read_pending_restores() is None
+        mock_subprocess.assert_called_once()
+        assert mock_subprocess.call_args.args[0][:4] == [
+            "tmux", "show-options", "-gqv", "@itmux_pending_restore"
+        ]
 
     def test_generate_window_name_first(
         self, mock_config_manager, mock_iterm2_bridge
@@ -155,7 +165,7 @@ class TestOpen:
 
         # open_project_windowsが呼ばれる
         mock_iterm2_bridge.open_project_windows.assert_called_once_with(
-            "test-project", windows, {}, cwd=None
+            "test-project", windows, {}, cwd=None, primary_only=False
         )
 
     @pytest.mark.asyncio
@@ -174,7 +184,7 @@ class TestOpen:
 
         # open_project_windowsが呼ばれる
         mock_iterm2_bridge.open_project_windows.assert_called_once_with(
-            "test-project", windows, {}, cwd=None
+            "test-project", windows, {}, cwd=None, primary_only=False
         )
 
     @pytest.mark.asyncio
@@ -194,13 +204,13 @@ class TestOpen:
 
         # open_project_windowsが呼ばれる（ウィンドウサイズはWindowConfig内に含まれる）
         mock_iterm2_bridge.open_project_windows.assert_called_once_with(
-            "test-project", windows, {}, cwd=None
+            "test-project", windows, {}, cwd=None, primary_only=False
         )
 
     @pytest.mark.asyncio
-    @patch('itmux.orchestrator.ProjectOrchestrator._is_tmux_running')
+    @patch('itmux.orchestrator.ProjectOrchestrator._restore_for_open')
     async def test_open_project_not_found(
-        self, mock_is_tmux_running, mock_config_manager, mock_iterm2_bridge, mock_environ
+        self, mock_restore_for_open, mock_config_manager, mock_iterm2_bridge, mock_environ
     ):
         """プロジェクトが存在しない場合は自動作成される."""
         # 最初のget_projectはProjectNotFoundErrorを発生
@@ -210,8 +220,8 @@ class TestOpen:
             ProjectConfig(name="nonexistent", tmux_windows=[])
         ]
 
-        # tmuxが起動していることをモック
-        mock_is_tmux_running.return_value = True
+        # 復元するセッションがないことをモック
+        mock_restore_for_open.return_value = None
 
         orchestrator = ProjectOrchestrator(mock_config_manager, mock_iterm2_bridge)
 
@@ -222,13 +232,13 @@ class TestOpen:
         mock_config_manager.create_project.assert_called_once_with("nonexistent", windows=[])
 
     @pytest.mark.asyncio
-    @patch('itmux.orchestrator.ProjectOrchestrator._is_tmux_running')
+    @patch('itmux.orchestrator.ProjectOrchestrator._restore_for_open')
     async def test_open_passes_environments_to_bridge(
-        self, mock_is_tmux_running,
+        self, mock_restore_for_open,
         mock_config_manager, mock_iterm2_bridge, mock_environ
     ):
         """open 時に environments を bridge へ渡す（シェル起動前適用）."""
-        mock_is_tmux_running.return_value = True
+        mock_restore_for_open.return_value = None
         mock_config_manager.get_project.return_value = ProjectConfig(
             name="test-project",
             environments={"MY_KEY": "my_value"},
@@ -243,20 +253,25 @@ class TestOpen:
             [WindowConfig(name="editor")],
             {"MY_KEY": "my_value"},
             cwd=None,
+            primary_only=False,
         )
 
     @pytest.mark.asyncio
     @patch("itmux.orchestrator.apply_session_environments")
-    @patch('itmux.orchestrator.ProjectOrchestrator._is_tmux_running')
+    @patch('itmux.orchestrator.ProjectOrchestrator._restore_for_open')
     async def test_open_skips_env_when_all_windows_already_open(
-        self, mock_is_tmux_running, mock_apply_env,
+        self, mock_restore_for_open, mock_apply_env,
         mock_config_manager, mock_iterm2_bridge, mock_environ
     ):
         """全ウィンドウが既に開いていても environments は適用."""
-        mock_is_tmux_running.return_value = True
-        mock_window = AsyncMock()
-        mock_window.async_get_variable.return_value = "editor"
-        mock_iterm2_bridge.find_windows_by_project.return_value = [mock_window]
+        mock_restore_for_open.return_value = None
+        mock_iterm2_bridge.build_window_index.return_value = WindowIndex(
+            entries=[
+                WindowEntry(
+                    window=AsyncMock(), project_id="test-project", window_name="editor"
+                )
+            ]
+        )
         mock_config_manager.get_project.return_value = ProjectConfig(
             name="test-project",
             environments={"FOO": "bar"},
@@ -270,13 +285,13 @@ class TestOpen:
         mock_apply_env.assert_called_once_with("test-project", {"FOO": "bar"})
 
     @pytest.mark.asyncio
-    @patch('itmux.orchestrator.ProjectOrchestrator._is_tmux_running')
+    @patch('itmux.orchestrator.ProjectOrchestrator._restore_for_open')
     async def test_open_passes_cwd_to_bridge(
-        self, mock_is_tmux_running,
+        self, mock_restore_for_open,
         mock_config_manager, mock_iterm2_bridge, mock_environ, tmp_path
     ):
         """open 時に cwd を bridge へ渡す."""
-        mock_is_tmux_running.return_value = True
+        mock_restore_for_open.return_value = None
         cwd = tmp_path.resolve()
         mock_config_manager.get_project.return_value = ProjectConfig(
             name="test-project",
@@ -292,20 +307,25 @@ class TestOpen:
             [WindowConfig(name="editor")],
             {},
             cwd=cwd,
+            primary_only=False,
         )
 
     @pytest.mark.asyncio
-    @patch('itmux.orchestrator.ProjectOrchestrator._is_tmux_running')
+    @patch('itmux.orchestrator.ProjectOrchestrator._restore_for_open')
     async def test_open_skips_cwd_when_all_windows_already_open(
-        self, mock_is_tmux_running,
+        self, mock_restore_for_open,
         mock_config_manager, mock_iterm2_bridge, mock_environ, tmp_path
     ):
         """全ウィンドウが既に開いている場合は cwd を再適用しない."""
-        mock_is_tmux_running.return_value = True
+        mock_restore_for_open.return_value = None
         cwd = tmp_path.resolve()
-        mock_window = AsyncMock()
-        mock_window.async_get_variable.return_value = "editor"
-        mock_iterm2_bridge.find_windows_by_project.return_value = [mock_window]
+        mock_iterm2_bridge.build_window_index.return_value = WindowIndex(
+            entries=[
+                WindowEntry(
+                    window=AsyncMock(), project_id="test-project", window_name="editor"
+                )
+            ]
+        )
         mock_config_manager.get_project.return_value = ProjectConfig(
             name="test-project",
             cwd=cwd,
@@ -318,15 +338,15 @@ class TestOpen:
         mock_iterm2_bridge.open_project_windows.assert_not_called()
 
     @pytest.mark.asyncio
-    @patch('itmux.orchestrator.ProjectOrchestrator._is_tmux_running')
+    @patch('itmux.orchestrator.ProjectOrchestrator._restore_for_open')
     async def test_open_invalid_cwd_raises(
-        self, mock_is_tmux_running,
+        self, mock_restore_for_open,
         mock_config_manager, mock_iterm2_bridge, mock_environ
     ):
         """存在しない cwd で open は失敗."""
         from itmux.exceptions import CwdError
 
-        mock_is_tmux_running.return_value = True
+        mock_restore_for_open.return_value = None
         mock_config_manager.get_project.return_value = ProjectConfig(
             name="test-project",
             cwd=Path("/nonexistent/itmux-cwd-open"),
@@ -339,6 +359,97 @@ class TestOpen:
             await orchestrator.open("test-project")
 
 
+class TestStagedOpen:
+    """段階的 open（open(staged=True) / materialize）のテスト."""
+
+    @pytest.fixture
+    def project_windows(self, mock_config_manager):
+        windows = [WindowConfig(name="editor"), WindowConfig(name="server"), WindowConfig(name="logs")]
+        mock_config_manager.get_project.return_value = ProjectConfig(
+            name="test-project", tmux_windows=windows
+        )
+        return windows
+
+    @pytest.mark.asyncio
+    @patch("itmux.orchestrator.subprocess.Popen")
+    @patch("itmux.orchestrator.forward_to_daemon", new_callable=AsyncMock)
+    async def test_staged_open_hands_rest_to_daemon(
+        self, mock_forward, mock_popen, mock_config_manager, mock_iterm2_bridge,
+        mock_subprocess, mock_environ, project_windows,
+    ):
+        """先頭ウィンドウだけ開き、残りはデーモンに任せる."""
+        mock_forward.return_value = True
+
+        orchestrator = ProjectOrchestrator(mock_config_manager, mock_iterm2_bridge)
+        backgrounded = await orchestrator.open("test-project", staged=True)
+
+        assert backgrounded is True
+        mock_iterm2_bridge.open_project_windows.assert_called_once_with(
+            "test-project", project_windows, {}, cwd=None, primary_only=True
+        )
+        mock_iterm2_bridge.setup_hooks.assert_awaited_once()
+        assert mock_forward.await_args.args == ("materialize",)
+        assert mock_forward.await_args.kwargs["project"] == "test-project"
+        mock_popen.assert_not_called()
+        assert orchestrator.metrics.histogram("open.time_to_first_window").count == 1
+        assert orchestrator.metrics.histogram("open.time_to_full_project").count == 0
+
+    @pytest.mark.asyncio
+    @patch("itmux.orchestrator.subprocess.Popen")
+    @patch("itmux.orchestrator.forward_to_daemon", new_callable=AsyncMock)
+    async def test_staged_open_spawns_worker_without_daemon(
+        self, mock_forward, mock_popen, mock_config_manager, mock_iterm2_bridge,
+        mock_subprocess, mock_environ, project_windows, tmp_path,
+    ):
+        """デーモンがなければ切り離したワーカーを起動する."""
+        mock_forward.return_value = False
+        mock_environ["ITMUX_COMMAND"] = "/usr/local/bin/itmux"
+
+        orchestrator = ProjectOrchestrator(mock_config_manager, mock_iterm2_bridge)
+        with patch("itmux.orchestrator.OPEN_LOG_PATH", tmp_path / "open.log"):
+            await orchestrator.open("test-project", staged=True)
+
+        argv = mock_popen.call_args.args[0]
+        assert argv[:3] == ["/usr/local/bin/itmux", "materialize", "test-project"]
+        assert "--started-at" in argv
+        assert mock_popen.call_args.kwargs["start_new_session"] is True
+
+    @pytest.mark.asyncio
+    @patch("itmux.orchestrator.forward_to_daemon", new_callable=AsyncMock)
+    async def test_single_window_is_not_staged(
+        self, mock_forward, mock_config_manager, mock_iterm2_bridge, mock_subprocess, mock_environ
+    ):
+        """開くウィンドウが1つなら通常の open."""
+        orchestrator = ProjectOrchestrator(mock_config_manager, mock_iterm2_bridge)
+        backgrounded = await orchestrator.open("test-project", staged=True)
+
+        assert backgrounded is False
+        assert mock_iterm2_bridge.open_project_windows.call_args.kwargs["primary_only"] is False
+        mock_forward.assert_not_called()
+        assert orchestrator.metrics.histogram("open.time_to_full_project").count == 1
+
+    @pytest.mark.asyncio
+    async def test_materialize_tags_all_config_windows(
+        self, mock_config_manager, mock_iterm2_bridge, project_windows
+    ):
+        """config の全ウィンドウを対応付け、全体の所要時間を記録する."""
+        import time
+
+        tmux_conn = MagicMock()
+        mock_iterm2_bridge.get_tmux_connection.return_value = tmux_conn
+        progress = MagicMock()
+
+        orchestrator = ProjectOrchestrator(mock_config_manager, mock_iterm2_bridge)
+        await orchestrator.materialize("test-project", started_at=time.time() - 1, progress=progress)
+
+        mock_iterm2_bridge.tag_session_windows.assert_awaited_once_with(
+            tmux_conn, "test-project", project_windows, cwd=None, progress=progress
+        )
+        histogram = orchestrator.metrics.histogram("open.time_to_full_project")
+        assert histogram.count == 1
+        assert histogram.total >= 1
+
+
 class TestAdd:
     """add() のテスト."""
 
@@ -389,7 +500,7 @@ class TestAdd:
         mock_iterm2_bridge.get_tmux_connection.side_effect = ITerm2Error(
             "TmuxConnection not found for project: iTmux"
         )
-        mock_subprocess.return_value = MagicMock(returncode=1)
+        mock_subprocess.return_value = MagicMock(returncode=1, stdout="", stderr="")
         mock_config_manager.get_project.return_value = ProjectConfig(
             name="iTmux",
             tmux_windows=[WindowConfig(name="window-1")],
@@ -413,7 +524,9 @@ class TestAdd:
         mock_iterm2_bridge.get_tmux_connection.side_effect = ITerm2Error(
             "TmuxConnection not found for project: iTmux"
         )
-        mock_subprocess.return_value = MagicMock(returncode=0)
+        mock_subprocess.return_value = MagicMock(
+            returncode=0, stdout="iTmux\t@1\t0\t1\twindow-1\n", stderr=""
+        )
         mock_config_manager.get_project.return_value = ProjectConfig(
             name="iTmux",
             tmux_windows=[WindowConfig(name="window-1")],
@@ -437,7 +550,7 @@ class TestAdd:
         mock_iterm2_bridge.get_tmux_connection.side_effect = ITerm2Error(
             "TmuxConnection not found for project: iTmux"
         )
-        mock_subprocess.return_value = MagicMock(returncode=1)
+        mock_subprocess.return_value = MagicMock(returncode=1, stdout="", stderr="")
         mock_config_manager.get_project.side_effect = ProjectNotFoundError(
             "Project 'iTmux' not found"
         )
@@ -460,7 +573,7 @@ class TestSyncDataProtection:
         return ProjectOrchestrator(mock_config_manager, mock_iterm2_bridge)
 
     def _no_session(self, mock_subprocess):
-        mock_subprocess.return_value = MagicMock(returncode=1)
+        mock_subprocess.return_value = MagicMock(returncode=1, stdout="", stderr="")
 
     def test_should_delete_window_only_project(
         self, mock_config_manager, mock_iterm2_bridge
@@ -603,3 +716,571 @@ class TestSyncDataProtection:
 
         mock_config_manager.delete_project.assert_called_once_with("proj")
         mock_config_manager.update_project.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_sync_closed_session_keeps_snapshot(
+        self, mock_config_manager, mock_iterm2_bridge, mock_subprocess
+    ):
+        """session-closed hook: 閉じたプロジェクトだけを処理し、スナップショットは保存しない."""
+        self._no_session(mock_subprocess)
+        mock_config_manager.get_project.return_value = ProjectConfig(
+            name="proj", tmux_windows=[WindowConfig(name="editor")]
+        )
+
+        orchestrator = self._orchestrator(mock_config_manager, mock_iterm2_bridge)
+        with patch.object(orchestrator, "_save_snapshots") as mock_save:
+            await orchestrator.sync("proj")
+
+        mock_config_manager.delete_project.assert_called_once_with("proj")
+        mock_config_manager.list_projects.assert_called_once()  # 保存待ちの片付けのみ
+        mock_save.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_sync_all_lists_sessions_once(
+        self, mock_config_manager, mock_iterm2_bridge, mock_subprocess
+    ):
+        """sync --all: プロジェクト数によらず tmux の起動は list-windows 1回."""
+        mock_subprocess.side_effect = [
+            MagicMock(
+                returncode=0, stdout="a\t@1\t0\t1\teditor\nscratch\t@2\t0\t1\tzsh\n", stderr=""
+            ),
+            MagicMock(returncode=0, stdout=":a:scratch:\n", stderr=""),
+            MagicMock(returncode=0, stdout="", stderr=""),
+        ]
+        mock_config_manager.list_projects.return_value = ["a", "b", "c", "d"]
+        mock_config_manager.get_project.return_value = ProjectConfig(
+            name="x", tmux_windows=[WindowConfig(name="editor")]
+        )
+
+        orchestrator = self._orchestrator(mock_config_manager, mock_iterm2_bridge)
+        await orchestrator._sync_all_projects()
+
+        tmux_calls = [c for c in mock_subprocess.call_args_list if c.args[0][0] == "tmux"]
+        assert tmux_calls[0].args[0][1:3] == ["list-windows", "-a"]
+        # 残りは管理下の一覧（存在しないセッションがなければ書き込まない）と復元待ちの読み込み
+        assert len(tmux_calls) == 3
+        assert [c.args[0][1] for c in tmux_calls[1:]] == ["show-options", "show-options"]
+        deleted = [c.args[0] for c in mock_config_manager.delete_project.call_args_list]
+        assert deleted == ["b", "c", "d"]
+
+    @pytest.mark.asyncio
+    async def test_sync_single_unregisters_closed_session(
+        self, mock_config_manager, mock_iterm2_bridge, mock_subprocess
+    ):
+        """セッション不在: プロジェクトを削除しても管理下の一覧から外す."""
+        self._no_session(mock_subprocess)
+        mock_config_manager.get_project.return_value = ProjectConfig(
+            name="proj", tmux_windows=[WindowConfig(name="editor")]
+        )
+
+        orchestrator = self._orchestrator(mock_config_manager, mock_iterm2_bridge)
+        with patch("itmux.orchestrator.unregister_managed_sessions") as mock_unregister:
+            await orchestrator._sync_single_project("proj")
+
+        mock_config_manager.delete_project.assert_called_once_with("proj")
+        mock_unregister.assert_called_once_with(["proj"])
+
+    @pytest.mark.asyncio
+    async def test_sync_all_unregisters_stale_managed_sessions(
+        self, mock_config_manager, mock_iterm2_bridge, mock_subprocess
+    ):
+        """sync --all: 設定にないプロジェクトも含め、存在しないセッションを一覧から外す."""
+        mock_subprocess.return_value = MagicMock(
+            returncode=0, stdout="a\t@1\t0\t1\teditor\n", stderr=""
+        )
+        mock_config_manager.list_projects.return_value = ["a"]
+
+        orchestrator = self._orchestrator(mock_config_manager, mock_iterm2_bridge)
+        with patch(
+            "itmux.orchestrator.read_managed_sessions", return_value=["a", "gone", "renamed"]
+        ), patch("itmux.orchestrator.unregister_managed_sessions") as mock_unregister:
+            await orchestrator._sync_all_projects()
+
+        mock_unregister.assert_called_once_with(["gone", "renamed"])
+
+    @pytest.mark.asyncio
+    async def test_sync_all_without_server_skips_managed_sessions(
+        self, mock_config_manager, mock_iterm2_bridge, mock_subprocess
+    ):
+        """sync --all: tmux サーバーがなければ管理下の一覧は読まない."""
+        self._no_session(mock_subprocess)
+        mock_config_manager.list_projects.return_value = []
+
+        orchestrator = self._orchestrator(mock_config_manager, mock_iterm2_bridge)
+        with patch("itmux.orchestrator.read_managed_sessions") as mock_read:
+            await orchestrator._sync_all_projects()
+
+        mock_read.assert_not_called()
+
+
+class TestWindowEventSync:
+    """hook のウィンドウイベントによる差分同期."""
+
+    def _setup(self, mock_config_manager, mock_iterm2_bridge, names, window_map, live_ids):
+        from itmux.tmux.window_events import WindowMap
+
+        mock_config_manager.get_project.return_value = ProjectConfig(
+            name="proj",
+            cwd=Path("/tmp"),
+            tmux_windows=[
+                WindowConfig(name=n, window_size=WindowSize(columns=80, lines=24)) for n in names
+            ],
+        )
+        mock_iterm2_bridge.read_window_map.return_value = WindowMap(window_map)
+        mock_iterm2_bridge.list_session_window_ids.return_value = live_ids
+        mock_iterm2_bridge.window_manager = MagicMock(tag_window=AsyncMock())
+        return ProjectOrchestrator(mock_config_manager, mock_iterm2_bridge)
+
+    @pytest.mark.asyncio
+    async def test_added_window_is_inserted_and_tagged(
+        self, mock_config_manager, mock_iterm2_bridge
+    ):
+        """追加されたウィンドウだけをタグ付けし、config に挿入する（他のウィンドウは触らない）."""
+        from itmux.tmux.window_events import WindowEvent, WindowMap
+
+        orchestrator = self._setup(
+            mock_config_manager, mock_iterm2_bridge,
+            ["editor", "window-1"], [("1", "editor"), ("4", "window-1")], ["1", "3", "4"],
+        )
+        window = AsyncMock()
+        mock_iterm2_bridge.find_session_window.return_value = WindowEntry(window=window)
+
+        with patch.object(orchestrator, "_sync_single_project") as mock_full:
+            await orchestrator.sync("proj", event=WindowEvent("added", "@3", 1, "zsh"))
+
+        mock_full.assert_not_called()
+        mock_iterm2_bridge.build_window_index.assert_not_called()
+        mock_iterm2_bridge.window_manager.tag_window.assert_awaited_once_with(
+            window, "proj", "window-2"
+        )
+        windows = mock_config_manager.update_project.call_args.args[1]
+        assert [w.name for w in windows] == ["editor", "window-2", "window-1"]
+        assert windows[0].window_size is not None
+        mock_iterm2_bridge.write_window_map.assert_awaited_once()
+        assert mock_iterm2_bridge.write_window_map.call_args.args[2] == WindowMap(
+            [("1", "editor"), ("3", "window-2"), ("4", "window-1")]
+        )
+        assert orchestrator.metrics.counter("sync.delta_applied") == 1
+
+    @pytest.mark.asyncio
+    async def test_removed_window_is_dropped(self, mock_config_manager, mock_iterm2_bridge):
+        from itmux.tmux.window_events import WindowEvent
+
+        orchestrator = self._setup(
+            mock_config_manager, mock_iterm2_bridge,
+            ["editor", "server"], [("1", "editor"), ("4", "server")], ["4"],
+        )
+
+        with patch.object(orchestrator, "_sync_single_project") as mock_full:
+            await orchestrator.sync("proj", event=WindowEvent("removed", "@1", name="vim"))
+
+        mock_full.assert_not_called()
+        windows = mock_config_manager.update_project.call_args.args[1]
+        assert [w.name for w in windows] == ["server"]
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_full_reconcile_when_map_is_stale(
+        self, mock_config_manager, mock_iterm2_bridge
+    ):
+        """対応表が config と食い違う場合は全体の照合を行う."""
+        from itmux.tmux.window_events import WindowEvent
+
+        orchestrator = self._setup(
+            mock_config_manager, mock_iterm2_bridge,
+            ["editor", "renamed"], [("1", "editor"), ("4", "server")], ["4"],
+        )
+
+        with patch.object(
+            orchestrator, "_sync_single_project", AsyncMock(return_value=True)
+        ) as mock_full:
+            await orchestrator.sync("proj", event=WindowEvent("removed", "1"))
+
+        mock_full.assert_awaited_once_with("proj")
+        mock_config_manager.update_project.assert_not_called()
+        assert orchestrator.metrics.counter("sync.delta_fallback") == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_config_update_falls_back(
+        self, mock_config_manager, mock_iterm2_bridge
+    ):
+        """読み込んだ後にウィンドウリストが更新されていれば、差分を書かずに全体を照合する."""
+        from itmux.exceptions import ConfigConflictError
+        from itmux.tmux.window_events import WindowEvent
+
+        orchestrator = self._setup(
+            mock_config_manager, mock_iterm2_bridge,
+            ["editor", "server"], [("1", "editor"), ("4", "server")], ["4"],
+        )
+        mock_config_manager.update_project.side_effect = ConfigConflictError("changed")
+
+        with patch.object(
+            orchestrator, "_sync_single_project", AsyncMock(return_value=True)
+        ) as mock_full:
+            await orchestrator.sync("proj", event=WindowEvent("removed", "1"))
+
+        mock_config_manager.update_project.assert_called_once_with(
+            "proj", [mock_config_manager.get_project.return_value.tmux_windows[1]],
+            expected=["editor", "server"],
+        )
+        mock_full.assert_awaited_once_with("proj")
+        mock_iterm2_bridge.write_window_map.assert_not_awaited()
+
+
+class TestFullSyncRetry:
+    """全体の照合の再取得のテスト."""
+
+    @pytest.mark.asyncio
+    async def test_refetches_windows_when_config_changed(self, mock_config_manager):
+        """取得中にウィンドウリストが更新されていれば、tmux から取得し直して書き込む."""
+        from itmux.exceptions import ConfigConflictError
+
+        mock_config_manager.get_project.side_effect = [
+            ProjectConfig(name="proj", tmux_windows=[WindowConfig(name="a")]),
+            ProjectConfig(name="proj", tmux_windows=[WindowConfig(name="a"), WindowConfig(name="b")]),
+        ]
+        mock_config_manager.update_project.side_effect = [ConfigConflictError("changed"), None]
+        first = [WindowConfig(name="a")]
+        second = [WindowConfig(name="a"), WindowConfig(name="b")]
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+
+        with patch.object(orchestrator, "_tmux_has_session", return_value=True), patch.object(
+            orchestrator, "_sync_windows_from_tmux_session", AsyncMock(side_effect=[first, second])
+        ):
+            assert await orchestrator._sync_single_project("proj") is True
+
+        mock_config_manager.load.assert_called_once()
+        assert mock_config_manager.update_project.call_args_list[-1] == call(
+            "proj", second, expected=["a", "b"]
+        )
+
+
+class TestLazyBridge:
+    """iTerm2ブリッジの遅延作成のテスト."""
+
+    @pytest.mark.asyncio
+    async def test_bridge_created_on_first_use_only(
+        self, mock_config_manager, mock_iterm2_bridge
+    ):
+        """ブリッジは初回利用時に1回だけ作成される."""
+        factory = AsyncMock(return_value=mock_iterm2_bridge)
+        orchestrator = ProjectOrchestrator(mock_config_manager, bridge_factory=factory)
+
+        factory.assert_not_called()
+        assert await orchestrator.get_bridge() is mock_iterm2_bridge
+        assert await orchestrator.get_bridge() is mock_iterm2_bridge
+        factory.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_reconnects_after_connection_is_lost(self, mock_config_manager):
+        """iTerm2 の再起動などで接続が切れたブリッジは捨てて接続し直す."""
+        stale, fresh = AsyncMock(is_connected=True), AsyncMock(is_connected=True)
+        factory = AsyncMock(side_effect=[stale, fresh])
+        orchestrator = ProjectOrchestrator(mock_config_manager, bridge_factory=factory)
+
+        assert await orchestrator.get_bridge() is stale
+        stale.is_connected = False
+        assert await orchestrator.get_bridge() is fresh
+        assert await orchestrator.get_bridge() is fresh
+        assert factory.await_count == 2
+
+    def test_save_does_not_create_bridge(self, mock_config_manager):
+        """saveはブリッジを作成しない."""
+        factory = AsyncMock()
+        orchestrator = ProjectOrchestrator(mock_config_manager, bridge_factory=factory)
+
+        with patch.object(orchestrator, "_save_snapshots"):
+            orchestrator.save("test-project")
+
+        factory.assert_not_called()
+        assert orchestrator.bridge is None
+
+
+class TestSnapshots:
+    """レイアウトのスナップショット保存・復元のテスト."""
+
+    @pytest.fixture
+    def snapshot(self):
+        from itmux.tmux.snapshot import PaneSnapshot, ProjectSnapshot, WindowSnapshot
+
+        return ProjectSnapshot(
+            session="test-project",
+            windows=[
+                WindowSnapshot(index=0, name="window1", layout="", panes=[PaneSnapshot(cwd="/tmp")])
+            ],
+        )
+
+    def test_save_captures_only_that_project(self, mock_config_manager, tmp_path, snapshot):
+        """save はそのプロジェクトだけを1回の取得で保存する."""
+        mock_config_manager.config_path = tmp_path / "config.json"
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+
+        with patch(
+            "itmux.orchestrator.capture_snapshots", return_value={"test-project": snapshot}
+        ) as mock_capture:
+            orchestrator.save("test-project")
+
+        mock_capture.assert_called_once_with(["test-project"])
+        assert (tmp_path / "snapshots" / "test-project.json").exists()
+
+    def test_unchanged_layout_is_not_saved_again(
+        self, mock_config_manager, tmp_path, snapshot, capsys
+    ):
+        """フィンガープリントが前回と同じなら保存せず、hit として記録する."""
+        from itmux.orchestrator import (
+            SNAPSHOT_FINGERPRINT_HITS_METRIC,
+            SNAPSHOT_FINGERPRINT_MISSES_METRIC,
+        )
+
+        mock_config_manager.config_path = tmp_path / "config.json"
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+        path = tmp_path / "snapshots" / "test-project.json"
+
+        with patch(
+            "itmux.orchestrator.capture_snapshots", return_value={"test-project": snapshot}
+        ):
+            orchestrator.save("test-project")
+            written = path.stat().st_mtime_ns
+            snapshot.windows[0].panes[0].command = "vim"
+            orchestrator.save("test-project")
+
+        assert path.stat().st_mtime_ns == written
+        assert orchestrator.metrics.counter(SNAPSHOT_FINGERPRINT_MISSES_METRIC) == 1
+        assert orchestrator.metrics.counter(SNAPSHOT_FINGERPRINT_HITS_METRIC) == 1
+        assert "[save] fingerprint hits=1 misses=0\n" in capsys.readouterr().err
+
+    def test_debounced_save_is_deferred_to_one_worker(self, mock_config_manager):
+        """save --debounce（デーモンなし）は保存せず、遅延ワーカーを1つだけ起動する."""
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+
+        with patch.object(
+            ProjectOrchestrator, "_spawn_deferred_save", return_value=os.getpid()
+        ) as mock_spawn, patch.object(orchestrator, "_save_snapshots") as mock_save:
+            orchestrator.save("test-project", debounce=True)
+            orchestrator.save("test-project", debounce=True)
+
+        mock_spawn.assert_called_once_with()
+        mock_save.assert_not_called()
+
+    def test_deferred_worker_saves_due_projects_together(self, mock_config_manager):
+        """遅延ワーカーは期限の来たプロジェクトをまとめて1回保存する（削除されたものは除く）."""
+        from itmux.save_scheduler import DebouncePolicy, SaveScheduleFile
+
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+        with patch.object(ProjectOrchestrator, "_spawn_deferred_save", return_value=os.getpid()):
+            orchestrator.save("test-project", debounce=True)
+            orchestrator.save("removed", debounce=True)
+
+        policy = DebouncePolicy(window=0.0)
+        with patch("itmux.orchestrator.SaveScheduleFile", lambda: SaveScheduleFile(policy=policy)), \
+                patch.object(orchestrator, "_save_snapshots") as mock_save:
+            orchestrator.save_deferred()
+            orchestrator.save_deferred()
+
+        mock_save.assert_called_once_with(["test-project"], requests=1)
+
+    def test_saves_are_coalesced_into_running_save(self, mock_config_manager, tmp_path):
+        """他のプロセスが保存中なら待ち行列に積み、実行中の保存が続けて1回で保存する."""
+        from filelock import FileLock
+        from itmux.orchestrator import SAVES_COALESCED_METRIC
+        from itmux.save_scheduler import SaveCoordinator
+
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+        coordinator = SaveCoordinator()
+
+        with patch.object(orchestrator, "_write_snapshots") as mock_write:
+            with FileLock(coordinator.run_lock_path):
+                orchestrator._save_snapshots(["a"])
+                orchestrator._save_snapshots(["b"])
+            mock_write.assert_not_called()
+
+            orchestrator._save_snapshots(["c"])
+
+        mock_write.assert_called_once_with(["a", "b", "c"])
+        assert orchestrator.metrics.counter(SAVES_COALESCED_METRIC) == 2
+
+    @pytest.fixture
+    def saved_snapshots(self, mock_config_manager, tmp_path, snapshot):
+        """test-project と other のスナップショットを保存."""
+        from itmux.tmux.snapshot import ProjectSnapshot, save_snapshot
+
+        mock_config_manager.config_path = tmp_path / "config.json"
+        mock_config_manager.list_projects.return_value = ["test-project", "other"]
+        save_snapshot(snapshot, tmp_path / "snapshots" / "test-project.json")
+        other = ProjectSnapshot.from_dict({**snapshot.to_dict(), "session": "other"})
+        save_snapshot(other, tmp_path / "snapshots" / "other.json")
+        return snapshot
+
+    @pytest.mark.asyncio
+    async def test_deleted_project_snapshot_is_not_restored(
+        self, mock_config_manager, saved_snapshots
+    ):
+        """設定から削除されたプロジェクトのスナップショットは復元待ちにしない."""
+        mock_config_manager.list_projects.return_value = ["test-project"]
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+
+        with patch("itmux.orchestrator.read_pending_restores", return_value=None), patch(
+            "itmux.orchestrator.write_pending_restores", return_value=True
+        ) as mock_write, patch("itmux.orchestrator.restore_snapshot", return_value=True):
+            await orchestrator._restore_for_open("test-project")
+
+        mock_write.assert_called_once_with([])
+
+    @pytest.mark.asyncio
+    async def test_closed_session_snapshot_is_removed(
+        self, mock_config_manager, saved_snapshots, tmp_path
+    ):
+        """サーバーが起動したまま閉じたセッションのスナップショットは削除する."""
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+        mock_config_manager.get_project.return_value = ProjectConfig(name="other", cwd=Path("/tmp"))
+
+        with patch.object(orchestrator, "_tmux_has_session", return_value=False), patch(
+            "itmux.orchestrator.read_pending_restores", return_value=[]
+        ), patch("itmux.orchestrator.unregister_managed_sessions"):
+            await orchestrator._sync_single_project("other")
+
+        assert not (tmp_path / "snapshots" / "other.json").exists()
+        assert (tmp_path / "snapshots" / "test-project.json").exists()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("pending", [None, ["other"]])
+    async def test_snapshot_kept_on_server_exit_or_pending(
+        self, mock_config_manager, saved_snapshots, tmp_path, pending
+    ):
+        """kill-server などサーバーの終了と、まだ復元していないプロジェクトでは残す."""
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+        mock_config_manager.get_project.return_value = ProjectConfig(name="other", cwd=Path("/tmp"))
+
+        with patch.object(orchestrator, "_tmux_has_session", return_value=False), patch(
+            "itmux.orchestrator.read_pending_restores", return_value=pending
+        ), patch("itmux.orchestrator.unregister_managed_sessions"):
+            await orchestrator._sync_single_project("other")
+
+        assert (tmp_path / "snapshots" / "other.json").exists()
+
+    @pytest.mark.asyncio
+    async def test_deleted_project_snapshot_is_removed_on_server_exit(
+        self, mock_config_manager, saved_snapshots, tmp_path
+    ):
+        """sync が削除したプロジェクトのスナップショットはサーバーの状態によらず削除する."""
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+        mock_config_manager.get_project.return_value = ProjectConfig(
+            name="other", tmux_windows=[WindowConfig(name="w")]
+        )
+        mock_config_manager.delete_project.side_effect = (
+            lambda name: mock_config_manager.list_projects.return_value.remove(name)
+        )
+
+        with patch.object(orchestrator, "_tmux_has_session", return_value=False), patch(
+            "itmux.orchestrator.read_pending_restores", return_value=None
+        ), patch("itmux.orchestrator.unregister_managed_sessions"):
+            await orchestrator._sync_single_project("other")
+
+        assert not (tmp_path / "snapshots" / "other.json").exists()
+
+    @pytest.mark.asyncio
+    async def test_open_restores_only_requested_project(
+        self, mock_config_manager, saved_snapshots
+    ):
+        """tmux 未起動なら開くプロジェクトだけを復元し、残りを復元待ちに記録する."""
+        from itmux.orchestrator import RESTORE_PROJECT_METRIC
+
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+
+        with patch("itmux.orchestrator.read_pending_restores", return_value=None), patch(
+            "itmux.orchestrator.write_pending_restores", return_value=True
+        ) as mock_write, patch(
+            "itmux.orchestrator.restore_snapshot", return_value=True
+        ) as mock_restore, patch("itmux.orchestrator.subprocess.run") as mock_run:
+            unrecorded = await orchestrator._restore_for_open("test-project")
+
+        mock_restore.assert_called_once_with(saved_snapshots)
+        mock_write.assert_called_once_with(["other"])
+        mock_run.assert_not_called()
+        assert unrecorded is None
+        assert orchestrator.metrics.histogram(RESTORE_PROJECT_METRIC).count == 1
+
+    @pytest.mark.asyncio
+    async def test_pending_project_is_restored_on_first_open(
+        self, mock_config_manager, saved_snapshots
+    ):
+        """起動済みのサーバーでは、復元待ちのプロジェクトだけを初回の open で復元する."""
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+
+        with patch(
+            "itmux.orchestrator.read_pending_restores", return_value=["other", "test-project"]
+        ), patch("itmux.orchestrator.write_pending_restores", return_value=True) as mock_write, patch(
+            "itmux.orchestrator.restore_snapshot", return_value=True
+        ) as mock_restore:
+            await orchestrator._restore_for_open("other")
+            mock_restore.assert_called_once()
+            mock_write.assert_called_once_with(["test-project"])
+
+        with patch("itmux.orchestrator.read_pending_restores", return_value=[]), patch(
+            "itmux.orchestrator.restore_snapshot"
+        ) as mock_restore:
+            await orchestrator._restore_for_open("other")
+        mock_restore.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_restore_others_in_background(self, mock_config_manager, saved_snapshots):
+        """restore_others では残りのプロジェクトをバックグラウンドに任せる."""
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+
+        with patch("itmux.orchestrator.read_pending_restores", return_value=None), patch(
+            "itmux.orchestrator.write_pending_restores", return_value=False
+        ) as mock_write, patch("itmux.orchestrator.restore_snapshot", return_value=True), patch.object(
+            orchestrator, "_restore_in_background"
+        ) as mock_background:
+            unrecorded = await orchestrator._restore_for_open("test-project", restore_others=True)
+
+        mock_background.assert_awaited_once_with(["other"])
+        # 復元できたかどうかは restore_sessions が復元待ちから外すときに判定する
+        mock_write.assert_called_once_with(["other"])
+        assert unrecorded == ["other"]
+
+    @pytest.mark.asyncio
+    async def test_failed_restore_stays_pending(self, mock_config_manager, saved_snapshots):
+        """復元に失敗したプロジェクトは復元待ちに残し、エラーにする."""
+        from itmux.exceptions import RestoreError
+
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+
+        with patch(
+            "itmux.orchestrator.read_pending_restores", return_value=["other", "test-project"]
+        ), patch("itmux.orchestrator.write_pending_restores", return_value=True) as mock_write, patch(
+            "itmux.orchestrator.restore_snapshot", return_value=False
+        ), patch.object(orchestrator, "_tmux_has_session", return_value=False):
+            with pytest.raises(RestoreError, match="test-project"):
+                await orchestrator._restore_for_open("test-project")
+
+        mock_write.assert_called_once_with(["other", "test-project"])
+
+    @pytest.mark.asyncio
+    async def test_existing_session_is_not_restored_again(
+        self, mock_config_manager, saved_snapshots
+    ):
+        """同名のセッションが既にあれば、復元できなくても復元待ちから外す."""
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+
+        with patch(
+            "itmux.orchestrator.read_pending_restores", return_value=["test-project"]
+        ), patch("itmux.orchestrator.write_pending_restores", return_value=True) as mock_write, patch(
+            "itmux.orchestrator.restore_snapshot", return_value=False
+        ), patch.object(orchestrator, "_tmux_has_session", return_value=True):
+            assert await orchestrator._restore_for_open("test-project") is None
+
+        mock_write.assert_called_once_with([])
+
+    def test_restore_sessions_keeps_failed_projects_pending(
+        self, mock_config_manager, saved_snapshots
+    ):
+        orchestrator = ProjectOrchestrator(mock_config_manager)
+
+        with patch(
+            "itmux.orchestrator.read_pending_restores", return_value=["other", "test-project"]
+        ), patch("itmux.orchestrator.write_pending_restores") as mock_write, patch(
+            "itmux.orchestrator.restore_snapshot", side_effect=[True, False]
+        ):
+            orchestrator.restore_sessions(["test-project", "other"])
+
+        mock_write.assert_called_once_with(["other"])
@@ -0,0 +1,104 @@
+"""tests/itmux/test_readonly.py - 軽量な読み取り処理のテスト."""
+
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+
+from itmux.exceptions import ConfigError
+from itmux.readonly import current_session_name, list_project_summaries, read_config_data
+
+
+class TestReadConfigData:
+    """read_config_data のテスト."""
+
+    def test_missing_file_returns_empty(self, tmp_path):
+        """ファイルが存在しない場合は空の設定."""
+        assert read_config_data(tmp_path / "config.json") == {"projects": {}}
+
+    def test_invalid_json(self, tmp_path):
+        """JSONが壊れている場合はConfigError."""
+        config_path = tmp_path / "config.json"
+        config_path.write_text("{invalid")
+
+        with pytest.raises(ConfigError, match="Invalid JSON format"):
+            read_config_data(config_path)
+
+    def test_uses_itmux_config_path(self, tmp_path, monkeypatch):
+        """ITMUX_CONFIG_PATH の設定ファイルを読む."""
+        config_path = tmp_path / "config.json"
+        config_path.write_text(json.dumps({"projects": {"p": {"name": "p"}}}))
+        monkeypatch.setenv("ITMUX_CONFIG_PATH", str(config_path))
+
+        assert list(read_config_data()["projects"]) == ["p"]
+
+
+    def test_follows_config_layout_env(self, tmp_path, monkeypatch):
+        """ITMUX_CONFIG_LAYOUT で指定された形式を ConfigManager と同じ優先順位で読む."""
+        from itmux.config import ConfigManager
+
+        config_path = tmp_path / "config.json"
+        ConfigManager(config_path, layout="sqlite").create_project("db")
+        # 以前のバージョンの移行で残ったインデックス
+        projects_dir = tmp_path / "projects"
+        projects_dir.mkdir()
+        (projects_dir / "index.json").write_text(json.dumps({"projects": ["stale"]}))
+        (projects_dir / "stale.json").write_text(json.dumps({"name": "stale"}))
+
+        assert list(read_config_data(config_path)["projects"]) == ["stale"]
+        monkeypatch.setenv("ITMUX_CONFIG_LAYOUT", "sqlite")
+        assert list(read_config_data(config_path)["projects"]) == ["db"]
+        assert ConfigManager(config_path).list_projects() == ["db"]
+        monkeypatch.setenv("ITMUX_CONFIG_LAYOUT", "yaml")
+        with pytest.raises(ConfigError, match="Unknown config layout"):
+            read_config_data(config_path)
+
+    def test_reads_existing_layout_before_migration(self, tmp_path, monkeypatch):
+        """指定された形式へまだ移行していなければ、移行元の形式を読む."""
+        config_path = tmp_path / "config.json"
+        config_path.write_text(json.dumps({"projects": {"p": {"name": "p"}}}))
+        monkeypatch.setenv("ITMUX_CONFIG_LAYOUT", "sqlite")
+
+        assert list(read_config_data(config_path)["projects"]) == ["p"]
+        assert not (tmp_path / "config.db").exists()
+
+
+class TestListProjectSummaries:
+    """list_project_summaries のテスト."""
+
+    def test_summaries(self, tmp_path):
+        """ProjectOrchestrator.list() と同じ形式で返す."""
+        config_path = tmp_path / "config.json"
+        config_path.write_text(json.dumps({
+            "projects": {
+                "p1": {
+                    "name": "p1",
+                    "description": "desc",
+                    "tmux_windows": [{"name": "editor"}, {"name": "server"}],
+                },
+                "p2": {"name": "p2"},
+            }
+        }))
+
+        result = list_project_summaries(config_path)
+
+        assert result == {
+            "p1": {"windows": ["editor", "server"], "count": 2, "description": "desc"},
+            "p2": {"windows": [], "count": 0, "description": None},
+        }
+
+
+class TestCurrentSessionName:
+    """current_session_name のテスト."""
+
+    def test_outside_tmux(self, monkeypatch):
+        """tmux外ではNone."""
+        monkeypatch.delenv("TMUX", raising=False)
+
+        assert current_session_name() is None
+
+    def test_inside_tmux(self, monkeypatch):
+        """tmux内ではセッション名を返す."""
+        monkeypatch.setenv("TMUX", "/tmp/tmux-501/default,1,0")
+
+        with patch("subprocess.run", return_value=MagicMock(stdout="my-project\n")):
+            assert current_session_name() == "my-project"
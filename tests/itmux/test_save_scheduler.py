@@ -0,0 +1,224 @@
+"""tests/itmux/test_save_scheduler.py - 保存の debounce スケジューラのテスト."""
+
+import asyncio
+import os
+import pytest
+
+from filelock import FileLock
+
+from itmux.save_scheduler import (
+    DebouncePolicy,
+    DebounceScheduler,
+    SaveCoordinator,
+    SaveDecision,
+    SaveScheduleFile,
+)
+
+
+class TestDebouncePolicy:
+    """DebouncePolicy のテスト."""
+
+    def test_due_is_trailing_edge_capped_by_max_wait(self):
+        policy = DebouncePolicy(window=1.0, max_wait=3.0)
+
+        assert policy.due(first=10.0, last=10.5) == 11.5
+        assert policy.due(first=10.0, last=12.5) == 13.0
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.setenv("ITMUX_SAVE_DEBOUNCE", "0.5")
+        monkeypatch.setenv("ITMUX_SAVE_MAX_WAIT", "invalid")
+        monkeypatch.setenv("ITMUX_SAVE_TRAILING", "off")
+
+        assert DebouncePolicy.from_env() == DebouncePolicy(window=0.5, max_wait=5.0, trailing=False)
+
+
+class TestDebounceScheduler:
+    """メモリ上のタイマー（デーモン用）のテスト."""
+
+    @pytest.mark.asyncio
+    async def test_burst_saves_once_after_last_request(self):
+        """連続した要求は最後の要求から window 後に1回だけ保存する."""
+        saved = []
+
+        async def save(projects):
+            saved.append(projects)
+
+        scheduler = DebounceScheduler(save, DebouncePolicy(window=0.05, max_wait=1.0))
+        for _ in range(3):
+            assert scheduler.request("a") is SaveDecision.SCHEDULED
+            await asyncio.sleep(0.02)
+        assert saved == []
+
+        await asyncio.sleep(0.1)
+
+        assert saved == [["a"]]
+        assert scheduler.pending == []
+
+    @pytest.mark.asyncio
+    async def test_max_wait_bounds_continuous_requests(self):
+        """要求が途切れなくても max_wait で保存する."""
+        saved = []
+
+        async def save(projects):
+            saved.append(projects)
+
+        scheduler = DebounceScheduler(save, DebouncePolicy(window=0.05, max_wait=0.1))
+        for _ in range(8):
+            scheduler.request("a")
+            await asyncio.sleep(0.03)
+
+        assert saved
+
+    @pytest.mark.asyncio
+    async def test_flush_runs_pending_saves(self):
+        """終了時は保存待ちをすぐに実行する."""
+        saved = []
+
+        async def save(projects):
+            saved.append(projects)
+
+        scheduler = DebounceScheduler(save, DebouncePolicy(window=10.0))
+        scheduler.request("a")
+        scheduler.request("b")
+
+        await scheduler.flush()
+
+        assert saved == [["a", "b"]]
+
+    @pytest.mark.asyncio
+    async def test_close_deadlines_are_saved_together(self):
+        """期限が近い別プロジェクトの保存は1回にまとめる."""
+        saved = []
+
+        async def save(projects):
+            saved.append(projects)
+
+        scheduler = DebounceScheduler(save, DebouncePolicy(window=0.05))
+        scheduler.request("a")
+        await asyncio.sleep(0.01)
+        scheduler.request("b")
+
+        await asyncio.sleep(0.15)
+
+        assert saved == [["a", "b"]]
+
+    @pytest.mark.asyncio
+    async def test_leading_edge(self):
+        """trailing=False では最初の要求で保存し、window 内の要求は捨てる."""
+        saved = []
+
+        async def save(projects):
+            saved.append(projects)
+
+        scheduler = DebounceScheduler(save, DebouncePolicy(window=10.0, trailing=False))
+
+        assert scheduler.request("a") is SaveDecision.RUN
+        assert scheduler.request("a") is SaveDecision.SKIPPED
+        await asyncio.sleep(0)
+        assert saved == [["a"]]
+
+
+class TestSaveScheduleFile:
+    """状態ファイル（デーモンなし）のテスト."""
+
+    def test_one_worker_for_all_projects(self, tmp_path):
+        """生きているワーカーがいる間は、他のプロジェクトの要求でも追加で起動しない."""
+        schedule = SaveScheduleFile(tmp_path / "s.json", DebouncePolicy(window=1.0))
+        spawned = []
+
+        def spawn():
+            spawned.append(1)
+            return os.getpid()
+
+        for project, now in (("a", 100.0), ("a", 100.2), ("b", 100.4)):
+            assert schedule.request(project, spawn, now=now) is SaveDecision.SCHEDULED
+
+        assert len(spawned) == 1
+        assert schedule.load()["a"] == {"first": 100.0, "last": 100.2}
+
+    def test_take_due_sleeps_until_trailing_deadline(self, tmp_path):
+        """ワーカーは最後の要求から window 後まで待ち、期限の近いプロジェクトをまとめて取り出す."""
+        schedule = SaveScheduleFile(tmp_path / "s.json", DebouncePolicy(window=1.0))
+        schedule.request("a", os.getpid, now=100.0)
+        schedule.request("b", os.getpid, now=100.1)
+        schedule.request("c", os.getpid, now=100.2)
+        clock = [100.2]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(round(seconds, 3))
+            # 待っている間に次の要求が届く
+            if len(sleeps) == 1:
+                schedule.request("a", os.getpid, now=100.5)
+            clock[0] += seconds
+
+        def take():
+            return schedule.take_due(sleep=sleep, clock=lambda: clock[0])
+
+        # a の期限は 101.5 に延び、期限の近い b（101.1）と c（101.2）を先にまとめて取り出す
+        assert take() == ["b", "c"]
+        assert sleeps == [0.8, 0.1]
+        assert take() == ["a"]
+        # 保存待ちがなくなるとワーカーの記録を消す（次の要求で新しいワーカーを起動する）
+        assert take() == []
+        spawned = []
+        schedule.request("a", lambda: spawned.append(1) or 1, now=200.0)
+        assert spawned == [1]
+
+    def test_leading_edge_skips_within_window(self, tmp_path):
+        schedule = SaveScheduleFile(tmp_path / "s.json", DebouncePolicy(window=1.0, trailing=False))
+
+        assert schedule.request("a", os.getpid, now=100.0) is SaveDecision.RUN
+        assert schedule.request("a", os.getpid, now=100.5) is SaveDecision.SKIPPED
+        assert schedule.request("a", os.getpid, now=101.5) is SaveDecision.RUN
+
+    def test_retain_removes_deleted_projects_and_legacy_stamps(self, tmp_path):
+        """存在しないプロジェクトの状態と .last_save_* を削除する."""
+        schedule = SaveScheduleFile(tmp_path / "s.json")
+        schedule.request("a", os.getpid, now=100.0)
+        schedule.request("gone", os.getpid, now=100.0)
+        (tmp_path / ".last_save_gone").write_text("100.0")
+
+        schedule.retain(["a"])
+
+        assert list(schedule.load()) == ["a"]
+        assert not (tmp_path / ".last_save_gone").exists()
+
+
+class TestSaveCoordinator:
+    """SaveCoordinator（single-flight）のテスト."""
+
+    def test_runs_when_idle(self, tmp_path):
+        coordinator = SaveCoordinator(tmp_path / "q.json")
+        saved = []
+
+        assert coordinator.run(["a"], saved.append) == 0
+        assert saved == [["a"]]
+
+    def test_queues_behind_running_save(self, tmp_path):
+        """実行中の保存があれば待ち行列に積んで戻り、次の実行でまとめて保存する."""
+        coordinator = SaveCoordinator(tmp_path / "q.json")
+        saved = []
+
+        with FileLock(coordinator.run_lock_path):
+            assert coordinator.run(["a"], saved.append) is None
+            assert coordinator.run(["b", "a"], saved.append) is None
+        assert saved == []
+
+        assert coordinator.run(["c"], saved.append) == 2
+        assert saved == [["a", "b", "c"]]
+
+    def test_request_during_save_gets_one_follow_up(self, tmp_path):
+        """保存中に届いた要求は、実行中のプロセスが続けてもう1回保存する."""
+        coordinator = SaveCoordinator(tmp_path / "q.json")
+        saved = []
+
+        def save(projects):
+            saved.append(projects)
+            if len(saved) == 1:
+                # 別プロセスからの要求（実行ロックを取れないので積むだけ）
+                for project in ("b", "c"):
+                    assert SaveCoordinator(coordinator.path).run([project], saved.append) is None
+
+        assert coordinator.run(["a"], save) == 1
+        assert saved == [["a"], ["b", "c"]]
@@ -0,0 +1,193 @@
+"""tests/itmux/test_session_manager.py - SessionManagerのテスト."""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from itmux.exceptions import ITerm2Error
+from itmux.tmux.batch import TmuxCommandResult
+from itmux.tmux.session_manager import CONNECTION_ID_OPTION, SessionManager
+
+
+def _tmux_conn(connection_id: str, session_name: str) -> MagicMock:
+    """session name を返す TmuxConnection のモック."""
+    conn = MagicMock()
+    conn.connection_id = connection_id
+
+    async def send_command(command):
+        if command.startswith("display-message"):
+            return f"{session_name}\n"
+        return ""
+
+    conn.async_send_command = AsyncMock(side_effect=send_command)
+    return conn
+
+
+def _probe_count(conn: MagicMock) -> int:
+    return sum(
+        1 for c in conn.async_send_command.await_args_list
+        if c.args[0].startswith("display-message")
+    )
+
+
+@pytest.fixture
+def no_persisted_id():
+    """セッションユーザーオプションにIDが記録されていない状態."""
+    with patch(
+        "itmux.tmux.session_manager.run_tmux",
+        return_value=TmuxCommandResult(args=[], ok=True, executed=True, output=""),
+    ) as mock_run:
+        yield mock_run
+
+
+class TestGetTmuxConnection:
+    """get_tmux_connection() のテスト."""
+
+    @pytest.mark.asyncio
+    async def test_probe_then_cache(self, mock_iterm2_connection, no_persisted_id):
+        """2回目以降はプローブせずキャッシュから返す."""
+        conns = [_tmux_conn(f"c{i}", f"proj{i}") for i in range(8)]
+        manager = SessionManager(mock_iterm2_connection)
+
+        with patch(
+            "itmux.tmux.session_manager.iterm2.async_get_tmux_connections",
+            AsyncMock(return_value=conns),
+        ):
+            first = await manager.get_tmux_connection("proj5")
+            second = await manager.get_tmux_connection("proj5")
+            other = await manager.get_tmux_connection("proj2")
+
+        assert first is conns[5]
+        assert second is conns[5]
+        assert other is conns[2]
+        assert all(_probe_count(conn) == 1 for conn in conns)
+
+    @pytest.mark.asyncio
+    async def test_probes_run_concurrently_with_timeout(
+        self, mock_iterm2_connection, no_persisted_id
+    ):
+        """応答しない接続はタイムアウトで読み飛ばす."""
+        hanging = MagicMock()
+        hanging.connection_id = "hang"
+
+        async def never(command):
+            await asyncio.sleep(10)
+
+        hanging.async_send_command = AsyncMock(side_effect=never)
+        target = _tmux_conn("ok", "proj")
+        manager = SessionManager(mock_iterm2_connection, probe_timeout=0.05)
+
+        with patch(
+            "itmux.tmux.session_manager.iterm2.async_get_tmux_connections",
+            AsyncMock(return_value=[hanging, target]),
+        ):
+            result = await asyncio.wait_for(manager.get_tmux_connection("proj"), timeout=1)
+
+        assert result is target
+
+    @pytest.mark.asyncio
+    async def test_stale_entries_are_rebuilt(self, mock_iterm2_connection, no_persisted_id):
+        """接続一覧から消えたIDはキャッシュから破棄して再プローブ."""
+        old = _tmux_conn("old", "proj")
+        new = _tmux_conn("new", "proj")
+        manager = SessionManager(mock_iterm2_connection)
+        get_conns = AsyncMock(return_value=[old])
+
+        with patch("itmux.tmux.session_manager.iterm2.async_get_tmux_connections", get_conns):
+            assert await manager.get_tmux_connection("proj") is old
+            get_conns.return_value = [new]
+            assert await manager.get_tmux_connection("proj") is new
+
+    @pytest.mark.asyncio
+    async def test_found_connection_id_is_persisted(
+        self, mock_iterm2_connection, no_persisted_id
+    ):
+        """プローブで見つけた connection_id をセッションユーザーオプションに記録."""
+        conn = _tmux_conn("gateway 1", "proj")
+        manager = SessionManager(mock_iterm2_connection)
+
+        with patch(
+            "itmux.tmux.session_manager.iterm2.async_get_tmux_connections",
+            AsyncMock(return_value=[conn]),
+        ):
+            await manager.get_tmux_connection("proj")
+
+        conn.async_send_command.assert_any_await(
+            f"set-option -t =proj: {CONNECTION_ID_OPTION} 'gateway 1'"
+        )
+
+    @pytest.mark.asyncio
+    async def test_persisted_connection_id_skips_probing(self, mock_iterm2_connection):
+        """記録済みIDが接続一覧にあれば、その接続だけをプローブする（hookプロセス向け）."""
+        conns = [_tmux_conn(f"c{i}", f"proj{i}") for i in range(4)]
+        manager = SessionManager(mock_iterm2_connection)
+
+        with patch(
+            "itmux.tmux.session_manager.run_tmux",
+            return_value=TmuxCommandResult(args=[], ok=True, executed=True, output="c3\n"),
+        ), patch(
+            "itmux.tmux.session_manager.iterm2.async_get_tmux_connections",
+            AsyncMock(return_value=conns),
+        ):
+            result = await manager.get_tmux_connection("proj3")
+
+        assert result is conns[3]
+        assert [_probe_count(conn) for conn in conns] == [0, 0, 0, 1]
+
+    @pytest.mark.asyncio
+    async def test_reused_connection_id_falls_back_to_probing(self, mock_iterm2_connection):
+        """記録済みIDが別のセッションの接続に再利用されていれば、全体のプローブで探し直す."""
+        conns = [_tmux_conn(f"c{i}", f"proj{i}") for i in range(4)]
+        manager = SessionManager(mock_iterm2_connection)
+
+        with patch(
+            "itmux.tmux.session_manager.run_tmux",
+            return_value=TmuxCommandResult(args=[], ok=True, executed=True, output="c1\n"),
+        ), patch(
+            "itmux.tmux.session_manager.iterm2.async_get_tmux_connections",
+            AsyncMock(return_value=conns),
+        ):
+            result = await manager.get_tmux_connection("proj3")
+            other = await manager.get_tmux_connection("proj1")
+
+        assert result is conns[3]
+        assert other is conns[1]
+        # 確認済みの接続は再プローブしない
+        assert all(_probe_count(conn) == 1 for conn in conns)
+        conns[3].async_send_command.assert_any_await(f"set-option -t =proj3: {CONNECTION_ID_OPTION} c3")
+
+    @pytest.mark.asyncio
+    async def test_not_found_raises(self, mock_iterm2_connection, no_persisted_id):
+        """該当する接続がなければ ITerm2Error."""
+        manager = SessionManager(mock_iterm2_connection)
+
+        with patch(
+            "itmux.tmux.session_manager.iterm2.async_get_tmux_connections",
+            AsyncMock(return_value=[_tmux_conn("c1", "other")]),
+        ):
+            with pytest.raises(ITerm2Error, match="TmuxConnection not found"):
+                await manager.get_tmux_connection("proj")
+
+
+class TestPersistedConnectionIdIntegration:
+    """記録した connection_id の読み込み（独立したtmuxサーバーを使用）."""
+
+    def test_reads_only_exact_session(self, tmp_path, monkeypatch):
+        """"proj" の記録を、前方一致する "project" セッションから読まない."""
+        import shutil
+        import subprocess
+
+        if shutil.which("tmux") is None:
+            pytest.skip("tmux not available")
+        monkeypatch.delenv("TMUX", raising=False)
+        monkeypatch.setenv("TMUX_TMPDIR", str(tmp_path))
+        try:
+            subprocess.run(["tmux", "new-session", "-d", "-s", "project"], check=True)
+            subprocess.run(
+                ["tmux", "set-option", "-t", "project", CONNECTION_ID_OPTION, "c1"], check=True
+            )
+
+            assert SessionManager._read_persisted_connection_id("project") == "c1"
+            assert SessionManager._read_persisted_connection_id("proj") is None
+        finally:
+            subprocess.run(["tmux", "kill-server"], capture_output=True, check=False)
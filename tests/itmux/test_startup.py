@@ -0,0 +1,50 @@
+"""tests/itmux/test_startup.py - サブコマンドの起動時間予算のテスト."""
+
+import pytest
+
+from itmux.startup import STARTUP_BUDGETS, check_budget, parse_importtime, profile_command
+
+
+class TestParseImporttime:
+    """-X importtime 出力の解析のテスト."""
+
+    def test_counts_top_level_after_cli(self):
+        """itmux.cli 以降のトップレベル import だけを合計する."""
+        stderr = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:      1000 |       5000 | site",
+            "import time:       300 |        300 |   itmux.exceptions",
+            "import time:      2000 |       2300 | itmux.cli",
+            "import time:       100 |        100 |   json.decoder",
+            "import time:       400 |        500 | json",
+        ])
+
+        import_seconds, modules = parse_importtime(stderr)
+
+        assert import_seconds == pytest.approx(0.0028)
+        assert "site" not in modules
+        assert {"itmux.cli", "json", "json.decoder"} <= modules
+
+
+class TestStartupBudgets:
+    """各サブコマンドが予算内で起動することのテスト."""
+
+    @pytest.mark.parametrize("command", list(STARTUP_BUDGETS))
+    def test_command_avoids_heavy_modules(self, command):
+        """重いモジュールを読み込まない（時間は判定しない）."""
+        profile = profile_command(command)
+
+        assert "itmux.cli" in profile.modules
+        assert check_budget(profile, timing=False) == []
+
+    @pytest.mark.bench
+    @pytest.mark.parametrize("command", list(STARTUP_BUDGETS))
+    def test_command_within_budget(self, command):
+        """import 時間が予算内（--run-bench を指定したときだけ実行）."""
+        # 揺れを除くため、2回のうち速い方で判定する
+        profile = min(
+            (profile_command(command) for _ in range(2)),
+            key=lambda p: p.import_seconds,
+        )
+
+        assert check_budget(profile) == []
@@ -0,0 +1,138 @@
+"""tests/itmux/test_tmux_batch.py - tmuxコマンド一括実行のテスト."""
+
+import os
+import shutil
+import subprocess
+import pytest
+from unittest.mock import MagicMock, patch
+
+from itmux.tmux.batch import TmuxBatch, escape_argument, run_tmux
+
+
+def _marker_of(argv: list[str]) -> str:
+    """argv からマーカー接頭辞を取り出す."""
+    index = argv.index("display-message")
+    return argv[index + 2][:-1]
+
+
+class TestEscapeArgument:
+    """escape_argument() のテスト."""
+
+    def test_plain_argument_unchanged(self):
+        assert escape_argument("value") == "value"
+
+    def test_trailing_semicolon_escaped(self):
+        assert escape_argument("a;") == "a\\;"
+
+    def test_trailing_escaped_semicolon_escaped_again(self):
+        """元から `\\;` で終わる値も tmux に `\\;` として渡るようエスケープ."""
+        assert escape_argument("a\\;") == "a\\\\;"
+
+    def test_inner_semicolon_unchanged(self):
+        assert escape_argument("a;b") == "a;b"
+
+
+class TestTmuxBatch:
+    """TmuxBatch.run() のテスト（subprocess モック）."""
+
+    def test_empty_batch_does_not_fork(self):
+        """コマンドがなければ tmux を起動しない."""
+        with patch("itmux.tmux.batch.subprocess.run") as mock_run:
+            assert TmuxBatch().run() == []
+        mock_run.assert_not_called()
+
+    def test_commands_joined_in_single_invocation(self):
+        """全コマンドを1回のtmux起動で実行し、出力をコマンドごとに分割."""
+        batch = TmuxBatch()
+        batch.add("show-environment", "-t", "proj")
+        batch.add("set-environment", "-t", "proj", "FOO", "bar")
+
+        def fake_run(argv, **kwargs):
+            marker = _marker_of(argv)
+            stdout = f"A=1\nB=2\n{marker}0\n{marker}1\n"
+            return MagicMock(returncode=0, stdout=stdout, stderr="")
+
+        with patch("itmux.tmux.batch.subprocess.run", side_effect=fake_run) as mock_run:
+            results = batch.run()
+
+        assert mock_run.call_count == 1
+        argv = mock_run.call_args.args[0]
+        assert argv[:4] == ["tmux", "show-environment", "-t", "proj"]
+        assert ";" in argv
+        assert [r.ok for r in results] == [True, True]
+        assert results[0].lines == ["A=1", "B=2"]
+        assert results[1].output == ""
+
+    def test_failure_stops_remaining_commands(self):
+        """失敗したコマンド以降は executed=False."""
+        batch = TmuxBatch()
+        batch.add("has-session", "-t", "a")
+        batch.add("has-session", "-t", "missing")
+        batch.add("set-environment", "-t", "missing", "FOO", "bar")
+
+        def fake_run(argv, **kwargs):
+            marker = _marker_of(argv)
+            return MagicMock(
+                returncode=1,
+                stdout=f"{marker}0\n",
+                stderr="can't find session: missing\n",
+            )
+
+        with patch("itmux.tmux.batch.subprocess.run", side_effect=fake_run):
+            results = batch.run()
+
+        assert results[0].ok is True
+        assert results[1].ok is False
+        assert results[1].executed is True
+        assert "can't find session" in results[1].error
+        assert results[2].executed is False
+
+    def test_env_is_passed(self):
+        """env 指定時はそれを subprocess に渡す."""
+        with patch("itmux.tmux.batch.subprocess.run") as mock_run:
+            mock_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
+            run_tmux("list-sessions", env={"PATH": "/usr/bin"})
+
+        assert mock_run.call_args.kwargs["env"] == {"PATH": "/usr/bin"}
+
+
+class TestTmuxBatchIntegration:
+    """TmuxBatch の tmux 実機検証（独立したtmuxサーバーを使用）."""
+
+    @pytest.fixture
+    def tmux_env(self, tmp_path):
+        if shutil.which("tmux") is None:
+            pytest.skip("tmux not available")
+        env = os.environ.copy()
+        env.pop("TMUX", None)
+        env["TMUX_TMPDIR"] = str(tmp_path)
+        yield env
+        subprocess.run(["tmux", "kill-server"], env=env, capture_output=True, check=False)
+
+    def test_per_command_status_and_output(self, tmux_env):
+        """1回の起動でセッション作成・環境変数設定・取得ができる."""
+        batch = TmuxBatch(env=tmux_env)
+        batch.add("new-session", "-d", "-s", "batch-test")
+        batch.add("set-environment", "-t", "batch-test", "FOO", "ends;")
+        batch.add("show-environment", "-t", "batch-test", "FOO")
+        batch.add("has-session", "-t", "missing")
+        batch.add("set-environment", "-t", "batch-test", "BAR", "never")
+
+        results = batch.run()
+
+        assert [r.ok for r in results] == [True, True, True, False, False]
+        assert results[2].lines == ["FOO=ends;"]
+        assert results[4].executed is False
+        assert not run_tmux("show-environment", "-t", "batch-test", "BAR", env=tmux_env).ok
+
+    def test_value_ending_with_escaped_semicolon_round_trips(self, tmux_env):
+        """`\\;` で終わる値がそのまま保存される."""
+        batch = TmuxBatch(env=tmux_env)
+        batch.add("new-session", "-d", "-s", "batch-test")
+        batch.add("set-environment", "-t", "batch-test", "FOO", "ends\\;")
+        batch.add("show-environment", "-t", "batch-test", "FOO")
+
+        results = batch.run()
+
+        assert all(r.ok for r in results)
+        assert results[2].lines == ["FOO=ends\\;"]
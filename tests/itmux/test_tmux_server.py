@@ -0,0 +1,92 @@
+"""tests/itmux/test_tmux_server.py - tmux サーバーのスナップショットのテスト."""
+
+import os
+import shutil
+import subprocess
+import pytest
+from unittest.mock import MagicMock, patch
+
+from itmux.tmux.batch import run_tmux
+from itmux.tmux.server import TmuxServerSnapshot
+
+
+class TestParse:
+    """list-windows 出力の解析."""
+
+    def test_groups_windows_by_session(self):
+        output = "\n".join(
+            [
+                "proj\t@3\t1\t2\tserver",
+                "proj\t@1\t0\t1\teditor",
+                "other\t@5\t0\t1\tzsh",
+                "garbage",
+            ]
+        )
+
+        server = TmuxServerSnapshot.parse(output)
+
+        assert server.running is True
+        assert sorted(server.sessions) == ["other", "proj"]
+        assert [(w.index, w.name, w.panes) for w in server.windows("proj")] == [
+            (0, "editor", 1),
+            (1, "server", 2),
+        ]
+        assert server.windows("missing") == []
+
+    def test_session_name_is_exact_match(self):
+        server = TmuxServerSnapshot.parse("project\t@1\t0\t1\tzsh")
+
+        assert server.has_session("project") is True
+        assert server.has_session("proj") is False
+
+
+class TestCapture:
+    """capture() のテスト（subprocess モック）."""
+
+    def test_one_tmux_call(self):
+        with patch("itmux.tmux.batch.subprocess.run") as mock_run:
+            mock_run.return_value = MagicMock(returncode=0, stdout="a\t@1\t0\t1\tzsh\n", stderr="")
+            server = TmuxServerSnapshot.capture()
+
+        mock_run.assert_called_once()
+        assert mock_run.call_args.args[0][1:3] == ["list-windows", "-a"]
+        assert server.has_session("a")
+
+    def test_no_server(self):
+        with patch("itmux.tmux.batch.subprocess.run") as mock_run:
+            mock_run.return_value = MagicMock(
+                returncode=1, stdout="", stderr="no server running on /tmp/tmux-0/default"
+            )
+            server = TmuxServerSnapshot.capture()
+
+        assert server.running is False
+        assert server.sessions == {}
+
+
+class TestServerIntegration:
+    """tmux 実機での取得（独立したtmuxサーバーを使用）."""
+
+    @pytest.fixture
+    def tmux_env(self, tmp_path):
+        if shutil.which("tmux") is None:
+            pytest.skip("tmux not available")
+        env = os.environ.copy()
+        env.pop("TMUX", None)
+        env["TMUX_TMPDIR"] = str(tmp_path)
+        yield env
+        subprocess.run(["tmux", "kill-server"], env=env, capture_output=True, check=False)
+
+    def test_capture_live_server(self, tmux_env):
+        assert TmuxServerSnapshot.capture(env=tmux_env).running is False
+
+        run_tmux("new-session", "-d", "-s", "proj", "-n", "editor", env=tmux_env)
+        run_tmux("split-window", "-t", "=proj:=editor", env=tmux_env)
+        run_tmux("new-window", "-d", "-t", "=proj:", "-n", "my server", env=tmux_env)
+
+        server = TmuxServerSnapshot.capture(env=tmux_env)
+
+        assert server.running is True
+        assert [(w.name, w.panes) for w in server.windows("proj")] == [
+            ("editor", 2),
+            ("my server", 1),
+        ]
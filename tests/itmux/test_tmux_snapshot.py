@@ -0,0 +1,283 @@
+"""tests/itmux/test_tmux_snapshot.py - tmux レイアウトのスナップショットのテスト."""
+
+import os
+import shutil
+import subprocess
+import pytest
+from unittest.mock import MagicMock, patch
+
+from itmux.tmux.batch import run_tmux
+from itmux.tmux.snapshot import (
+    PANE_FIELDS,
+    PaneSnapshot,
+    ProjectSnapshot,
+    WindowSnapshot,
+    build_restore_batch,
+    capture_snapshots,
+    load_snapshot,
+    parse_list_panes,
+    read_pending_restores,
+    read_snapshot_fingerprint,
+    restore_snapshot,
+    save_snapshot,
+    write_pending_restores,
+)
+
+
+LAYOUT = "b25f,200x50,0,0{100x50,0,0,1,99x50,101,0,2}"
+
+
+def _row(**values) -> str:
+    defaults = {
+        "session_name": "proj",
+        "window_index": "0",
+        "window_name": "editor",
+        "window_layout": LAYOUT,
+        "window_active": "1",
+        "pane_index": "0",
+        "pane_active": "1",
+        "pane_current_path": "/tmp",
+        "pane_current_command": "zsh",
+    }
+    defaults.update(values)
+    return "\t".join(defaults[name] for name in PANE_FIELDS)
+
+
+@pytest.fixture
+def sample_snapshot():
+    """2ウィンドウ（2ペイン + 1ペイン）のスナップショット."""
+    return ProjectSnapshot(
+        session="proj",
+        windows=[
+            WindowSnapshot(
+                index=0,
+                name="editor",
+                layout=LAYOUT,
+                active=False,
+                panes=[
+                    PaneSnapshot(cwd="/tmp", command="vim"),
+                    PaneSnapshot(cwd="/usr", command="zsh", active=True),
+                ],
+            ),
+            WindowSnapshot(
+                index=1,
+                name="server",
+                layout="c3d4,200x50,0,0,3",
+                active=True,
+                panes=[PaneSnapshot(cwd="/var", command="zsh", active=True)],
+            ),
+        ],
+    )
+
+
+class TestParse:
+    """list-panes 出力の解析."""
+
+    def test_groups_panes_by_session_and_window(self):
+        output = "\n".join(
+            [
+                _row(pane_current_command="vim"),
+                _row(pane_index="1", pane_active="0", pane_current_path="/usr"),
+                _row(window_index="1", window_name="server", window_active="0"),
+                _row(session_name="other"),
+            ]
+        )
+
+        snapshots = parse_list_panes(output)
+
+        assert list(snapshots) == ["proj", "other"]
+        windows = snapshots["proj"].windows
+        assert [w.name for w in windows] == ["editor", "server"]
+        assert [p.cwd for p in windows[0].panes] == ["/tmp", "/usr"]
+        assert windows[0].panes[0].command == "vim"
+        assert windows[0].size == (200, 50)
+
+    def test_ignores_malformed_lines(self):
+        assert parse_list_panes("garbage\n") == {}
+
+
+class TestCapture:
+    """capture_snapshots() のテスト（subprocess モック）."""
+
+    def _fake_run(self, stdout):
+        def fake_run(argv, **kwargs):
+            marker = argv[argv.index("display-message") + 2]
+            return MagicMock(returncode=0, stdout=f"{stdout}\n{marker}\n", stderr="")
+
+        return fake_run
+
+    def test_single_project_is_one_tmux_call(self):
+        """1プロジェクトは list-panes -s -t の1回で取得する."""
+        with patch(
+            "itmux.tmux.batch.subprocess.run", side_effect=self._fake_run(_row())
+        ) as mock_run:
+            snapshots = capture_snapshots(["proj"])
+
+        assert mock_run.call_count == 1
+        argv = mock_run.call_args.args[0]
+        assert argv[1:5] == ["list-panes", "-s", "-t", "=proj"]
+        assert list(snapshots) == ["proj"]
+
+    def test_multiple_projects_filter_all_panes(self):
+        """複数プロジェクトは list-panes -a の1回で取得し、対象だけを返す."""
+        output = "\n".join([_row(), _row(session_name="b"), _row(session_name="scratch")])
+        with patch(
+            "itmux.tmux.batch.subprocess.run", side_effect=self._fake_run(output)
+        ) as mock_run:
+            snapshots = capture_snapshots(["proj", "b", "missing"])
+
+        assert mock_run.call_count == 1
+        assert "-a" in mock_run.call_args.args[0]
+        assert sorted(snapshots) == ["b", "proj"]
+
+
+class TestPersistence:
+    """保存・読み込みのテスト."""
+
+    def test_round_trip_and_skip_identical(self, tmp_path, sample_snapshot):
+        path = tmp_path / "snapshots" / "proj.json"
+
+        assert save_snapshot(sample_snapshot, path) is True
+        assert save_snapshot(sample_snapshot, path) is False
+        assert load_snapshot(path) == sample_snapshot
+
+    def test_fingerprint_ignores_commands_and_focus(self, tmp_path, sample_snapshot):
+        """前面のコマンド・アクティブなペインだけの変化では保存しない."""
+        path = tmp_path / "proj.json"
+        save_snapshot(sample_snapshot, path)
+
+        sample_snapshot.windows[0].panes[0].command = "less"
+        sample_snapshot.windows[0].panes[0].active = True
+        assert save_snapshot(sample_snapshot, path) is False
+        assert read_snapshot_fingerprint(path) == sample_snapshot.fingerprint()
+
+        sample_snapshot.windows[0].panes[1].cwd = "/opt"
+        assert save_snapshot(sample_snapshot, path) is True
+        assert load_snapshot(path).windows[0].panes[1].cwd == "/opt"
+
+    def test_load_invalid_returns_none(self, tmp_path):
+        path = tmp_path / "proj.json"
+        path.write_text("{not json")
+
+        assert load_snapshot(path) is None
+        assert load_snapshot(tmp_path / "missing.json") is None
+
+
+class TestRestoreBatch:
+    """build_restore_batch() のテスト."""
+
+    def test_builds_session_windows_and_layout(self, sample_snapshot):
+        commands = build_restore_batch(sample_snapshot).commands
+
+        assert commands[0] == [
+            "new-session", "-d", "-s", "proj", "-n", "editor", "-c", "/tmp", "-x", "200", "-y", "50",
+        ]
+        assert ["split-window", "-t", "=proj:$", "-c", "/usr"] in commands
+        assert ["select-layout", "-t", "=proj:$", LAYOUT] in commands
+        assert ["select-pane", "-t", "=proj:$.+2"] in commands
+        assert ["new-window", "-d", "-t", "=proj:", "-n", "server", "-c", "/var"] in commands
+        assert commands[-1] == ["select-window", "-t", "=proj:$"]
+
+    def test_never_targets_windows_by_name(self, sample_snapshot):
+        """ウィンドウ名は -n でのみ使い、対象の指定には使わない."""
+        sample_snapshot.windows[1].name = "editor"
+        commands = build_restore_batch(sample_snapshot).commands
+
+        targets = [c[c.index("-t") + 1] for c in commands if "-t" in c]
+        assert all("editor" not in target for target in targets)
+
+
+class TestSnapshotIntegration:
+    """tmux 実機でのスナップショット取得と復元（独立したtmuxサーバーを使用）."""
+
+    @pytest.fixture
+    def tmux_env(self, tmp_path):
+        if shutil.which("tmux") is None:
+            pytest.skip("tmux not available")
+        env = os.environ.copy()
+        env.pop("TMUX", None)
+        env["TMUX_TMPDIR"] = str(tmp_path)
+        yield env
+        subprocess.run(["tmux", "kill-server"], env=env, capture_output=True, check=False)
+
+    def test_capture_and_restore_round_trip(self, tmux_env, tmp_path):
+        """保存したウィンドウ・ペイン・作業ディレクトリが復元される."""
+        dirs = [tmp_path / name for name in ("a", "b", "c")]
+        for d in dirs:
+            d.mkdir()
+        run_tmux(
+            "new-session", "-d", "-s", "proj", "-n", "editor", "-c", str(dirs[0]),
+            "-x", "160", "-y", "40", env=tmux_env,
+        )
+        run_tmux("split-window", "-h", "-t", "=proj:=editor", "-c", str(dirs[1]), env=tmux_env)
+        run_tmux("new-window", "-d", "-t", "=proj:", "-n", "server", "-c", str(dirs[2]), env=tmux_env)
+
+        original = capture_snapshots(["proj"], env=tmux_env)["proj"]
+        run_tmux("kill-server", env=tmux_env)
+
+        assert restore_snapshot(original, env=tmux_env) is True
+        restored = capture_snapshots(["proj"], env=tmux_env)["proj"]
+
+        assert [w.name for w in restored.windows] == ["editor", "server"]
+        assert [[p.cwd for p in w.panes] for w in restored.windows] == [
+            [str(dirs[0].resolve()), str(dirs[1].resolve())],
+            [str(dirs[2].resolve())],
+        ]
+        # レイアウト文字列の先頭（チェックサム）以外が一致する
+        assert restored.windows[0].layout.split(",", 1)[1] == original.windows[0].layout.split(",", 1)[1]
+
+    def test_restore_duplicate_and_dotted_names(self, tmux_env, tmp_path):
+        """同名のウィンドウや `.`・`:` を含む名前、base-index が 0 以外でも全て復元する."""
+        run_tmux("new-session", "-d", "-s", "keep", env=tmux_env)
+        run_tmux("set-option", "-g", "base-index", "1", env=tmux_env)
+        run_tmux(
+            "new-session", "-d", "-s", "proj", "-n", "zsh", "-c", str(tmp_path),
+            "-x", "160", "-y", "40", env=tmux_env,
+        )
+        run_tmux("split-window", "-h", "-t", "=proj:1", env=tmux_env)
+        run_tmux("new-window", "-t", "=proj:", "-n", "zsh", env=tmux_env)
+        run_tmux("split-window", "-v", "-t", "=proj:2", env=tmux_env)
+        run_tmux("new-window", "-d", "-t", "=proj:", "-n", "a.b:c", env=tmux_env)
+        original = capture_snapshots(["proj"], env=tmux_env)["proj"]
+        run_tmux("kill-session", "-t", "=proj", env=tmux_env)
+
+        assert restore_snapshot(original, env=tmux_env) is True
+
+        restored = capture_snapshots(["proj"], env=tmux_env)["proj"]
+        assert [(w.index, w.name, len(w.panes)) for w in restored.windows] == [
+            (1, "zsh", 2),
+            (2, "zsh", 2),
+            (3, "a.b:c", 1),
+        ]
+        assert [w.active for w in restored.windows] == [False, True, False]
+        # 左右・上下の分割（レイアウト）もウィンドウごとに復元される
+        assert [w.layout[w.layout.index(",0,0") + 4] for w in restored.windows[:2]] == ["{", "["]
+
+    def test_failed_restore_removes_partial_session(self, tmux_env, sample_snapshot):
+        """途中で失敗した復元は作りかけのセッションを残さない."""
+        run_tmux("new-session", "-d", "-s", "keep", env=tmux_env)
+        sample_snapshot.windows[0].layout = "invalid"
+
+        assert restore_snapshot(sample_snapshot, env=tmux_env) is False
+        assert not run_tmux("has-session", "-t", "=proj", env=tmux_env).ok
+
+    def test_restore_existing_session_fails(self, tmux_env, sample_snapshot):
+        """既存のセッションには復元しない."""
+        run_tmux("new-session", "-d", "-s", "proj", env=tmux_env)
+
+        assert restore_snapshot(sample_snapshot, env=tmux_env) is False
+        # 既存のセッションは削除しない
+        assert run_tmux("has-session", "-t", "=proj", env=tmux_env).ok
+
+    def test_pending_restores_live_on_the_server(self, tmux_env):
+        """復元待ちはサーバーのオプションに記録し、サーバーがなければ None."""
+        assert read_pending_restores(env=tmux_env) is None
+        assert write_pending_restores(["a"], env=tmux_env) is False
+
+        run_tmux("new-session", "-d", "-s", "proj", env=tmux_env)
+        assert read_pending_restores(env=tmux_env) == []
+        assert write_pending_restores(["b c", "a"], env=tmux_env) is True
+        assert read_pending_restores(env=tmux_env) == ["a", "b c"]
+
+        assert write_pending_restores([], env=tmux_env) is True
+        assert read_pending_restores(env=tmux_env) == []
@@ -0,0 +1,43 @@
+"""tests/itmux/test_window_events.py - ウィンドウイベントの差分同期のテスト."""
+
+import pytest
+
+from itmux.tmux.window_events import WindowEvent, WindowMap
+
+
+class TestWindowEvent:
+    def test_strips_window_id_prefix(self):
+        assert WindowEvent("added", "@3").window_id == "3"
+
+    def test_rejects_unknown_kind(self):
+        with pytest.raises(ValueError):
+            WindowEvent("renamed", "3")
+
+
+class TestWindowMap:
+    """WindowMap のテスト."""
+
+    def test_round_trip(self):
+        window_map = WindowMap([("1", "editor"), ("4", "my server")])
+
+        assert WindowMap.loads(window_map.dumps()) == window_map
+        assert WindowMap.loads("") is None
+        assert WindowMap.loads('{"1": "editor"}') is None
+
+    def test_position_for_added(self):
+        window_map = WindowMap([("1", "editor"), ("4", "server")])
+        names = ["editor", "server"]
+
+        assert window_map.position_for_added("3", names, ["1", "3", "4"]) == 1
+        assert window_map.position_for_added("5", names, ["1", "4", "5"]) == 2
+        # 対応表にないウィンドウが他にもある・config と食い違う場合は全体の照合
+        assert window_map.position_for_added("5", names, ["1", "2", "4", "5"]) is None
+        assert window_map.position_for_added("5", ["editor"], ["1", "4", "5"]) is None
+
+    def test_position_for_removed(self):
+        window_map = WindowMap([("1", "editor"), ("4", "server")])
+        names = ["editor", "server"]
+
+        assert window_map.position_for_removed("1", names, ["4"]) == 0
+        assert window_map.position_for_removed("9", names, ["1", "4"]) is None
+        assert window_map.position_for_removed("1", names, ["4", "7"]) is None